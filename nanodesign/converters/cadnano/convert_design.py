@@ -188,8 +188,9 @@ class CadnanoConvertDesign(object):
         #__if self._logger.getEffectiveLevel() == logging.DEBUG
 
         # Remove deleted bases.
+        modified_helices = set()
         if (modify):
-            self._delete_bases(helices, base_connectivity)
+            modified_helices.update(self._delete_bases(helices, base_connectivity))
             print_base_connectivity = False
             if print_base_connectivity:
                 self._logger.info("Size of topology after deletes %d" % len(base_connectivity))
@@ -206,7 +207,7 @@ class CadnanoConvertDesign(object):
 
         # Add inserted bases.
         if (modify):
-            self._insert_bases(helices, base_connectivity)
+            modified_helices.update(self._insert_bases(helices, base_connectivity))
             print_base_connectivity = False
             if print_base_connectivity:
                 self._logger.info("Size of topology after inserts %d" % len(base_connectivity))
@@ -220,6 +221,12 @@ class CadnanoConvertDesign(object):
             #__if print_base_connectivity_p
         #__if (modify)
 
+        # Regenerate the coordinate arrays of helices with deleted or inserted bases.
+        for helix in helices:
+            if helix.id in modified_helices:
+                helix.update_modified_bases()
+        #__for helix in helices
+
         # Create a DnaStructure object to store the base connectivty and helices.
         name = "dna structure"
         self.dna_structure = DnaStructure(name, base_connectivity, helices, self.dna_parameters)
@@ -230,7 +237,7 @@ class CadnanoConvertDesign(object):
         if strands == None:
             self._logger.error("Create strands failed.")
             sys.exit(1)
-        self._set_strands_colors(strands)
+        self._set_strands_colors()
         self.dna_structure.strands = strands
         self._logger.info("Number of strands %d " % len(strands)) 
         if self._logger.getEffectiveLevel() == logging.DEBUG:
@@ -249,25 +256,41 @@ class CadnanoConvertDesign(object):
     #__def create_structure
 
     def _delete_bases(self, helices, base_connectivity):
-        """ Remove bases from helices and base_connectivity.  """
+        """ Remove bases from helices and base_connectivity.  
+
+            Arguments:
+                helices(List[DnaStructureHelix]): The list of helices for the structure.
+                base_connectivity (List[DnaBase]): The list of DNA bases for the structure.
+
+            Returns the set of IDs of the helices with deleted bases. 
+
+            Deleted bases are flagged in a mask indexed by base ID and removed from base_connectivity[] 
+            in a single pass. The helix coordinate arrays are not updated.
+        """
         self._logger.debug("==================== delete bases ====================")
 
         # Delete bases from each helix.
         num_deleted_bases = 0
+        modified_helices = set()
+        is_deleted = np.zeros(len(base_connectivity), dtype=bool)
         for helix in helices:
-            deleted_bases = helix.process_base_deletes()
+            deleted_bases = helix.process_base_deletes(update_coordinates=False)
+            if len(deleted_bases) == 0:
+                continue
             num_deleted_bases += len(deleted_bases)
-            # Remove bases from base_connectivity.
+            modified_helices.add(helix.id)
             for base in deleted_bases:
                 self._logger.debug("Delete base %d" % base.id)
-                base_connectivity.remove(base)
+                is_deleted[base.id] = True
             #__for base in deleted_bases
         #__for helix in helices
 
-        # Renumber base IDs.
+        # Remove bases from base_connectivity and renumber base IDs.
         if num_deleted_bases != 0:
             self._logger.info("Number of deleted bases %d" % num_deleted_bases) 
+            base_connectivity[:] = [base for base in base_connectivity if not is_deleted[base.id]]
             self._renumber_baseIDs(base_connectivity)
+        return modified_helices
 
     def _insert_bases(self, helices, base_connectivity):
         """ Insert bases into helices and base_connectivity[]. 
@@ -276,8 +299,10 @@ class CadnanoConvertDesign(object):
                 helices(List[DnaStructureHelix]): The list of helices for the structure.
                 base_connectivity (List[DnaBase]): The list of DNA bases for the structure.
 
+           Returns the set of IDs of the helices with inserted bases. 
+
            The DnaBase.num_inserts attribute determines the number of bases inserted at that base. 
-           Bases are inserted in the 3' direction. 
+           Bases are inserted in the 3' direction. The helix coordinate arrays are not updated.
         """
         self._logger.debug("==================== insert bases ====================")
         num_bases = len(base_connectivity)
@@ -305,7 +330,7 @@ class CadnanoConvertDesign(object):
         #__for helix in helices
         self._logger.debug("Number of base inserts %d" % len(base_inserts))
         if len(base_inserts) == 0:
-            return 
+            return set()
 
         # Iterated over bases with inserts. 
         processed_bases = set()
@@ -373,10 +398,11 @@ class CadnanoConvertDesign(object):
         for helix_id in new_bases.keys():
             base_list = new_bases[helix_id]
             self._logger.debug("Helix ID %d  add num bases %d " % (helix_id, len(base_list)))
-            helix_map[helix_id].insert_bases(base_list)
+            helix_map[helix_id].insert_bases(base_list, update_coordinates=False)
         #__for helix_id in new_bases.keys()
 
         self._logger.info("Number of inserted bases %d" % num_insert_bases)
+        return set(new_bases.keys())
     #__def _insert_bases
 
     def _insert_bases_ssDNA(self, curr_base, base_id, helix_axis, new_bases, base_connectivity):
@@ -500,11 +526,12 @@ class CadnanoConvertDesign(object):
         rot_mat = vrrotvec2mat(y_up_vec, deg2rad(ang_bp))
         next_frame = np.dot(rot_mat,curr_frame)
         [insert_coords, insert_frames] = bp_interp(curr_coords, curr_frame, next_coords, next_frame, num_inserts/2)
-        self._logger.debug("Insert dsDNA")
-        self._logger.debug("num_inserts %d " % num_inserts)
-        self._logger.debug("next_coords %s" % str(next_coords))
-        self._logger.debug("curr_coords %s" % str(curr_coords))
-        self._logger.debug("insert coords %s" % str(insert_coords )) 
+        if self._logger.getEffectiveLevel() == logging.DEBUG:
+            self._logger.debug("Insert dsDNA")
+            self._logger.debug("num_inserts %d " % num_inserts)
+            self._logger.debug("next_coords %s" % str(next_coords))
+            self._logger.debug("curr_coords %s" % str(curr_coords))
+            self._logger.debug("insert coords %s" % str(insert_coords )) 
 
         # Create bases to insert.
         last_base1 = None 
@@ -781,26 +808,21 @@ class CadnanoConvertDesign(object):
                 shelix.possible_scaffold_crossovers.append((cross_sh,index,coord))
         #__for vhelix in design.helices
 
-    def _set_strands_colors(self, strands):
+    def _set_strands_colors(self):
         """ Set the color for staple strands. 
 
-            Arguments:
-                strands (List[DnaStrand]): The list of strands for the design.
-
             Strands may not have colors assigned to them. If they do then they have both
             an RGB and integer representation. The integer representation can be used
             as an ID to group staple strands by functionality.
+
+            A staple color is defined at the position of the first base of a staple so the 
+            staple is looked up using the structure strand start index.
         """
-        for strand in strands:
-            if (strand.is_scaffold):
-                continue 
-            base = strand.tour[0]
-            for staple_color in self.staple_colors:
-                if ((staple_color.vhelix_num == base.h) and (staple_color.vhelix_pos == base.p)): 
-                    strand.color = staple_color.rgb 
-                    strand.icolor = staple_color.color
-            #__for color in self.staple_colors
-        #__for strand in strands
+        for staple_color in self.staple_colors:
+            strand = self.dna_structure.get_strand_by_start(staple_color.vhelix_num, staple_color.vhelix_pos)
+            if strand: 
+                self.dna_structure.set_strand_color(strand, staple_color.rgb, staple_color.color)
+        #__for staple_color in self.staple_colors
 
     def set_sequence_from_name(self, dna_structure, modified_structure, seq_name):
         """ Set the sequence information for the staple and scaffold strands using a known
@@ -50,8 +50,7 @@ def generate_coordinates(dna_parameters, lattice_type, row, col, helix_num, scaf
 
     # Positions of the scaffold nucleotide and staple nucleotide
     # in the local reference frame.
-    scaf_local = r_helix * np.array([cos(deg2rad(180-ang_minor/2)), sin(deg2rad(180-ang_minor/2)), 0.0]).transpose()
-    stap_local = r_helix * np.array([cos(deg2rad(180+ang_minor/2)), sin(deg2rad(180+ang_minor/2)), 0.0]).transpose()
+    scaf_local, stap_local = get_nucleotide_local_coordinates(dna_parameters)
 
     # Set the helix start coordinates. 
     init_coord,init_ang = get_start_coordinates_angle(dna_parameters, lattice_type, row, col, helix_num)
@@ -111,6 +110,39 @@ def generate_coordinates(dna_parameters, lattice_type, row, col, helix_num, scaf
     return axis_coords, axis_frames, scaffold_coords, staple_coords 
 #__def generate_coordinates
 
+def get_nucleotide_local_coordinates(dna_parameters):
+    """ Get the positions of the scaffold and staple nucleotides in a base reference frame. 
+
+        Arguments:
+            dna_parameters (DnaParameters): The DNA parameters to use when creating the 3D geometry for the design.
+
+        Returns:
+            scaf_local (NumPy 3 ndarray[float]): The scaffold nucleotide position.
+            stap_local (NumPy 3 ndarray[float]): The staple nucleotide position.
+    """
+    r_helix = dna_parameters.helix_radius          # radius of DNA helices (nm)
+    ang_minor = dna_parameters.minor_groove_angle  # angle of the minor groove (degrees)
+    scaf_local = r_helix * np.array([cos(deg2rad(180-ang_minor/2)), sin(deg2rad(180-ang_minor/2)), 0.0]).transpose()
+    stap_local = r_helix * np.array([cos(deg2rad(180+ang_minor/2)), sin(deg2rad(180+ang_minor/2)), 0.0]).transpose()
+    return scaf_local, stap_local
+#__def get_nucleotide_local_coordinates
+
+def compute_nucleotide_coordinates(dna_parameters, coords, frames, is_scaffold):
+    """ Compute the nucleotide coordinates for a set of bases from their helix axis coordinates and frames. 
+
+        Arguments:
+            dna_parameters (DnaParameters): The DNA parameters to use when creating the 3D geometry for the design.
+            coords (NumPy Nx3 ndarray[float]): The helix axis coordinates of the bases.
+            frames (NumPy Nx3x3 ndarray[float]): The helix axis reference frames of the bases.
+            is_scaffold (bool): If True then compute scaffold nucleotide coordinates, else staple. 
+
+        Returns the nucleotide coordinates (NumPy Nx3 ndarray[float]).
+    """
+    scaf_local, stap_local = get_nucleotide_local_coordinates(dna_parameters)
+    local = scaf_local if is_scaffold else stap_local
+    return coords + np.dot(frames, local)
+#__def compute_nucleotide_coordinates
+
 def get_start_coordinates_angle(dna_parameters, lattice_type, row, col, helix_num):
     """ Get the start axis coordinates and angle for a virtual helix. 
 
@@ -180,7 +212,10 @@ def vrrotmat2vec(R):
 #__def vrrotmat2vec
 
 def vrrotvec2mat(axis, theta):
-    """ Create a rotation matrix to rotate theta degrees about the axis defined by vec. """
+    """ Create a rotation matrix to rotate theta degrees about the axis defined by vec. 
+
+        If theta is an array of n angles then a 3x3xn array of rotation matrices is returned.
+    """
     s = np.sin(theta)
     c = np.cos(theta)
     t = 1 - c
@@ -203,21 +238,17 @@ def bp_interp(dnode_1, triad_1, dnode_2, triad_2, n):
         Solve for rotation matrix R defined as the solution of: 
             R * triad_1 = triad_2 (multiply both sides by transpose(triad_1).
     """
-    dnode_interp = np.zeros((n,3),dtype=float)
-    triad_interp = np.zeros((3,3,n),dtype=float)
-
     # Solve for rotation matrix R.
     R = np.dot(triad_2,triad_1.T)
 
     # Get the equivalent rotation about an axis for R.
     a,theta = vrrotmat2vec(R)
 
-    # Calculate for dNode_interp and triad_interp.
-    for i in xrange(0,n):
-        dnode_interp[i,:] = (dnode_1*(n+1-(i+1)) + dnode_2*(i+1)) / (n+1)
-        angle = theta*(i+1)/(n+1)
-        rot_mat = vrrotvec2mat(a, angle)
-        triad_interp[:,:,i] = np.dot(rot_mat,triad_1)
+    # Calculate for dNode_interp and triad_interp for all n positions at once.
+    steps = np.arange(1,n+1,dtype=float)
+    dnode_interp = (np.outer(n+1-steps, dnode_1) + np.outer(steps, dnode_2)) / (n+1)
+    rot_mats = vrrotvec2mat(a, theta*steps/(n+1))
+    triad_interp = np.dot(rot_mats.transpose(2,0,1), triad_1).transpose(1,2,0)
 
     return dnode_interp, triad_interp
 
@@ -15,11 +15,11 @@
 """
 This module is used to write caDNAno design JSON files.
 """
-import json
 import logging
 import os.path
 from .common import CadnanoLatticeName,CadnanoLatticeType
 from ...data.parameters import DnaParameters
+from ...utils.json_emitter import JsonArray,JsonEmitter
 
 class CadnanoWriter(object):
     """ The CadnanoWriter class is used to write out a caDNAno design JSON file.
@@ -28,25 +28,32 @@ class CadnanoWriter(object):
         self.dna_structure = dna_structure
         self._logger = logging.getLogger(__name__)   
 
-    def write(self,file_name):
+    def write(self,file_name,indent=4):
         """ Write a caDNAno design JSON file.
 
         Args:
             file_name (string): The name of a caDNAno JSON file to write.
+            indent (int): The JSON indentation. If None then the file is written in compact form.
+
+        The information for each virtual helix is created as it is written.
         """
         self._logger.info("Writing caDNAno design JSON file %s " % file_name)
         dna_structure = self.dna_structure
-        vstrand_info = self._get_vstrand_info(dna_structure)
+        vstrand_info = JsonArray(self._iter_vstrand_info(dna_structure))
 
         design = { 'name'    : os.path.basename(file_name),
                    'vstrands': vstrand_info
                  }
 
         with open(file_name, 'w') as outfile:
-            json.dump(design, outfile, indent=4, separators=(',', ': '))
+            JsonEmitter(outfile, indent).dump(design)
 
     def _get_vstrand_info(self, dna_structure):
-        """ Get virtual helix information for the design. 
+        """ Get the list of virtual helix information for the design. """
+        return list(self._iter_vstrand_info(dna_structure))
+
+    def _iter_vstrand_info(self, dna_structure):
+        """ Generate virtual helix information for the design. 
 
             In caDNAno all the virtual helices are the same size (i.e. the same number of base positions).
             The lists of helix bases for staple and scaffold strands may contain fewer bases than the 
@@ -54,7 +61,6 @@ class CadnanoWriter(object):
             virtual helix size and fill from the base lists. 
         """
         self._logger.info("Number of helices %d " % len(dna_structure.structure_helices_map))
-        vstrands_info = []
 
         # Create a map of helix nums to the list of strands that start in that helix.
         # Used for writing color information.
@@ -111,11 +117,9 @@ class CadnanoWriter(object):
                         "stap_colors": staple_colors
                       }
 
-            vstrands_info.append( vstrand )
+            yield vstrand 
         #__for load_order in sorted(helix_map)
-
-        return vstrands_info
-    #__def _get_vstrand_info
+    #__def _iter_vstrand_info
 
     def _get_staple_colors(self, strands):
         """ Get the array of staple colors for the strands originating in a given helix.
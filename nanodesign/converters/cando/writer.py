@@ -32,11 +32,33 @@ class CandoWriter(object):
         Args:
             file_name (string): The name of a viewer JSON file to write.
 
+        The base data for each table is gathered into arrays and each table is formatted using a single
+        string format operation.
         """
         dna_structure = self.dna_structure
         base_conn = dna_structure.base_connectivity 
+        num_bases = len(base_conn)
         self._logger.info("Writing CanDo .cndo file: %s " % file_name)
-        self._logger.info("Number of bases %d " % len(base_conn))
+        self._logger.info("Number of bases %d " % num_bases)
+
+        # Gather base data.
+        index = np.arange(1, num_bases+1)
+        topology = np.empty((num_bases,6), dtype=object)
+        topology[:,0] = index
+        topology[:,1] = [base.id for base in base_conn]
+        topology[:,2] = [base.up.id if base.up else -1 for base in base_conn]
+        topology[:,3] = [base.down.id if base.down else -1 for base in base_conn]
+        topology[:,4] = [base.across.id if base.across else -1 for base in base_conn]
+        topology[:,5] = [base.seq for base in base_conn]
+        coords = np.array([base.coordinates for base in base_conn], dtype=float).reshape((num_bases,3))
+        ref_frames = np.array([base.ref_frame for base in base_conn], dtype=float).reshape((num_bases,3,3))
+
+        # The triad vectors e1,e2,e3 are the reference frame columns with e1 and e3 reversed.
+        triads = np.empty((num_bases,3,3), dtype=float)
+        triads[:,0,:] = -ref_frames[:,:,0]
+        triads[:,1,:] =  ref_frames[:,:,1]
+        triads[:,2,:] = -ref_frames[:,:,2]
+        id_nt = np.array(self._create_id_nt(base_conn), dtype=int).reshape((-1,2))
 
         with open(file_name, 'w') as cndo_file:
             # write header
@@ -45,36 +67,37 @@ class CandoWriter(object):
 
             # write dna topology
             cndo_file.write("dnaTop,id,up,down,across,seq\n")
-            for i in xrange(0,len(base_conn)):
-                base = base_conn[i] 
-                up = base.up.id if base.up else -1
-                down = base.down.id if base.down else -1
-                across = base.across.id if base.across else -1
-                cndo_file.write("%d,%d,%d,%d,%d,%s\n" % (i+1, base.id, up, down, across, base.seq))
+            cndo_file.write(self._format_table("%d,%d,%d,%d,%d,%s\n", topology))
             cndo_file.write("\n")
 
             # base nodes
             cndo_file.write('dNode,"e0(1)","e0(2)","e0(3)"\n')
-            for i in xrange(0,len(base_conn)):
-                coords = base_conn[i].coordinates 
-                cndo_file.write("%d,%f,%f,%f\n" % (i+1, coords[0], coords[1], coords[2]))
+            cndo_file.write(self._format_table("%d,%f,%f,%f\n", np.column_stack((index, coords))))
             cndo_file.write("\n")
 
             # triad vectors
             cndo_file.write('triad,"e1(1)","e1(2)","e1(3)","e2(1)","e2(2)","e2(3)","e3(1)","e3(2)","e3(3)"\n')
-            for i in xrange(0,len(base_conn)):
-                ref_frame = base_conn[i].ref_frame
-                cndo_file.write("%d,%f,%f,%f,%f,%f,%f,%f,%f,%f\n" % (i+1, -ref_frame[0,0], -ref_frame[1,0], -ref_frame[2,0],
-                    ref_frame[0,1], ref_frame[1,1], ref_frame[2,1], -ref_frame[0,2], -ref_frame[1,2], -ref_frame[2,2]))
+            cndo_file.write(self._format_table("%d" + ",%f"*9 + "\n", 
+                np.column_stack((index, triads.reshape((num_bases,9))))))
             cndo_file.write("\n")
 
             # Nucleotide binding table.
-            id_nt = self._create_id_nt(base_conn)
             cndo_file.write("id_nt,id1,id2\n")
-            for i in xrange(0,len(id_nt)):
-                cndo_file.write("%d,%d,%d\n" % (i+1, id_nt[i][0]+1, id_nt[i][1]+1))
+            cndo_file.write(self._format_table("%d,%d,%d\n", 
+                np.column_stack((np.arange(1, len(id_nt)+1), id_nt+1))))
         self._logger.info("Done.")
 
+    def _format_table(self, row_format, table):
+        """ Format the rows of a 2D array as a string. 
+
+            Arguments:
+                row_format (string): The format string for a row.
+                table (NumPy ndarray): The array of rows to format.
+        """
+        if len(table) == 0:
+            return ""
+        return (row_format * len(table)) % tuple(table.ravel().tolist())
+
     def _setup_logging(self):
         """ Set up logging."""
         self._logger = logging.getLogger(__name__)
@@ -38,7 +38,7 @@ from .pdbcif.cif_writer import CifWriter
 
 from ..data.dna_structure import DnaStructure
 from ..data.parameters import DnaParameters
-from ..utils.xform import Xform,HelixGroupXform,apply_helix_xforms,xform_from_connectors
+from ..utils.xform import Xform,HelixGroupXform,apply_helix_xforms,xforms_from_connectors,solve_helix_group_xforms
 
 from .dna_sequence_data import dna_sequence_data
 # TODO (JMS, 10/26/16): revisit where the sequence data is kept?
@@ -54,7 +54,8 @@ class ConverterFileFormats(object):
     STRUCTURE = "structure"
     TOPOLOGY  = "topology"
     VIEWER    = "viewer"
-    names = [ CADNANO, CANDO, CIF, PDB, SIMDNA, STRUCTURE, TOPOLOGY, VIEWER ]
+    VIEWER_BINARY = "viewer_binary"
+    names = [ CADNANO, CANDO, CIF, PDB, SIMDNA, STRUCTURE, TOPOLOGY, VIEWER, VIEWER_BINARY ]
 
 class Converter(object):
     """ This class stores objects for various models created when reading from a file.
@@ -118,6 +119,15 @@ class Converter(object):
         viewer_writer = ViewerWriter(self.dna_structure, self.dna_parameters)
         viewer_writer.write(file_name)
 
+    def write_viewer_binary_file(self, file_name):
+        """ Write a binary Nanodesign Viewer file.
+
+            Arguments:
+                file_name (String): The name of the binary Nanodesign Viewer file to write. 
+        """
+        viewer_writer = ViewerWriter(self.dna_structure, self.dna_parameters)
+        viewer_writer.write_binary(file_name)
+
     def write_pdb_file(self, file_name):
         """ Write an RCSB PDB-format file.
 
@@ -212,6 +222,10 @@ class Converter(object):
 
             The format of the transform commands is:
                 helices(0,1):rotate(90,0,0),translate(0,0,0);helices(2,3):rotate(0,90,0),translate(0,0,0)
+
+            The transformations of helix groups given the 'assemble' command are solved for together so that 
+            the distance crossovers connecting them are as short as possible:
+                helices(0-5):assemble;helices(6-11):assemble
         """
         helices_map = self.dna_structure.structure_helices_map
         self.logger.info("Transform %s" % transform)
@@ -220,6 +234,9 @@ class Converter(object):
 
         # Parse helix IDs.
         helix_group_xforms = []
+        connector_helix_groups = []
+        connector_xforms = []
+        assembly_group_xforms = []
         for helix_group in helix_groups:
             tokens = helix_group.split(":")
             pattern = re.compile(r"[,()]")
@@ -257,6 +274,7 @@ class Converter(object):
             xform_tokens = pattern.split(tokens[1])
             n = 0
             use_connectors = False
+            use_assembly = False
             xform = Xform()
             while (n != len(xform_tokens)): 
                 s = xform_tokens[n]
@@ -279,25 +297,50 @@ class Converter(object):
                     use_connectors = True
                     strand_name = xform_tokens[n+1]
                     n += 1
+                elif s == "assemble":
+                    use_assembly = True
                 #__if s == "rotate"
                 n += 1
             #__while (n != len(xform_tokens))
 
             # Automatically generate the transformation the moves one group of helices to another
-            # using the connections of distance crossovers. 
+            # using the connections of distance crossovers. The transformations for all groups 
+            # are generated together below.
             if use_connectors:
                 self.logger.info("Use connectors with strand \'%s\'" % strand_name)
-                connector_strands = []
-                for strand in self.dna_structure.strands:
-                    if strand.is_scaffold:
-                        connector_strands.append(strand)
-                helix_dist = self.dna_structure.dna_parameters.helix_distance
-                xform_from_connectors(connector_strands, helix_ids, helix_dist, xform)
+                connector_helix_groups.append(helix_ids)
+                connector_xforms.append(xform)
             #__if use_connectors
 
             helix_group_xforms.append( HelixGroupXform(helices, xform) )
+            if use_assembly:
+                assembly_group_xforms.append(helix_group_xforms[-1])
         #__for helix_group in helix_groups
 
+        if connector_xforms:
+            connector_strands = []
+            for strand in self.dna_structure.strands:
+                if strand.is_scaffold:
+                    connector_strands.append(strand)
+            helix_dist = self.dna_structure.dna_parameters.helix_distance
+            xforms_from_connectors(connector_strands, connector_helix_groups, helix_dist, connector_xforms)
+        #__if connector_xforms
+
+        # Solve for the transformations of the assembled helix groups together.
+        if assembly_group_xforms:
+            connector_strands = [strand for strand in self.dna_structure.strands if strand.is_scaffold]
+            helix_dist = self.dna_structure.dna_parameters.helix_distance
+            try:
+                solution = solve_helix_group_xforms(assembly_group_xforms, connector_strands, helix_dist)
+            except ValueError as error:
+                self.logger.error("Can't assemble helix groups: %s" % str(error))
+                return
+            self.logger.info("Assembled %d helix groups with %d connections in %d iterations (%.3f s)" % 
+                (len(assembly_group_xforms), solution.num_connections, solution.num_iterations, solution.time))
+            self.logger.info("Connection RMS distance %g -> %g, converged %s" % (solution.initial_rms_distance, 
+                solution.rms_distance, str(solution.converged)))
+        #__if assembly_group_xforms
+
         # Apply the transformation to the dna structure helices.
         apply_helix_xforms(helix_group_xforms) 
     #__def transform_structure
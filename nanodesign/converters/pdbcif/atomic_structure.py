@@ -182,6 +182,8 @@ class AtomicStructure(object):
         self.molecules = [] 
         self.strands = []
         self._logger = logging.getLogger(__name__)   
+        self._dof_strand_ids = set()
+        self._templates_ss = None
         self._init_strand_data()
 
         # Template structures file names.
@@ -809,68 +811,109 @@ class AtomicStructure(object):
         self._logger.info("Generate atomic structure for ssDNA.") 
         self._logger.info("Number of bases  %d " % len(base_conn))
 
-        # Scale to convert base node coords in nm to angstroms.
-        nm_to_ang = 10.0
+        # Generate atomic structures from the dna strands.
+        self.molecules = self._generate_atoms_ss(self.strands)
+        self._logger.debug("Generated %d atomic structures. " % len(self.molecules));
+        return self.molecules 
 
-        # Rotation to convert frame [e1 e2 e3] to [-e2 e3 -e1].
-        rot_mat = np.array([ [0, 0, -1], [ -1, 0, 0], [0, 1, 0]], dtype=float)
+    def generate_strand_structure_ss(self, strand):
+        """ Generate the atomic structure for a single strand. 
 
-        # Create strands helix maps. 
-        self.dna_structure.set_strand_helix_references()
+            Arguments:
+                strand (AtomicStructureStrand): The atomic structure strand to create atoms for.
 
-        # Set the rotation matrix, translation vector and sequence for strand paired bases.
-        helix_map = self.dna_structure.structure_helices_map
-        for strand in self.strands:
-            self._logger.debug("=================== strand:%d =================== "  % strand.id)
-            base_coords = strand.dna_strand.get_base_coords()
-
-            for i,base in enumerate(strand.tour):
-                #frame = np.zeros((3,3),dtype=float)
-                #frame = np.copy(base.ref_frame)
-                frame = base.ref_frame
-                self._logger.debug("base id %d  vh %d  pos %d " % (base.id, base.h, base.p))
-                frame[:,0] = -frame[:,0]
-                frame[:,2] = -frame[:,2]
-                self._logger.debug("     frame[0] %g %g %g" % (frame[0,0], frame[1,0], frame[2,0])) 
-                self._logger.debug("     frame[1] %g %g %g" % (frame[0,1], frame[1,1], frame[2,1])) 
-                self._logger.debug("     frame[2] %g %g %g" % (frame[0,2], frame[1,2], frame[2,2])) 
-                strand.is_main[i] = strand.is_scaffold
-                if base.seq == "N":
-                    strand.seq[i] = "A"
-                else:
-                    strand.seq[i] = base.seq
-                strand.rotations[i] = np.dot(frame,rot_mat)
-                strand.translations[i] = nm_to_ang*base_coords[i]
-            #__for base_id in strand.tour
-        #__for strand in self.strands
+            Returns a Molecule object containing the strand atoms. The atom IDs start at 1. 
 
-        self._logger.debug("=================== create bulges ==================");
-        for strand in self.strands:
-            self._logger.debug("---------- strand %d ---------- "  % strand.id)
-            base = strand.tour[0]
-            rotations = strand.rotations
-            translations = strand.translations
-            is_main = strand.is_main
-            is_circular = strand.is_circular
-            seq = strand.seq
+            This is used to generate the atomic structure of a strand only when it is needed (e.g. when it is 
+            first displayed) rather than generating the atomic structure for all strands.
+        """
+        molecule, first_atomID = self._create_atoms_from_strand_ss(strand, *self._get_templates_ss(), first_atomID_in=1)
+        return molecule
 
-            self._generate_bulge_dof(strand, rotations, translations, is_main, is_circular)
+    def _set_strand_dof_ss(self, strand):
+        """ Set the rotation matrix, translation vector and sequence for the bases of a strand. 
 
-            strand.rotations = rotations 
-            strand.translations = translations
-            strand.is_main = is_main
+            Arguments:
+                strand (AtomicStructureStrand): The atomic structure strand.
 
-            for i in xrange(0,len(seq)):
-                if (seq[i] == 'N'):
-                    base_index = strand.tour[i]-1
-                    strand.seq[i] = base_conn[base_index].seq
-            #_for i in xrange(0,len(seq))
-        #__for strand in self.strands
+            The data is only set once for each strand.
+        """
+        if strand.id in self._dof_strand_ids:
+            return
+        self._dof_strand_ids.add(strand.id)
+        base_conn = self.dna_structure.base_connectivity
 
-        # Generate atomic structures from the dna strands.
-        self.molecules = self._generate_atoms_ss(self.strands)
-        self._logger.debug("Generated %d atomic structures. " % len(self.molecules));
-        return self.molecules 
+        # Scale to convert base node coords in nm to angstroms.
+        nm_to_ang = 10.0
+
+        # Rotation to convert frame [e1 e2 e3] to [-e2 e3 -e1].
+        rot_mat = np.array([ [0, 0, -1], [ -1, 0, 0], [0, 1, 0]], dtype=float)
+
+        # Set the helices referenced by the strand.
+        helix_map = self.dna_structure.structure_helices_map
+        for base in strand.tour:
+            strand.dna_strand.add_helix(helix_map[base.h])
+
+        # Set the rotation matrix, translation vector and sequence for strand paired bases.
+        self._logger.debug("=================== strand:%d =================== "  % strand.id)
+        base_coords = strand.dna_strand.get_base_coords()
+
+        for i,base in enumerate(strand.tour):
+            # Flip a copy of the frame, base frames are shared with the visualizer and other bases.
+            frame = base.ref_frame.copy()
+            self._logger.debug("base id %d  vh %d  pos %d " % (base.id, base.h, base.p))
+            frame[:,0] = -frame[:,0]
+            frame[:,2] = -frame[:,2]
+            self._logger.debug("     frame[0] %g %g %g" % (frame[0,0], frame[1,0], frame[2,0])) 
+            self._logger.debug("     frame[1] %g %g %g" % (frame[0,1], frame[1,1], frame[2,1])) 
+            self._logger.debug("     frame[2] %g %g %g" % (frame[0,2], frame[1,2], frame[2,2])) 
+            strand.is_main[i] = strand.is_scaffold
+            if base.seq == "N":
+                strand.seq[i] = "A"
+            else:
+                strand.seq[i] = base.seq
+            strand.rotations[i] = np.dot(frame,rot_mat)
+            strand.translations[i] = nm_to_ang*base_coords[i]
+        #__for base_id in strand.tour
+
+        # Create bulges.
+        self._logger.debug("---------- create bulges strand %d ---------- "  % strand.id)
+        rotations = strand.rotations
+        translations = strand.translations
+        is_main = strand.is_main
+        is_circular = strand.is_circular
+        seq = strand.seq
+
+        self._generate_bulge_dof(strand, rotations, translations, is_main, is_circular)
+
+        strand.rotations = rotations 
+        strand.translations = translations
+        strand.is_main = is_main
+
+        for i in xrange(0,len(seq)):
+            if (seq[i] == 'N'):
+                base_index = strand.tour[i]-1
+                strand.seq[i] = base_conn[base_index].seq
+        #_for i in xrange(0,len(seq))
+    #__def _set_strand_dof_ss
+
+    def _get_templates_ss(self):
+        """ Get the dicts mapping base names to forward (5'->3') and reverse template structures. 
+
+            The template structures are read the first time they are needed.
+        """
+        if self._templates_ss == None:
+            # Read template structures, seperating atoms into forward (5'->3') and reverse chains.
+            A_for, T_rev = self._read_template(AtomicStructure.TEMPLATE_PDB_STRUCTURE_FILE_A)
+            G_for, C_rev = self._read_template(AtomicStructure.TEMPLATE_PDB_STRUCTURE_FILE_G)
+            C_for, G_rev = self._read_template(AtomicStructure.TEMPLATE_PDB_STRUCTURE_FILE_C)
+            T_for, A_rev = self._read_template(AtomicStructure.TEMPLATE_PDB_STRUCTURE_FILE_T)
+
+            # Create a dict mapping base name to forward and reverse structures. 
+            forward_struct = { DnaBaseNames.A : A_for, DnaBaseNames.C : C_for, DnaBaseNames.G : G_for, DnaBaseNames.T : T_for}
+            reverse_struct = { DnaBaseNames.A : A_rev, DnaBaseNames.C : C_rev, DnaBaseNames.G : G_rev, DnaBaseNames.T : T_rev}
+            self._templates_ss = (forward_struct, reverse_struct)
+        return self._templates_ss
 
     def _generate_atoms_ss(self, strands):
         """ Generate atomic structures from the dna strands. 
@@ -879,16 +922,7 @@ class AtomicStructure(object):
                 strands (List[AtomicStructureStrand]): The list of atomic stucture strands to create atoms for.
         """
         self._logger.debug("=================== _generate_atoms_ss ==================");
-        # Read template structures, seperating atoms into forward (5'->3') and reverse chains.
-        A_for, T_rev = self._read_template(AtomicStructure.TEMPLATE_PDB_STRUCTURE_FILE_A)
-        G_for, C_rev = self._read_template(AtomicStructure.TEMPLATE_PDB_STRUCTURE_FILE_G)
-        C_for, G_rev = self._read_template(AtomicStructure.TEMPLATE_PDB_STRUCTURE_FILE_C)
-        T_for, A_rev = self._read_template(AtomicStructure.TEMPLATE_PDB_STRUCTURE_FILE_T)
-
-        # Create a dict mapping base name to forward and reverse structures. 
-        forward_struct = { DnaBaseNames.A : A_for, DnaBaseNames.C : C_for, DnaBaseNames.G : G_for, DnaBaseNames.T : T_for}
-        reverse_struct = { DnaBaseNames.A : A_rev, DnaBaseNames.C : C_rev, DnaBaseNames.G : G_rev, DnaBaseNames.T : T_rev}
-
+        forward_struct, reverse_struct = self._get_templates_ss()
         molecular_structures = []
         num_strands = len(strands)
         first_atomID = 1     # serial number for the first atom in a tour
@@ -928,6 +962,7 @@ class AtomicStructure(object):
         max_atom_per_base = 40
         num_bases = len(strand.tour)
         self._logger.debug("first_atomID_in %d " % first_atomID_in) 
+        self._set_strand_dof_ss(strand)
 
         # Create a Molecule object to store the atoms for the strand structure. 
         molecule = Molecule(strand.id)
@@ -40,6 +40,7 @@ The SimDNA pairs file file format is:
 import collections
 import itertools
 import logging
+import numpy as np
 
 class SimDnaWriter(object):
     """ The SimDnaWriter class writes out a SimDNA pairs file. 
@@ -81,27 +82,55 @@ class SimDnaWriter(object):
             #__for strand in itertools.chain(scaffold_strands, staple_strands)
 
             # Write base records.
-            for strand in itertools.chain(scaffold_strands, staple_strands):
-                strand_id = strand_map[strand.id]
-                base_coords = strand.get_base_coords()
-
-                for i in xrange(0,len(strand.tour)):
-                    base = strand.tour[i]
-                    if base.across == None:
-                        paired_strand_id = -1
-                        paired_base_id = -1
-                    else:
-                        across_base = base.across
-                        paired_strand_id = across_base.strand
-                        paired_strand = self.dna_structure.strands_map[paired_strand_id]
-                        paired_base_id = paired_strand.get_base_index(across_base)+1
-                    #__if base.across == None
-                    coord = nm_to_ang * base.nt_coords
-                    base_id = strand.get_base_index(base)+1
-                    outfile.write("%4d %4d %8g %8g %8g %4d %4d\n" % 
-                        (strand_id, i+1, coord[0], coord[1], coord[2], paired_strand_id, paired_base_id))
-                #__for i in xrange(0,len(strand.tour))
-            #__for strand in itertools.chain(scaffold_strands, staple_strands)
+            records = self._get_base_records(itertools.chain(scaffold_strands, staple_strands), strand_map, nm_to_ang)
+            if len(records) != 0:
+                outfile.write(("%4d %4d %8g %8g %8g %4d %4d\n" * len(records)) % tuple(records.ravel().tolist()))
         #__with open(file_name, 'w') as outfile
     #__def write
+
+    def _get_base_records(self, strands, strand_map, scale):
+        """ Get the base records for a list of strands.
+
+            Arguments:
+                strands (List[DnaStrand]): The strands to write, in output order.
+                strand_map (Dict): The map of strand IDs to output strand IDs.
+                scale (float): The scale applied to base coordinates.
+
+            Returns a NumPy array with a row (strand ID, base index, x, y, z, paired strand ID, paired base index)
+            for each base. The strand-relative index of each base is stored in an array indexed by base ID so that
+            paired base indexes are looked up once for all bases.
+        """
+        bases = []
+        record_strand_ids = []
+        base_indexes = []
+        for strand in strands:
+            num_strand_bases = len(strand.tour)
+            bases.extend(strand.tour)
+            record_strand_ids.append(np.full(num_strand_bases, strand_map[strand.id], dtype=int))
+            base_indexes.append(np.arange(1, num_strand_bases+1))
+        #__for strand in strands
+        num_bases = len(bases)
+        if num_bases == 0:
+            return np.zeros((0,7), dtype=float)
+
+        base_ids = np.array([base.id for base in bases], dtype=int)
+        base_indexes = np.concatenate(base_indexes)
+        base_id_index = np.full(base_ids.max()+1, -1, dtype=int)
+        base_id_index[base_ids] = base_indexes
+
+        # Paired bases are written using their strand ID and strand-relative index.
+        across_ids = np.array([base.across.id if base.across else -1 for base in bases], dtype=int)
+        paired = across_ids != -1
+        paired_strand_ids = np.array([base.across.strand if base.across else -1 for base in bases], dtype=int)
+        paired_base_indexes = np.full(num_bases, -1, dtype=int)
+        paired_base_indexes[paired] = base_id_index[across_ids[paired]]
+
+        records = np.empty((num_bases,7), dtype=float)
+        records[:,0] = np.concatenate(record_strand_ids)
+        records[:,1] = base_indexes
+        records[:,2:5] = scale * np.array([base.nt_coords for base in bases], dtype=float).reshape((num_bases,3))
+        records[:,5] = paired_strand_ids
+        records[:,6] = paired_base_indexes
+        return records
+    #__def _get_base_records
 #__class SimDnaWriter
@@ -0,0 +1,124 @@
+# Copyright 2016 Autodesk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module is used to read and write binary DNA Design viewer files.
+
+A binary viewer file stores the per-base data of a viewer model as little-endian typed arrays that can be
+mapped directly into typed arrays (e.g. a JavaScript Float32Array used for a WebGL buffer) without parsing.
+The data that is not stored in arrays is stored in a JSON header. The file layout is:
+
+    magic          4 bytes  "NDVB"
+    version        uint32   the format version
+    header_size    uint32   the size in bytes of the JSON header
+    header         JSON     the model data, padded with spaces to a multiple of 8 bytes
+    arrays                  the typed arrays, each starting at a multiple of 8 bytes from the start of the file
+
+The header 'arrays' entry lists the arrays stored in the file. Each entry gives the array name, element
+type ('int32', 'float32' or 'uint8'), number of items, number of elements per item and the byte offset
+of the array from the start of the file.
+"""
+import json
+import struct
+import numpy as np
+
+MAGIC = "NDVB"
+VERSION = 1
+ALIGNMENT = 8
+
+# The little-endian NumPy types for the array element types.
+array_types = { 'int32'   : '<i4',
+                'float32' : '<f4',
+                'uint8'   : 'u1'
+              }
+
+def _padding(size):
+    """ Get the number of bytes needed to align a size to ALIGNMENT. """
+    return (ALIGNMENT - size % ALIGNMENT) % ALIGNMENT
+
+def write_binary_viewer_file(file_name, header, arrays):
+    """ Write a binary viewer file.
+
+        Arguments:
+            file_name (string): The name of the binary viewer file to write.
+            header (Dict): The model data to write in the JSON header.
+            arrays (List[Tuple]): The list of (name, type, array) tuples giving the arrays to write. The
+                type is a key in array_types[]. Arrays are 1D (one element per item) or 2D.
+    """
+    # Convert arrays to their file types.
+    file_arrays = []
+    for name,array_type,array in arrays:
+        file_array = np.ascontiguousarray(array, dtype=array_types[array_type])
+        size = 1 if file_array.ndim == 1 else file_array.shape[1]
+        file_arrays.append((name, array_type, size, file_array))
+    #__for name,array_type,array in arrays
+
+    # The array offsets depend on the size of the header so compute the header size
+    # using offsets that are large enough and then pad the header.
+    header = dict(header)
+    arrays_info = [ { 'name' : name, 'type' : array_type, 'count' : len(file_array), 'size' : size,
+                      'offset' : 0xffffffff } for name,array_type,size,file_array in file_arrays ]
+    header['arrays'] = arrays_info
+    header_size = len(json.dumps(header, separators=(',',':')))
+    prefix_size = len(MAGIC) + 8
+    header_size += _padding(prefix_size + header_size)
+
+    offset = prefix_size + header_size
+    for info,(name,array_type,size,file_array) in zip(arrays_info, file_arrays):
+        info['offset'] = offset
+        offset += file_array.nbytes + _padding(file_array.nbytes)
+    #__for info,file_array in zip(arrays_info, file_arrays)
+
+    header_str = json.dumps(header, separators=(',',':'))
+    header_str += " " * (header_size - len(header_str))
+
+    with open(file_name, 'wb') as outfile:
+        outfile.write(MAGIC)
+        outfile.write(struct.pack('<II', VERSION, header_size))
+        outfile.write(header_str)
+        for name,array_type,size,file_array in file_arrays:
+            outfile.write(file_array.tostring())
+            outfile.write("\0" * _padding(file_array.nbytes))
+    #__with open(file_name, 'wb') as outfile
+#__def write_binary_viewer_file
+
+def read_binary_viewer_file(file_name):
+    """ Read a binary viewer file.
+
+        Arguments:
+            file_name (string): The name of the binary viewer file to read.
+
+        Returns the header (Dict) and a dictionary mapping array names to NumPy arrays.
+    """
+    with open(file_name, 'rb') as infile:
+        data = infile.read()
+
+    if data[0:len(MAGIC)] != MAGIC:
+        raise ValueError("The file %s is not a binary viewer file." % file_name)
+    prefix_size = len(MAGIC) + 8
+    version,header_size = struct.unpack('<II', data[len(MAGIC):prefix_size])
+    if version != VERSION:
+        raise ValueError("The binary viewer file %s has an unsupported version %d." % (file_name, version))
+    header = json.loads(data[prefix_size:prefix_size+header_size])
+
+    arrays = {}
+    for info in header['arrays']:
+        count = info['count'] * info['size']
+        array = np.frombuffer(data, dtype=array_types[info['type']], count=count, offset=info['offset'])
+        if info['size'] != 1:
+            array = array.reshape((info['count'], info['size']))
+        arrays[info['name']] = array
+    #__for info in header['arrays']
+    return header, arrays
+#__def read_binary_viewer_file
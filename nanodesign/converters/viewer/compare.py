@@ -0,0 +1,373 @@
+# Copyright 2016 Autodesk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module is used to compare DNA Design viewer JSON files.
+
+The helix, helix connectivity, crossover, strand, base and domain data of a viewer file are stored in columnar
+tables: each field (e.g. base coordinates) is stored in a NumPy array with a row for each component. The rows of
+the tables of two files are matched using key fields (e.g. the strand ID and helix position of a base) and each
+field is compared for all of the matched rows at once. Float fields are compared using a tolerance.
+
+A viewer file can be read in streaming mode: the elements of its helix, strand and domain arrays are parsed one
+at a time and added to the tables so that the complete JSON object graph of a large file is never held in memory.
+"""
+import collections
+import json
+import logging
+import numpy as np
+from ...utils.json_reader import JsonReader
+
+# The value stored for null integer values (e.g. the second strand of a crossover with no second strand).
+NULL_INT = np.iinfo(np.int64).min
+
+class ViewerFieldType:
+    """ The types of the values stored in a table field. """
+    BOOL   = 'bool'
+    FLOAT  = 'float'
+    INT    = 'int'
+    STRING = 'string'
+    VECTOR = 'vector'
+
+class ViewerTable(object):
+    """ This class stores the data of a DNA structure component (e.g. bases) in columns.
+
+        Attributes:
+            columns (Dict[NumPy ndarray]): The column for each field, indexed by field name. Vector fields are
+                stored in Nx3 arrays.
+            fields (List[Tuple[String,ViewerFieldType]]): The names and types of the fields compared.
+            keys (List[String]): The names of the integer fields used to match the rows of two tables.
+            name (String): The name of the table.
+            num_rows (int): The number of rows in the table.
+
+        Values are added to the columns using add_row() or add_rows() and the columns are converted to arrays
+        using finish().
+    """
+    def __init__(self, name, keys, fields):
+        self.name = name
+        self.keys = keys
+        self.fields = fields
+        self.columns = {}
+        self.num_rows = 0
+        self._values = collections.OrderedDict((key,[]) for key in keys)
+        for field,ftype in fields:
+            self._values[field] = []
+
+    def add_row(self, row):
+        """ Add a row given as a dict of field values. """
+        row_values = [row[field] for field in self._values]
+        for values,value in zip(self._values.values(), row_values):
+            values.append(value)
+        self.num_rows += 1
+
+    def add_rows(self, columns):
+        """ Add rows given as a dict of field value lists. """
+        row_columns = [columns[field] for field in self._values]
+        num_rows = len(row_columns[0])
+        for values,column in zip(self._values.values(), row_columns):
+            values.extend(column)
+        self.num_rows += num_rows
+
+    def finish(self):
+        """ Convert the column value lists to arrays. """
+        field_types = dict(self.fields)
+        for field,values in self._values.items():
+            ftype = field_types.get(field, ViewerFieldType.INT)
+            if ftype == ViewerFieldType.VECTOR:
+                column = np.array(values, dtype=float).reshape((len(values),3))
+            elif ftype == ViewerFieldType.FLOAT:
+                column = np.array(values, dtype=float)
+            elif ftype == ViewerFieldType.INT:
+                try:
+                    column = np.array(values, dtype=np.int64)
+                except TypeError:
+                    column = np.array([NULL_INT if value == None else value for value in values], dtype=np.int64)
+            elif ftype == ViewerFieldType.BOOL:
+                column = np.array(values, dtype=bool)
+            else:
+                column = np.array(values, dtype=object)
+            self.columns[field] = column
+        self._values = None
+
+    def get_keys(self):
+        """ Get the Nx(M+1) array of row keys.
+
+            The last key column is the occurrence of the row's key in the table (see get_occurrences()) so that
+            the n-th row with a repeated key (e.g. the bases of an insert share a helix position) is matched
+            with the n-th row with that key in another table.
+        """
+        keys = np.column_stack([self.columns[key] for key in self.keys]).reshape((self.num_rows,len(self.keys)))
+        return np.column_stack((keys, get_occurrences(keys)))
+
+    def get_key_names(self):
+        """ Get the names of the key columns returned by get_keys(). """
+        return self.keys + ['occurrence']
+
+#__class ViewerTable(object)
+
+def get_occurrences(keys):
+    """ Get the occurrence of each row's key in a key array.
+
+        Arguments:
+            keys (NumPy NxM ndarray[int]): The row keys.
+
+        Returns the NumPy array of the number of rows before each row that have the same key.
+    """
+    occurrences = np.zeros(len(keys), dtype=np.int64)
+    if len(keys) == 0:
+        return occurrences
+    # Sort the rows by key; the sort is stable so rows with the same key stay in file order.
+    order = np.lexsort(keys.T[::-1])
+    sorted_keys = keys[order]
+    new_key = np.ones(len(keys), dtype=bool)
+    new_key[1:] = np.any(sorted_keys[1:] != sorted_keys[:-1], axis=1)
+    positions = np.arange(len(keys))
+    occurrences[order] = positions - np.maximum.accumulate(np.where(new_key, positions, 0))
+    return occurrences
+
+def match_rows(keys1, keys2):
+    """ Match the rows of two tables using their keys.
+
+        Arguments:
+            keys1 (NumPy NxM ndarray[int]): The keys of the first table.
+            keys2 (NumPy NxM ndarray[int]): The keys of the second table.
+
+        Returns the NumPy array of the indexes into the second table of the rows of the first table. The index
+        of a row not found in the second table is -1. Keys are expected to be unique (see ViewerTable.get_keys());
+        if a key appears more than once in the second table then its last row is used.
+    """
+    num_keys1 = len(keys1)
+    keys = np.ascontiguousarray(np.concatenate((keys1, keys2)), dtype=np.int64)
+    if len(keys) == 0:
+        return np.empty(0, dtype=int)
+    rows = keys.view(np.dtype((np.void, keys.dtype.itemsize*keys.shape[1]))).ravel()
+    unique_rows, inverse = np.unique(rows, return_inverse=True)
+    index = np.full(len(unique_rows), -1, dtype=int)
+    index[inverse[num_keys1:]] = np.arange(len(keys2))
+    return index[inverse[:num_keys1]]
+
+class ViewerFile(object):
+    """ This class stores the data of a viewer JSON file in columnar tables.
+
+        Attributes:
+            file_name (String): The name of the viewer file.
+            lattice_type (String): The lattice type of the DNA structure.
+            model_name (String): The name of the DNA structure.
+            num_bad_data (int): The number of helices, strands and domains with missing JSON fields.
+            tables (OrderedDict[ViewerTable]): The tables of the file, indexed by table name.
+    """
+    # The top-level arrays parsed one element at a time in streaming mode.
+    STREAMED_KEYS = ('virtual_helices', 'strands', 'domains')
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.lattice_type = None
+        self.model_name = None
+        self.num_bad_data = 0
+        self._logger = logging.getLogger(__name__)
+        F = ViewerFieldType
+        self.tables = collections.OrderedDict()
+        self._add_table('helix', ['num'], [('id',F.INT), ('row',F.INT), ('col',F.INT),
+            ('helix_distance',F.FLOAT), ('base_pair_rise',F.FLOAT), ('start_position',F.VECTOR),
+            ('end_position',F.VECTOR), ('orientation',F.VECTOR), ('len(domains)',F.INT),
+            ('len(helix_connectivity)',F.INT), ('num_possible_staple_crossovers',F.INT),
+            ('num_possible_scaffold_crossovers',F.INT)])
+        self._add_table('helix connectivity', ['num','helix_id','helix_num'], [('angle',F.FLOAT),
+            ('direction',F.VECTOR), ('len(crossovers)',F.INT)])
+        self._add_table('crossover', ['num','helix_id','helix_num','vhelix_base_index'], [
+            ('first_strand_ID',F.INT), ('first_strand_base_index',F.INT), ('second_strand_ID',F.INT),
+            ('second_strand_base_index',F.INT)])
+        self._add_table('strand', ['id'], [('is_scaffold',F.BOOL), ('is_circular',F.BOOL),
+            ('number_of_bases',F.INT), ('len(bases)',F.INT), ('len(domains)',F.INT),
+            ('len(virtual_helices)',F.INT)])
+        # Base IDs are not compared, they can be different for the same structure.
+        self._add_table('base', ['strand_id','h','p'], [('sequence',F.STRING), ('coordinates',F.VECTOR)])
+        self._add_table('domain', ['id'], [('strand_id',F.INT), ('number_of_bases',F.INT), ('len(bases)',F.INT),
+            ('start_base_index',F.INT), ('end_base_index',F.INT), ('connected_strand',F.INT),
+            ('connected_domain',F.INT), ('melting_temperature',F.FLOAT), ('start_position',F.VECTOR),
+            ('end_position',F.VECTOR), ('orientation',F.VECTOR)])
+
+    def _add_table(self, name, keys, fields):
+        self.tables[name] = ViewerTable(name, keys, fields)
+
+    def read(self, stream=False, chunk_size=1<<20):
+        """ Read the viewer file.
+
+            Arguments:
+                stream (bool): If True then parse the helices, strands and domains one at a time.
+                chunk_size (int): The number of bytes read at a time in streaming mode.
+        """
+        self._logger.info("Read file %s" % self.file_name)
+        with open(self.file_name) as infile:
+            if stream:
+                items = JsonReader(infile, chunk_size).iter_items(ViewerFile.STREAMED_KEYS)
+            else:
+                items = json.load(infile).iteritems()
+            for key,value in items:
+                self._add_item(key, value)
+        #__with open(self.file_name) as infile
+
+        for table in self.tables.values():
+            table.finish()
+        self._logger.info("Lattice type %s" % self.lattice_type)
+        self._logger.info("Number of virtual helices %d" % self.tables['helix'].num_rows)
+        self._logger.info("Number of strands %d" % self.tables['strand'].num_rows)
+        self._logger.info("Number of bases %d" % self.tables['base'].num_rows)
+        self._logger.info("Number of domains %d" % self.tables['domain'].num_rows)
+
+    def _add_item(self, key, value):
+        """ Add the data of a member of the viewer file top-level JSON object. """
+        if key == 'lattice_type':
+            self.lattice_type = value
+        elif key == 'model_name':
+            self.model_name = value
+        elif key == 'virtual_helices':
+            self._add_elements('helix', value, self._add_helix)
+        elif key == 'strands':
+            self._add_elements('strand', value, self._add_strand)
+        elif key == 'domains':
+            self._add_elements('domain', value, self._add_domain)
+
+    def _add_elements(self, name, elements, add_element):
+        """ Add the JSON data for the elements of an array, skipping elements with missing fields. """
+        for element in elements:
+            try:
+                add_element(element)
+            except KeyError as e:
+                self._logger.error("%s data is missing the JSON %s field: %s" % (name.capitalize(), str(e),
+                    str(element)[:200]))
+                self.num_bad_data += 1
+        #__for element in elements
+
+    def _add_helix(self, helix):
+        """ Add the JSON data for a helix and its connections to the tables. """
+        cadnano_info = helix['cadnano_info']
+        num = cadnano_info['num']
+        connectivity = [connection for connection in helix['helix_connectivity'] if connection]
+        row = dict(helix)
+        row.update({ 'num':num, 'row':cadnano_info['row'], 'col':cadnano_info['col'],
+            'len(domains)':len(helix['domains']), 'len(helix_connectivity)':len(connectivity) })
+        self.tables['helix'].add_row(row)
+
+        for connection in connectivity:
+            row = dict(connection)
+            row.update({ 'num':num, 'len(crossovers)':len(connection['crossovers']) })
+            self.tables['helix connectivity'].add_row(row)
+            for crossover in connection['crossovers']:
+                row = dict(crossover)
+                row.update({ 'num':num, 'helix_id':connection['helix_id'], 'helix_num':connection['helix_num'] })
+                self.tables['crossover'].add_row(row)
+        #__for connection in connectivity
+
+    def _add_strand(self, strand):
+        """ Add the JSON data for a strand and its bases to the tables. """
+        bases = strand['bases']
+        row = dict(strand)
+        row.update({ 'len(bases)':len(bases), 'len(domains)':len(strand['domains']),
+            'len(virtual_helices)':len(strand['virtual_helices']) })
+        self.tables['strand'].add_row(row)
+
+        strand_id = strand['id']
+        self.tables['base'].add_rows({ 'strand_id':[strand_id]*len(bases),
+            'h':[base['h'] for base in bases],
+            'p':[base['p'] for base in bases],
+            'sequence':[base['sequence'] for base in bases],
+            'coordinates':[base['coordinates'] for base in bases] })
+
+    def _add_domain(self, domain):
+        """ Add the JSON data for a domain to the tables. """
+        row = dict(domain)
+        row['len(bases)'] = len(domain['bases'])
+        self.tables['domain'].add_row(row)
+
+    def compare(self, viewer_file, tol=1e-9):
+        """ Compare the data with the data of another viewer file.
+
+            Arguments:
+                viewer_file (ViewerFile): The viewer file to compare to.
+                tol (Float): The tolerance used to compare float values.
+
+            Returns the number of differences found.
+        """
+        self._logger.info("Compare %s to %s:" % (self.file_name, viewer_file.file_name))
+        num_errors = self.num_bad_data + viewer_file.num_bad_data
+        if self.lattice_type != viewer_file.lattice_type:
+            self._logger.error("Lattice types are not equal: %s != %s" % (self.lattice_type,
+                viewer_file.lattice_type))
+            num_errors += 1
+        for name,table in self.tables.items():
+            num_errors += self._compare_tables(table, viewer_file.tables[name], tol)
+
+        if num_errors == 0:
+            self._logger.info("Files are identical.")
+        else:
+            self._logger.info("Number of differences %d" % num_errors)
+        return num_errors
+
+    def _compare_tables(self, table1, table2, tol):
+        """ Compare the fields of the matching rows of two tables. Returns the number of differences found. """
+        self._logger.info("==================== compare %s data ====================" % table1.name)
+        keys1 = table1.get_keys()
+        keys2 = table2.get_keys()
+        index1 = match_rows(keys1, keys2)
+        index2 = match_rows(keys2, keys1)
+        num_errors = 0
+
+        # Check for rows that are only in one of the tables.
+        for keys,index,other in ((keys1,index1,'second'), (keys2,index2,'first')):
+            missing = np.where(index < 0)[0]
+            if len(missing):
+                self._logger.error("%d %s rows are not in the %s file: %s = %s" % (len(missing), table1.name,
+                    other, ','.join(table1.get_key_names()), self._format_rows(keys, missing)))
+                num_errors += len(missing)
+        #__for keys,index,other
+
+        rows1 = np.where(index1 >= 0)[0]
+        rows2 = index1[rows1]
+        for field,ftype in table1.fields:
+            values1 = table1.columns[field][rows1]
+            values2 = table2.columns[field][rows2]
+            if ftype in (ViewerFieldType.FLOAT, ViewerFieldType.VECTOR):
+                # NaN values are equal.
+                diff = np.abs(values1 - values2) > tol
+                diff |= np.isnan(values1) != np.isnan(values2)
+                if ftype == ViewerFieldType.VECTOR:
+                    diff = np.any(diff, axis=1)
+            else:
+                diff = values1 != values2
+            diff_rows = np.where(diff)[0]
+            if len(diff_rows):
+                first = diff_rows[0]
+                self._logger.error("'%s' %s values are not equal for %d rows: %s = %s  %s != %s" % (field,
+                    table1.name, len(diff_rows), ','.join(table1.get_key_names()),
+                    self._format_rows(keys1, rows1[diff_rows]), self._format_value(values1[first]), self._format_value(values2[first])))
+                num_errors += len(diff_rows)
+        #__for field,ftype in table1.fields
+
+        return num_errors
+
+    def _format_rows(self, keys, rows, max_rows=5):
+        """ Format the keys of the first rows of a list of rows. """
+        text = ' '.join(str(tuple(keys[row])) for row in rows[:max_rows])
+        if len(rows) > max_rows:
+            text += ' ...'
+        return text
+
+    def _format_value(self, value):
+        """ Format a field value. """
+        if isinstance(value, np.ndarray):
+            return str(value.tolist())
+        return str(value)
+
+#__class ViewerFile(object)
@@ -13,15 +13,18 @@
 # limitations under the License.
 
 """ 
-This module is used to write DNA Design viewer JSON files. 
+This module is used to write DNA Design viewer JSON and binary files. 
 """
 import collections
-import json
+import itertools
 import logging
 import numpy as np
 from math import pi
 from ..cadnano.common import CadnanoLatticeName,CadnanoLatticeType
 from ...data.parameters import DnaParameters
+from ...data.domain import melting_temperatures
+from ...utils.json_emitter import JsonArray,JsonEmitter
+from .binary_format import write_binary_viewer_file
 
 class ViewerWriter(object):
     """ The ViewerWriter class writes out a DNA Design viewer JSON file. 
@@ -32,21 +35,23 @@ class ViewerWriter(object):
         self.dna_parameters = dna_parameters
         self._logger = logging.getLogger(__name__)   
 
-    def write(self,file_name):
+    def write(self,file_name,indent=4):
         """Write a viewer JSON file.
 
         Arguments:
             file_name (string): The name of a viewer JSON file to write.
+            indent (int): The JSON indentation. If None then the file is written in compact form.
 
+        The strand, strand base and domain data are created as they are written.
         """
 
         self._logger.info("Writing DNA Design Viewer JSON file: %s " % file_name)
         dna_structure = self.dna_structure
         dna_structure.compute_aux_data()
         lattice_type = CadnanoLatticeType.names[dna_structure.lattice_type]
-        strands_info = self._get_strand_info(dna_structure)
+        strands_info = JsonArray(self._iter_strand_info(dna_structure, stream_bases=True))
         helices_info = self._get_helices_info(dna_structure)
-        domains_info = self._get_domain_info(dna_structure)
+        domains_info = JsonArray(self._iter_domain_info(dna_structure))
 
         vis_model = { 'model_name'      : dna_structure.name,
                       'lattice_type'    : lattice_type,
@@ -56,20 +61,96 @@ class ViewerWriter(object):
                     }
 
         with open(file_name, 'w') as outfile:
-            json.dump(vis_model, outfile, indent=4, separators=(',', ': '))
-            #json.dump(vis_model, outfile)
+            JsonEmitter(outfile, indent).dump(vis_model)
 
-    def _get_domain_info(self, dna_structure):
-        """ Get JSON serialized data for all the domains. """
-        domains_info = [] 
-        for domain in dna_structure.domain_list:
+    def write_binary(self,file_name):
+        """Write a binary viewer file.
+
+        Arguments:
+            file_name (string): The name of a binary viewer file to write.
+
+        The model is the same as for the JSON file but the base data for strands and domains are stored in 
+        typed arrays rather than per-base objects (see binary_format.py). Bases are stored in strand order:
+
+            base_ids (int32)            : the base IDs. 
+            base_coordinates (float32x3): the base coordinates. 
+            base_helix_positions (int32x2): the base helix IDs and positions. 
+            base_sequence (uint8)       : the base sequence letters as ASCII codes. 
+            strand_offsets (int32)      : the index of the first base of each strand in the base arrays, 
+                                          with a final entry for the total number of bases.
+            domain_base_ids (int32)     : the base IDs of each domain, in domain order.
+            domain_offsets (int32)      : the index of the first base of each domain in domain_base_ids[], 
+                                          with a final entry for its size.
+        """
+        self._logger.info("Writing DNA Design Viewer binary file: %s " % file_name)
+        dna_structure = self.dna_structure
+        dna_structure.compute_aux_data()
+        lattice_type = CadnanoLatticeType.names[dna_structure.lattice_type]
+        strands_info = self._get_strand_info(dna_structure, include_bases=False)
+        helices_info = self._get_helices_info(dna_structure)
+        domains_info = self._get_domain_info(dna_structure, include_bases=False)
+
+        header = { 'model_name'      : dna_structure.name,
+                   'lattice_type'    : lattice_type,
+                   'strands'         : strands_info,
+                   'virtual_helices' : helices_info,
+                   'domains'         : domains_info
+                 }
+
+        # Create the base arrays.
+        strands = dna_structure.strands
+        strand_sizes = [len(strand.tour) for strand in strands]
+        strand_offsets = np.cumsum([0] + strand_sizes)
+        bases = list(itertools.chain.from_iterable([strand.tour for strand in strands]))
+        base_ids = np.array([base.id for base in bases], dtype=int)
+        base_coords = np.zeros((len(bases),3), dtype=float)
+        for strand,offset in zip(strands, strand_offsets):
+            base_coords[offset:offset+len(strand.tour)] = strand.get_base_coords()
+        base_helix_pos = np.array([(base.h, base.p) for base in bases], dtype=int).reshape((len(bases),2))
+        base_seq = np.array([ord(base.seq) for base in bases], dtype=np.uint8)
+
+        # Create the domain arrays.
+        domain_list = dna_structure.domain_list
+        domain_offsets = np.cumsum([0] + [len(domain.base_list) for domain in domain_list])
+        domain_base_ids = np.array([base.id for domain in domain_list for base in domain.base_list], dtype=int)
+
+        arrays = [ ('base_ids',             'int32',   base_ids),
+                   ('base_coordinates',     'float32', base_coords),
+                   ('base_helix_positions', 'int32',   base_helix_pos),
+                   ('base_sequence',        'uint8',   base_seq),
+                   ('strand_offsets',       'int32',   strand_offsets),
+                   ('domain_base_ids',      'int32',   domain_base_ids),
+                   ('domain_offsets',       'int32',   domain_offsets)
+                 ]
+        write_binary_viewer_file(file_name, header, arrays)
+
+    def _get_domain_info(self, dna_structure, include_bases=True):
+        """ Get JSON serialized data for all the domains. 
+
+            Arguments:
+                dna_structure (DnaStructure): The structure to get domain data for.
+                include_bases (bool): If False then the list of domain base IDs is not included.
+        """
+        return list(self._iter_domain_info(dna_structure, include_bases))
+
+    def _iter_domain_info(self, dna_structure, include_bases=True):
+        """ Generate JSON serialized data for each domain. 
+
+            Arguments:
+                dna_structure (DnaStructure): The structure to get domain data for.
+                include_bases (bool): If False then the list of domain base IDs is not included.
+
+            The location of domain bases within their strand is found using the strand base index map and 
+            the domain melting temperatures are computed together, so the time is linear in the number of bases.
+        """
+        temperatures = melting_temperatures(dna_structure.domain_list)
+        for domain,temperature in zip(dna_structure.domain_list, temperatures):
             point1,point2 = domain.get_end_points()
             base_info = [base.id for base in domain.base_list]
             if (domain.strand):
                 strand_id = domain.strand.id
-                strand_base_ids = [base.id for base in domain.strand.tour]
-                start_base_index = strand_base_ids.index(base_info[0])
-                end_base_index = strand_base_ids.index(base_info[-1])
+                start_base_index = domain.strand.get_base_index(domain.base_list[0])
+                end_base_index = domain.strand.get_base_index(domain.base_list[-1])
             else:
                 strand_id = -1
                 start_base_index = -1
@@ -87,11 +168,12 @@ class ViewerWriter(object):
                      'end_base_index'    : end_base_index,
                      'connected_strand'  : domain.connected_strand,
                      'connected_domain'  : domain.connected_domain,
-                     'melting_temperature' : domain.melting_temperature() #"{:.2f}".format(domain.melting_temperature())
+                     'melting_temperature' : temperature #"{:.2f}".format(domain.melting_temperature())
                    }
-            domains_info.append(info)
+            if not include_bases:
+                del info['bases']
+            yield info
         #__for domain in dna_structure.domain_list
-        return domains_info 
 
     def _get_helices_info(self, dna_structure):
         """ Get JSON serialized data for helix objects. """
@@ -131,11 +213,25 @@ class ViewerWriter(object):
 
         return helices_info
 
-    def _get_strand_info(self, dna_structure):
+    def _get_strand_info(self, dna_structure, include_bases=True):
         """ Get JSON serialized data for strands objetcs. 
+
+            Arguments:
+                dna_structure (DnaStructure): The structure to get strand data for.
+                include_bases (bool): If False then the list of strand base data is not included.
+        """
+        return list(self._iter_strand_info(dna_structure, include_bases))
+
+    def _iter_strand_info(self, dna_structure, include_bases=True, stream_bases=False):
+        """ Generate JSON serialized data for each strand. 
+
+            Arguments:
+                dna_structure (DnaStructure): The structure to get strand data for.
+                include_bases (bool): If False then the list of strand base data is not included.
+                stream_bases (bool): If True then the strand base data is a JsonArray whose elements
+                    are created as they are written. 
         """
         self._logger.debug("==================== get strand information p ===================")
-        strand_info_list = []
         for strand in dna_structure.strands:
             self._logger.debug("---------- strand %d ----------" % strand.id) 
             self._logger.debug("Is scaffold %s" % str(strand.is_scaffold))
@@ -166,14 +262,14 @@ class ViewerWriter(object):
             #if strand.is_circular:
             #    domain_ids = self._modify_domain_ids(strand, domain_ids)
 
-            base_coords = strand.get_base_coords()
             base_info = []
-            for i in xrange(0,len(strand.tour)):
-                base = strand.tour[i]
-                coord = base_coords[i]
-                base_info.append({ 'id': base.id, 'coordinates' : list(coord), 'sequence' : base.seq,
-                                   'h' : base.h,  'p' : base.p
-                                 })
+            if include_bases:
+                base_info = self._iter_strand_base_info(strand)
+                if stream_bases:
+                    base_info = JsonArray(base_info)
+                else:
+                    base_info = list(base_info)
+            #__if include_bases
  
             info = { 'id' : strand.id,
                      'is_scaffold'     : strand.is_scaffold,
@@ -184,9 +280,20 @@ class ViewerWriter(object):
                      'bases'           : base_info,
                      'color'           : strand.color
                    }
-
-            strand_info_list.append(info)
-        return strand_info_list
+            if not include_bases:
+                del info['bases']
+
+            yield info
+        #__for strand in dna_structure.strands
+
+    def _iter_strand_base_info(self, strand):
+        """ Generate JSON serialized data for each strand base. """
+        base_coords = strand.get_base_coords()
+        for base,coord in zip(strand.tour, base_coords):
+            yield { 'id': base.id, 'coordinates' : list(coord), 'sequence' : base.seq,
+                    'h' : base.h,  'p' : base.p
+                  }
+        #__for base,coord in zip(strand.tour, base_coords)
 
     def _modify_domain_ids(self, strand, domain_ids):
         """ Modify the list of strand domains IDs so that the order of domain bases 
@@ -19,7 +19,6 @@ A DNA structure consists of a number of scaffold and staple strands (DNA origami
 to form a designed geometric shape.
 """
 from collections import OrderedDict
-import json
 import logging
 import numpy as np
 import sys 
@@ -27,11 +26,11 @@ import sys
 # imports from other parts of the package
 from .parameters import DnaParameters
 from ..converters.cadnano.common import CadnanoLatticeType
-from ..converters.cadnano.utils import generate_coordinates
 from .dna_structure_helix import DnaStructureHelix,DnaHelixConnection
 from .lattice import Lattice
 from .strand import DnaStrand
 from . import Domain
+from ..utils.json_emitter import JsonArray,JsonEmitter
 
 class DnaStructure(object):
     """ This class stores the base connectivity and geometry for a DNA model. 
@@ -46,6 +45,11 @@ class DnaStructure(object):
             parameters (DnaParameters): Stores information for DNA parameters (e.g. helix radius).
             strands (List[DnaStrand]): The list a DnaStrand objects. 
             strands_map (Dict[DnaStrand]): The dictionary that maps strand IDs to DnaStrand objects.
+            strands_color_map (Dict[Set[DnaStrand]]): The dictionary that maps staple color IDs to staple strands.
+            strands_helix_map (Dict[Set[DnaStrand]]): The dictionary that maps helix IDs to the strands passing 
+                through the helix.
+            strands_start_map (Dict[DnaStrand]): The dictionary that maps the (helix ID, position, is_scaffold) of 
+                the first base of a strand to the strand.
     """ 
     def __init__(self, name, base_connectivity, helices, dna_parameters):
         """ Initialize a DnaStructure object. 
@@ -65,11 +69,17 @@ class DnaStructure(object):
         self.structure_helices_coord_map = dict()
         self.strands = None
         self.strands_map = dict()
+        self.strands_color_map = dict()
+        self.strands_helix_map = dict()
+        self.strands_start_map = dict()
+        self._strands_indexed = False
         self.domain_list = []
         self.connector_points = []
         self._logger = logging.getLogger(__name__)
         self._add_structure_helices(helices)
         self._aux_data_computed = False
+        self._modified_strands = set()
+        self._modified_helices = set()
 
     def _add_structure_helices(self, structure_helices):
         """ Add a list of structural helices. 
@@ -105,35 +115,118 @@ class DnaStructure(object):
             Compute data derived from the base connectivty: domains, strand/helix and helix/helix connectivty 
             relationships, and crossovers. This data is needed for visualization, calculating melting
             temperature and other applications.
+
+            If auxiliary data has already been computed then only the data for the strands and helices 
+            modified since then (e.g. by removing staples) is recomputed.
         """
         if self._aux_data_computed:
+            if self._modified_strands or self._modified_helices:
+                self._update_aux_data()
             return 
         for strand in self.strands:
             strand.dna_structure = self
+            strand.domain_list = []
         self.set_strand_helix_references()
         self._compute_strand_helix_references()
         self._compute_domains()
         self._set_helix_connectivity()
         self._compute_helix_design_crossovers()
         self._aux_data_computed = True
+        self._modified_strands = set()
+        self._modified_helices = set()
+
+    def _update_aux_data(self):
+        """ Update auxiliary data for the strands and helices modified since it was last computed. 
+
+            Domains are recomputed only for modified strands, the domains of the other strands are 
+            kept and renumbered. Helix connectivity and design crossovers are recomputed only for modified helices. 
+        """
+        self._logger.info("Update auxiliary data: modified strands %d  modified helices %d" % 
+            (len(self._modified_strands), len(self._modified_helices)))
+        modified_strands = []
+        for strand in self.strands:
+            strand.dna_structure = self
+            if strand.id in self._modified_strands:
+                modified_strands.append(strand)
+        #__for strand in self.strands
+
+        # Reset the helices referenced by the modified strands.
+        for strand in modified_strands:
+            strand.helix_list = dict()
+            for base in strand.tour:
+                strand.add_helix(self.structure_helices_map[base.h])
+        #__for strand in modified_strands
+
+        self._update_domains(modified_strands)
+
+        # Recompute the connectivity of the modified helices and the direction of the connections to them from
+        # other helices, it depends on the helix bases.
+        modified_helices = [ self.structure_helices_map[helix_id] for helix_id in self._modified_helices
+                             if helix_id in self.structure_helices_map ]
+        self._set_helix_connectivity(modified_helices)
+        for helix in self.structure_helices_map.itervalues():
+            if helix.id in self._modified_helices:
+                continue
+            for connection in helix.helix_connectivity:
+                if connection.to_helix.id in self._modified_helices:
+                    connection._compute_direction()
+        #__for helix in self.structure_helices_map.itervalues()
+
+        # Recompute the design crossovers for the modified helices.
+        for helix in modified_helices:
+            helix.compute_design_crossovers(self)
+
+        self._modified_strands = set()
+        self._modified_helices = set()
+    #__def _update_aux_data
+
+    def _set_modified_bases(self, bases):
+        """ Flag the strands and helices affected by changes to the given bases as modified. 
+
+            Arguments:
+                bases (List[DnaBase]): The list of bases that are changed.
+
+            A change to a base modifies its helix and the strand its paired base is in. 
+        """
+        for base in bases:
+            self._modified_helices.add(base.h)
+            if base.across:
+                self._modified_strands.add(base.across.strand)
+        #__for base in bases
 
     def create_strands(self):
         """ Create the list of strands connecting contiguous sequences of bases.  
 
             Returns the list of strands (List[DnaStrand]).
         """
-        base_connectivity = self.base_connectivity 
-        num_bases = len(base_connectivity)
+        is_visited = [False]*len(self.base_connectivity)
+        strands = self._trace_strands(self.base_connectivity, is_visited, 0)
+        if strands == None:
+            return None
+        self.strands = strands
+        self.strands_map = dict()
+        self._strands_indexed = False
+        return self.strands
+    #_def create_strands
+
+    def _trace_strands(self, bases, is_visited, n_strand):
+        """ Trace the strands containing a list of bases. 
+
+            Arguments:
+                bases (List[DnaBase]): The list of bases, sorted by ID, to start tracing strands from.
+                is_visited (List[bool]): The list indexed by base ID flagging bases already assigned to a strand.
+                n_strand (int): The ID of the first strand created.
+
+            Returns the list of strands (List[DnaStrand]) or None if the base connectivity is not consistent.
+
+            Strands are traced from the first unvisited base in the list. They are created in the order of the 
+            smallest base ID they contain.
+        """
         strands = []
-        n_strand = 0
-        is_visited = [False]*num_bases
 
-        while (True):
-            try:
-                base_index = is_visited.index(False)
-                curr_base = base_connectivity[base_index]
-            except:
-                break
+        for curr_base in bases:
+            if is_visited[curr_base.id]:
+                continue
 
             init_base = curr_base
 
@@ -192,11 +285,10 @@ class DnaStructure(object):
             strand = DnaStrand(n_strand, self, is_scaffold, is_circular, tour)
             strands.append(strand)
             n_strand += 1
-        #__while (True):
+        #__for curr_base in bases
 
-        self.strands = strands
-        return self.strands
-    #_def create_strands
+        return strands
+    #_def _trace_strands
 
     def get_domains(self):
         if (not self.domain_list): 
@@ -212,6 +304,86 @@ class DnaStructure(object):
             return None
         return self.strands_map[id]
 
+    def get_strand_by_start(self, helix_id, pos, is_scaffold=False):
+        """ Get the strand starting at a helix position. 
+
+            Arguments:
+                helix_id (int): The ID of the helix containing the first base of the strand.
+                pos (int): The position of the first base of the strand in the helix.
+                is_scaffold (bool): If True then get a scaffold strand, else a staple strand.
+
+            Returns the strand (DnaStrand) or None if no strand starts at the position.
+        """
+        self._index_strands()
+        return self.strands_start_map.get((helix_id,pos,is_scaffold), None)
+
+    def get_helix_strands(self, helix_id):
+        """ Get the strands passing through a helix. 
+
+            Arguments:
+                helix_id (int): The helix ID.
+
+            Returns the list of strands (List[DnaStrand]) sorted by strand ID.
+        """
+        self._index_strands()
+        strands = self.strands_helix_map.get(helix_id, set())
+        return sorted(strands, key=lambda strand: strand.id)
+
+    def set_strand_color(self, strand, rgb, icolor):
+        """ Set the color of a strand and update the color index. 
+
+            Arguments:
+                strand (DnaStrand): The strand to set the color for.
+                rgb (List[float]): The strand color in RGB.
+                icolor (int): The strand color as an integer.
+        """
+        if self._strands_indexed:
+            self._remove_strands_from_index([strand])
+        strand.color = rgb
+        strand.icolor = icolor
+        if self._strands_indexed:
+            self._add_strands_to_index([strand])
+
+    def _index_strands(self):
+        """ Create the strand indexes if they are not up to date. 
+
+            The indexes map staple colors, strand start positions and helices to strands. They are created 
+            when first used and are then maintained as strands are colored and removed. Operations that
+            create new strands (e.g. create_strands()) mark the indexes to be recreated.
+        """
+        if self._strands_indexed:
+            return
+        self.strands_color_map = dict()
+        self.strands_helix_map = dict()
+        self.strands_start_map = dict()
+        self._add_strands_to_index(self.strands)
+        self._strands_indexed = True
+
+    def _add_strands_to_index(self, strands):
+        """ Add a list of strands to the strand indexes. """
+        for strand in strands:
+            base = strand.tour[0]
+            self.strands_start_map[(base.h,base.p,strand.is_scaffold)] = strand
+            if (not strand.is_scaffold) and (strand.icolor != None):
+                self.strands_color_map.setdefault(strand.icolor, set()).add(strand)
+            for helix_id in set([base.h for base in strand.tour]):
+                self.strands_helix_map.setdefault(helix_id, set()).add(strand)
+        #__for strand in strands
+
+    def _remove_strands_from_index(self, strands):
+        """ Remove a list of strands from the strand indexes. """
+        for strand in strands:
+            base = strand.tour[0]
+            key = (base.h,base.p,strand.is_scaffold)
+            if self.strands_start_map.get(key, None) == strand:
+                del self.strands_start_map[key]
+            if strand.icolor in self.strands_color_map:
+                self.strands_color_map[strand.icolor].discard(strand)
+            for helix_id in set([base.h for base in strand.tour]):
+                if helix_id in self.strands_helix_map:
+                    self.strands_helix_map[helix_id].discard(strand)
+        #__for strand in strands
+
     def remove_staples(self, retain_staples):
         """ Remove all staple strands except for those in the given retained staples list.
 
@@ -225,6 +397,8 @@ class DnaStructure(object):
         self.remove_helices_bases(removed_strands)
 
         # Reset strand data.
+        if self._strands_indexed:
+            self._remove_strands_from_index(removed_strands)
         self.strands = remaining_strands
         self.strands_map = dict()
 
@@ -290,7 +464,11 @@ class DnaStructure(object):
             at locations not occupied by the bases in the retained strands. Crossover information is then 
             added to the helices by setting down and up pointers for crossover bases.
 
-            The structure base connectivity table is generated and a new list of strands are created from it. 
+            New staple bases are only added at helix positions that have a scaffold base so their geometry is 
+            taken from the existing helix axis coordinates and frames. 
+
+            The structure base connectivity table is generated and strands are traced only for the new bases 
+            and the retained strands connected to them by crossovers. 
         """
         self._logger.info("Add maximal staple set")
 
@@ -301,32 +479,91 @@ class DnaStructure(object):
         #  Remove the bases from the structure helices.
         self.remove_helices_bases(removed_strands)
 
-        # Add maximal set of staple strands bases.
+        # Add maximal set of staple strands bases and their nucleotide coordinates.
+        new_bases = []
         for helix in self.structure_helices_map.values():
-            helix.add_maximal_staple_bases()
+            new_bases.extend(helix.add_maximal_staple_bases(self.dna_parameters))
 
-        # Add maximal set of staple strands crossovers and generate the helix 
-        # axis coordinates and frames, and DNA helix nucleotide coordinates.
+        # Add maximal set of staple strands crossovers.
+        crossover_bases = []
         for helix in self.structure_helices_map.values():
-            helix.add_maximal_staple_crossovers()
-            axis_coords, axis_frames, scaffold_coords, staple_coords = \
-                generate_coordinates(self.dna_parameters, self.lattice_type, helix.lattice_row, helix.lattice_col, \
-                    helix.lattice_num, helix.scaffold_bases, helix.staple_bases)
-            helix.set_coordinates(axis_coords, axis_frames, scaffold_coords, staple_coords) 
-        #__for helix in self.structure_helices_map.values()
+            crossover_bases.extend(helix.add_maximal_staple_crossovers())
 
         # Create the base connectivity needed for strand generation.
         self.create_base_connectivity_table()
 
-        # Create the list of strands from the new base connectivity.
-        self.create_strands()
+        # Create the list of strands from the new bases.
+        self._add_maximal_staple_strands(remaining_strands, new_bases, crossover_bases)
         self.strands_map = dict()
+        self._strands_indexed = False
+        self._aux_data_computed = False
         self._logger.info("Number of added staples %d" % (len(self.strands)-len(remaining_strands)))
+        self._logger.info("Number of new staple bases %d" % len(new_bases))
         self._logger.info("Total number of strands %d" % len(self.strands))
     #__def generate_maximal_staple_set
 
+    def _add_maximal_staple_strands(self, remaining_strands, new_bases, crossover_bases):
+        """ Add the strands for the bases of a maximal staple set.
+
+            Arguments:
+                remaining_strands (List[DnaStrand]): The list of strands retained in the structure.
+                new_bases (List[DnaBase]): The list of bases added for the maximal staple set. 
+                crossover_bases (List[DnaBase]): The list of bases connected by maximal staple set crossovers.
+
+            Strands are traced for the new bases, for the retained circular strands and for the retained strands 
+            that have been connected to new bases by crossovers. Other retained strands are kept. Strands are then sorted and renumbered 
+            by the smallest base ID they contain, the same order given by create_strands().
+        """
+        # New bases have not been assigned a strand.
+        retraced_strand_ids = set()
+        for base in crossover_bases:
+            if base.strand != None:
+                retraced_strand_ids.add(base.strand)
+        #__for base in crossover_bases
+
+        # Circular strands are also retraced because the base IDs have changed and the tour 
+        # must start at the same base as it would using create_strands().
+        kept_strands = []
+        trace_bases = list(new_bases)
+        for strand in remaining_strands:
+            if (strand.id in retraced_strand_ids) or strand.is_circular:
+                trace_bases.extend(strand.tour)
+            else:
+                kept_strands.append(strand)
+        #__for strand in remaining_strands
+
+        is_visited = [False]*len(self.base_connectivity)
+        for strand in kept_strands:
+            for base in strand.tour:
+                is_visited[base.id] = True
+        #__for strand in kept_strands
+
+        trace_bases.sort(key=lambda base: base.id)
+        new_strands = self._trace_strands(trace_bases, is_visited, len(remaining_strands))
+        if new_strands == None:
+            self._logger.error("Create strands for the maximal staple set failed.")
+            return
+
+        # Base IDs have changed so reset the base index maps of the kept strands.
+        for strand in kept_strands:
+            strand.base_id_list = dict()
+
+        # Sort and renumber strands.
+        strands = kept_strands + new_strands
+        strands.sort(key=lambda strand: min([base.id for base in strand.tour]))
+        for n_strand,strand in enumerate(strands):
+            if strand.id != n_strand:
+                strand.id = n_strand
+                for base in strand.tour:
+                    base.strand = n_strand
+            #__if strand.id != n_strand
+        #__for n_strand,strand in enumerate(strands)
+        self.strands = strands
+    #__def _add_maximal_staple_strands
+
     def create_removed_staple_lists(self, retain_staples):
         # Create lists of strands to remove and strands to keep.
+        retain_staples = set(retain_staples)
         removed_strands = []
         remaining_strands = []
         for strand in self.strands:
@@ -344,28 +581,28 @@ class DnaStructure(object):
             Arguments:
                 removed_strands (List[DnaStrand]): The list of strands to remove.
 
-           A list of bases for each helix is first created from removed strands bases. 
-           The bases for each helix are then removed using that list.
+           The removed bases are flagged in a mask indexed by base ID. The bases for each helix 
+           containing removed bases are then removed using that mask.
         """
         self._logger.debug("===================== remove strands  =====================")
 
-        # Create lists of bases to remove for each helix.
-        helix_base_map = {}
+        # Flag the bases to remove and the helices they are in.
+        is_removed = np.zeros(len(self.base_connectivity), dtype=bool)
+        helix_ids = set()
         for strand in removed_strands:
             base = strand.tour[0]
             self._logger.debug("Remove strand ID %d  start h %d  p %d" % (strand.id, base.h, base.p))
-            for base in strand.tour:
-                if base.h not in helix_base_map: 
-                    helix_base_map[base.h] = [] 
-                helix_base_map[base.h].append(base)
-            #__for base in strand.tour
+            self._set_modified_bases(strand.tour)
+            base_ids = [base.id for base in strand.tour]
+            is_removed[base_ids] = True
+            helix_ids.update([base.h for base in strand.tour])
         #__for strand in removed_strands
 
         # Remove bases from helices.
-        for helix_id,base_list in helix_base_map.iteritems():
+        for helix_id in helix_ids:
             helix = self.structure_helices_map[helix_id]
-            helix.remove_bases(base_list)
-        #__for helix_id,base_list in helix_base_map.iteritems
+            helix.remove_masked_bases(is_removed)
+        #__for helix_id in helix_ids
     #__def remove_helices_bases
 
     def get_staples_by_color(self, staple_colors):
@@ -376,12 +613,11 @@ class DnaStructure(object):
 
             Returns the set of staple strands IDs matching the colors in the input list.
         """
+        self._index_strands()
         staple_strands = set()
         for color in staple_colors:
-            for strand in self.strands:
-                if (not strand.is_scaffold) and (strand.icolor == color): 
-                    staple_strands.add(strand.id)
-            #__for strand in self.strands
+            for strand in self.strands_color_map.get(color, []):
+                staple_strands.add(strand.id)
         #__for color in staple_colors
         return staple_strands
     #__def get_staples_by_color
@@ -415,94 +651,150 @@ class DnaStructure(object):
 
         # Iterate over the scaffold and staple strands of a structure. 
         for strand in self.strands:
-            self._logger.debug("")
-            if ( strand.is_scaffold):
-                self._logger.debug("==================== scaffold strand %d ====================" % strand.id)
-            else:
-                self._logger.debug("==================== staple strand %d ====================" % strand.id)
+            domain_id = self._compute_strand_domains(strand, domain_id, merge_domains)
 
-            start_base = strand.tour[0]
-            end_base = strand.tour[-1]
-            self._logger.debug("Strand number of bases: %3d" % len(strand.tour))
-            self._logger.debug("Strand start: h: %3d  p: %3d" % (start_base.h, start_base.p))
-            self._logger.debug("Strand end: h: %3d  p: %3d" % (end_base.h, end_base.p))
+        self._logger.info("Number of domains computed: %d " % len(self.domain_list))
 
-            # Initialize the domain base list.
-            base = strand.tour[0]
-            curr_across_sign = 0 if base.across else -1
-            domain_bases = [ base ]
-
-            # Traverse the bases in a strand and create domains.
-            for i in xrange(1,len(strand.tour)):
-                base = strand.tour[i]
-                across_sign = 0 if base.across else -1
-                add_curr_base = True
-                #self._logger.debug("Base h %3d  p %3d " % (base.h, base.p))
-                #if (base.up): 
-                #    self._logger.debug("    Base up  h %3d  p %3d " % (base.up.h, base.up.p))
-
-                # If no domain bases then just continue after checking for sign change.
-                if len(domain_bases) == 0:
-                    domain_bases.append(base)
-                    if curr_across_sign != across_sign:
-                        curr_across_sign = across_sign
-                    continue
+        # Check if the computed domains are consistent with the strands they were computed from.
+        self.check_domains()
+
+        # Set the strand and domain each domain is connected to.
+        self._set_domain_connections()
+    #__def _compute_domains
+
+    def _update_domains(self, modified_strands):
+        """ Recompute the domains for a list of modified strands. 
+
+            Arguments:
+                modified_strands (List[DnaStrand]): The list of strands to recompute domains for.
+
+            The domains of strands that have not been modified are reused. All domains are renumbered 
+            to follow the order of self.strands so the result is the same as computing domains for all strands.
+        """
+        self._logger.debug("===================== update domains =====================")
+        modified_ids = set([strand.id for strand in modified_strands])
+        merge_domains = False
+        domain_id = 0
+        self.domain_list = []
+
+        for strand in self.strands:
+            if strand.id in modified_ids:
+                strand.domain_list = []
+                domain_id = self._compute_strand_domains(strand, domain_id, merge_domains)
+                continue
+            for domain in strand.domain_list:
+                if domain.id != domain_id:
+                    domain.id = domain_id
+                    for base in domain.base_list:
+                        base.domain = domain_id
+                self.domain_list.append(domain)
+                domain_id += 1
+            #__for domain in strand.domain_list
+        #__for strand in self.strands
+
+        self._logger.info("Number of domains recomputed: %d  total: %d" % (sum([len(strand.domain_list) 
+            for strand in modified_strands]), len(self.domain_list)))
+        self.check_domains(modified_strands)
+        self._set_domain_connections()
+    #__def _update_domains
+
+    def _compute_strand_domains(self, strand, domain_id, merge_domains):
+        """ Compute the domains for a single strand. 
+
+            Arguments:
+                strand (DnaStrand): The strand to compute domains for.
+                domain_id (int): The ID of the first domain created for the strand.
+                merge_domains (bool): If True then for circular strands merge the bases from the start of the strand with
+                    those from the end. 
 
-                # Check for a single->double or double->single strand transition.
+            Returns the next domain ID.
+        """
+        self._logger.debug("")
+        if ( strand.is_scaffold):
+            self._logger.debug("==================== scaffold strand %d ====================" % strand.id)
+        else:
+            self._logger.debug("==================== staple strand %d ====================" % strand.id)
+
+        start_base = strand.tour[0]
+        end_base = strand.tour[-1]
+        self._logger.debug("Strand number of bases: %3d" % len(strand.tour))
+        self._logger.debug("Strand start: h: %3d  p: %3d" % (start_base.h, start_base.p))
+        self._logger.debug("Strand end: h: %3d  p: %3d" % (end_base.h, end_base.p))
+
+        # Initialize the domain base list.
+        base = strand.tour[0]
+        curr_across_sign = 0 if base.across else -1
+        domain_bases = [ base ]
+
+        # Traverse the bases in a strand and create domains.
+        for i in xrange(1,len(strand.tour)):
+            base = strand.tour[i]
+            across_sign = 0 if base.across else -1
+            add_curr_base = True
+            #self._logger.debug("Base h %3d  p %3d " % (base.h, base.p))
+            #if (base.up): 
+            #    self._logger.debug("    Base up  h %3d  p %3d " % (base.up.h, base.up.p))
+
+            # If no domain bases then just continue after checking for sign change.
+            if len(domain_bases) == 0:
+                domain_bases.append(base)
                 if curr_across_sign != across_sign:
-                    domain_id = self._add_domain(domain_id, strand, domain_bases, merge_domains, "sign change")
-                    domain_bases = []
                     curr_across_sign = across_sign
-
-                # Check for a crossover between helices for this base.
-                elif self._check_base_crossover(base):
+                continue
+
+            # Check for a single->double or double->single strand transition.
+            if curr_across_sign != across_sign:
+                domain_id = self._add_domain(domain_id, strand, domain_bases, merge_domains, "sign change")
+                domain_bases = []
+                curr_across_sign = across_sign
+
+            # Check for a crossover between helices for this base.
+            elif self._check_base_crossover(base):
+                last_base = domain_bases[-1]
+                # Make sure the current base is in the same helix.
+                if base.h == last_base.h:
+                    domain_bases.append(base)
+                    add_curr_base = False
+                domain_id = self._add_domain(domain_id, strand, domain_bases, merge_domains, "base crossover")
+                domain_bases = []
+
+            # Check the base paired to this base for: crossover or termination.
+            elif base.across != None:
+                abase = base.across
+                if self._check_base_crossover(abase):
+                    domain_bases.append(base)
+                    add_curr_base = False
+                    domain_id = self._add_domain(domain_id, strand, domain_bases, merge_domains, "abase crossover")
+                    domain_bases = []
+                # If a strand terminates make sure the current base is in the same strand. 
+                elif (abase.down == None) or (abase.up == None):
                     last_base = domain_bases[-1]
-                    # Make sure the current base is in the same helix.
-                    if base.h == last_base.h:
+                    if last_base.across != None:
+                        last_abase = last_base.across
+                        if abase.strand == last_abase.strand:
+                            domain_bases.append(base)
+                            add_curr_base = False
+                    else:
                         domain_bases.append(base)
                         add_curr_base = False
-                    domain_id = self._add_domain(domain_id, strand, domain_bases, merge_domains, "base crossover")
+                    domain_id = self._add_domain(domain_id, strand, domain_bases, merge_domains, "abase start/end")
                     domain_bases = []
+            #__if curr_across_sign != across_sign
 
-                # Check the base paired to this base for: crossover or termination.
-                elif base.across != None:
-                    abase = base.across
-                    if self._check_base_crossover(abase):
-                        domain_bases.append(base)
-                        add_curr_base = False
-                        domain_id = self._add_domain(domain_id, strand, domain_bases, merge_domains, "abase crossover")
-                        domain_bases = []
-                    # If a strand terminates make sure the current base is in the same strand. 
-                    elif (abase.down == None) or (abase.up == None):
-                        last_base = domain_bases[-1]
-                        if last_base.across != None:
-                            last_abase = last_base.across
-                            if abase.strand == last_abase.strand:
-                                domain_bases.append(base)
-                                add_curr_base = False
-                        else:
-                            domain_bases.append(base)
-                            add_curr_base = False
-                        domain_id = self._add_domain(domain_id, strand, domain_bases, merge_domains, "abase start/end")
-                        domain_bases = []
-                #__if curr_across_sign != across_sign
-
-                # Add the current base to the current list of domain bases.
-                if add_curr_base:
-                    domain_bases.append(base)
-            #__for i in xrange(1,len(strand.tour))
-
-            # Add a domain for any remaining bases.
-            if len(domain_bases) != 0:
-                domain_id = self._add_domain(domain_id, strand, domain_bases, merge_domains, "remaining")
-        #__for strand in self.strands__
+            # Add the current base to the current list of domain bases.
+            if add_curr_base:
+                domain_bases.append(base)
+        #__for i in xrange(1,len(strand.tour))
 
-        self._logger.info("Number of domains computed: %d " % len(self.domain_list))
+        # Add a domain for any remaining bases.
+        if len(domain_bases) != 0:
+            domain_id = self._add_domain(domain_id, strand, domain_bases, merge_domains, "remaining")
 
-        # Check if the computed domains are consistent with the strands they were computed from.
-        self.check_domains()
+        return domain_id
+    #__def _compute_strand_domains
 
-        # Set the strand and domain each domain is connected to.
+    def _set_domain_connections(self):
+        """ Set the strand and domain each domain is connected to. """
         for domain in self.domain_list:
             across_base = None
             for base in domain.base_list:
@@ -539,16 +831,22 @@ class DnaStructure(object):
 
         return False
 
-    def check_domains(self):
+    def check_domains(self, strands=None):
         """ Check that the bases in the domains created for a structure are consistent with the bases in the strand
             they are part of.
 
+            Arguments:
+                strands (List[DnaStrand], optional): The list of strands to check. If not given then all the 
+                    strands of the structure are checked.
+
             The combination of the bases in a list of domains for a strand should equal the number of base and follow the 
             order of bases in that strand. In addition each domain should only contain bases for a single helix. 
         """
         self._logger.debug("============================== check domains ============================== " )
+        if strands == None:
+            strands = self.strands
         num_failures = 0
-        for strand in self.strands:
+        for strand in strands:
             self._logger.debug("-------------------- strand %d -------------------- " % strand.id)
             self._logger.debug("Number of bases %d " % len(strand.tour))
             strand_bases = ""
@@ -608,7 +906,7 @@ class DnaStructure(object):
             else:
                 self._logger.debug("Check passed: domain bases match strand bases.")
             #__if match_failed
-        #__for strand in self.strands
+        #__for strand in strands
 
         if num_failures == 0:
             self._logger.info("Domain consistency check: all domains passed.")
@@ -726,10 +1024,17 @@ class DnaStructure(object):
                 strand.add_helix(helix)
         #__for strand in self.strands__
 
-    def _set_helix_connectivity(self):
-        """ For each helix set the list of helices it is connected to. """ 
+    def _set_helix_connectivity(self, helices=None):
+        """ For each helix set the list of helices it is connected to. 
+
+            Arguments:
+                helices (List[DnaStructureHelix]): The helices to set the connectivity for. If None then the
+                    connectivity is set for all helices.
+        """ 
         self._logger.debug("[DnaModel::==================== set_vhelix_connectivity==================== ] ")
-        for helix1 in self.structure_helices_map.itervalues():
+        if helices == None:
+            helices = self.structure_helices_map.values()
+        for helix1 in helices:
             self._logger.debug(" ----- vhelix num %d -----" % helix1.lattice_num)
             helix_connectivity = []
             row = helix1.lattice_row
@@ -750,9 +1055,46 @@ class DnaStructure(object):
         for helix in self.structure_helices_map.itervalues():
             helix.compute_design_crossovers(self)
 
-    def write(self, file_name, write_json_format):
+    def _get_base_json_info(self, base):
+        """ Get the information written for a base in structure and topology JSON files. """
+        base_info = OrderedDict()
+        base_info['id'] = base.id
+        base_info['helix'] = base.h
+        base_info['pos'] = base.p
+        base_info['up'] =  base.up.id if base.up else -1 
+        base_info['down'] = base.down.id if base.down else -1
+        base_info['across'] = base.across.id if base.across else -1
+        base_info['sequence'] = base.seq
+        base_info['strand'] = base.strand
+        return base_info
+
+    def _get_strand_json_info(self, strand):
+        """ Get the information written for a strand in structure JSON files. """
+        strand_info = OrderedDict()
+        strand_info['id'] = strand.id
+        strand_info['scaffold'] = strand.is_scaffold
+        strand_info['bases'] = [base.id for base in strand.tour]
+        strand_info['domain_ids'] = [domain.id for domain in strand.domain_list ]
+        return strand_info
+
+    def _get_domain_json_info(self, domain):
+        """ Get the information written for a domain in structure JSON files. """
+        domain_info = OrderedDict()
+        domain_info['id'] = domain.id
+        domain_info['bases'] = [base.id for base in domain.base_list]
+        return domain_info
+
+    def write(self, file_name, write_json_format, indent=4):
         """ Write the structure information to a file. 
             Structure information is written to files in JSON and plain text formats.
+
+            Arguments:
+                file_name (string): The name of the JSON file to write. 
+                write_json_format (bool): If True then write a JSON file.
+                indent (int): The JSON indentation. If None then the JSON file is written in compact form.
+
+            The JSON file is written incrementally, the information for each base, strand and domain is 
+            created as it is written.
         """
 
         # Compute auxillary data to calculate domains.
@@ -761,46 +1103,16 @@ class DnaStructure(object):
         # Write structure information in JSON format.
         if write_json_format:
             self._logger.info("Writing DNA strcuture to file %s." % file_name)
-            base_list = []
-            for base in self.base_connectivity:
-                base_info = OrderedDict()
-                base_info['id'] = base.id
-                base_info['helix'] = base.h
-                base_info['pos'] = base.p
-                base_info['up'] =  base.up.id if base.up else -1 
-                base_info['down'] = base.down.id if base.down else -1
-                base_info['across'] = base.across.id if base.across else -1
-                base_info['sequence'] = base.seq
-                base_info['strand'] = base.strand
-                base_list.append(base_info)
-            #__for base in self.base_connectivity
-
-            strand_list = []
-            for strand in self.strands:
-                strand_info = OrderedDict()
-                strand_info['id'] = strand.id
-                strand_info['scaffold'] = strand.is_scaffold
-                strand_info['bases'] = [base.id for base in strand.tour]
-                strand_info['domain_ids'] = [domain.id for domain in strand.domain_list ]
-                strand_list.append(strand_info)
-
-            domain_list = []
-            for domain in self.domain_list:
-                domain_info = OrderedDict()
-                domain_info['id'] = domain.id
-                domain_info['bases'] = [base.id for base in domain.base_list]
-                domain_list.append(domain_info)
-
             structure = OrderedDict()
-            structure['num_bases'] = len(base_list)
-            structure['num_strands'] = len(strand_list)
-            structure['num_domains'] = len(domain_list)
-            structure['bases'] = base_list
-            structure['strands'] = strand_list
-            structure['domains'] = domain_list 
+            structure['num_bases'] = len(self.base_connectivity)
+            structure['num_strands'] = len(self.strands)
+            structure['num_domains'] = len(self.domain_list)
+            structure['bases'] = JsonArray(self._get_base_json_info(base) for base in self.base_connectivity)
+            structure['strands'] = JsonArray(self._get_strand_json_info(strand) for strand in self.strands)
+            structure['domains'] = JsonArray(self._get_domain_json_info(domain) for domain in self.domain_list)
 
             with open(file_name, 'w') as outfile:
-                json.dump(structure, outfile, indent=4, separators=(',', ': '), sort_keys=False)
+                JsonEmitter(outfile, indent).dump(structure)
 
         # Write structure information in plain text format.
         file_name = file_name.replace("json", "txt")
@@ -827,30 +1139,21 @@ class DnaStructure(object):
                     (domain.id, len(domain.base_list), [base.id for base in domain.base_list]))
         #__with open(file_name, 'w') as outfile
 
-    def write_topology(self, file_name, write_json_format):
+    def write_topology(self, file_name, write_json_format, indent=4):
         """ Write the base information with base connectivity to a file. 
             Base information is written to files in JSON and plain text formats.
+
+            Arguments:
+                file_name (string): The name of the JSON file to write. 
+                write_json_format (bool): If True then write a JSON file.
+                indent (int): The JSON indentation. If None then the JSON file is written in compact form.
         """
         # Write base information in JSON format.
         if write_json_format:
             self._logger.info("Writing DNA base connectivity in JSON format to file %s." % file_name)
-            base_list = []
-            for base in self.base_connectivity:
-                base_info = OrderedDict()
-                base_info['id'] = base.id 
-                base_info['helix'] = base.h 
-                base_info['pos'] = base.p 
-                base_info['up'] =  base.up.id if base.up else -1 
-                base_info['down'] = base.down.id if base.down else -1
-                base_info['across'] = base.across.id if base.across else -1
-                base_info['sequence'] = base.seq 
-                base_info['strand'] = base.strand 
-                base_list.append(base_info)
-            #__for base in self.base_connectivity
-
-            topology = { 'bases' : base_list } 
+            topology = { 'bases' : JsonArray(self._get_base_json_info(base) for base in self.base_connectivity) }
             with open(file_name, 'w') as outfile:
-                json.dump(topology, outfile, indent=4, separators=(',', ': '), sort_keys=False)
+                JsonEmitter(outfile, indent).dump(topology)
 
         # Write base information in plain text format.
         file_name = file_name.replace("json", "txt")
@@ -39,6 +39,7 @@ import sys
 # Within package imports
 from .parameters import DnaParameters,DnaPolarity
 from ..converters.cadnano.common import CadnanoLatticeType
+from ..converters.cadnano.utils import compute_nucleotide_coordinates
 from .lattice import Lattice
 from .base import DnaBase
 
@@ -217,12 +218,20 @@ class DnaStructureHelix(object):
         #__for base in self.scaffold_bases
     #__def build_base_pos_maps
 
-    def add_maximal_staple_bases(self):
+    def add_maximal_staple_bases(self, dna_parameters):
         """ Add bases for the maximal staple set. 
 
+            Arguments:
+                dna_parameters (DnaParameters): The DNA parameters used to compute nucleotide coordinates.
+
             New bases are created and added to the helix at locations not occupied by bases. 
             The helix locations to add bases are detemined by the max/min positions of the
             helix scaffold bases.
+
+            New bases are only added at positions with a scaffold base. Their coordinates and reference 
+            frames are those of the scaffold base so the helix axis geometry does not need to be regenerated.
+
+            Returns the list of new bases (List[DnaBase]).
         """
         self._logger.debug("=================== add maximal staple bases %d ===================" % self.id)
         self._logger.debug("Scaffold polarity %s" % self.scaffold_polarity)
@@ -246,7 +255,8 @@ class DnaStructureHelix(object):
                 base.h = self.id
                 base.is_scaf = False
                 base.across = self.scaffold_pos[pos]
-                base.coordinates = np.array([0.0, 0.0, 0.0], dtype=float)
+                base.coordinates = base.across.coordinates
+                base.ref_frame = base.across.ref_frame
                 self.staple_pos[base.p] = base
                 new_base_pos.add(pos)
                 id += 1
@@ -276,10 +286,28 @@ class DnaStructureHelix(object):
                     base.down = down_base
         #__for base in self.staple_bases
 
+        # Set the nucleotide coordinates of the staple bases.
+        new_bases = [self.staple_pos[pos] for pos in sorted(new_base_pos)]
+        if len(new_bases) != 0:
+            coords = np.array([base.coordinates for base in new_bases], dtype=float)
+            frames = np.array([base.ref_frame for base in new_bases], dtype=float)
+            nt_coords = compute_nucleotide_coordinates(dna_parameters, coords, frames, False)
+            for base,nt_coord in itertools.izip(new_bases, nt_coords):
+                base.nt_coords = nt_coord
+            self.staple_coords = np.array([base.nt_coords for base in self.staple_bases], dtype=float)
+            for base,nt_coord in itertools.izip(self.staple_bases, self.staple_coords):
+                base.nt_coords = nt_coord
+        #__if len(new_bases) != 0
+
+        self.build_base_pos_maps()
+        return new_bases
     #__def add_maximal_staple_bases
 
     def add_maximal_staple_crossovers(self):
-        """ Add crossover connections for bases for the maximal staple set. """
+        """ Add crossover connections for bases for the maximal staple set. 
+
+            Returns the list of bases (List[DnaBase]) whose connectivity was changed.
+        """
         self._logger.debug("=================== add maximal staple crossovers %d ===================" % self.id)
         self._logger.debug("Scaffold polarity %s" % self.scaffold_polarity)
 
@@ -290,6 +318,7 @@ class DnaStructureHelix(object):
 
         # Add the up/down pointers for bases at crossovers. 
         five_prime = (self.scaffold_polarity == DnaPolarity.FIVE_PRIME)
+        crossover_bases = []
         for crossover in self.possible_staple_crossovers:
             to_helix = crossover[0]
             pos = crossover[1]
@@ -311,9 +340,12 @@ class DnaStructureHelix(object):
                     else:
                         base.up = to_base 
                         to_base.down = base 
+                crossover_bases.append(base)
+                crossover_bases.append(to_base)
                 self._logger.debug("Crossover base at pos %d to helix %d" % (base.p, to_helix.id))
         #__for crossover in possible_staple_crossovers
 
+        return crossover_bases
     #__def add_maximal_staple_crossovers
 
     def apply_xform(self, xform):
@@ -321,32 +353,49 @@ class DnaStructureHelix(object):
 
             Arguments:
                 xform (Xform): The transformation to apply to the helx geometry.
+
+            The helix axis coordinates and reference frames are transformed in place so the base coordinates 
+            and reference frames, which are views into these arrays, are also transformed. The nucleotide 
+            coordinates of all helix bases are transformed together.
         """
         self._logger.debug("=================== apply xform to helix %d ===================" % self.id)
-        R = xform.rotation_matrix
-        #xform.print_transformation()
         translation = xform.translation 
         center = xform.center 
-        coord = np.array([0.0,0.0,0.0], dtype=float) 
-        frame = np.zeros((3,3), dtype=float)
-        xcoord = np.array([0.0,0.0,0.0], dtype=float) 
-        xframe = np.zeros((3,3), dtype=float)
-        num_coords = len(self.helix_axis_coords)
-        self._logger.debug("Number of coordinates %d" % num_coords) 
+        self._logger.debug("Number of coordinates %d" % len(self.helix_axis_coords)) 
         self._logger.debug("Xform center (%g %g %g)" % (center[0], center[1], center[2])) 
         self._logger.debug("Xform translation (%g %g %g)" % (translation[0], translation[1], translation[2])) 
-        for i in xrange(0, num_coords):
-            coord[:] = self.helix_axis_coords[i,:] - center
-            frame = self.helix_axis_frames[:,:,i]
-            xcoord[:] = np.dot(R, coord) + center + translation
-            xframe = np.dot(R, frame)
-	    self.helix_axis_coords[i,:] = xcoord[:] 
-	    self.helix_axis_frames[:,:,i] = xframe[:,:]
-        #__for i in xrange(0, num_coords)
+        self.helix_axis_coords[:] = xform.transform_points(self.helix_axis_coords)
+        self.helix_axis_frames[:] = xform.transform_frames(self.helix_axis_frames)
+        self.set_nucleotide_coords(xform.transform_points(self.get_nucleotide_coords()))
 
         # Reset helix end coordinates.
         self.set_end_coords()
 
+    def get_nucleotide_coords(self):
+        """ Get the nucleotide coordinates of the helix bases.
+
+            Returns the coordinates (NumPy Nx3 ndarray[float]) of the scaffold bases followed by the staple bases.
+        """
+        bases = list(itertools.chain(self.scaffold_bases, self.staple_bases))
+        return np.array([base.nt_coords for base in bases], dtype=float).reshape((len(bases),3))
+
+    def set_nucleotide_coords(self, nt_coords):
+        """ Set the nucleotide coordinates of the helix bases.
+
+            Arguments:
+                nt_coords (NumPy Nx3 ndarray[float]): The coordinates of the scaffold bases followed by the staple bases.
+
+            The scaffold_coords and staple_coords arrays are set and the base nucleotide coordinates are set 
+            to views into them.
+        """
+        num_scaffold_bases = len(self.scaffold_bases)
+        self.scaffold_coords = np.array(nt_coords[:num_scaffold_bases], dtype=float)
+        self.staple_coords = np.array(nt_coords[num_scaffold_bases:], dtype=float)
+        for base,nt_coord in itertools.izip(self.scaffold_bases, self.scaffold_coords):
+            base.nt_coords = nt_coord
+        for base,nt_coord in itertools.izip(self.staple_bases, self.staple_coords):
+            base.nt_coords = nt_coord
+
     def get_center(self):
         """ Get helix geometric center. 
 
@@ -415,143 +464,245 @@ class DnaStructureHelix(object):
             This function is used to remove bases after a design file has been processed. 
             For example, it is called when removing strands from a structure.
         """
-        self._logger.debug("========== remove bases ==========")
-        self._logger.debug("Number of staple bases %d" % len(self.staple_bases))
-        self._logger.debug("Number of bases to remove %d" % len(base_list))
-
-        # Create base helix position maps.
-        removed_staple_bases = set()
-        removed_scaffold_bases = set()
+        if len(base_list) == 0:
+            return
+        max_id = max([base.id for base in itertools.chain(base_list, self.staple_bases, self.scaffold_bases)])
+        is_removed = np.zeros(max_id+1, dtype=bool)
         for base in base_list:
-            if base.is_scaf:
-                removed_scaffold_bases.add(base.p)
-            else:
-                removed_staple_bases.add(base.p)
-        #__for base in base_list
+            is_removed[base.id] = True
+        self.remove_masked_bases(is_removed)
+    #__def remove_bases
 
-        # Modify list of staple bases.
-        remaining_staple_bases = []
-        for base in self.staple_bases:
-            if base.p not in removed_staple_bases:
-                remaining_staple_bases.append(base)
-            else:
+    def remove_masked_bases(self, is_removed):
+        """ Remove the bases flagged in a mask from the helix.
+
+            Arguments:
+                is_removed (NumPy N ndarray[bool]): The mask indexed by base ID flagging the bases to remove.
+
+            The helix base lists and the nucleotide coordinate, axis coordinate and axis reference frame arrays 
+            are compacted once. Removing bases does not change the positions of the remaining bases so the 
+            helix geometry is not regenerated, the coordinate and reference frame views of the remaining bases 
+            are remapped into the compacted arrays.
+        """
+        self._logger.debug("========== remove bases ==========")
+        self._logger.debug("Number of staple bases %d" % len(self.staple_bases))
+        staple_keep = self._get_keep_mask(self.staple_bases, is_removed)
+        scaffold_keep = self._get_keep_mask(self.scaffold_bases, is_removed)
+        if staple_keep.all() and scaffold_keep.all():
+            return
+
+        # Disconnect the removed bases.
+        for base_list,keep in [(self.staple_bases,staple_keep), (self.scaffold_bases,scaffold_keep)]:
+            for base in itertools.compress(base_list, ~keep):
                 base.up = None
                 base.down = None
                 if base.across: 
                     base.across.across = None 
                     base.across = None 
-            #__if base.p not in removed_staple_bases
-        #__for base in self.staple_bases
+            #__for base in itertools.compress(base_list, ~keep)
+        #__for base_list,keep in [(self.staple_bases,staple_keep), (self.scaffold_bases,scaffold_keep)]
 
-        self._logger.debug("Number of bases removed %d" % (len(self.staple_bases) - len(remaining_staple_bases)))
-        self._logger.debug("Number of bases remaining %d" % len(remaining_staple_bases)) 
-        self.staple_bases = remaining_staple_bases
-        for base in self.staple_bases:
-            self._logger.debug("Base ID %d  h %d  p %d" % (base.id, base.h, base.p))
+        # Compact the base lists and nucleotide coordinates.
+        self.staple_bases, self.staple_coords = self._compact_bases(self.staple_bases, self.staple_coords, staple_keep)
+        self.scaffold_bases, self.scaffold_coords = self._compact_bases(self.scaffold_bases, self.scaffold_coords, 
+            scaffold_keep)
+        self._logger.debug("Number of bases removed %d" % (len(staple_keep) - len(self.staple_bases)))
+        self._logger.debug("Number of bases remaining %d" % len(self.staple_bases)) 
 
-        # Regenerate the helix coordinate and reference frame  
-        # arrays from the modified list of bases.
-        self.regenerate_coordinate_arrays()
+        # Compact the helix coordinate and reference frame arrays.
+        self._compact_axis_arrays()
 
         # Rebuild base position maps.
         self.build_base_pos_maps()
+    #__def remove_masked_bases
+
+    def _get_keep_mask(self, base_list, is_removed):
+        """ Get the mask of the bases in a list that are not flagged in the removed mask. """
+        num_bases = len(base_list)
+        base_ids = np.fromiter((base.id for base in base_list), dtype=int, count=num_bases)
+        keep = np.ones(num_bases, dtype=bool)
+        in_mask = base_ids < len(is_removed)
+        keep[in_mask] = ~is_removed[base_ids[in_mask]]
+        return keep
+    #__def _get_keep_mask
+
+    def _compact_bases(self, base_list, nt_coords, keep):
+        """ Compact a list of bases and its nucleotide coordinates array using a mask of the bases to keep. 
+
+            The nucleotide coordinates of the remaining bases are set to views into the compacted array. If
+            the coordinates array does not match the list of bases (e.g. after inserting bases) then it is not 
+            changed.
+        """
+        if keep.all():
+            return base_list, nt_coords
+        remaining_bases = list(itertools.compress(base_list, keep))
+        if (nt_coords is None) or (len(nt_coords) != len(base_list)):
+            return remaining_bases, nt_coords
+        nt_coords = nt_coords[keep]
+        for i,base in enumerate(remaining_bases):
+            base.nt_coords = nt_coords[i]
+        return remaining_bases, nt_coords
+    #__def _compact_bases
+
+    def _get_axis_rows(self, bases):
+        """ Get the helix axis array row of each base in a list.
+
+            The coordinates of a base are a view into a row of the helix axis coordinates array, the row is
+            found from the offset of the view into the array. Returns None if the coordinates of a base are
+            not a view into the array.
+        """
+        axis_coords = self.helix_axis_coords
+        start = axis_coords.__array_interface__['data'][0]
+        row_stride = axis_coords.strides[0]
+        num_rows = len(axis_coords)
+        rows = np.empty(len(bases), dtype=int)
+        for i,base in enumerate(bases):
+            coords = base.coordinates
+            if (not isinstance(coords, np.ndarray)) or (coords.shape != axis_coords.shape[1:]) or \
+               (coords.strides != axis_coords.strides[1:]):
+                return None
+            row,remainder = divmod(coords.__array_interface__['data'][0] - start, row_stride)
+            if (remainder != 0) or (row < 0) or (row >= num_rows):
+                return None
+            rows[i] = row
+        #__for i,base in enumerate(bases)
+        return rows
+
+    def _compact_axis_arrays(self):
+        """ Compact the helix axis coordinate and reference frame arrays to the positions of the remaining bases. 
+
+            The axis array row of each base is found from its coordinates view into the axis coordinates
+            array (see _get_axis_rows()). The rows that are not used by any base are removed and the base
+            coordinates and reference frames are set to views into the compacted arrays. If the coordinates
+            of a base are not a view into the array then the arrays are regenerated from the base lists.
+        """
+        num_rows = len(self.helix_axis_coords)
+        bases = list(itertools.chain(self.scaffold_bases, self.staple_bases))
+        if len(bases) == 0:
+            return
+        rows = self._get_axis_rows(bases)
+        if rows is None:
+            self.regenerate_coordinate_arrays()
+            return
+
+        keep = np.zeros(num_rows, dtype=bool)
+        keep[rows] = True
+        new_rows = np.cumsum(keep) - 1
+        self.helix_axis_coords = self.helix_axis_coords[keep]
+        self.helix_axis_frames = self.helix_axis_frames[:,:,keep]
+        for base,row in itertools.izip(bases, new_rows[rows]):
+            base.coordinates = self.helix_axis_coords[row]
+            base.ref_frame = self.helix_axis_frames[:,:,row]
+        self.set_end_coords()
+    #__def _compact_axis_arrays
 
-    def process_base_deletes(self):
+    def process_base_deletes(self, update_coordinates=True):
         """ Process bases flagged for deletion.
 
+            Arguments:
+                update_coordinates (bool): If True then regenerate the helix coordinate arrays. 
+
             This function is used to remove bases flagged for deletion (DnaBase.num_deletion) in the 
             design file. It is called when the design file is being processed. Bases are removed from 
             the helix staple_bases and scaffold_bases. The coordinates and frames for the helix are then 
             recreated from the new list of bases.
 
+            The coordinate arrays may be updated later using update_modified_bases() when bases are both 
+            deleted and inserted.
+
             A list of deleted bases is returned.
         """
         deleted_bases = []
-  
-        # Delete staple bases. 
-        num_del = 0
-        for base in self.staple_bases: 
-            if base.num_deletions != 0:
-                num_del += 1
-        #__for base in self.staple_bases
-
-        if num_del != 0:
-            staple_bases = []
-            for base in self.staple_bases: 
-                if base.num_deletions == 0:
-                    staple_bases.append(base)
-                else:
-                    base.remove()
-                    deleted_bases.append(base)
-            #__for base in self.staple_bases
-            self.staple_bases = staple_bases 
-        #__if num_del != 0
-
-        # Delete scaffold bases. 
-        num_del = 0
-        for base in self.scaffold_bases: 
-            if base.num_deletions != 0:
-                num_del += 1
-        #__for base in self.scaffold_bases
-
-        if num_del != 0:
-            scaffold_bases = []
-            for base in self.scaffold_bases: 
-                if base.num_deletions == 0:
-                    scaffold_bases.append(base)
-                else:
-                    base.remove()
-                    deleted_bases.append(base)
-            #__for base in self.scaffold_bases
-            self.scaffold_bases = scaffold_bases
-        #__if num_del != 0
+        self.staple_bases = self._remove_deleted_bases(self.staple_bases, deleted_bases)
+        self.scaffold_bases = self._remove_deleted_bases(self.scaffold_bases, deleted_bases)
 
         # Regenerate the helix coordinate and reference frame  arrays 
         # from the new list of bases.
-        if len(deleted_bases) != 0:
-            self.regenerate_coordinate_arrays()
-            self.build_base_pos_maps()
+        if update_coordinates and (len(deleted_bases) != 0):
+            self.update_modified_bases()
         return deleted_bases 
     #__def process_base_deletes(self)
 
-    def insert_bases(self, insert_bases):
+    def _remove_deleted_bases(self, bases, deleted_bases):
+        """ Remove the bases flagged for deletion from a list of bases.
+
+            Arguments:
+                bases (List[DnaBase]): The list of bases. 
+                deleted_bases (List[DnaBase]): The list the removed bases are appended to.
+
+            Returns the list of bases not flagged for deletion.
+        """
+        kept_bases = []
+        for base in bases: 
+            if base.num_deletions == 0:
+                kept_bases.append(base)
+            else:
+                base.remove()
+                deleted_bases.append(base)
+        #__for base in bases
+        if len(kept_bases) == len(bases):
+            return bases
+        return kept_bases
+    #__def _remove_deleted_bases
+
+    def insert_bases(self, insert_bases, update_coordinates=True):
         """ Insert a list of bases into the helix lists of scaffold and staple bases.
 
             Arguments:
                 insert_bases (List[DnaBase]): The list of bases to insert.
+                update_coordinates (bool): If True then regenerate the helix coordinate arrays. 
 
             Bases are inserted into the scaffold and staple base lists at the 
             position given in the base (i.e. DnaBase.p).
+
+            The bases inserted at a position form a run placed, in reverse order, before the first base 
+            at that position. The runs are merged into the base lists in a single pass.
         """
         self._logger.debug("=================== insert_bases ===================")
         self._logger.debug("Number of bases to insert %d" % len(insert_bases))
+
+        # Group the bases to insert into runs by strand type and position.
+        insert_runs = dict()
         for insert_base in insert_bases:
-            if insert_base.is_scaf:
-                for i,base in enumerate(self.scaffold_bases): 
-                    if base.p == insert_base.p: 
-                        self._logger.debug("Insert scaffold base at position %d" % insert_base.p)
-                        self._logger.debug("    base coord        %s" % str(base.coordinates))
-                        self._logger.debug("    insert base coord %s" % str(insert_base.coordinates))
-                        self.scaffold_bases.insert(i,insert_base)
-                        break
-                #__for i,base in enumerate(self.scaffold_bases)
-            else:
-                for i,base in enumerate(self.staple_bases): 
-                    if base.p == insert_base.p: 
-                        self._logger.debug("Insert staple base at position  %d" % insert_base.p)
-                        self._logger.debug("    base coord        %s" % str(base.coordinates))
-                        self._logger.debug("    insert base coord %s" % str(insert_base.coordinates))
-                        self.staple_bases.insert(i,insert_base)
-                        break
-                #__for i,base in enumerate(self.staple_bases)
-        #__for insert_base in insert_bases
+            insert_runs.setdefault((insert_base.is_scaf,insert_base.p), []).append(insert_base)
+
+        self.scaffold_bases = self._merge_insert_runs(self.scaffold_bases, True, insert_runs)
+        self.staple_bases = self._merge_insert_runs(self.staple_bases, False, insert_runs)
 
         # Regenerate the helix coordinate arrays from the new list of bases.
-        if len(insert_bases) != 0:
-            self.regenerate_coordinate_arrays()
-            self.build_base_pos_maps()
+        if update_coordinates and (len(insert_bases) != 0):
+            self.update_modified_bases()
     #__def insert_bases(self, insert_bases)
 
+    def _merge_insert_runs(self, bases, is_scaf, insert_runs):
+        """ Merge runs of inserted bases into a list of bases. 
+
+            Arguments:
+                bases (List[DnaBase]): The list of scaffold or staple bases. 
+                is_scaf (bool): If True then the list contains scaffold bases.
+                insert_runs (Dict): The map of (is_scaf,position) keys to lists of bases to insert. 
+                    Merged runs are removed from the map.
+
+            Returns the merged list of bases.
+        """
+        if len(insert_runs) == 0:
+            return bases
+        merged_bases = []
+        for base in bases: 
+            run = insert_runs.pop((is_scaf,base.p), None)
+            if run:
+                self._logger.debug("Insert %d bases at position %d  scaffold %s" % (len(run), base.p, is_scaf))
+                merged_bases.extend(reversed(run))
+            merged_bases.append(base)
+        #__for base in bases
+        return merged_bases
+    #__def _merge_insert_runs
+
+    def update_modified_bases(self):
+        """ Update the helix coordinate arrays and position maps after bases have been deleted or inserted. """
+        self.regenerate_coordinate_arrays()
+        self.build_base_pos_maps()
+
     def regenerate_coordinate_arrays(self):
         """ Regenerate the coordinate arrays after a change in the base lists.
 
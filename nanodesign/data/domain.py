@@ -18,7 +18,7 @@ This module is used to store information for a DNA domain.
 A domain is a contiguous sequence of bases within a strand. They are bounded by single->double 
 or double->single strand transitions, crossovers between helices or strand termination.
 """
-__all__ = ["Domain"]
+__all__ = ["Domain", "melting_temperatures"]
 
 from .energymodel import energy_model, convert_temperature_K_to_C
 
@@ -96,4 +96,32 @@ class Domain(object):
         
         _,_,dH,dS = energy_model.stack_energy( self.sequence, rev_complement( self.sequence ))
         return convert_temperature_K_to_C( energy_model.melting_temperature( dH, dS ) )
+
+
+def melting_temperatures( domains ):
+    """ Calculate the melting temperatures for a list of domains. 
+
+        Arguments:
+            domains (List[Domain]): The list of domains.
+
+        Returns the list of melting temperatures, the same values given by Domain.melting_temperature(). 
+        The stack energies of all the paired domains are computed in a single pass.
+    """
+    temperatures = [None]*len(domains)
+    paired_indexes = []
+    paired_sequences = []
+    for i,domain in enumerate(domains):
+        if domain.connected_domain == -1: 
+            temperatures[i] = -500.0
+        elif "N" in domain.sequence or 'n' in domain.sequence:
+            temperatures[i] = -501.0
+        else:
+            paired_indexes.append(i)
+            paired_sequences.append(domain.sequence)
+    #__for i,domain in enumerate(domains)
+
+    energies = energy_model.paired_stack_energies( paired_sequences )
+    for i,(dH,dS) in zip( paired_indexes, energies ):
+        temperatures[i] = convert_temperature_K_to_C( energy_model.melting_temperature( dH, dS ) )
+    return temperatures
         
@@ -171,6 +171,36 @@ class EnergyModel(object):
 
         return (dG_37, dG_check, dH, dS)
 
+    def paired_stack_energies( self, sequences ):
+        """ Computes the enthalpy and entropy of a list of perfectly paired helical regions.
+
+        Each sequence is paired with its reverse complement so only the top strand is needed. The 
+        result for a sequence is the same as the dH and dS returned by stack_energy( sequence, 
+        reverse_complement(sequence) ) but the pair types are looked up once for each base.
+
+        Args:
+            sequences (List[str]): base identifiers for the top strands, 5' to 3' order
+
+        Returns:
+            list of 2-tuples containing the computed dH and dS for each sequence.
+        """
+        complement = {"A":"T", "T":"A", "C":"G", "G":"C", "a":"t", "t":"a", "c":"g", "g":"c"}
+        complement_pair_types = dict( (base, self.pair_types[base+complement[base]]) for base in complement )
+
+        energies = []
+        stack_dH = self.stack_dH
+        stack_dS = self.stack_dS
+        for sequence in sequences:
+            # Bases without a complement (e.g. 'N') have the pair type -1 given by pair_type().
+            pairs = [ complement_pair_types.get(base, -1) for base in sequence ]
+            dH = 0.0
+            dS = 0.0
+            for pair_1,pair_2 in zip( pairs[:-1], pairs[1:] ):
+                dH += stack_dH[pair_1][pair_2]
+                dS += stack_dS[pair_1][pair_2]
+            energies.append( (dH, dS) )
+        return energies
+
 
     def melting_temperature( self, dH, dS, staple_conc = 100e-9, scaffold_conc = 10e-9, sodium_conc = 1.0, magnesium_conc = 20e-3):
         """
@@ -0,0 +1,135 @@
+# Copyright 2016 Autodesk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module is used to write JSON files incrementally.
+
+Large JSON files (e.g. a list of every base in a structure) are written without first creating the complete
+list of objects to write. A JsonArray wraps an iterable (e.g. a generator) whose elements are created and written
+one at a time. JsonArray values may be nested in dicts and in other JsonArray elements. Other values are written
+using the json module.
+
+The output is compact by default. If an indent is given the output is the same as that written by
+json.dump(value, indent=indent, separators=(',', ': ')).
+"""
+import json
+
+class JsonArray(object):
+    """ This class stores an iterable whose elements are written as a JSON array.
+
+        Attributes:
+            iterable (Iterable): The iterable producing the array elements.
+    """
+    def __init__(self, iterable):
+        self.iterable = iterable
+
+class JsonEmitter(object):
+    """ This class writes values containing JsonArray objects to a file.
+
+        Attributes:
+            outfile (File): The file to write to.
+            indent (int): The number of spaces to indent nested values. If None then the output is compact.
+    """
+    def __init__(self, outfile, indent=None):
+        self.outfile = outfile
+        self.indent = indent
+        if indent is None:
+            self._item_separator = ','
+            self._key_separator = ':'
+        else:
+            self._item_separator = ','
+            self._key_separator = ': '
+
+    def dump(self, value):
+        """ Write a value to the file. """
+        self._write_value(value, 0)
+
+    def _write_value(self, value, level):
+        """ Write a value nested at the given level. """
+        if isinstance(value, JsonArray):
+            self._write_array(value, level)
+        elif isinstance(value, dict) and self._is_streamed(value):
+            self._write_object(value, level)
+        else:
+            self.outfile.write(self._encode(value, level))
+
+    def _is_streamed(self, value):
+        """ Check if a dict contains JsonArray values, directly or in nested dicts. """
+        for item in value.itervalues():
+            if isinstance(item, JsonArray):
+                return True
+            if isinstance(item, dict) and self._is_streamed(item):
+                return True
+        return False
+
+    def _encode(self, value, level):
+        """ Encode a value that does not contain JsonArray values. """
+        if self.indent is None:
+            return json.dumps(value, separators=(self._item_separator, self._key_separator))
+        s = json.dumps(value, indent=self.indent, separators=(self._item_separator, self._key_separator))
+        if level != 0:
+            s = s.replace('\n', self._newline(level))
+        return s
+
+    def _newline(self, level):
+        """ Get the string starting a new line at the given level. """
+        if self.indent is None:
+            return ''
+        return '\n' + ' ' * (self.indent * level)
+
+    def _write_array(self, array, level):
+        """ Write a JsonArray, writing each element as it is produced. """
+        write = self.outfile.write
+        is_empty = True
+        for item in array.iterable:
+            if is_empty:
+                write('[')
+                is_empty = False
+            else:
+                write(self._item_separator)
+            write(self._newline(level+1))
+            self._write_value(item, level+1)
+        #__for item in array.iterable
+
+        if is_empty:
+            write('[]')
+        else:
+            write(self._newline(level))
+            write(']')
+
+    def _write_object(self, value, level):
+        """ Write a dict containing JsonArray values. """
+        write = self.outfile.write
+        is_empty = True
+        for key,item in value.iteritems():
+            if is_empty:
+                write('{')
+                is_empty = False
+            else:
+                write(self._item_separator)
+            write(self._newline(level+1))
+            if not isinstance(key, basestring):
+                key = str(key)
+            write(json.dumps(key))
+            write(self._key_separator)
+            self._write_value(item, level+1)
+        #__for key,item in value.iteritems()
+
+        if is_empty:
+            write('{}')
+        else:
+            write(self._newline(level))
+            write('}')
+
+#__class JsonEmitter
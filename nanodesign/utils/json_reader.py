@@ -0,0 +1,140 @@
+# Copyright 2016 Autodesk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""
+This module is used to read JSON files incrementally.
+
+Large JSON files (e.g. a viewer file listing every base in a structure) are read without first creating the
+complete object graph stored in the file. A JsonReader parses the members of the top-level JSON object of a file
+one at a time. The elements of the array members given as streamed keys are parsed one at a time as they are
+iterated over; other values are parsed using the json module. The file is read in chunks so only the value being
+parsed is held in memory.
+"""
+import json
+
+class JsonReader(object):
+    """ This class reads the members of the top-level JSON object stored in a file.
+
+        Attributes:
+            chunk_size (int): The number of bytes read from the file at a time.
+            infile (File): The file to read from.
+    """
+    WHITESPACE = ' \t\n\r'
+    DELIMITERS = WHITESPACE + ',:]}'
+    CONTAINERS = '"[{'
+
+    def __init__(self, infile, chunk_size=1<<20):
+        self.infile = infile
+        self.chunk_size = chunk_size
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+        self._decoder = json.JSONDecoder()
+
+    def iter_items(self, streamed_keys=()):
+        """ Generate the (key,value) pairs of the members of the top-level JSON object.
+
+            Arguments:
+                streamed_keys (List[String]): The keys of the array members whose elements are parsed one at a
+                    time. The value generated for these members is an iterator over the array elements.
+
+            The iterator of a streamed member is exhausted before the next member is parsed.
+        """
+        self._expect('{')
+        if self._peek() == '}':
+            return
+        while True:
+            key = self._read_value()
+            self._expect(':')
+            if (key in streamed_keys) and (self._peek() == '['):
+                elements = self._iter_array()
+                yield key, elements
+                for element in elements:
+                    pass
+            else:
+                yield key, self._read_value()
+            char = self._next_char()
+            if char == '}':
+                break
+            if char != ',':
+                raise ValueError("Expecting , delimiter or } at offset %d" % self._pos)
+        #__while True
+
+    def _iter_array(self):
+        """ Generate the elements of a JSON array. """
+        self._expect('[')
+        if self._peek() == ']':
+            self._pos += 1
+            return
+        while True:
+            yield self._read_value()
+            char = self._next_char()
+            if char == ']':
+                break
+            if char != ',':
+                raise ValueError("Expecting , delimiter or ] at offset %d" % self._pos)
+        #__while True
+
+    def _read_value(self):
+        """ Parse the JSON value at the current position.
+
+            A number or literal may continue in the next chunk (e.g. '1.5' may be the start of '1.5e-10') so it
+            is parsed again after the next chunk is read unless it is followed by a delimiter. The size of the
+            chunk read doubles the unparsed part of the buffer so that a large value is parsed a few times at most.
+        """
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+                if self._eof or ((end < len(self._buffer)) and ((self._buffer[self._pos] in JsonReader.CONTAINERS)
+                        or (self._buffer[end] in JsonReader.DELIMITERS))):
+                    self._pos = end
+                    return value
+            except ValueError:
+                if self._eof:
+                    raise
+            self._read_chunk(len(self._buffer) - self._pos)
+        #__while True
+
+    def _peek(self):
+        """ Get the next non-whitespace character. Returns an empty string at the end of the file. """
+        while True:
+            while (self._pos < len(self._buffer)) and (self._buffer[self._pos] in JsonReader.WHITESPACE):
+                self._pos += 1
+            if (self._pos < len(self._buffer)) or self._eof:
+                return self._buffer[self._pos:self._pos+1]
+            self._read_chunk()
+        #__while True
+
+    def _next_char(self):
+        """ Get the next non-whitespace character and move past it. """
+        char = self._peek()
+        self._pos += 1
+        return char
+
+    def _expect(self, char):
+        """ Move past the next non-whitespace character, which must be the given character. """
+        if self._next_char() != char:
+            raise ValueError("Expecting %s at offset %d" % (char, self._pos-1))
+
+    def _read_chunk(self, min_size=0):
+        """ Read the next chunk of the file, discarding the part of the buffer already parsed. """
+        chunk = self.infile.read(max(self.chunk_size, min_size))
+        if not chunk:
+            self._eof = True
+            return
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+
+#__class JsonReader(object)
@@ -18,6 +18,7 @@ This module is used for geometrically transforming portions of a DNA structure.
 from math import pi,sin,cos,atan,radians
 import numpy as np
 import sys
+import time
 
 class Xform(object):
     """ This class stores information for an affine transformation. 
@@ -140,6 +141,26 @@ class Xform(object):
             R[1,1] = cx
         return R
 
+    def transform_points(self, points):
+        """ Transform an array of points.
+
+            Arguments:
+                points (NumPy Nx3 ndarray[float]): The points to transform.
+
+            Returns the transformed points (NumPy Nx3 ndarray[float]). 
+        """
+        return np.dot(points - self.center, self.rotation_matrix.T) + self.center + self.translation
+
+    def transform_frames(self, frames):
+        """ Rotate an array of reference frames.
+
+            Arguments:
+                frames (NumPy 3x3xN ndarray[float]): The reference frames to rotate.
+
+            Returns the rotated reference frames (NumPy 3x3xN ndarray[float]). 
+        """
+        return np.einsum('ij,jkn->ikn', self.rotation_matrix, frames)
+
     def rms_fit(self, points1, points2):
         """ Fit two sets of coordinates. 
 
@@ -150,42 +171,44 @@ class Xform(object):
             Calculates the transformation that will translate and rotate points1 to points2 using the method 
             described in Kabsch (Acta Cryst. (1978) A34, 827-828).
         """ 
-        # Calculate centers.
-        num_points = len(points1)
-        center1 = np.array([0.0,0.0,0.0], dtype=float)
-        center2 = np.array([0.0,0.0,0.0], dtype=float)
-        for i in xrange(0,num_points): 
-            center1 += points1[i]
-            center2 += points2[i]
-        #__for i in xrange(0,num_points) 
-        center1 /= num_points 
-        center2 /= num_points 
-
-        # Move points centers to origin.
-        cpts1 = np.array(points1, dtype=float, copy=True)
-        cpts2 = np.array(points2, dtype=float, copy=True)
-        for k in xrange(0,num_points): 
-           cpts1[k] = points1[k] -  center1
-           cpts2[k] = points2[k] -  center2
-        #__for k in xrange(0,num_points)
-
-        # Calculate correlation matrix.
-        M = np.dot(cpts1.T, cpts2)
-
-        # Calculate SVD of correlation matrix.
-        U, S, V = np.linalg.svd(M)
-
-        # Calulate rotation matirx.
-        R = np.dot(U, V)
+        points1 = np.asarray(points1, dtype=float).reshape((-1,3))
+        points2 = np.asarray(points2, dtype=float).reshape((-1,3))
+        center1 = points1.mean(axis=0)
+        center2 = points2.mean(axis=0)
+
+        # Calculate correlation matrix of the points moved to the origin.
+        M = np.dot((points1 - center1).T, points2 - center2)
 
         self.translation = center2 - center1 
         self.center = center1 
-        self.rotation_matrix = R
+        self.rotation_matrix = kabsch_rotations(M[np.newaxis])[0]
     #__def rms_fit(self, points1, points2)
 
 #__class Xform
 
 
+def kabsch_rotations(correlations):
+    """ Calculate the rotation matrices that best align sets of centered points.
+
+        Arguments:
+            correlations (NumPy Nx3x3 ndarray[float]): The correlation matrices P^T Q of the centered points P 
+                to rotate onto the centered points Q.
+
+        The rotations are calculated from the SVDs of all the correlation matrices computed together. A 
+        reflection is removed by changing the sign of the singular vector with the smallest singular value.
+
+        Returns the rotation matrices (NumPy Nx3x3 ndarray[float]). 
+    """
+    U, S, Vt = np.linalg.svd(correlations)
+    V = np.transpose(Vt, (0,2,1))
+    Ut = np.transpose(U, (0,2,1))
+    d = np.sign(np.linalg.det(np.einsum('nij,njk->nik', V, Ut)))
+    d[d == 0] = 1.0
+    V[:,:,2] *= d[:,np.newaxis]
+    return np.einsum('nij,njk->nik', V, Ut)
+#__def kabsch_rotations
+
+
 # TODO: We have left this class in as a basic storage container due to possible
 # future needs. This should probably be revisited once we've worked on more
 # algorithms that generate structure configurations from the topology.
@@ -211,25 +234,96 @@ def apply_helix_xforms(helix_group_xforms):
 
         The geometry for the list of helices for each group are rotated and translated together 
         by the given transformation. 
+
+        The groups are applied in batches: the helix geometry for all of the groups in a batch is 
+        transformed using a single set of array operations. A group is added to the batch following 
+        the last batch containing any of its helices so the result is the same as applying the group 
+        transformations one after another.
     """
+    # Assign the helix groups to batches.
+    batches = []
+    helix_batch = {}
     for helix_group in helix_group_xforms:
-        # Get the center of the helix group.
-        group_center = np.array([0.0,0.0,0.0], dtype=float)
+        if len(helix_group.helices) == 0:
+            continue
+        n = max([helix_batch.get(helix.id, -1) for helix in helix_group.helices]) + 1
+        if n == len(batches):
+            batches.append([])
+        batches[n].append(helix_group)
         for helix in helix_group.helices:
-            helix_center = helix.get_center()
-            group_center += helix_center 
-        #__for helix_id in helix_group.helices
-        group_center /= len(helix_group.helices)
-        helix_group.transformation.set_center(group_center)
- 
-        # Transform helices geometry.
-        for helix in helix_group.helices:
-            helix.apply_xform(helix_group.transformation)
-        #__for helix_id in helix_group_xforms.helices:
+            helix_batch[helix.id] = n
     #__for helix_group in helix_group_xforms
 
+    for batch in batches:
+        # Set the transformation centers to the centers of the helix groups.
+        for helix_group in batch:
+            group_center = np.mean([helix.get_center() for helix in helix_group.helices], axis=0)
+            helix_group.transformation.set_center(group_center)
+        #__for helix_group in batch
+        _apply_helix_xforms_batch(batch)
+    #__for batch in batches
 #__def apply_helix_xforms
 
+def _apply_helix_xforms_batch(helix_group_xforms):
+    """ Apply helix group transformations to a set of helices that are each in a single group. 
+
+        Arguments:
+            helix_group_xforms (List[HelixGroupXform]): The list of helix group transforms.
+
+        The helix axis coordinates and frames and the nucleotide coordinates of all the helices are 
+        concatenated and transformed together, with each row using the transformation of its group.
+    """
+    helices = []
+    xforms = []
+    for helix_group in helix_group_xforms:
+        helices.extend(helix_group.helices)
+        xforms.extend([helix_group.transformation]*len(helix_group.helices))
+    #__for helix_group in helix_group_xforms
+    rotations = np.array([xform.rotation_matrix for xform in xforms], dtype=float)
+    centers = np.array([xform.center for xform in xforms], dtype=float)
+    translations = np.array([xform.translation for xform in xforms], dtype=float)
+
+    # Transform the helix axes.
+    sizes = [len(helix.helix_axis_coords) for helix in helices]
+    offsets = np.cumsum([0] + sizes)
+    rows = np.repeat(np.arange(len(helices)), sizes)
+    axis_coords = _transform_points(np.concatenate([helix.helix_axis_coords for helix in helices]), 
+        rotations[rows], centers[rows], translations[rows])
+    axis_frames = np.einsum('nij,jkn->ikn', rotations[rows], 
+        np.concatenate([helix.helix_axis_frames for helix in helices], axis=2))
+
+    # Transform the nucleotide coordinates.
+    nt_coords = [helix.get_nucleotide_coords() for helix in helices]
+    nt_sizes = [len(coords) for coords in nt_coords]
+    nt_offsets = np.cumsum([0] + nt_sizes)
+    nt_rows = np.repeat(np.arange(len(helices)), nt_sizes)
+    nt_coords = _transform_points(np.concatenate(nt_coords), rotations[nt_rows], centers[nt_rows], 
+        translations[nt_rows])
+
+    # Update helices. The axis arrays are updated in place because the base coordinates
+    # and reference frames are views into them.
+    for i,helix in enumerate(helices):
+        start,end = offsets[i],offsets[i+1]
+        helix.helix_axis_coords[:] = axis_coords[start:end]
+        helix.helix_axis_frames[:] = axis_frames[:,:,start:end]
+        helix.set_nucleotide_coords(nt_coords[nt_offsets[i]:nt_offsets[i+1]])
+        helix.set_end_coords()
+    #__for i,helix in enumerate(helices)
+#__def _apply_helix_xforms_batch
+
+def _transform_points(points, rotations, centers, translations):
+    """ Transform points each using its own rotation, center and translation.
+
+        Arguments:
+            points (NumPy Nx3 ndarray[float]): The points to transform.
+            rotations (NumPy Nx3x3 ndarray[float]): The rotation matrix for each point.
+            centers (NumPy Nx3 ndarray[float]): The center of rotation for each point.
+            translations (NumPy Nx3 ndarray[float]): The translation for each point.
+
+        Returns the transformed points (NumPy Nx3 ndarray[float]). 
+    """
+    return np.einsum('nij,nj->ni', rotations, points - centers) + centers + translations
+
 
 def xform_from_connectors(connector_strands, helix_ids, helix_distance, xform):
     """ Create a transformation to rotate and translate a group of helices so that
@@ -247,45 +341,300 @@ def xform_from_connectors(connector_strands, helix_ids, helix_distance, xform):
         a transformation that only translates the two sections together but does not oriented them,  
         the relative rotation of two components created by excluded volume interactions. 
     """
-    # Create a set of helix IDs to include in the transformation.
-    helix_set = set()
-    for id in helix_ids:
-        helix_set.add(id)
+    xforms_from_connectors(connector_strands, [helix_ids], helix_distance, [xform])
+#__def xform_from_connectors
+
+def xforms_from_connectors(connector_strands, helix_groups, helix_distance, xforms):
+    """ Create the transformations for a list of helix groups so that their distance crossovers 
+        (connections) align.
+
+        Arguments:
+            connector_strands (List[DnaStrand]): The list of strands that contain connections. 
+            helix_groups (List[List[int]]): The list of helix IDs for each group to transform.
+            xforms (List[Xform]): The transformations to set for each helix group.
 
-    # Create the points lists for the connections. 
+        The connection points are found once for all groups. For each group the points in the group 
+        helices are fit to the points in the other helices and the rotations for all groups are computed 
+        together. A group without connection points is not changed.
+    """
+    points, point_helix_ids = _get_connector_points(connector_strands, helix_distance)
+    fit_xforms = []
+    correlations = []
+    for helix_ids,xform in zip(helix_groups, xforms):
+        in_group = np.in1d(point_helix_ids, list(helix_ids))
+        points1 = points[in_group]
+        points2 = points[~in_group]
+        if (len(points1) == 0) or (len(points2) == 0):
+            continue
+        center1 = points1.mean(axis=0)
+        center2 = points2.mean(axis=0)
+        xform.translation = center2 - center1 
+        xform.center = center1 
+        correlations.append(np.dot((points1 - center1).T, points2 - center2))
+        fit_xforms.append(xform)
+    #__for helix_ids,xform in zip(helix_groups, xforms)
+
+    if len(fit_xforms) == 0:
+        return
+    rotations = kabsch_rotations(np.array(correlations))
+    for xform,R in zip(fit_xforms, rotations):
+        xform.rotation_matrix = R
+#__def xforms_from_connectors
+
+def _get_connector_points(connector_strands, helix_distance):
+    """ Get the coordinates of the bases at the ends of distance crossovers.
+
+        Arguments:
+            connector_strands (List[DnaStrand]): The list of strands that contain connections. 
+            helix_distance (float): The distance between adjacent helices. 
+
+        The helix positions at the start and at the end of crossovers are each only included once.
+
+        Returns the coordinates (NumPy Nx3 ndarray[float]) and the helix IDs (NumPy N ndarray[int]) of the 
+        crossover bases.
+    """
+    points = []
+    point_helix_ids = []
+    start_positions = set()
+    end_positions = set()
+    for base1,base2,pt1,pt2 in zip(*_get_distance_crossovers(connector_strands, helix_distance)):
+        if (base1.h,base1.p) not in start_positions:
+            start_positions.add((base1.h,base1.p))
+            points.append(pt1)
+            point_helix_ids.append(base1.h)
+        if (base2.h,base2.p) not in end_positions:
+            end_positions.add((base2.h,base2.p))
+            points.append(pt2)
+            point_helix_ids.append(base2.h)
+    #__for base1,base2,pt1,pt2 in zip(*_get_distance_crossovers(connector_strands, helix_distance))
+
+    return np.array(points, dtype=float).reshape((-1,3)), np.array(point_helix_ids, dtype=int)
+#__def _get_connector_points
+
+def _get_distance_crossovers(connector_strands, helix_distance):
+    """ Get the distance crossovers in a list of strands.
+
+        Arguments:
+            connector_strands (List[DnaStrand]): The list of strands that contain connections. 
+            helix_distance (float): The distance between adjacent helices. 
+
+        A distance crossover is a pair of consecutive strand bases whose distance is greater than twice 
+        the helix distance. The distances for each strand are computed together from its array of base 
+        coordinates.
+
+        Returns the lists of bases at the start and end of the crossovers (List[DnaBase]) and the arrays of 
+        their coordinates (NumPy Nx3 ndarray[float]).
+    """
     max_dist = 2.0*helix_distance
-    points1 = []
-    points1_map = set()
-    points2 = []
-    points2_map = set()
+    bases1 = []
+    bases2 = []
+    coords1 = []
+    coords2 = []
     for strand in connector_strands:
         tour = strand.tour 
-        for i in xrange(0,len(tour)-1):
-            base1 = tour[i]
-            pt1 = base1.coordinates
-            base2 = tour[i+1]
-            pt2 = base2.coordinates
-            dist = np.linalg.norm(pt1 - pt2)
-            if dist > max_dist:
-                if (base1.h,base1.p) not in points1_map:
-                    points1_map.add((base1.h,base1.p))
-                    if base1.h in helix_set:
-                        points1.append(pt1)
-                    else:
-                        points2.append(pt1)
-                #__if (base1.h,base1.p) not in points1_map
-
-                if (base2.h,base2.p) not in points2_map:
-                    points2_map.add((base2.h,base2.p))
-
-                    if base2.h in helix_set:
-                        points1.append(pt2)
-                    else:
-                        points2.append(pt2)
-                #__if (base2.h,base2.p) not in points2_map:
-        #__for i in xrange(0,len(tour)-1)
+        if len(tour) < 2:
+            continue
+        coords = np.array([base.coordinates for base in tour], dtype=float)
+        dists = np.linalg.norm(coords[1:] - coords[:-1], axis=1)
+        crossovers = np.flatnonzero(dists > max_dist)
+        bases1.extend([tour[i] for i in crossovers])
+        bases2.extend([tour[i+1] for i in crossovers])
+        coords1.append(coords[crossovers])
+        coords2.append(coords[crossovers+1])
     #__for strand in connector_strands
 
-    # Set the transformation that fits points1 to points2.
-    xform.rms_fit(points1, points2)
-#__def xform_from_connectors
+    if len(bases1) == 0:
+        return [], [], np.zeros((0,3), dtype=float), np.zeros((0,3), dtype=float)
+    return bases1, bases2, np.concatenate(coords1), np.concatenate(coords2)
+#__def _get_distance_crossovers
+
+class AssemblySolution(object):
+    """ This class stores the result of solving for the transformations of a set of helix groups.
+
+        Attributes:
+            converged (bool): If True then the solver converged.
+            initial_rms_distance (float): The RMS distance between connected bases before solving.
+            num_connections (int): The number of connections between the helix groups.
+            num_iterations (int): The number of iterations performed.
+            rms_distance (float): The RMS distance between connected bases after solving.
+            time (float): The time in seconds taken to solve.
+    """
+    def __init__(self):
+        self.converged = False
+        self.initial_rms_distance = 0.0
+        self.num_connections = 0
+        self.num_iterations = 0
+        self.rms_distance = 0.0
+        self.time = 0.0
+
+#__class AssemblySolution
+
+def solve_helix_group_xforms(helix_group_xforms, connector_strands, helix_distance, max_iterations=100, 
+                             tolerance=1e-8):
+    """ Solve for the transformations of a set of helix groups that minimize the distance between connections. 
+
+        Arguments:
+            helix_group_xforms (List[HelixGroupXform]): The helix groups to solve transformations for.
+            connector_strands (List[DnaStrand]): The list of strands that contain connections. 
+            helix_distance (float): The distance between adjacent helices. 
+            max_iterations (int): The maximum number of iterations.
+            tolerance (float): The relative decrease of the sum of squared connection distances below 
+                which the solver stops.
+
+        The connections are the distance crossovers between bases in different helix groups or between a 
+        helix group and the helices that are not in any group, which are not moved. The sum of the squared 
+        distances between connected bases is minimized over the rigid-body transformations of all the groups 
+        together using damped Gauss-Newton (Levenberg-Marquardt) iterations. Each iteration solves for a 
+        rotation vector and translation for every group from a single linear system built from the 
+        Jacobian blocks of all the connections.
+
+        The group transformations are set using the center used by apply_helix_xforms() so they can be 
+        applied using that function. 
+
+        Returns an AssemblySolution. 
+    """
+    start_time = time.time()
+    solution = AssemblySolution()
+    num_groups = len(helix_group_xforms)
+
+    # Map helix IDs to groups. Helices not in a group use the identity transformation at index num_groups.
+    helix_groups = {}
+    for n,helix_group in enumerate(helix_group_xforms):
+        for helix in helix_group.helices:
+            if helix_groups.get(helix.id, n) != n:
+                raise ValueError("Helix %d is in more than one helix group." % helix.id)
+            helix_groups[helix.id] = n
+    #__for n,helix_group in enumerate(helix_group_xforms)
+
+    # Get the connections between groups. 
+    bases1,bases2,coords1,coords2 = _get_distance_crossovers(connector_strands, helix_distance)
+    groups1 = np.array([helix_groups.get(base.h, num_groups) for base in bases1], dtype=int)
+    groups2 = np.array([helix_groups.get(base.h, num_groups) for base in bases2], dtype=int)
+    connected = groups1 != groups2
+    points1 = coords1[connected]
+    points2 = coords2[connected]
+    groups1 = groups1[connected]
+    groups2 = groups2[connected]
+    num_connections = len(points1)
+    solution.num_connections = num_connections
+
+    # Initialize the transformations. The rotations are about the group centers. 
+    rotations = np.tile(np.identity(3), (num_groups+1,1,1))
+    translations = np.zeros((num_groups+1,3), dtype=float)
+    centers = np.zeros((num_groups+1,3), dtype=float)
+    for n,helix_group in enumerate(helix_group_xforms):
+        centers[n] = np.mean([helix.get_center() for helix in helix_group.helices], axis=0)
+
+    cost = _connection_distances(points1, groups1, points2, groups2, rotations, centers, translations)[1]
+    solution.initial_rms_distance = np.sqrt(cost / max(num_connections,1))
+    damping = 1e-3
+    num_params = 6*num_groups
+    for iteration in xrange(0,max_iterations):
+        if (num_connections == 0) or (cost == 0.0):
+            solution.converged = True
+            break
+        solution.num_iterations = iteration + 1
+
+        # Build the normal equations for the changes to the group rotations and translations.
+        H,g = _connection_normal_equations(points1, groups1, points2, groups2, rotations, centers, translations)
+        H = H[:num_groups,:num_groups].transpose((0,2,1,3)).reshape((num_params,num_params))
+        g = g[:num_groups].reshape(num_params)
+        A = H + damping*np.diag(np.diag(H)) + 1e-12*np.identity(num_params)
+        step = np.linalg.solve(A, -g).reshape((num_groups,6))
+
+        # Try the step and adjust the damping. 
+        trial_rotations = rotations.copy()
+        trial_translations = translations.copy()
+        trial_rotations[:num_groups] = np.einsum('nij,njk->nik',
+            _rotation_vector_matrices(step[:,0:3]), rotations[:num_groups])
+        trial_translations[:num_groups] += step[:,3:6]
+        trial_cost = _connection_distances(points1, groups1, points2, groups2, trial_rotations, centers, 
+            trial_translations)[1]
+        if trial_cost < cost:
+            rotations = trial_rotations
+            translations = trial_translations
+            last_cost = cost
+            cost = trial_cost
+            damping = max(damping/10.0, 1e-12)
+            if last_cost - cost <= tolerance*last_cost:
+                solution.converged = True
+                break
+        else:
+            damping *= 10.0
+            if damping > 1e12:
+                solution.converged = True
+                break
+        #__if trial_cost < cost
+    #__for iteration in xrange(0,max_iterations)
+
+    for n,helix_group in enumerate(helix_group_xforms):
+        xform = helix_group.transformation
+        xform.rotation_matrix = rotations[n].copy()
+        xform.translation = translations[n].copy()
+        xform.center = centers[n].copy()
+    #__for n,helix_group in enumerate(helix_group_xforms)
+
+    solution.rms_distance = np.sqrt(cost / max(num_connections,1))
+    solution.time = time.time() - start_time
+    return solution
+#__def solve_helix_group_xforms
+
+def _connection_distances(points1, groups1, points2, groups2, rotations, centers, translations):
+    """ Get the vectors between connected points transformed by their group transformations. 
+
+        Returns the vectors (NumPy Nx3 ndarray[float]) and the sum of their squared lengths.
+    """
+    xpoints1 = _transform_points(points1, rotations[groups1], centers[groups1], translations[groups1])
+    xpoints2 = _transform_points(points2, rotations[groups2], centers[groups2], translations[groups2])
+    residuals = xpoints1 - xpoints2
+    return residuals, np.sum(residuals**2)
+
+def _connection_normal_equations(points1, groups1, points2, groups2, rotations, centers, translations):
+    """ Build the Gauss-Newton normal equations for the group transformations. 
+
+        A point p in group n is transformed to R(p - c) + c + t. For a rotation vector w applied after R, 
+        the derivative of the transformed point is -[v]x w + dt where v = R(p - c). The 3x6 Jacobian blocks 
+        of the connections are combined into 6x6 blocks for each pair of groups. 
+
+        Returns the blocks of J^T J (NumPy GxGx6x6 ndarray[float]) and J^T r (NumPy Gx6 ndarray[float]), 
+        where G is the number of groups including the group of fixed helices.
+    """
+    num_groups = len(rotations)
+    residuals = _connection_distances(points1, groups1, points2, groups2, rotations, centers, translations)[0]
+    jacobians = []
+    for points,groups,sign in [ (points1,groups1,1.0), (points2,groups2,-1.0) ]:
+        v = np.einsum('nij,nj->ni', rotations[groups], points - centers[groups])
+        J = np.zeros((len(points),3,6), dtype=float)
+        J[:,0,1] =  v[:,2]; J[:,0,2] = -v[:,1]
+        J[:,1,0] = -v[:,2]; J[:,1,2] =  v[:,0]
+        J[:,2,0] =  v[:,1]; J[:,2,1] = -v[:,0]
+        J[:,:,3:6] = np.identity(3)
+        jacobians.append((groups, sign*J))
+    #__for points,groups,sign in [ (points1,groups1,1.0), (points2,groups2,-1.0) ]
+
+    H = np.zeros((num_groups,num_groups,6,6), dtype=float)
+    g = np.zeros((num_groups,6), dtype=float)
+    for groups_i,J_i in jacobians:
+        np.add.at(g, groups_i, np.einsum('nij,ni->nj', J_i, residuals))
+        for groups_j,J_j in jacobians:
+            np.add.at(H, (groups_i,groups_j), np.einsum('nki,nkj->nij', J_i, J_j))
+    #__for groups_i,J_i in jacobians
+    return H, g
+
+def _rotation_vector_matrices(vectors):
+    """ Create the rotation matrices for a set of rotation vectors using the Rodrigues formula. 
+
+        Arguments:
+            vectors (NumPy Nx3 ndarray[float]): The rotation vectors, the axis scaled by the angle in radians.
+
+        Returns the rotation matrices (NumPy Nx3x3 ndarray[float]). 
+    """
+    angles = np.linalg.norm(vectors, axis=1)
+    axes = vectors / np.where(angles == 0.0, 1.0, angles)[:,np.newaxis]
+    K = np.zeros((len(vectors),3,3), dtype=float)
+    K[:,0,1] = -axes[:,2]; K[:,0,2] =  axes[:,1]
+    K[:,1,0] =  axes[:,2]; K[:,1,2] = -axes[:,0]
+    K[:,2,0] = -axes[:,1]; K[:,2,1] =  axes[:,0]
+    s = np.sin(angles)[:,np.newaxis,np.newaxis]
+    c = np.cos(angles)[:,np.newaxis,np.newaxis]
+    return np.identity(3) + s*K + (1.0 - c)*np.einsum('nij,njk->nik', K, K)
@@ -26,10 +26,15 @@
                          lines.
       P atom distances - Large deviations of P-P bond lengths are highlighted.
 
+   When a strand is viewed zoomed out its bonds and backbone P atoms
+   representations are rendered as lines connecting the end points of its
+   domains.
+
 """
 import logging 
 import numpy as np
 from .geometry import VisGeometryPath,VisGeometryLines,VisGeometryPolygon
+from .residue_tables import dna_residue_tables
 from math import sqrt
 
 class VisAtomicStructureRepType:
@@ -43,11 +48,15 @@ class VisAtomicStructure(object):
     """ This class is used to visualize the atomic structure of a DNA strand. 
 
         Attributes:
+            atomic_structure (AtomicStructure): The atomic structure used to generate the strand molecule.
+            atomic_strand (AtomicStructureStrand): The atomic structure strand the molecule is generated for.
             color (List[float]): The color assigned to the structure. This is a list of four floats (RGBA) 
                 obtained from the DNA strand color.
             graphics (VisGraphics): The VisGraphics object.
             id (int): The structure id, usually just the molecule count. Not really used.
-            molecule (Molecule): The Molecule object storing the strand atomic structure.
+            model (VisModel): The visualization model object.
+            molecule (Molecule): The Molecule object storing the strand atomic structure. This is generated the 
+                first time it is used.
             name (String): The strand chain name.
             representations (Dict[List[VisGeometry]): The dictionary storing the list of geometry for a representation.
             scale (Float): The scale to convert angstroms to nanometers.
@@ -56,7 +65,7 @@ class VisAtomicStructure(object):
             strand_name (String): The strand name created for this structure.
 
         The visualization geometry is createed from the atomic coordinates of the atomistic model of a single DNA strand 
-        taken from the given Molecule object. It is assumed that the Molecule object contains a single continuous strand
+        taken from the strand Molecule object. It is assumed that the Molecule object contains a single continuous strand
         when creating geometry.
 
         The chain ID of the atomic structure DNA strand is assumed to have the following format:
@@ -76,25 +85,28 @@ class VisAtomicStructure(object):
     average_p_bond_length = 0.65   # The average distance between P-P bonds.
     p_bond_length_tol = 0.1        # The tolerance for P-P bond deviation.
 
-    def __init__(self, id, model, molecule, graphics):
+    def __init__(self, id, model, atomic_structure, atomic_strand, graphics):
         """ Initialize a VisAtomicStructure object. 
 
             Arguments:
                 id (int): The atomic structure ID, from 0 to the number of atomic structures.
                 model (VisModel): The visualization model object used to interface with the DNA design structure
                     and manage the visualization of all representions.
-                molecule (Molecule): The atomic structure molecule object for a ssDNA. 
+                atomic_structure (AtomicStructure): The atomic structure used to generate the strand molecule. 
+                atomic_strand (AtomicStructureStrand): The atomic structure strand for a ssDNA. 
                 graphics (VisGraphics): The visualization graphics object that manages the display of geometry for
                     various representations.
         """
         self.id = id
+        self.model = model
         self.graphics = graphics
-        self.molecule = molecule
+        self.atomic_structure = atomic_structure
+        self.atomic_strand = atomic_strand
+        self._molecule = None
         self.scale = 0.1
         self.representations = {}
-        # Set the structure name. This will just be the chain ID. There should be just one chain.
-        chains = list(molecule.chains)
-        self.name = chains[0]
+        # Set the structure name. This will just be the chain ID of the strand molecule.
+        self.name = atomic_strand.chainID
         self._logger = logging.getLogger(__name__ + ':' + self.name) 
 
         # Set the equivalent strand name for this chain.
@@ -121,6 +133,14 @@ class VisAtomicStructure(object):
         """ The compare function used to sort strands by helix number and then position. """
         return cmp(a.strand.start_helix,b.strand.start_helix) or cmp(a.strand.start_pos,b.strand.start_pos)
 
+    @property
+    def molecule(self):
+        """ Get the Molecule object for the strand, generating its atoms the first time it is used. """
+        if self._molecule == None:
+            self._logger.info("Generate atomic structure for strand %s " % self.strand_name)
+            self._molecule = self.atomic_structure.generate_strand_structure_ss(self.atomic_strand)
+        return self._molecule
+
     def show(self, rep, show, display=True):
         """ Show the strand atomic structure with the given representation. 
 
@@ -132,13 +152,33 @@ class VisAtomicStructure(object):
             If the geometry for the representation has not been created then create and store it. 
         """ 
         self._logger.debug("Show atomic structure \'%s\'  rep \'%s\' " % (self.name, rep))
-        if rep not in self.representations:
-            self.create_rep_methods[rep]()
+        self.create_rep(rep)
         for geom in self.representations[rep]:
             geom.visible = show
         if display:
             self.graphics.display()
 
+    def create_rep(self, rep):
+        """ Create and store the geometry for the representation if it has not been created. """
+        if rep not in self.representations:
+            self.create_rep_methods[rep]()
+        self.model.rep_cache.touch(self, rep)
+
+    def remove_rep(self, rep):
+        """ Remove the geometry for the representation from the graphics scene. 
+
+            The geometry is created again the next time the representation is shown.
+        """
+        for geom in self.representations.pop(rep, []):
+            self.graphics.remove_render_geometry(geom)
+
+    def _set_lod_path(self, geom):
+        """ Set the strand domain end points path as the level of detail proxy for a geometry showing residues. """
+        strand = self.model.strands.get(self.strand_name)
+        if strand:
+            geom.lod_proxy = strand.get_lod_path()
+            geom.lod_size = VisAtomicStructure.average_p_bond_length
+
     def print_info(self):
         """ Print atomic stucture information. """ 
         self._logger.info("Number of residues %d" % (len(self.molecule.residues)))
@@ -166,6 +206,7 @@ class VisAtomicStructure(object):
         geom.select_vertex = True
         geom.selected_callback = self.select_backbone
         geom.entity_indexes = range(0,len(points))
+        self._set_lod_path(geom)
         self.representations[VisAtomicStructureRepType.BACKBONE] = [geom]
         self.graphics.add_render_geometry(geom)
 
@@ -191,34 +232,17 @@ class VisAtomicStructure(object):
             The bond representaion visualizes DNA atomic bonds as lines. The sugar, purine, and pyrimidine ring atoms 
             are displayed as solid polygons. A list of which points belong to which base is created so that the base 
             number of a picked point on the bond geometry can be determined. 
+
+            The bond end points and ring polygon points of all residues are gathered from the array of atom 
+            coordinates using the residue index tables of VisDnaResidueTables (see residue_tables.py). Bonds and 
+            rings with missing atoms are skipped.
         """
         self._logger.debug("Create atomic structure bonds rep.")
         self._logger.debug("Number of residues %d " % len(self.molecule.residues))
-        num_bond_points = 0
-        bond_indexes = []
-        bond_points = []
-        num_plane_points = 0
-        plane_counts = []
-        plane_points = []
-        plane_indexes = []
-        num_res = len(self.molecule.residues)
-        res_list = list(self.molecule.residues.values())
-        for i in xrange(0,num_res): 
-            residue_atoms = res_list[i]
-            atom = residue_atoms["P"]
-            self._get_residue_bond_geometry(bond_points, atom.res_name, residue_atoms)
-            self._get_residue_plane_geometry(plane_counts, plane_points, atom.res_name, residue_atoms)
-            if i != num_res-1:
-                next_residue_atoms = res_list[i+1]
-                self._add_residue_bond("P", residue_atoms, "O3'", next_residue_atoms, bond_points)
-            # Add indexes into the bond and plane points arrays to map points to individual bases.
-            num_bond_points = len(bond_points)
-            bond_indexes.append(num_bond_points)
-            num_plane_points = len(plane_counts)
-            plane_indexes.append(num_plane_points)
-            #self._logger.debug("Residue %d  number of bounds points %d " % (i,num_bond_points))
-            #self._logger.debug("Residue %d  number of plane points %d " % (i,num_plane_points))
-        #__for i in xrange(0,num_res)
+        tables = dna_residue_tables
+        coords, atom_rows, res_types = tables.get_atom_arrays(self.molecule.residues.values(), self.scale)
+        bond_points, bond_indexes = tables.get_bond_points(coords, atom_rows, res_types)
+        plane_points, plane_counts, plane_indexes = tables.get_ring_points(coords, atom_rows, res_types)
 
         # Create the lines geometry for atom bonds.
         name = "BaseBonds:%s" %  self.strand_name
@@ -227,6 +251,7 @@ class VisAtomicStructure(object):
         geom.line_width = 2.0
         geom.entity_indexes = bond_indexes
         geom.selected_callback = self.select_bonds
+        self._set_lod_path(geom)
         self.representations[VisAtomicStructureRepType.BONDS] = [geom]
         self.graphics.add_render_geometry(geom)
         # Create the polygon geometry for sugar and base planes.
@@ -235,6 +260,7 @@ class VisAtomicStructure(object):
         geom.color = self.color[:]
         geom.entity_indexes = plane_indexes
         geom.selected_callback = self.select_bonds
+        self._set_lod_path(geom)
         self.representations[VisAtomicStructureRepType.BONDS].append(geom)
         self.graphics.add_render_geometry(geom)
 
@@ -313,130 +339,3 @@ class VisAtomicStructure(object):
         lengths = geom.data[0][1]
         self._logger.info("Selected check \'%s\'  P-P length %g " % (self.name, lengths[index]))
         #__if residue_num >= 0 and residue_num < num_res
-
-    def _get_residue_bond_geometry(self, points, res_name, residue_atoms):
-        """ Create the atomic bond geometry for the given residue.
-
-            Arguments:
-                points (List[float[3]]): The list of points to store the geometry.                
-                res_name (String): The name of the residue.
-                residue_atoms (List[Atom]): The list of atoms for the residue.
-        """
-        res_name = res_name.lower()
-        # Add the backbone bonds.
-        self._add_bonds(residue_atoms, VisDnaBonds.backbone, points)
-        # Add the base bonds.
-        if res_name == "da":
-            self._add_bonds(residue_atoms, VisDnaBonds.ade, points)
-        elif res_name == "dc":
-            self._add_bonds(residue_atoms, VisDnaBonds.cyt, points)
-        elif res_name == "dg":
-            self._add_bonds(residue_atoms, VisDnaBonds.gua, points)
-        elif res_name == "dt":
-            self._add_bonds(residue_atoms, VisDnaBonds.thy, points)
-
-    def _get_residue_plane_geometry(self, plane_counts, plane_points, res_name, residue_atoms):
-        """ Create the atomic ring plane geometry for the given residue.
-
-            Arguments:
-                plane_counts (List[int]): The list of number of points for each polygon.
-                plane_points (List[List[float]]): The list of points for each polygon.
-                res_name (String): The residue name to create geometry for.
-                residue_atoms (List[Atom]): The list of atoms for the residue.
-
-            The geometry added are the coordinates of the polygons representing the surgar and base planes obtained
-            from their ring atoms.
-        """
-        res_name = res_name.lower()
-        # Add the sugar ring.
-        self._add_planes(residue_atoms, VisDnaPlanes.sugar, plane_counts, plane_points)
-        # Add the purine or pyrimidine ring(s).
-        if res_name == "da":
-            self._add_planes(residue_atoms, VisDnaPlanes.ade, plane_counts, plane_points)
-        elif res_name == "dc":
-            self._add_planes(residue_atoms, VisDnaPlanes.cyt, plane_counts, plane_points)
-        elif res_name == "dg":
-            self._add_planes(residue_atoms, VisDnaPlanes.gua, plane_counts, plane_points)
-        elif res_name == "dt":
-            self._add_planes(residue_atoms, VisDnaPlanes.thy, plane_counts, plane_points)
-
-    def _add_planes(self, residue_atoms, planes, counts, points):
-        """ Add the plane geometry for the given residue.
-
-            Arguments:
-                residue_atoms (List[Atom]): The list of atoms for the residue.
-                planes (List[Tuples]): The list of atom names for a ring of atoms.
-                counts (List[int]): The list of number of points for each polygon.
-                points (List[List[float]]): The list of points for each polygon.
-        """
-        s = self.scale
-        for plane in planes: 
-            counts.append(len(plane))
-            for atom_name in plane: 
-                atom = residue_atoms[atom_name]
-                points.append( [s*atom.coords[0], s*atom.coords[1], s*atom.coords[2]] )
-        #__for plane in planes
-
-    def _add_bonds(self, residue_atoms, bonds, points):
-        """ Add the bond geometry for the given residue.
-
-            Arguments:
-                residue_atoms (List[Atom]): The list of atoms for the residue.
-                bonds (List[Tuples]): The list of atom names for the residue bonds.
-                points (List[List[float]]): The list of points for each bond (a line).
-        """
-        s = self.scale
-        for bond in bonds: 
-            if( bond[0] not in residue_atoms) or (bond[1] not in residue_atoms):
-                continue
-            atom1 = residue_atoms[bond[0]]
-            atom2 = residue_atoms[bond[1]]
-            points.append( [s*atom1.coords[0], s*atom1.coords[1], s*atom1.coords[2]] )
-            points.append( [s*atom2.coords[0], s*atom2.coords[1], s*atom2.coords[2]] )
-
-    def _add_residue_bond(self, atom_name1, residue_atoms1, atom_name2, residue_atoms2, points):
-        """ Add the points representing a bond between atoms of two residues.
-
-            Arguments:
-                atom_name1 (String): The name of the atom in the 1st residue. 
-                residue_atoms1 (String): The atoms of the 1st residue. 
-                atom_name2 (String): The name of the atom in the 2nd residue. 
-                residue_atoms2 (String): The atoms of the 2nd residue. 
-                points (List[List[float]]): The list of points for each bond.
-        """
-        s = self.scale
-        atom1 = residue_atoms1[atom_name1]
-        atom2 = residue_atoms2[atom_name2]
-        points.append( [s*atom1.coords[0], s*atom1.coords[1], s*atom1.coords[2]] )
-        points.append( [s*atom2.coords[0], s*atom2.coords[1], s*atom2.coords[2]] )
-
-class VisDnaBonds:
-    """ This class defines the atom names for atomic bonds. """
-    backbone = [
-        # Phosphate group.
-        ("P", "OP1"), ("P", "OP2"), ("P", "OP3"), ("P", "O5'"),
-        # Sugar
-        ("O5'", "C5'"), ("C5'", "C4'"), ("C4'", "C3'"), ("C3'", "C2'"), ("C2'", "C1'"), ("C1'", "O4'"),
-        ("O4'", "C4'"), ("C3'", "O3'") ]
-
-    # Bases.
-    ade = [ ("C1'", "N9"), ("N9", "C8"), ("C8", "N7"), ("N7", "C5"), ("C5", "C4"), ("C4", "N9"), ("C5", "C6"),
-            ("C6", "N1"), ("N1", "C2"), ("C2", "N3"), ("N3", "C4") ]
-
-    gua = [ ("C1'", "N9"), ("N9", "C8"), ("C8", "N7"), ("N7", "C5"), ("C5", "C4"), ("C4", "N9"),
-            ("C5", "C6"), ("C6", "N1"), ("N1", "C2"), ("C2", "N3"), ("N3", "C4"), ("C6", "O6"), ("C2", "N2") ]
-
-    cyt = [ ("C1'", "N1"), ("N1", "C2"), ("C2", "N3"), ("N3", "C4"), ("C4", "C5"), ("C5", "C6"), ("C6", "N1"),
-            ("C4", "N4"), ("C2", "O2") ]
-
-    thy = [ ("C1'", "N1"), ("N1", "C2"), ("C2", "N3"), ("N3", "C4"), ("C4", "C5"), ("C5", "C6"), ("C6", "N1"),
-            ("C4", "O4"), ("C5", "C7") ]
-
-class VisDnaPlanes:
-    """ This class defines the atom names for ring atoms. """
-    sugar = [ ("C4'", "C3'", "C2'", "C1'", "O4'") ]
-    ade = [ ("N9", "C8", "N7", "C5", "C4"), ("C5", "C6", "N1", "C2", "N3", "C4") ]
-    gua = [ ("N9", "C8", "N7", "C5", "C4"), ("C5", "C6", "N1", "C2", "N3", "C4") ]
-    cyt = [ ("N1", "C6", "C5", "C4", "N3", "C2") ]
-    thy = [ ("N1", "C6", "C5", "C4", "N3", "C2") ]
-
@@ -0,0 +1,165 @@
+# Copyright 2016 Autodesk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""This module is used to pack geometry into batches for rendering.
+
+    Rendering each geometry object using per-vertex OpenGL operations (e.g.
+    glVertex) is slow for large models. Geometry objects instead describe their
+    points, lines and triangles as VisBatchItem objects. Items with the same
+    primitive type and material (line width or point size, lighting, face
+    culling and transparency) are packed into a single VisRenderBatch storing
+    shared vertex, normal, color and index arrays. Each batch is then drawn by
+    the graphics module using a single glDrawElements call.
+
+    The packing performed here only uses NumPy and does not require OpenGL.
+"""
+import numpy as np
+
+class VisBatchPrimitive:
+    """ This class defines the batch primitive types. """
+    POINTS    = "points"
+    LINES     = "lines"
+    TRIANGLES = "triangles"
+
+class VisBatchItem(object):
+    """ This class stores the vertex data for a part of a geometry object to be packed into a batch.
+
+        Attributes:
+            color (List[Float]): The RGBA color used for all vertices if colors is None.
+            colors (NumPy Nx4 ndarray[float]): The vertex RGBA colors.
+            cull_face (bool): If true then back facing triangles are culled.
+            indices (NumPy ndarray[int]): The vertex indices of the primitives. If None then the vertices are
+                used in order.
+            lighting (bool): If true then the primitives are lit.
+            normals (NumPy Nx3 ndarray[float]): The vertex normals, or a single normal used for all vertices.
+            primitive (String): The primitive type, a VisBatchPrimitive value.
+            size (Float): The line width or point size.
+            transparent (bool): If true then the primitives are transparent.
+            vertices (NumPy Nx3 ndarray[float]): The item vertices.
+    """
+    def __init__(self, primitive, vertices, indices=None, normals=None, color=None, colors=None, size=1.0,
+                 lighting=False, cull_face=True, transparent=False):
+        self.primitive = primitive
+        self.vertices = np.asarray(vertices, dtype=float).reshape((-1,3))
+        self.indices = indices
+        self.normals = normals
+        if color is None:
+            color = [1.0, 1.0, 1.0, 1.0]
+        self.color = color
+        self.colors = colors
+        self.size = size
+        self.lighting = lighting
+        self.cull_face = cull_face
+        self.transparent = transparent
+
+    def get_material(self):
+        """ Get the tuple of values that items packed into the same batch must share. """
+        return (self.primitive, float(self.size), bool(self.lighting), bool(self.cull_face), bool(self.transparent))
+
+class VisRenderBatch(object):
+    """ This class stores the shared arrays used to draw a batch of primitives.
+
+        Attributes:
+            colors (NumPy Nx4 ndarray[float32]): The vertex RGBA colors.
+            cull_face (bool): If true then back facing triangles are culled.
+            indices (NumPy ndarray[uint32]): The vertex indices of the primitives.
+            lighting (bool): If true then the primitives are lit.
+            normals (NumPy Nx3 ndarray[float32]): The vertex normals. This is None for unlit batches.
+            num_items (int): The number of items packed into the batch.
+            primitive (String): The primitive type, a VisBatchPrimitive value.
+            size (Float): The line width or point size.
+            transparent (bool): If true then the primitives are transparent.
+            vertices (NumPy Nx3 ndarray[float32]): The vertices.
+    """
+    def __init__(self, material, vertices, normals, colors, indices, num_items):
+        self.primitive, self.size, self.lighting, self.cull_face, self.transparent = material
+        self.vertices = vertices
+        self.normals = normals
+        self.colors = colors
+        self.indices = indices
+        self.num_items = num_items
+
+def line_strip_indices(num_vertices, closed=False):
+    """ Get the indices of the lines connecting a strip of vertices.
+
+        Arguments:
+            num_vertices (int): The number of vertices in the strip.
+            closed (bool): If true then the last vertex is connected to the first (i.e. a loop).
+
+        Returns a NumPy array of vertex index pairs, one pair per line.
+    """
+    if num_vertices < 2:
+        return np.zeros(0, dtype=int)
+    start = np.arange(num_vertices-1+closed)
+    end = (start + 1) % num_vertices
+    return np.column_stack((start, end)).ravel()
+
+def pack_batches(items):
+    """ Pack items into batches of the same primitive type and material.
+
+        Arguments:
+            items (List[VisBatchItem]): The items to pack.
+
+        Returns a list of VisRenderBatch objects. Opaque batches are listed before transparent batches and
+        batches are otherwise ordered by the first item packed into them.
+    """
+    groups = {}
+    materials = []
+    for item in items:
+        if len(item.vertices) == 0:
+            continue
+        material = item.get_material()
+        if material not in groups:
+            groups[material] = []
+            materials.append(material)
+        groups[material].append(item)
+    #__for item in items
+
+    batches = [_pack_items(material, groups[material]) for material in materials]
+    return [batch for batch in batches if not batch.transparent] + [batch for batch in batches if batch.transparent]
+
+def _pack_items(material, items):
+    """ Pack items sharing the same material into a single batch. """
+    lighting = material[2]
+    counts = np.array([len(item.vertices) for item in items], dtype=int)
+    offsets = np.zeros(len(items)+1, dtype=int)
+    np.cumsum(counts, out=offsets[1:])
+    num_vertices = offsets[-1]
+
+    vertices = np.empty((num_vertices,3), dtype=np.float32)
+    colors = np.empty((num_vertices,4), dtype=np.float32)
+    if lighting:
+        normals = np.empty((num_vertices,3), dtype=np.float32)
+    else:
+        normals = None
+    indices = []
+
+    for item,start,end in zip(items, offsets[:-1], offsets[1:]):
+        vertices[start:end] = item.vertices
+        if item.colors is not None:
+            colors[start:end] = item.colors
+        else:
+            colors[start:end] = item.color
+        if lighting:
+            if item.normals is None:
+                raise ValueError("A lit batch item has no normals.")
+            normals[start:end] = item.normals
+        if item.indices is None:
+            indices.append(np.arange(start, end))
+        else:
+            indices.append(np.asarray(item.indices, dtype=int).ravel() + start)
+    #__for item,start,end in zip(items, offsets[:-1], offsets[1:])
+
+    indices = np.concatenate(indices).astype(np.uint32)
+    return VisRenderBatch(material, vertices, normals, colors, indices, len(items))
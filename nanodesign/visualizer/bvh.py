@@ -0,0 +1,309 @@
+# Copyright 2016 Autodesk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""This module is used to intersect a pick line with geometry.
+
+    Geometry is picked by intersecting a 3D line, defined by unprojecting a
+    point in the graphics window, with the line segments, triangles, spheres
+    and cylinders representing it. A VisBvh bounding volume hierarchy built
+    over the bounding boxes of these primitives is used to quickly find the
+    primitives that may intersect the pick line. The intersection of the pick
+    line with these primitives is then calculated using the array functions
+    defined here (e.g. intersect_line_segments).
+
+    The intersection functions return the parameter t of the intersection
+    point point1 + t*(point2 - point1) along the pick line for each primitive.
+    This is NaN if the primitive is not intersected. Only intersections for t
+    between 0 and 1 are returned.
+"""
+import numpy as np
+
+# The maximum distance between the pick line and a line segment for the segment to be picked.
+LINE_PICK_TOLERANCE = 0.1
+
+class VisBvh(object):
+    """ This class stores a bounding volume hierarchy of axis-aligned bounding boxes.
+
+        Attributes:
+            node_children (NumPy Mx2 ndarray[int]): The indexes of the two children of each node. This is -1 for
+                leaf nodes.
+            node_maxs (NumPy Mx3 ndarray[float]): The maximum corner of the bounding box of each node.
+            node_mins (NumPy Mx3 ndarray[float]): The minimum corner of the bounding box of each node.
+            node_ranges (NumPy Mx2 ndarray[int]): The range into primitives[] of the primitives stored in each
+                leaf node.
+            num_primitives (int): The number of primitives.
+            primitives (NumPy N ndarray[int]): The primitive indexes ordered by leaf node.
+
+        The hierarchy is built top-down by splitting the primitives of a node at the median of their box centers
+        along the longest axis of the centers extent.
+    """
+    def __init__(self, mins, maxs, leaf_size=8):
+        """ Build a VisBvh object.
+
+            Arguments:
+                mins (NumPy Nx3 ndarray[float]): The minimum corner of the bounding box of each primitive.
+                maxs (NumPy Nx3 ndarray[float]): The maximum corner of the bounding box of each primitive.
+                leaf_size (int): The maximum number of primitives stored in a leaf node.
+        """
+        mins = np.asarray(mins, dtype=float).reshape((-1,3))
+        maxs = np.asarray(maxs, dtype=float).reshape((-1,3))
+        self.num_primitives = len(mins)
+        centers = 0.5*(mins + maxs)
+        node_mins = []
+        node_maxs = []
+        node_children = []
+        node_ranges = []
+        primitives = []
+        num_leaf_primitives = 0
+
+        # Each stack entry is the node id and the primitive indexes of the node.
+        stack = [(0, np.arange(self.num_primitives))]
+        node_mins.append(None)
+        node_maxs.append(None)
+        node_children.append(None)
+        node_ranges.append(None)
+        while stack:
+            node, indexes = stack.pop()
+            if len(indexes) == 0:
+                node_mins[node] = np.full(3, np.inf)
+                node_maxs[node] = np.full(3, -np.inf)
+            else:
+                node_mins[node] = np.min(mins[indexes], axis=0)
+                node_maxs[node] = np.max(maxs[indexes], axis=0)
+            node_centers = centers[indexes]
+            if len(indexes) > leaf_size:
+                extent = np.max(node_centers, axis=0) - np.min(node_centers, axis=0)
+                axis = np.argmax(extent)
+            if (len(indexes) <= leaf_size) or (extent[axis] == 0.0):
+                node_children[node] = (-1, -1)
+                node_ranges[node] = (num_leaf_primitives, num_leaf_primitives+len(indexes))
+                primitives.append(indexes)
+                num_leaf_primitives += len(indexes)
+                continue
+            half = len(indexes) // 2
+            order = np.argpartition(node_centers[:,axis], half)
+            left = len(node_mins)
+            node_children[node] = (left, left+1)
+            node_ranges[node] = (0, 0)
+            for child_indexes in [indexes[order[:half]], indexes[order[half:]]]:
+                stack.append((len(node_mins), child_indexes))
+                node_mins.append(None)
+                node_maxs.append(None)
+                node_children.append(None)
+                node_ranges.append(None)
+            #__for child_indexes in [indexes[order[:half]], indexes[order[half:]]]
+        #__while stack
+
+        self.node_mins = np.array(node_mins, dtype=float)
+        self.node_maxs = np.array(node_maxs, dtype=float)
+        self.node_children = np.array(node_children, dtype=int)
+        self.node_ranges = np.array(node_ranges, dtype=int)
+        self.primitives = np.concatenate(primitives).astype(int)
+
+    def get_bounds(self):
+        """ Get the minimum and maximum corners of the bounding box of all primitives. """
+        return self.node_mins[0], self.node_maxs[0]
+
+    def query_line(self, point1, point2):
+        """ Get the primitives whose leaf node bounding boxes intersect a line segment.
+
+            Arguments:
+                point1 (List[Float]): The start point of the line segment.
+                point2 (List[Float]): The end point of the line segment.
+
+            Returns a NumPy array of primitive indexes.
+
+            The nodes at each level of the hierarchy are tested together.
+        """
+        if self.num_primitives == 0:
+            return np.zeros(0, dtype=int)
+        nodes = np.zeros(1, dtype=int)
+        leaves = []
+        while len(nodes) != 0:
+            hit = intersect_line_boxes(point1, point2, self.node_mins[nodes], self.node_maxs[nodes])
+            nodes = nodes[hit]
+            is_leaf = self.node_children[nodes,0] < 0
+            leaves.append(nodes[is_leaf])
+            nodes = self.node_children[nodes[~is_leaf]].ravel()
+        #__while len(nodes) != 0
+        leaves = np.concatenate(leaves)
+        if len(leaves) == 0:
+            return np.zeros(0, dtype=int)
+        return np.concatenate([ self.primitives[start:end] for start,end in self.node_ranges[leaves] ])
+
+#__class VisBvh(object)
+
+def get_segment_bounds(starts, ends, tolerance=LINE_PICK_TOLERANCE):
+    """ Get the bounding boxes of line segments expanded by a tolerance. """
+    return np.minimum(starts, ends) - tolerance, np.maximum(starts, ends) + tolerance
+
+def intersect_line_boxes(point1, point2, mins, maxs):
+    """ Intersect a line segment with axis-aligned boxes.
+
+        Returns a NumPy array of bool that is true for each box intersected.
+    """
+    o = np.asarray(point1, dtype=float)
+    d = np.asarray(point2, dtype=float) - o
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t1 = (mins - o) / d
+        t2 = (maxs - o) / d
+    tmin = np.fmin(t1, t2)
+    tmax = np.fmax(t1, t2)
+
+    # The slabs of axes parallel to the line contain the line or do not intersect it.
+    parallel = (d == 0.0)
+    if np.any(parallel):
+        inside = (mins[:,parallel] <= o[parallel]) & (maxs[:,parallel] >= o[parallel])
+        tmin[:,parallel] = np.where(inside, -np.inf, np.inf)
+        tmax[:,parallel] = np.where(inside, np.inf, -np.inf)
+    t_enter = np.maximum(np.max(tmin, axis=1), 0.0)
+    t_exit = np.minimum(np.min(tmax, axis=1), 1.0)
+    return t_enter <= t_exit
+
+def intersect_line_segments(point1, point2, starts, ends, tolerance=LINE_PICK_TOLERANCE):
+    """ Intersect a line with line segments.
+
+        Arguments:
+            point1 (List[Float]): The start point of the line.
+            point2 (List[Float]): The end point of the line.
+            starts (NumPy Nx3 ndarray[float]): The start point of each segment.
+            ends (NumPy Nx3 ndarray[float]): The end point of each segment.
+            tolerance (Float): The maximum distance between the line and a segment for them to intersect.
+
+        Returns the NumPy array of line parameters and the Nx3 array of the closest points on each segment.
+
+        This computes the same intersection as geometry.comp_line_line_intersect() using array operations.
+    """
+    p1 = np.asarray(point1, dtype=float)
+    v1 = np.asarray(point2, dtype=float) - p1
+    v2 = ends - starts
+    a = np.dot(v1, v1)
+    b = -np.dot(v2, v1)
+    c = -b
+    d = -np.sum(v2*v2, axis=1)
+    sp = starts - p1
+    e = np.dot(sp, v1)
+    f = np.sum(v2*sp, axis=1)
+    det = a*d - c*b
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = (e*d - f*b) / det
+        u = (a*f - e*c) / det
+        s1 = p1 + t[:,None]*v1
+        s2 = starts + u[:,None]*v2
+        dist = np.sqrt(np.sum((s1 - s2)**2, axis=1))
+        hit = (det != 0.0) & (t >= 0.0) & (t <= 1.0) & (u >= 0.0) & (u <= 1.0) & (dist <= tolerance)
+    return np.where(hit, t, np.nan), s2
+
+def intersect_line_triangles(point1, point2, vertices1, vertices2, vertices3):
+    """ Intersect a line with triangles.
+
+        Arguments:
+            point1 (List[Float]): The start point of the line.
+            point2 (List[Float]): The end point of the line.
+            vertices1,vertices2,vertices3 (NumPy Nx3 ndarray[float]): The vertices of each triangle.
+
+        Returns the NumPy array of line parameters.
+    """
+    o = np.asarray(point1, dtype=float)
+    d = np.asarray(point2, dtype=float) - o
+    edges1 = vertices2 - vertices1
+    edges2 = vertices3 - vertices1
+    p = np.cross(d, edges2)
+    det = np.sum(edges1*p, axis=1)
+    s = o - vertices1
+    q = np.cross(s, edges1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        u = np.sum(s*p, axis=1) / det
+        v = np.dot(q, d) / det
+        t = np.sum(edges2*q, axis=1) / det
+        hit = (np.abs(det) > 1e-12) & (u >= 0.0) & (v >= 0.0) & (u + v <= 1.0) & (t >= 0.0) & (t <= 1.0)
+    return np.where(hit, t, np.nan)
+
+def intersect_line_spheres(point1, point2, centers, radii):
+    """ Intersect a line with spheres.
+
+        Returns the NumPy array of line parameters of the intersection points closest to point1.
+    """
+    o = np.asarray(point1, dtype=float)
+    v = np.asarray(point2, dtype=float) - o
+    oc = o - centers
+    a = np.dot(v, v)
+    b = 2.0*np.dot(oc, v)
+    c = np.sum(oc*oc, axis=1) - radii*radii
+    desc = b*b - 4.0*a*c
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = (-b - np.sqrt(np.where(desc >= 0.0, desc, np.nan))) / (2.0*a)
+        hit = (t >= 0.0) & (t <= 1.0)
+    return np.where(hit, t, np.nan)
+
+def intersect_line_cylinders(point1, point2, points1, unit_axes, lengths, radii, capped):
+    """ Intersect a line with cylinders.
+
+        Arguments:
+            point1 (List[Float]): The start point of the line.
+            point2 (List[Float]): The end point of the line.
+            points1 (NumPy Nx3 ndarray[float]): The first endpoint of each cylinder axis.
+            unit_axes (NumPy Nx3 ndarray[float]): The normalized axis of each cylinder.
+            lengths (NumPy N ndarray[float]): The length of each cylinder.
+            radii (NumPy N ndarray[float]): The radius of each cylinder.
+            capped (NumPy Nx2 ndarray[bool]): Flags for capping the ends of each cylinder.
+
+        Returns the NumPy array of line parameters of the intersection points closest to point1.
+    """
+    o = np.asarray(point1, dtype=float)
+    v = np.asarray(point2, dtype=float) - o
+    h = unit_axes
+    oc = o - points1
+    odh = np.sum(oc*h, axis=1)
+    vdh = np.dot(h, v)
+    t = np.full(len(points1), np.inf)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Check intersection with sides.
+        f = oc - odh[:,None]*h
+        g = v - vdh[:,None]*h
+        c1 = np.sum(g*g, axis=1)
+        c2 = 2.0*np.sum(f*g, axis=1)
+        c3 = np.sum(f*f, axis=1) - radii*radii
+        desc = c2*c2 - 4.0*c1*c3
+        desc = np.sqrt(np.where(desc >= 0.0, desc, np.nan))
+        for s in [-1.0, 1.0]:
+            ts = (-c2 + s*desc) / (2.0*c1)
+            k = odh + ts*vdh
+            valid = (ts >= 0.0) & (ts <= 1.0) & (k >= 0.0) & (k <= lengths) & (ts < t)
+            t[valid] = ts[valid]
+        #__for s in [-1.0, 1.0]
+
+        # Check for intersection with caps.
+        for i,cap_dist in enumerate([np.zeros(len(points1)), lengths]):
+            tc = (cap_dist - odh) / vdh
+            vec = o + tc[:,None]*v - (points1 + cap_dist[:,None]*h)
+            valid = capped[:,i] & (tc >= 0.0) & (tc <= 1.0) & (np.sum(vec*vec, axis=1) <= radii*radii) & (tc < t)
+            t[valid] = tc[valid]
+        #__for i,cap_dist in enumerate([np.zeros(len(points1)), lengths])
+    #__with np.errstate(divide='ignore', invalid='ignore')
+
+    return np.where(np.isinf(t), np.nan, t)
+
+def get_closest_intersection(t):
+    """ Get the index of the intersection closest to the start of the pick line.
+
+        Arguments:
+            t (NumPy N ndarray[float]): The line parameters returned by an intersection function.
+
+        Returns None if no primitive is intersected.
+    """
+    if (len(t) == 0) or np.all(np.isnan(t)):
+        return None
+    return int(np.nanargmin(t))
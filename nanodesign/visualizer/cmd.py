@@ -66,6 +66,7 @@ class VisCommand(object):
         self.model = model
         #self.update_menu = False
         self.update_menu = True
+        self.menu_updates = []
         self._logger = logging.getLogger(__name__)
         # Open command logging file.
         path = os.getcwd()
@@ -83,6 +84,33 @@ class VisCommand(object):
             VisCommandEntity.STRAND : self.proc_strand_cmd 
         }
 
+    def update_menu_selection(self, entity, name, rep):
+        """ Update the menu selection for a representation shown by a command. 
+
+            Arguments:
+                entity (VisMenuEntity): The entity type of the representation.
+                name (String): The entity name. This is None for model representations.
+                rep (String): The name of the representation.
+
+            If the menu has not been created yet (e.g. while the model is loading or when rendering offscreen)
+            then the update is kept and applied by apply_menu_updates().
+        """
+        if not self.model.menu:
+            self.menu_updates.append((entity, name, rep))
+            return
+        delay = True
+        if entity == VisMenuEntity.MODEL:
+            self.model.menu.update_selection(entity, rep, delay)
+        else:
+            self.model.menu.update_submenu_selection(entity, name, rep, delay)
+
+    def apply_menu_updates(self):
+        """ Apply the menu selection updates kept before the menu was created. """
+        menu_updates = self.menu_updates
+        self.menu_updates = []
+        for entity, name, rep in menu_updates:
+            self.update_menu_selection(entity, name, rep)
+
     def write_cmd(self, cmd):
         """ Write a command to a file. """
         self.file.write(cmd + "\n")
@@ -160,8 +188,7 @@ class VisCommand(object):
             self.model.show_helix(name, rep, attributes)
         # Update the menu but after graphics is up and fully initialized (delayed=True).
         if (show and self.update_menu):
-            delay = True
-            self.model.menu.update_submenu_selection(VisMenuEntity.HELIX, name, rep, delay)
+            self.update_menu_selection(VisMenuEntity.HELIX, name, rep)
 
     def generate_helix_cmd(self, helix_name, helix_rep, show):
         """ Generate a helix command. """
@@ -248,8 +275,7 @@ class VisCommand(object):
             return
 
         if (show and self.update_menu):
-            delay = True
-            self.model.menu.update_selection(VisMenuEntity.MODEL, rep, delay)
+            self.update_menu_selection(VisMenuEntity.MODEL, None, rep)
 
     def proc_strand_cmd(self, cmd, tokens):
         """ Process a 'strand' command. """
@@ -283,8 +309,7 @@ class VisCommand(object):
             self.model.show_strand(name, rep, attributes)
         # Update the menu but after graphics is up and fully initialized (delayed=True).
         if (show and self.update_menu):
-            delay = True
-            self.model.menu.update_submenu_selection(VisMenuEntity.STRAND, name, rep, delay)
+            self.update_menu_selection(VisMenuEntity.STRAND, name, rep)
 
     def proc_atomic_struct_cmd(self, cmd, tokens):
         """ Process a 'atomic_structure' command. """
@@ -307,8 +332,7 @@ class VisCommand(object):
         self.model.show_atomic_struct(name, rep, show)
         # Update the menu but after graphics is up and fully initialized (delayed=True).
         if (show and self.update_menu):
-            delay = True
-            self.model.menu.update_submenu_selection(VisMenuEntity.ATOMIC_STRUCTURE, name, rep, delay)
+            self.update_menu_selection(VisMenuEntity.ATOMIC_STRUCTURE, name, rep)
     #__def proc_atomic_struct_cmd(self, tokens)
 
     def generate_graphics_cmd(self, name, value):
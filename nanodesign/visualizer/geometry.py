@@ -20,9 +20,12 @@
 
     Geometry can be seleced using a 3D line defined by a graphics picking
     operation. The intersection of the 3D line with the geometry is calculated
-    numerically using functions (e.g comp_line_line_intersect) defined here. The
-    intersection point of the 3D geometry is stored together with the index of
-    the selected geometry element. For example, a VisGeometryLines geometry
+    numerically using array functions (e.g intersect_line_segments) defined in
+    bvh.py. Each geometry builds a VisBvh bounding volume hierarchy over its
+    line segments, triangles, spheres or cylinders the first time it is picked
+    and only the primitives whose bounding boxes are crossed by the line are
+    intersected. The intersection point of the 3D geometry is stored together
+    with the index of the selected geometry element. For example, a VisGeometryLines geometry
     represents a set of N lines. Picking on this geometry returns an index
     (between 0 and N-1) identifying the line element selected.
 
@@ -35,9 +38,12 @@
     the strand. The array of index counts for this geometry would look like:
     entity_indexes = [0, 1, 2, ..., N-1].
 
-    Note that the OpenGL per-vertex operations (e.g. glColor, glNormal,
-    glVertex) used here are now deprecated and that for large models rendering
-    will be slow.
+    Geometry is normally rendered in batches. The get_batch_items() method
+    returns the points, lines and triangles of a geometry as VisBatchItem
+    objects that the graphics module packs together with those of other
+    geometry and draws using vertex arrays. The render() method using OpenGL
+    per-vertex operations (e.g. glColor, glNormal, glVertex) is still used for
+    selected geometry and for geometry that is not batched.
 
 """
 from abc import ABCMeta, abstractmethod, abstractproperty
@@ -46,6 +52,9 @@ import sys
 import random
 import numpy as np
 from .extent import VisExtent
+from .batch import VisBatchItem, VisBatchPrimitive, line_strip_indices, pack_batches
+from .bvh import LINE_PICK_TOLERANCE, VisBvh, get_closest_intersection, get_segment_bounds, intersect_line_cylinders, \
+    intersect_line_segments, intersect_line_spheres, intersect_line_triangles
 from math import sqrt,cos,sin,pi,acos
 
 try:
@@ -62,6 +71,8 @@ class VisGeometry(object):
     """ This is the VisGeometry base class.
 
         Attributes:
+            bvh (VisBvh): The bounding volume hierarchy of the geometry pick primitives. This is created the first 
+                time it is needed.
             data (List): The geometry generic data. 
             color (List[float]): The default geometry RGBA color. This is a list of four floats.
             entity_indexes (List[int]): The list of entiy indexes for the geometry. 
@@ -70,6 +81,10 @@ class VisGeometry(object):
             intersect_index (int): The last intersection index into the geometry.
             intersect_point (List[Float]): The last intersection point for the geometry.
             line_width (Float): The geometry default rendering line width.
+            lod_proxy (VisGeometry): The coarse geometry rendered in place of the geometry when its detail is too
+                small to be seen (see lod.py).
+            lod_size (Float): The size of the smallest feature displayed by the geometry, used to select its level
+                of detail.
             name (String): The geometry name.
             num_vertices (int): The number of verices in the geometry. 
             selected (bool): If true then the geometry has been selected.
@@ -105,6 +120,9 @@ class VisGeometry(object):
         self.selected_entity = None
         self.selected_callback = None
         self.selected_vertex = None
+        self.bvh = None
+        self.lod_proxy = None
+        self.lod_size = None
         VisGeometry.num_geometries += 1
     
     @abstractmethod
@@ -117,6 +135,94 @@ class VisGeometry(object):
         """ Intersect the geometry with a line. """ 
         raise NotImplementedError
 
+    def get_batch_items(self):
+        """ Get the list of VisBatchItem objects used to render the geometry in batches. 
+
+            Returns None if the geometry is not batched and is rendered using render().
+        """
+        return None
+
+    def create_batch_item(self, primitive, vertices, **kwargs):
+        """ Create a VisBatchItem using the geometry color, line width and transparency. """
+        kwargs.setdefault('color', self.color)
+        kwargs.setdefault('size', self.line_width)
+        kwargs.setdefault('transparent', self.transparent)
+        return VisBatchItem(primitive, vertices, **kwargs)
+
+    def get_lod_proxy(self):
+        """ Get the coarse geometry rendered in place of the geometry at a low level of detail. 
+
+            Returns None if the geometry is always rendered at full detail.
+        """
+        return self.lod_proxy
+
+    def get_segments(self):
+        """ Get the line segments intersected by a pick line. 
+
+            Returns the start and end points of the segments as two NumPy Nx3 arrays, or None if the geometry 
+            is not picked using line segments. Segment i connects vertices i and i+1.
+        """
+        if self.num_vertices < 2:
+            return None
+        return self.vertices[:-1], self.vertices[1:]
+
+    def get_pick_bounds(self):
+        """ Get the bounding boxes of the primitives intersected by a pick line. 
+
+            Returns the minimum and maximum corners of the boxes as two NumPy Nx3 arrays, or None if the geometry 
+            has no pick primitives.
+        """
+        segments = self.get_segments()
+        if segments is None:
+            return None
+        return get_segment_bounds(*segments)
+
+    def get_bvh(self):
+        """ Get the bounding volume hierarchy of the geometry pick primitives, building it if needed. """
+        if self.bvh is None:
+            bounds = self.get_pick_bounds()
+            if bounds is None:
+                return None
+            self.bvh = VisBvh(*bounds)
+        return self.bvh
+
+    def get_bounds(self):
+        """ Get the minimum and maximum corners of the box bounding the geometry pick primitives. 
+
+            Returns None if the geometry has no pick primitives.
+        """
+        bvh = self.get_bvh()
+        if (bvh is None) or (bvh.num_primitives == 0):
+            return None
+        return bvh.get_bounds()
+
+    def query_pick_primitives(self, point1, point2):
+        """ Get the indexes of the pick primitives whose bounding boxes intersect a line. """
+        bvh = self.get_bvh()
+        if bvh is None:
+            return np.zeros(0, dtype=int)
+        return bvh.query_line(point1, point2)
+
+    def intersect_segments(self, point1, point2):
+        """ Intersect the geometry line segments with a line. 
+
+            Returns the index of the segment with the intersection point closest to point1 and the intersection 
+            point, or (None,None) if no segment is intersected.
+        """
+        segments = self.get_segments()
+        if segments is None:
+            return None, None
+        starts, ends = segments
+        indexes = self.query_pick_primitives(point1, point2)
+        t, points = intersect_line_segments(point1, point2, starts[indexes], ends[indexes])
+        hit = ~np.isnan(t)
+        if not np.any(hit):
+            return None, None
+        indexes = indexes[hit]
+        points = points[hit]
+        i = int(np.argmin(np.sum((points - point1)**2, axis=1)))
+        return int(indexes[i]), list(points[i])
+
     def select_entity(self):
         """ Select an entity using an index into a geometry's data (e.g. vertices) calculated by intersecting a 
             geometry with a pick line. 
@@ -202,6 +308,10 @@ class VisGeometryBox(VisGeometry):
         self.num_vertices = 24 
         self.update_stats(0, len(self.vertices))
 
+    def get_batch_items(self):
+        """ Get the batch items for the box lines. """
+        return [ self.create_batch_item(VisBatchPrimitive.LINES, self.vertices) ]
+
     def render(self):
         """ Render the box geometry. """
         if not self.visible:
@@ -217,27 +327,13 @@ class VisGeometryBox(VisGeometry):
             draw_cross(self.intersect_point)
         glEnable(GL_LIGHTING);
 
+    def get_segments(self):
+        """ Get the line segments connecting the box vertices. The last vertex is connected to the first. """
+        return self.vertices, np.roll(self.vertices, -1, axis=0)
+
     def intersect_line(self, point1, point2):
         """ Intersect the geometry with a line. """ 
-        self.intersect_index = None 
-        self.intersect_point = None
-        intersect_points = [] 
-        intersect_indexes = [] 
-        for i in xrange(0,self.num_vertices):
-            line2_p1 = self.vertices[i]
-            if i == self.num_vertices-1:
-                line2_p2 = self.vertices[0]
-            else:
-                line2_p2 = self.vertices[i+1]
-            ipt = comp_line_line_intersect(point1, point2, line2_p1, line2_p2)
-            if ipt: 
-                intersect_indexes.append(i)
-                intersect_points.append(ipt)
-        #__for i in xrange(0,self.num_vertices)
-        if len(intersect_points) != 0:
-            i,pt = get_closest_point(intersect_points, point1)
-            self.intersect_point = pt
-            self.intersect_index = intersect_indexes[i]
+        self.intersect_index, self.intersect_point = self.intersect_segments(point1, point2)
         return (self.intersect_point != None)
 
 class VisGeometryLines(VisGeometry):
@@ -261,9 +357,7 @@ class VisGeometryLines(VisGeometry):
     def _create_geometry(self, points, arrows):
         """ Create the lines geometry. """
         self.num_vertices = len(points)
-        self.vertices = np.zeros((self.num_vertices,3), dtype=float);
-        for i,point in enumerate(points):
-            self.vertices[i,:] = point
+        self.vertices = np.array(points, dtype=float).reshape((self.num_vertices,3))
 
         # Create the arrowhead geometry.
         if arrows:
@@ -287,28 +381,20 @@ class VisGeometryLines(VisGeometry):
         """ Intersect the geometry with a line. """
         if not self.visible:
             return False
-        self.intersect_index = None
-        intersect_indexes = []
-        self.intersect_point = None
-        intersect_points = []
         self.selected_entity = None
-        for i in xrange(0,self.num_vertices-1):
-            line2_p1 = self.vertices[i]
-            line2_p2 = self.vertices[i+1]
-            ipt = comp_line_line_intersect(point1, point2, line2_p1, line2_p2)
-            if ipt:
-                intersect_indexes.append(i)
-                intersect_points.append(ipt)
-        #__for i in xrange(0,self.num_vertices)
+        self.intersect_index, self.intersect_point = self.intersect_segments(point1, point2)
 
         # Set the selected entity.
-        if len(intersect_points) != 0:
-            i,pt = get_closest_point(intersect_points, point1)
-            self.intersect_point = pt
-            self.intersect_index = intersect_indexes[i]
         self.select_entity()
         return (self.intersect_point != None)
 
+    def get_batch_items(self):
+        """ Get the batch items for the lines and their arrowheads. """
+        items = [ self.create_batch_item(VisBatchPrimitive.LINES, self.vertices) ]
+        if self.num_arrow_vertices: 
+            items.append(self.create_batch_item(VisBatchPrimitive.LINES, self.arrow_vertices))
+        return items
+
     def render(self):
         """ Render the lines. """
         if not self.visible:
@@ -483,6 +569,26 @@ class VisGeometryPath(VisGeometry):
             #__for i in xrange(0,len(self.bend_points)/2)
     #__def _create_geometry
 
+    def decimate(self, indexes):
+        """ Create a path geometry from a subset of the path vertices. 
+
+            Arguments:
+                indexes (List[int]): The indexes of the vertices to keep.
+
+            The new path shares the color of the path and does not display vertices or arrows. It is used as 
+            a coarse proxy for the path at a low level of detail.
+        """
+        points = self.vertices[indexes]
+        if self.colors:
+            colors = [self.colors[i] for i in indexes]
+        else:
+            colors = None
+        path = VisGeometryPath(self.name + ":lod", points, colors=colors)
+        path.color = self.color
+        path.line_width = self.line_width
+        path.transparent = self.transparent
+        return path
+
     def intersect_line(self, point1, point2):
         """ Intersect the geometry with a line. """ 
 
@@ -495,24 +601,26 @@ class VisGeometryPath(VisGeometry):
         intersect_points = []
 
         # Intersect lines.
-        for i in xrange(0,self.num_vertices-1):
-            line2_p1 = self.vertices[i]
-            line2_p2 = self.vertices[i+1]
-            ipt = comp_line_line_intersect(point1, point2, line2_p1, line2_p2)
-            if ipt:
-                intersect_indexes.append(i)
-                intersect_points.append(ipt)
-        #__for i in xrange(0,self.num_vertices)
-
-        # Intersect vertex spheres.
+        index,ipt = self.intersect_segments(point1, point2)
+        if ipt != None:
+            intersect_indexes.append(index)
+            intersect_points.append(ipt)
+
+        # Intersect vertex spheres. The spheres are selected using their centers. A sphere lies within the 
+        # bounding boxes of the segments it joins if its radius is less than the segment pick tolerance.
         num_ipt = len(intersect_points)
         self.sphere_selected = False
         if self.vertex_spheres:
-            for i,sphere in enumerate(self.vertex_spheres):
-                if sphere.intersect_line(point1, point2):
-                     intersect_indexes.append(i)
-                     intersect_points.append(sphere.center)
-            #__for i,sphere in enumerate(self.vertex_spheres)
+            if (self.num_vertices > 1) and (self.sphere_radius <= LINE_PICK_TOLERANCE):
+                indexes = self.query_pick_primitives(point1, point2)
+                indexes = np.unique(np.concatenate((indexes, indexes+1)))
+            else:
+                indexes = np.arange(self.num_vertices)
+            radii = np.full(len(indexes), self.sphere_radius)
+            t = intersect_line_spheres(point1, point2, self.vertices[indexes], radii)
+            for i in indexes[~np.isnan(t)]:
+                intersect_indexes.append(int(i))
+                intersect_points.append(list(self.vertices[i]))
         #__if self.vertex_spheres
 
         # Set the selected entity.
@@ -546,6 +654,31 @@ class VisGeometryPath(VisGeometry):
         #__if len(intersect_points) != 0
         return (self.intersect_point != None)
 
+    def get_batch_items(self):
+        """ Get the batch items for the path lines, bend points, arrows and spheres. """
+        items = [ self.create_batch_item(VisBatchPrimitive.LINES, self.vertices, 
+            indices=line_strip_indices(self.num_vertices), colors=self.colors) ]
+        if self.bend_points:
+            items.append(self.create_batch_item(VisBatchPrimitive.POINTS, self.bend_points[1:], size=3.0))
+            if self.colors:
+                arrow_colors = self.arrow_colors
+            else:
+                arrow_colors = None
+            items.append(self.create_batch_item(VisBatchPrimitive.LINES, self.arrow_vertices, size=2.0, 
+                colors=arrow_colors))
+        #__if self.bend_points
+
+        for sphere in self.vertex_spheres:
+            sphere.color = self.color 
+            items.extend(sphere.get_batch_items())
+        if self.start_marker:
+            if not self.start_sphere:
+                name = self.name + "_start"
+                self.start_sphere = VisGeometrySphere(name, self.vertices[0], self.start_marker_radius)
+            self.start_sphere.color = self.color
+            items.extend(self.start_sphere.get_batch_items())
+        return items
+
     def render(self):
         """ Render the path geometry.  """
 
@@ -697,22 +830,27 @@ class VisGeometrySphere(VisGeometry):
         self.radius = radius
         self.num_sides = num_sides 
 
+    def get_pick_bounds(self):
+        """ Get the bounding box of the sphere. """
+        center = np.array([self.center], dtype=float)
+        return center - self.radius, center + self.radius
+
     def intersect_line(self, point1, point2):
         """ Intersect the sphere with a line. """ 
-        x0 = point1[0]; y0 = point1[1]; z0 = point1[2]
-        v1 = [point1[i] - point2[i] for i in range(3)]
-        v2 = [point1[i] - self.center[i] for i in range(3)]
-        xd = v1[0]; yd = v1[1]; zd = v1[2];
-        xc = v2[0]; yc = v2[1]; zc = v2[2];
-        a = xd*xd + yd*yd + zd*zd
-        b = 2.0 * (xd*xc + yd*yc + zd*zc)
-        c = xc*xc + yc*yc + zc*zc - self.radius*self.radius
-        d = b*b - 4.0*a*c
-        if d < 0.0:
-            intersect = False
-        else:
-            intersect = True
-        return intersect 
+        self.intersect_index = None
+        self.intersect_point = None
+        t = intersect_line_spheres(point1, point2, np.array([self.center], dtype=float), np.array([self.radius]))
+        if np.isnan(t[0]):
+            return False
+        self.intersect_index = 0
+        self.intersect_point = [point1[i] + t[0]*(point2[i] - point1[i]) for i in range(3)]
+        return True
+
+    def get_batch_items(self):
+        """ Get the batch items for the sphere triangles. """
+        vertices, indices = get_sphere_template(self.num_sides)
+        return [ self.create_batch_item(VisBatchPrimitive.TRIANGLES, np.add(self.center, self.radius*vertices), 
+            indices=indices, normals=vertices, lighting=True) ]
 
     def render(self):
         """ Render the sphere. """
@@ -771,6 +909,11 @@ class VisGeometryCylinder(VisGeometry):
         self.capped = capped
         self._generate_cyl()
 
+    def get_pick_bounds(self):
+        """ Get the bounding box of the cylinder. """
+        points = np.array([self.point1, self.point2], dtype=float)
+        return np.min(points, axis=0)[None,:] - self.radius, np.max(points, axis=0)[None,:] + self.radius
+
     def intersect_line(self, point1, point2):
         """ Intersect the cylinder with a line. """ 
         if not self.visible:
@@ -793,104 +936,49 @@ class VisGeometryCylinder(VisGeometry):
                 point1 (List[Float]): The first endpoint defining the line . 
                 point2 (List[Float]): The second endpoint defining the line. 
 
-            Returns the intersection point. 
+            Returns the intersection point closest to point1, or None if the cylinder is not intersected. 
         """
-        ipt = None
-        c = self.point1
-        d = self.point2
-        v = [point2[i] - point1[i] for i in range(3)]
-        h = vector_norm(self.axis)
-        o = point1
-        oc = [o[i] - c[i] for i in range(3)]
-        odh = vector_dot(o, h)
-        vdh = vector_dot(v, h)
-        cdh = vector_dot(c, h)
-
-        # Check for intersection with caps.
-        cpt_in = False
-        tc1 = 1e6
-
-        if vdh != 0.0:
-            co = [c[i] - o[i] for i in range(3)]
-            codh = vector_dot(co, h)
-            tc1 = codh / vdh
-            cpt1 = [o[i] + tc1*v[i] for i in range(3)]
-            vec = [cpt1[i] - c[i] for i in range(3)]
-            vec_length = vector_mag(vec)
-
-            if vec_length <= self.radius:
-                cpt_in = True
-                tc = tc1
-                cpt = cpt1
-
-            do = [d[i] - o[i] for i in range(3)]
-            dodh = vector_dot(do, h)
-            tc2 = dodh / vdh
-            cpt2 = [o[i] + tc2*v[i] for i in range(3)]
-            vec = [cpt2[i] - d[i] for i in range(3)]
-            vec_length = vector_mag(vec)
-
-            if vec_length <= self.radius: 
-                if cpt_in: 
-                    if tc2 < tc1:
-                        tc = tc2
-                        cpt = cpt2
-                else:
-                    cpt_in = True
-                    tc = tc2
-                    cpt = cpt2
-        #__if vdh != 0.0
-
-        if cpt_in:
-            ipt = cpt
-
-        # Check intersection with sides. 
-        spt_in = False
-        f = [oc[i] - (odh - cdh)*h[i] for i in range(3)]
-        g = [v[i] - vdh*h[i] for i in range(3)]
-        c2 = 2*vector_dot(f,g)
-        c1 = vector_dot(g,g)
-        c3 = vector_dot(f,f) - self.radius*self.radius
-        desc = c2*c2 - 4.0*c1*c3
-
-        if desc < 0.0:
-            return ipt
-
-        t1 = (-c2 + sqrt(desc)) / (2*c1)
-        t2 = (-c2 - sqrt(desc)) / (2*c1)
-
-        if (t1 < 0.0) and (t2 < 0.0):
-            return ipt
-
-        k1 = odh + t1*vdh - cdh
-        k2 = odh + t2*vdh - cdh
-
-        if (k1 <= self.length) and (k1 >= 0.0):
-            t = t1
-            spt_in = True
-        else:
-            t1 = -1.0
-
-        if (k2 <= self.length) and (k2 >= 0.0):
-            t = t2
-            spt_in = True
-        else:
-            t2 = -1.0
+        t = intersect_line_cylinders(point1, point2, np.array([self.point1], dtype=float), 
+            np.array([self.unit_axis], dtype=float), np.array([self.length]), np.array([self.radius]), 
+            np.array([self.capped], dtype=bool))
+        if np.isnan(t[0]):
+            return None
+        return [point1[i] + t[0]*(point2[i] - point1[i]) for i in range(3)]
+    #__def intersect_cyl_line(self, point1, point2)
 
-        if (t1 != -1.0) and (t2 != -1.0):
-            if t1 < t2: 
-                t = t1
-            else:
-                t = t2
+    def get_batch_items(self):
+        """ Get the batch items for the cylinder side and cap triangles and its highlighted ends. 
 
-        if spt_in:
-            if cpt_in and (tc < t): 
-                ipt = cpt
+            The side triangles share the vertex normals. The cap triangle vertices are copied so that 
+            they can be given the cap normal. 
+        """
+        n = self.num_sides
+        cap1 = self.capped[0]
+        cap2 = self.capped[1]
+        num_side_conn = 3*(self.num_tri - (cap1+cap2)*n)
+        items = [ self.create_batch_item(VisBatchPrimitive.TRIANGLES, self.vertices, 
+            indices=self.tri_conn[:num_side_conn], normals=self.normals, lighting=True) ]
+
+        # The cap triangles alternate between the first and second caps. 
+        if cap1 or cap2:
+            cap_conn = self.tri_conn[num_side_conn:3*self.num_tri]
+            if cap1 and cap2:
+                signs = np.tile([-1.0, 1.0], n)
+            elif cap1:
+                signs = -np.ones(n)
             else:
-                ipt = [o[i] + t*v[i] for i in range(3)]
+                signs = np.ones(n)
+            normals = np.outer(np.repeat(signs, 3), self.axis)
+            items.append(self.create_batch_item(VisBatchPrimitive.TRIANGLES, self.vertices[cap_conn], 
+                normals=normals, lighting=True))
+        #__if cap1 or cap2
 
-        return ipt
-    #__def intersect_cyl_line(self, point1, point2)
+        if self.ends_highlight_color != None:
+            loop = line_strip_indices(n, closed=True)
+            items.append(self.create_batch_item(VisBatchPrimitive.LINES, self.vertices[:2*n], 
+                indices=np.concatenate((loop, loop+n)), color=self.ends_highlight_color, size=1.5))
+        return items
+    #__def get_batch_items(self)
 
     def render(self):
         """ Render the cylinder. """
@@ -1017,87 +1105,48 @@ class VisGeometryCylinder(VisGeometry):
         cap1 = self.capped[0]
         cap2 = self.capped[1]
         ncaps = cap1 + cap2
-        u = self.unit_axis
-        v,w = compute_basis(u)
         n = self.num_sides
-        dt = 2.0*pi / n
-        t = 0.0
         radius = self.radius 
         num_verts = 2*n + ncaps
         verts = np.zeros((num_verts, 3), dtype=float)
         vnorms = np.zeros((num_verts, 3), dtype=float)
 
         # Cylinder sides. 
-        for i in xrange(0,n):
-            ct = radius*cos(t)
-            st = radius*sin(t)
-            for j in xrange(0, 3):
-                verts[i][j]    = origin[j] + ct*v[j] + st*w[j] 
-                verts[i+n][j]  = origin[j] + ct*v[j] + st*w[j] + self.axis[j]
-                vnorms[i][j]   = ct*v[j] + st*w[j]
-                vnorms[i+n][j] = ct*v[j] + st*w[j]
-            #__for j in xrange(0, 3)__
-            t += dt
-        #__for i in xrange(0,n)__
+        v,w = compute_bases(np.array([self.unit_axis], dtype=float))
+        cos_t,sin_t = get_circle_template(n)
+        radial = radius*(np.outer(cos_t, v[0]) + np.outer(sin_t, w[0]))
+        verts[0:n] = np.add(origin, radial)
+        verts[n:2*n] = verts[0:n] + self.axis
+        vnorms[0:n] = radial
+        vnorms[n:2*n] = radial
 
         # Cylinder end caps.
         if cap1 and cap2:
             offset = 1
         else:
             offset = 0
-        for j in xrange(0, 3):
-            if cap1:
-                verts[2*n][j]    = origin[j] 
-                vnorms[2*n][j]   = -u[j];
-            if cap2:
-                vnorms[2*n+offset][j] = u[j];
-                verts[2*n+offset][j]  = origin[j] + self.axis[j]
-        #__for j in xrange(0, 3)
+        if cap1:
+            verts[2*n] = origin
+            vnorms[2*n] = np.negative(self.unit_axis)
+        if cap2:
+            verts[2*n+offset] = np.add(origin, self.axis)
+            vnorms[2*n+offset] = self.unit_axis
 
         # Create the side polygons connectivity.
-        num_tri = 2*n + n*ncaps
-        conn = np.zeros((3*num_tri), dtype=int)
-        num_tri = 0;
-        for i in xrange(0, n):
-            i1 = i
-            i2 = i+1
-            i3 = i+n
-            if (i2 == n):
-                i2 = 0
-            conn[3*num_tri+0] = i1
-            conn[3*num_tri+1] = i2
-            conn[3*num_tri+2] = i3
-            num_tri += 1
-            j1 = i2
-            j2 = i2+n
-            j3 = i3
-            conn[3*num_tri+0] = j1
-            conn[3*num_tri+1] = j2
-            conn[3*num_tri+2] = j3
-            num_tri += 1
-        #__for i in xrange(0, n)__
-
-        # Create the end caps polygons connectivity.
-        for i in xrange(0,n):
-            i1 = i+1 
-            i2 = i 
-            i3 = 2*n
-            if (i1 == n): i1 = 0
-            if cap1:
-                conn[3*num_tri+0] = i1
-                conn[3*num_tri+1] = i2
-                conn[3*num_tri+2] = i3
-                num_tri += 1
-            j2 = i+1+n 
-            j1 = i+n 
-            j3 = 2*n+offset
-            if (j2 == 2*n): j2 = n
-            if cap2:
-                conn[3*num_tri+0] = j1
-                conn[3*num_tri+1] = j2
-                conn[3*num_tri+2] = j3
-                num_tri += 1
-        #__for i in xrange(0,n)
+        i1 = np.arange(n)
+        i2 = (i1 + 1) % n
+        conn = [ np.column_stack((i1, i2, i1+n, i2, i2+n, i1+n)) ]
+
+        # Create the end caps polygons connectivity. The triangles of the two caps alternate.
+        caps_conn = []
+        if cap1:
+            caps_conn.append(np.column_stack((i2, i1, np.full(n, 2*n))))
+        if cap2:
+            caps_conn.append(np.column_stack((i1+n, i2+n, np.full(n, 2*n+offset))))
+        if caps_conn:
+            conn.append(np.hstack(caps_conn))
+        conn = np.concatenate([ c.ravel() for c in conn ])
+        num_tri = len(conn) / 3
 
         self.vertices = verts
         self.normals = vnorms
@@ -1105,6 +1154,254 @@ class VisGeometryCylinder(VisGeometry):
         self.tri_conn = conn
     #_generate_cyl(self)
 
+class VisGeometryCylinderSet(VisGeometry):
+    """ This class is used to display a set of cylinders. 
+
+        Attributes:
+            capped ((NumPy Nx2 ndarray[bool]): Flags for capping the ends of each cylinder.
+            instance_colors ((NumPy Nx4 ndarray[float]): The RGBA color of each cylinder. If None then all 
+                cylinders use the geometry color. 
+            lengths ((NumPy N ndarray[float]): The length of each cylinder.
+            normals ((NumPy Mx3 ndarray[float]): The cylinders vertex normals. 
+            num_instances (int): The number of cylinders. 
+            num_sides (int): The number of sides (polygons) used to represent each cylinder.
+            points1 ((NumPy Nx3 ndarray[float]): The first endpoint defining the axis of each cylinder. 
+            points2 ((NumPy Nx3 ndarray[float]): The second endpoint defining the axis of each cylinder. 
+            radii ((NumPy N ndarray[float]): The radius of each cylinder.
+            unit_axes ((NumPy Nx3 ndarray[float]): The normalized axis of each cylinder.
+
+        The vertices of all cylinders are generated together from a single cylinder template. Each cylinder 
+        is an entity of the geometry: the index of the selected cylinder is passed to the selected callback.
+    """ 
+    def __init__(self, name, radius, points1, points2, num_sides=20, capped=(True,True), colors=None):
+        """ Initialize a VisGeometryCylinderSet object. 
+
+            Arguments:
+                name (String): The geometry name.
+                radius (Float or List[Float]): The cylinder radius, or the radius of each cylinder.
+                points1 (List[List[Float]]): The first endpoint defining the axis of each cylinder. 
+                points2 (List[List[Float]]): The second endpoint defining the axis of each cylinder. 
+                num_sides (int): The number of sides (polygons) used to represent each cylinder.
+                capped (Tuple(bool,bool) or List[Tuple(bool,bool)]): Flags for capping the ends of the cylinders, 
+                    or of each cylinder.
+                colors (List[List[Float]]): The RGB or RGBA color of each cylinder.
+        """
+        VisGeometry.__init__(self, name)
+        self.points1 = np.array(points1, dtype=float).reshape((-1,3))
+        self.points2 = np.array(points2, dtype=float).reshape((-1,3))
+        self.num_instances = len(self.points1)
+        self.radii = np.broadcast_to(np.array(radius, dtype=float), (self.num_instances,)).copy()
+        self.capped = np.broadcast_to(np.array(capped, dtype=bool).reshape((-1,2)), (self.num_instances,2)).copy()
+        self.instance_colors = get_instance_colors_array(colors)
+        self.num_sides = num_sides
+        self.lengths = None
+        self.unit_axes = None
+        self.normals = None 
+        self._generate_cyls()
+
+    def _generate_cyls(self):
+        """ Generate the cylinders vertices and normals. 
+
+            The vertices of each cylinder are stored as the side vertices at each end followed by the 
+            vertices for each cap (copies of the end vertices and the cap center) so the caps can be 
+            given the axis as their normal.
+        """
+        n = self.num_sides
+        axes = self.points2 - self.points1
+        self.lengths = np.sqrt(np.sum(axes*axes, axis=1))
+        self.unit_axes = axes / np.where(self.lengths == 0.0, 1.0, self.lengths)[:,None]
+        v,w = compute_bases(self.unit_axes)
+        cos_t,sin_t = get_circle_template(n)
+        # The ring of unit normals around each axis: (N,n,3).
+        ring = cos_t[None,:,None]*v[:,None,:] + sin_t[None,:,None]*w[:,None,:]
+        start = self.points1[:,None,:] + self.radii[:,None,None]*ring
+        end = start + axes[:,None,:]
+        verts = np.concatenate((start, end, start, self.points1[:,None,:], end, self.points2[:,None,:]), axis=1)
+        unit_axes = np.repeat(self.unit_axes[:,None,:], n+1, axis=1)
+        vnorms = np.concatenate((ring, ring, -unit_axes, unit_axes), axis=1)
+        self.num_vertices = self.num_instances*(4*n+2)
+        self.vertices = verts.reshape((-1,3))
+        self.normals = vnorms.reshape((-1,3))
+        self.update_stats(0, len(self.vertices))
+
+    def get_instance_colors(self):
+        """ Get the color of each cylinder. """
+        if self.instance_colors is None:
+            return np.tile(np.array(self.color, dtype=float), (self.num_instances,1))
+        return self.instance_colors
+
+    def get_batch_items(self):
+        """ Get the batch items for the cylinders triangles. """
+        n = self.num_sides
+        vertices_per_cyl = 4*n + 2
+        offsets = vertices_per_cyl*np.arange(self.num_instances)
+        side_conn, cap1_conn, cap2_conn = get_cylinder_template(n)
+        conn = [ (offsets[:,None] + side_conn.ravel()).ravel(), 
+                 (offsets[self.capped[:,0],None] + cap1_conn.ravel()).ravel(), 
+                 (offsets[self.capped[:,1],None] + cap2_conn.ravel()).ravel() ]
+        colors = np.repeat(self.get_instance_colors(), vertices_per_cyl, axis=0)
+        return [ self.create_batch_item(VisBatchPrimitive.TRIANGLES, self.vertices, indices=np.concatenate(conn), 
+            normals=self.normals, colors=colors, lighting=True) ]
+
+    def get_pick_bounds(self):
+        """ Get the bounding box of each cylinder. """
+        radii = self.radii[:,None]
+        return np.minimum(self.points1, self.points2) - radii, np.maximum(self.points1, self.points2) + radii
+
+    def intersect_line(self, point1, point2):
+        """ Intersect the cylinders with a line. 
+
+            The intersection of the line with the sides and caps of the cylinders whose bounding boxes are crossed 
+            by the line is calculated using array operations and the cylinder with the intersection point closest 
+            to point1 is selected.
+        """ 
+        if not self.visible:
+            return False
+        self.intersect_index = None
+        self.intersect_point = None
+        indexes = self.query_pick_primitives(point1, point2)
+        t = intersect_line_cylinders(point1, point2, self.points1[indexes], self.unit_axes[indexes], 
+            self.lengths[indexes], self.radii[indexes], self.capped[indexes])
+        i = get_closest_intersection(t)
+        if i == None:
+            return False
+        self.intersect_index = int(indexes[i])
+        self.intersect_point = [point1[j] + t[i]*(point2[j] - point1[j]) for j in range(3)]
+        self.selected_entity = self.intersect_index
+        return True
+    #__def intersect_line(self, point1, point2)
+
+    def render(self):
+        """ Render the cylinders. """
+        if not self.visible:
+            return
+        for batch in pack_batches(self.get_batch_items()):
+            draw_batch(batch)
+        restore_draw_state()
+
+        # If a cylinder is selected then hightlight its bounding circles at its ends. 
+        if self.selected and (self.selected_entity != None):
+            n = self.num_sides
+            start = self.selected_entity*(4*n+2)
+            glDisable(GL_LIGHTING)
+            glColor4fv(self.highlight_color)
+            glLineWidth(2.0)
+            for i in xrange(0,2):
+                glBegin(GL_LINE_LOOP)
+                for j in xrange(start+i*n,start+(i+1)*n):
+                    glVertex3dv(self.vertices[j])
+                glEnd()
+            #__for i in xrange(0,2)
+            glEnable(GL_LIGHTING)
+    #__def render(self)
+
+#__class VisGeometryCylinderSet(VisGeometry)
+
+class VisGeometrySphereSet(VisGeometry):
+    """ This class is used to display a set of spheres. 
+
+        Attributes:
+            centers ((NumPy Nx3 ndarray[float]): The center of each sphere.
+            instance_colors ((NumPy Nx4 ndarray[float]): The RGBA color of each sphere. If None then all 
+                spheres use the geometry color. 
+            normals ((NumPy Mx3 ndarray[float]): The spheres vertex normals. 
+            num_instances (int): The number of spheres. 
+            num_sides (int): The number of sides (polygons) used to represent each sphere.
+            radii ((NumPy N ndarray[float]): The radius of each sphere.
+
+        The vertices of all spheres are generated together from a single sphere template. Each sphere 
+        is an entity of the geometry: the index of the selected sphere is passed to the selected callback.
+    """ 
+    def __init__(self, name, centers, radius, num_sides=20, colors=None):
+        """ Initialize a VisGeometrySphereSet object. 
+
+            Arguments:
+                name (String): The geometry name.
+                centers (List[List[Float]]): The center of each sphere.
+                radius (Float or List[Float]): The sphere radius, or the radius of each sphere.
+                num_sides (int): The number of sides (polygons) used to represent each sphere.
+                colors (List[List[Float]]): The RGB or RGBA color of each sphere.
+        """
+        VisGeometry.__init__(self, name)
+        self.centers = np.array(centers, dtype=float).reshape((-1,3))
+        self.num_instances = len(self.centers)
+        self.radii = np.broadcast_to(np.array(radius, dtype=float), (self.num_instances,)).copy()
+        self.instance_colors = get_instance_colors_array(colors)
+        self.num_sides = num_sides
+        self.normals = None 
+        self._generate_spheres()
+
+    def _generate_spheres(self):
+        """ Generate the spheres vertices and normals. """
+        template_verts, template_conn = get_sphere_template(self.num_sides)
+        verts = self.centers[:,None,:] + self.radii[:,None,None]*template_verts[None,:,:]
+        self.num_vertices = self.num_instances*len(template_verts)
+        self.vertices = verts.reshape((-1,3))
+        self.normals = np.tile(template_verts, (self.num_instances,1))
+        self.update_stats(0, len(self.vertices))
+
+    def get_instance_colors(self):
+        """ Get the color of each sphere. """
+        if self.instance_colors is None:
+            return np.tile(np.array(self.color, dtype=float), (self.num_instances,1))
+        return self.instance_colors
+
+    def get_batch_items(self):
+        """ Get the batch items for the spheres triangles. """
+        template_verts, template_conn = get_sphere_template(self.num_sides)
+        vertices_per_sphere = len(template_verts)
+        offsets = vertices_per_sphere*np.arange(self.num_instances)
+        conn = (offsets[:,None] + template_conn.ravel()).ravel()
+        colors = np.repeat(self.get_instance_colors(), vertices_per_sphere, axis=0)
+        return [ self.create_batch_item(VisBatchPrimitive.TRIANGLES, self.vertices, indices=conn, 
+            normals=self.normals, colors=colors, lighting=True) ]
+
+    def get_pick_bounds(self):
+        """ Get the bounding box of each sphere. """
+        radii = self.radii[:,None]
+        return self.centers - radii, self.centers + radii
+
+    def intersect_line(self, point1, point2):
+        """ Intersect the spheres with a line. 
+
+            The sphere with the intersection point closest to point1 is selected.
+        """ 
+        if not self.visible:
+            return False
+        self.intersect_index = None
+        self.intersect_point = None
+        indexes = self.query_pick_primitives(point1, point2)
+        t = intersect_line_spheres(point1, point2, self.centers[indexes], self.radii[indexes])
+        i = get_closest_intersection(t)
+        if i == None:
+            return False
+        self.intersect_index = int(indexes[i])
+        self.intersect_point = [point1[j] + t[i]*(point2[j] - point1[j]) for j in range(3)]
+        self.selected_entity = self.intersect_index
+        return True
+    #__def intersect_line(self, point1, point2)
+
+    def render(self):
+        """ Render the spheres. """
+        if not self.visible:
+            return
+        for batch in pack_batches(self.get_batch_items()):
+            draw_batch(batch)
+        restore_draw_state()
+
+        # Highlight the selected sphere.
+        if self.selected and (self.selected_entity != None):
+            glColor4fv(self.highlight_color)
+            glPushMatrix()
+            try:
+                glTranslatef(*self.centers[self.selected_entity])
+                glutSolidSphere(1.01*self.radii[self.selected_entity], self.num_sides, self.num_sides)
+            finally:
+                glPopMatrix()
+    #__def render(self)
+
+#__class VisGeometrySphereSet(VisGeometry)
+
 class VisGeometryAxes(VisGeometry):
     """ This class is used to display axes as three pairs of lines.
 
@@ -1161,20 +1458,16 @@ class VisGeometryAxes(VisGeometry):
         """ Intersect the geometry with a line. """ 
         if not self.visible:
             return False
-        self.intersect_index = None
-        self.intersect_point = None
         self.selected_entity = None
-        for i in xrange(0,self.num_vertices-1):
-            line2_p1 = self.vertices[i]
-            line2_p2 = self.vertices[i+1]
-            ipt = comp_line_line_intersect(point1, point2, line2_p1, line2_p2)
-            if ipt:
-                self.selected_entity = i/self.num_vp
-                self.intersect_index = i
-                self.intersect_point = ipt
-                return True
-        #__for i in xrange(0,self.num_vertices)
-        return False 
+        self.intersect_index, self.intersect_point = self.intersect_segments(point1, point2)
+        if self.intersect_point == None:
+            return False
+        self.selected_entity = self.intersect_index/self.num_vp
+        return True
+
+    def get_batch_items(self):
+        """ Get the batch items for the axes lines. """
+        return [ self.create_batch_item(VisBatchPrimitive.LINES, self.vertices) ]
 
     def render(self):
         """ Render the axes geometry. """
@@ -1219,83 +1512,82 @@ class VisGeometryPolygon(VisGeometry):
         VisGeometry.__init__(self, name)
         self.num_polygons = len(counts)
         self.num_vertices = len(points)
-        self.vertices = np.zeros((self.num_vertices, 3), dtype=float)
+        self.vertices = np.array(points, dtype=float).reshape((self.num_vertices,3))
         self.centers = np.zeros((self.num_polygons, 3), dtype=float)
         self.normals = np.zeros((self.num_polygons, 3), dtype=float)
-        self.counts = counts[:]
+        self.counts = list(counts)
+        if self.num_polygons == 0:
+            return
 
         # Calculate the center of each polygon. 
-        pindex = 0
-        for i,n in enumerate(counts):
-            cx = 0.0
-            cy = 0.0
-            cz = 0.0
-            for j in xrange(0,n):
-                self.vertices[pindex,:] = points[pindex]
-                cx += points[pindex][0]
-                cy += points[pindex][1]
-                cz += points[pindex][2]
-                pindex += 1
-            #__for point in points
-            self.centers[i] = [ cx/n, cy/n, cz/n ]
-        #__for i,n in enumerate(counts)
+        counts = np.array(self.counts, dtype=int)
+        starts = np.cumsum(counts) - counts
+        self.centers[:] = np.add.reduceat(self.vertices, starts, axis=0) / counts[:,None]
 
-        # Compute normals.
-        pindex = 0
-        verts = self.vertices
+        # Compute normals by summing the terms for each polygon edge from vertex j to the next vertex k.
         if reverse_normals:
             s = -1.0
         else:
             s = 1.0
-        for i,n in enumerate(self.counts):
-            nx = 0.0
-            ny = 0.0
-            nz = 0.0
-            for j in xrange(0,n):
-                if j == n-1:
-                    k = 0
-                else:
-                    k = j+1
-                nx += (verts[j+pindex][1] - verts[k+pindex][1]) * (verts[j+pindex][2] + verts[k+pindex][2])  
-                ny += (verts[j+pindex][2] - verts[k+pindex][2]) * (verts[j+pindex][0] + verts[k+pindex][0])  
-                nz += (verts[j+pindex][0] - verts[k+pindex][0]) * (verts[j+pindex][1] + verts[k+pindex][1])  
-            #__for j in xrange(0,n)
-            mag = sqrt(nx*nx + ny*ny + nz*nz)
-            self.normals[i] = [ s*nx/mag, s*ny/mag, s*nz/mag ]
-            pindex += n
-        #__for i,n in enumerate(counts)
+        next_indexes = np.arange(1, self.num_vertices+1)
+        next_indexes[starts+counts-1] = starts
+        vj = self.vertices
+        vk = self.vertices[next_indexes]
+        terms = np.empty((self.num_vertices,3), dtype=float)
+        terms[:,0] = (vj[:,1] - vk[:,1]) * (vj[:,2] + vk[:,2])
+        terms[:,1] = (vj[:,2] - vk[:,2]) * (vj[:,0] + vk[:,0])
+        terms[:,2] = (vj[:,0] - vk[:,0]) * (vj[:,1] + vk[:,1])
+        normals = np.add.reduceat(terms, starts, axis=0)
+        mags = np.sqrt(np.sum(normals*normals, axis=1))
+        self.normals[:] = s * normals / mags[:,None]
+
+    def get_triangles(self):
+        """ Get the triangles connecting each polygon edge to the polygon center. 
+
+            Returns the three vertices of the triangles as NumPy Nx3 arrays and the polygon index of each triangle.
+        """
+        counts = np.array(self.counts, dtype=int)
+        starts = np.cumsum(counts) - counts
+        poly = np.repeat(np.arange(self.num_polygons), counts)
+        edge = np.arange(self.num_vertices)
+        next_edge = starts[poly] + (edge - starts[poly] + 1) % counts[poly]
+        return self.vertices[edge], self.vertices[next_edge], self.centers[poly], poly
+
+    def get_pick_bounds(self):
+        """ Get the bounding box of each polygon triangle. """
+        verts1, verts2, verts3, poly = self.get_triangles()
+        return np.minimum(np.minimum(verts1, verts2), verts3), np.maximum(np.maximum(verts1, verts2), verts3)
 
     def intersect_line(self, point1, point2):
         """ Intersect polygons with a line. """ 
         self.intersect_index = None
         self.intersect_point = None
-        intersect_indexes = []
-        intersect_points = [] 
-        pindex = 0
-        for i,n in enumerate(self.counts):
-            normal = self.normals[i]
-            for j in xrange(0,n):
-                if j == n-1:
-                    k = 0
-                else:
-                    k = j+1
-                poly_pts = [self.vertices[j+pindex], self.vertices[k+pindex], self.centers[i] ]
-                ipt = comp_poly_line_intersect(normal, poly_pts, point1, point2)
-                if ipt: 
-                    intersect_indexes.append(i)
-                    intersect_points.append(ipt)
-            #__for j in xrange(0,n)
-            pindex += n
-        #__for i,n in enumerate(counts)
+        indexes = self.query_pick_primitives(point1, point2)
+        verts1, verts2, verts3, poly = self.get_triangles()
+        t = intersect_line_triangles(point1, point2, verts1[indexes], verts2[indexes], verts3[indexes])
 
         # Set the selected entity.
-        if len(intersect_points) != 0:
-            i,pt = get_closest_point(intersect_points, point1)
-            self.intersect_point = pt
-            self.intersect_index = intersect_indexes[i]
+        i = get_closest_intersection(t)
+        if i != None:
+            self.intersect_point = [point1[j] + t[i]*(point2[j] - point1[j]) for j in range(3)]
+            self.intersect_index = int(poly[indexes[i]])
             self.select_entity()
         return (self.intersect_point != None)
 
+    def get_batch_items(self):
+        """ Get the batch items for the polygons. 
+
+            Each polygon is rendered as a fan of triangles connecting its edges to its center. 
+        """
+        verts1, verts2, verts3, poly = self.get_triangles()
+        vertices = np.empty((self.num_vertices,3,3), dtype=float)
+        vertices[:,0,:] = verts1
+        vertices[:,1,:] = verts2
+        vertices[:,2,:] = verts3
+        normals = np.repeat(self.normals[poly], 3, axis=0)
+        return [ self.create_batch_item(VisBatchPrimitive.TRIANGLES, vertices, normals=normals, lighting=True,
+            cull_face=False) ]
+
     def render(self):
         """ Render the polygons. """
         if not self.visible:
@@ -1432,20 +1724,16 @@ class VisGeometrySymbols(VisGeometry):
         """ Intersect the geometry with a line. """ 
         if not self.visible:
             return False
-        self.intersect_index = None
-        self.intersect_point = None
         self.selected_entity = None
-        for i in xrange(0,self.num_vertices-1):
-            line2_p1 = self.vertices[i]
-            line2_p2 = self.vertices[i+1]
-            ipt = comp_line_line_intersect(point1, point2, line2_p1, line2_p2)
-            if ipt:
-                self.selected_entity = i/self.num_vp
-                self.intersect_index = i
-                self.intersect_point = ipt
-                return True
-        #__for i in xrange(0,self.num_vertices)
-        return False 
+        self.intersect_index, self.intersect_point = self.intersect_segments(point1, point2)
+        if self.intersect_point == None:
+            return False
+        self.selected_entity = self.intersect_index/self.num_vp
+        return True
+
+    def get_batch_items(self):
+        """ Get the batch items for the symbol lines. """
+        return [ self.create_batch_item(VisBatchPrimitive.LINES, self.vertices) ]
 
     def render(self):
         """ Render the axes geometry. """
@@ -1499,6 +1787,11 @@ class VisGeometryCircle(VisGeometry):
         self.num_sides = num_sides
         self._generate_circle()
 
+    def get_pick_bounds(self):
+        """ Get the bounding box of the circle. """
+        center = np.array([self.center], dtype=float)
+        return center - self.radius, center + self.radius
+
     def intersect_line(self, point1, point2):
         """ Intersect the circle with a line. """ 
         ipt = None
@@ -1547,6 +1840,11 @@ class VisGeometryCircle(VisGeometry):
 
         return (ipt != None)
 
+    def get_batch_items(self):
+        """ Get the batch items for the circle lines. """
+        return [ self.create_batch_item(VisBatchPrimitive.LINES, self.vertices, 
+            indices=line_strip_indices(self.num_vertices)) ]
+
     def render(self):
         """ Render the circle. """
         if not self.visible:
@@ -1637,16 +1935,13 @@ class VisGeometryNumber(VisGeometry):
 
     def intersect_line(self, point1, point2):
         """ Intersect the number with a line. """ 
-        for i in xrange(0,self.num_vertices-1):
-            pt1 = self.vertices[i]
-            pt2 = self.vertices[i+1]
-            ipt = comp_line_line_intersect(pt1, pt2, point1, point2)
-            if ipt:
-                self.intersect_index = i
-                self.intersect_point = ipt
-        #__for i in xrange(0,self.num_vertices)
+        self.intersect_index, self.intersect_point = self.intersect_segments(point1, point2)
         return (self.intersect_point != None)
 
+    def get_batch_items(self):
+        """ Get the batch items for the number lines. """
+        return [ self.create_batch_item(VisBatchPrimitive.LINES, self.vertices) ]
+
     def render(self):
         """ Render the number. """
         if not self.visible:
@@ -1742,6 +2037,61 @@ def draw_cross(point,width=0.08,color=[1.0,0.8,0.8,1.0],line_width=2.0):
     glVertex3dv(pt2)
     glEnd()
 
+def draw_batch(batch):
+    """ Draw a VisRenderBatch using vertex arrays. """
+    primitive_modes = { VisBatchPrimitive.POINTS : GL_POINTS,
+                        VisBatchPrimitive.LINES : GL_LINES,
+                        VisBatchPrimitive.TRIANGLES : GL_TRIANGLES }
+    if batch.lighting:
+        glEnable(GL_LIGHTING)
+    else:
+        glDisable(GL_LIGHTING)
+    if batch.cull_face:
+        glEnable(GL_CULL_FACE)
+    else:
+        glDisable(GL_CULL_FACE)
+    if batch.primitive == VisBatchPrimitive.POINTS:
+        glPointSize(batch.size)
+    else:
+        glLineWidth(batch.size)
+
+    glEnableClientState(GL_VERTEX_ARRAY)
+    glEnableClientState(GL_COLOR_ARRAY)
+    glVertexPointer(3, GL_FLOAT, 0, batch.vertices)
+    glColorPointer(4, GL_FLOAT, 0, batch.colors)
+    if batch.normals is not None:
+        glEnableClientState(GL_NORMAL_ARRAY)
+        glNormalPointer(GL_FLOAT, 0, batch.normals)
+    try:
+        glDrawElements(primitive_modes[batch.primitive], len(batch.indices), GL_UNSIGNED_INT, batch.indices)
+    finally:
+        glDisableClientState(GL_NORMAL_ARRAY)
+        glDisableClientState(GL_COLOR_ARRAY)
+        glDisableClientState(GL_VERTEX_ARRAY)
+#__def draw_batch(batch)
+
+def restore_draw_state():
+    """ Restore the rendering state set by VisGraphics.init_view() that is changed by draw_batch(). """
+    glEnable(GL_LIGHTING)
+    glEnable(GL_CULL_FACE)
+    glLineWidth(1.0)
+    glPointSize(1.0)
+
+def get_instance_colors_array(colors):
+    """ Get the array of RGBA colors for the instances of a geometry set. 
+
+        Arguments:
+            colors (List[List[Float]]): The list of RGB or RGBA colors. RGB colors are given an alpha of 1.0.
+
+        Returns a NumPy Nx4 array of colors or None if colors is None.
+    """
+    if colors is None:
+        return None
+    colors = np.array(colors, dtype=float)
+    if (colors.ndim == 2) and (colors.shape[1] == 3):
+        colors = np.column_stack((colors, np.ones(len(colors))))
+    return colors.reshape((-1,4))
+
 def get_closest_point(points, point):
     """ Get the closest point in an array of points to the given point. """
     if len(points) == 1:
@@ -1760,6 +2110,62 @@ def get_closest_point(points, point):
     #__for i,pt in enumerate(points)
     return min_i, min_pt
 
+#----------------------------------------------------#
+#---------------- template functions ----------------#
+#----------------------------------------------------#
+
+# The templates for each number of sides.
+_circle_templates = {}
+_cylinder_templates = {}
+_sphere_templates = {}
+
+def get_circle_template(num_sides):
+    """ Get the cosines and sines of the angles of num_sides points equally spaced around a circle. """
+    if num_sides not in _circle_templates:
+        t = 2.0*pi*np.arange(num_sides) / num_sides
+        _circle_templates[num_sides] = (np.cos(t), np.sin(t))
+    return _circle_templates[num_sides]
+
+def get_cylinder_template(num_sides):
+    """ Get the triangle connectivity for a cylinder generated by VisGeometryCylinderSet. 
+
+        Returns the (2*num_sides)x3 side, and the num_sidesx3 first and second cap, arrays of vertex indices. 
+    """
+    if num_sides not in _cylinder_templates:
+        n = num_sides
+        i1 = np.arange(n)
+        i2 = (i1 + 1) % n
+        side_conn = np.column_stack((i1, i2, i1+n, i2, i2+n, i1+n)).reshape((-1,3))
+        cap1_conn = np.column_stack((i2+2*n, i1+2*n, np.full(n, 3*n)))
+        cap2_conn = np.column_stack((i1+3*n+1, i2+3*n+1, np.full(n, 4*n+1)))
+        _cylinder_templates[num_sides] = (side_conn, cap1_conn, cap2_conn)
+    return _cylinder_templates[num_sides]
+
+def get_sphere_template(num_sides):
+    """ Get the vertices and triangle connectivity for a unit sphere. 
+
+        The sphere is divided into num_sides slices around the z axis and num_sides stacks along the z axis. 
+        Returns the unit sphere vertices, which are also its normals, and the Mx3 array of vertex indices. 
+    """
+    if num_sides not in _sphere_templates:
+        n = num_sides
+        cos_p,sin_p = get_circle_template(n)
+        theta = pi*np.arange(n+1) / n
+        verts = np.empty((n+1,n,3), dtype=float)
+        verts[:,:,0] = np.outer(np.sin(theta), cos_p)
+        verts[:,:,1] = np.outer(np.sin(theta), sin_p)
+        verts[:,:,2] = np.cos(theta)[:,None]
+        stack = np.arange(n)[:,None]
+        i1 = np.arange(n)[None,:]
+        i2 = (i1 + 1) % n
+        v11 = stack*n + i1
+        v12 = stack*n + i2
+        v21 = v11 + n
+        v22 = v12 + n
+        conn = np.stack((v11, v21, v12, v21, v22, v12), axis=-1).reshape((-1,3))
+        _sphere_templates[num_sides] = (verts.reshape((-1,3)), conn)
+    return _sphere_templates[num_sides]
+
 #----------------------------------------------------#
 #----------------- vector functions -----------------#
 #----------------------------------------------------#
@@ -1789,6 +2195,26 @@ def compute_basis(normal):
           v[i] = v[i] / mag
     return u,v
 
+def compute_bases(normals):
+    """ Compute the orthonormal bases for an array of unit vectors. 
+
+        This computes the same basis vectors as compute_basis() using array operations. 
+
+        Arguments:
+            normals (NumPy Nx3 ndarray[float]): The unit vectors.
+
+        Returns the two NumPy Nx3 arrays of basis vectors.
+    """
+    u = np.zeros(normals.shape, dtype=float)
+    u[:,0] = -normals[:,1]
+    u[:,1] =  normals[:,0]
+    u[(u[:,0] == 0.0) & (u[:,1] == 0.0), 0] = 1.0
+    u /= np.sqrt(np.sum(u*u, axis=1))[:,None]
+    v = np.cross(normals, u)
+    mag = np.sqrt(np.sum(v*v, axis=1))
+    v /= np.where(mag == 0.0, 1.0, mag)[:,None]
+    return u,v
+
 def cross_product(u, v):
     return [u[1]*v[2]-u[2]*v[1], u[2]*v[0]-u[0]*v[2], u[0]*v[1]-u[1]*v[0]]
 
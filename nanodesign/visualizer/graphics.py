@@ -23,18 +23,45 @@ by visualization.
     that are rendered in a scene. The actual drawing of graphics primitives is
     performed in the geometry.py module.
 
-    Note that the OpenGL per-vertex operations (e.g. glColor, glNormal,
-    glVertex) used here are now deprecated and that for large models rendering
-    will be slow.
+    Geometry is rendered in batches to speed up rendering large models. The
+    batch items of the visible geometry are packed into vertex, normal, color
+    and index arrays by primitive type and material (see batch.py) and each
+    batch is drawn using a single glDrawElements call. The packed batches are
+    reused until the geometry added, its visibility, selection or material
+    changes. Selected geometry and geometry that does not provide batch items
+    is rendered by the geometry object itself.
+
+    Picking does not render the scene. A VisBvh bounding volume hierarchy is
+    built over the bounding boxes of the visible geometry and queried with the
+    3D pick line to find the geometry that it may intersect. The geometry then
+    intersects the line with its own primitives (see bvh.py).
+
+    Geometry with a coarse level of detail proxy (e.g. the base coordinates of
+    a helix) is rendered using the proxy when its detail is smaller than a few
+    pixels at the current zoom scaling (see lod.py). The batches are packed
+    again only when the level of detail selected for a geometry changes.
+
+    A model can be loaded while the graphics window is displayed (see
+    loader.py). Geometry created on the loading thread is put on a
+    thread-safe render queue that is drained into the render list by the
+    GLUT idle callback so that the scene fills in as the model is loaded.
 
 """
 import copy
+import logging
 from math import ceil, sqrt
 import os
+import Queue
 import sys
 import random
 from .menu import VisMenu 
 from .extent import VisExtent
+from .batch import pack_batches
+from .bvh import VisBvh
+from .lod import LOD_MIN_PIXELS, get_pixels_per_unit, select_lod_geometry
+from .raster import get_view_bounds
+from .temperature import map_values_to_colors
+from .geometry import draw_batch, restore_draw_state
 
 try:
     from OpenGL.GL import *
@@ -101,7 +128,6 @@ class VisGraphicsPick(object):
     """ This class stores the picking data for the graphics scene. 
 
         Attributes:
-            active (bool): If true then we are perfominf a pick. 
             color (List[Float]): The list of 4 (RGBA) color values used to display the pick line. 
             line_width (Float): The width used to display the pick line. 
             point1 (List[Float]): The first point defining the pick line.
@@ -114,7 +140,6 @@ class VisGraphicsPick(object):
         coordinates is then transformed into a 3D line that is then used to intersect the geometry in the scene.
     """
     def __init__(self):
-        self.active = False
         self.show_pick_line = False
         self.point1 = []
         self.point2 = []
@@ -183,9 +208,27 @@ class VisGraphics(object):
             height (int): The height of the graphics window.
             initial_xform (VisGraphicsXform): The transformation object storing the initial graphics scene rotation, 
                 translation and scaling.
+            loading (bool): If true then the model is being loaded by a VisModelLoader. Geometry added or removed
+                is put on render_queue and displaying the scene is left to the loader.
+            lod_enabled (bool): If true then render geometry using coarse proxies when its detail is too small to be 
+                seen.
+            lod_min_pixels (Float): The projected size in pixels of the detail of a geometry below which its proxy 
+                is rendered.
             menu (VisMenu): The menu object that manages the popup menu.
+            offscreen (bool): If true then the scene is rendered offscreen by a VisOffscreenRenderer and no graphics
+                window is used.
             pick (VisGraphicsPick): The pick object storing pick information.
+            pick_bvh (VisBvh): The bounding volume hierarchy of the bounding boxes of pick_geometry.
+            pick_bvh_state (Tuple): The ids of the visible geometry used to build pick_bvh.
+            pick_geometry (List[VisGeometry]): The list of visible geometry with bounds stored in pick_bvh.
+            unbounded_pick_geometry (List[VisGeometry]): The list of visible geometry without bounds, always 
+                intersected with the pick line.
+            render_batches (List[VisRenderBatch]): The list of packed geometry batches to render.
+            render_batches_state (Tuple): The state of the geometry used to pack render_batches. 
             render_geometry (Dict[VisGeometry]): The list of geometry to render.
+            render_queue (Queue): The thread-safe queue of (geometry,add) pairs of geometry added to or removed from 
+                the render list while the model is loading.
+            unbatched_geometry (List[VisGeometry]): The list of geometry rendered individually.
             title (String): The title of the graphics window.
             width (int): The width of the graphics window.
             xform (VisGraphicsXform): The transformation object storing the graphics scene rotation, translation and scaling.
@@ -217,6 +260,18 @@ class VisGraphics(object):
         self.spectrum_colors = None
         self.menu = None 
         self.render_geometry = {}
+        self.render_batches = []
+        self.render_batches_state = None
+        self.unbatched_geometry = []
+        self.pick_bvh = None
+        self.pick_bvh_state = None
+        self.pick_geometry = []
+        self.unbounded_pick_geometry = []
+        self.lod_enabled = True
+        self.lod_min_pixels = LOD_MIN_PIXELS
+        self.offscreen = False
+        self.loading = False
+        self.render_queue = Queue.Queue()
         self._logger = logging.getLogger(__name__)
 
     def start_interactive(self):
@@ -249,7 +304,7 @@ class VisGraphics(object):
         self.xform.translate_z = cz - point[2] 
         self.xform.scale = 10.0
         self.command.generate_graphics_cmd("center", point)
-        glutPostRedisplay()
+        self.post_redisplay()
 
     def center_on_pick(self):
         """ Set the center of rotation from a picked point. """
@@ -301,8 +356,58 @@ class VisGraphics(object):
         glutSpecialFunc(self.special_function)
 
     def add_render_geometry(self, geometry):
-        """ Add a geometry to the render list. """
+        """ Add a geometry to the render list. 
+
+            While the model is loading the geometry is put on the render queue and is added to the render list 
+            when the queue is drained.
+        """
+        if self.loading:
+            self.render_queue.put((geometry,True))
+            return
         self.render_geometry[geometry.id] = geometry
+        self.invalidate_batches()
+
+    def remove_render_geometry(self, geometry):
+        """ Remove a geometry from the render list. """
+        if self.loading:
+            self.render_queue.put((geometry,False))
+            return
+        self.render_geometry.pop(geometry.id, None)
+        if geometry.visible:
+            self.invalidate_batches()
+
+    def drain_render_queue(self):
+        """ Add or remove the geometry put on the render queue while the model is loading. 
+
+            This must be called on the thread running the graphics loop. Returns the number of geometry added
+            or removed.
+        """
+        count = 0
+        while True:
+            try:
+                geometry, add = self.render_queue.get_nowait()
+            except Queue.Empty:
+                break
+            if add:
+                self.render_geometry[geometry.id] = geometry
+            else:
+                self.render_geometry.pop(geometry.id, None)
+            count += 1
+        #__while True
+        if count:
+            self.invalidate_batches()
+        return count
+
+    def invalidate_batches(self):
+        """ Force geometry batches to be packed again the next time the scene is rendered. 
+
+            This must be called if the vertices of a geometry already added to the render list are changed.
+            The bounding volume hierarchies used for picking are also built again.
+        """
+        self.render_batches_state = None
+        self.pick_bvh_state = None
+        for geom in self.render_geometry.values():
+            geom.bvh = None
 
     def passive_motion(self, x, y):
         """ Process a passive mouse motion event. """
@@ -413,34 +518,9 @@ class VisGraphics(object):
         # defining a line passing through the screen point.
         self.unproject_point(x, y)
 
-        # Determine the geometry in the selected area by re-rendering it.
-        glSelectBuffer(1000)
-        glRenderMode(GL_SELECT)
-        glInitNames()
-        glPushName(0)
-        self.pick.active = True
-        self.display()
-
-        # Process the list of geometry IDs determined at the picked point. 
-        hit_buffer = glRenderMode(GL_RENDER)
-        self._logger.debug("Hit record buffer size %d" % len(hit_buffer)) 
-        num_hits = len(hit_buffer)
-        picked_geoms = []
-        for i,hit_record in enumerate(hit_buffer):
-            min_depth, max_depth, names = hit_record
-            self._logger.debug("Hit record min_depth %g max_depth %g   names %s" % (min_depth, max_depth, names)) 
-            for id in names:
-                if id in self.render_geometry:
-                    geom = self.render_geometry[id]
-                    picked_geoms.append(geom)
-                    if geom.name:
-                        name = geom.name
-                    else:
-                        name = " "
-                    self._logger.debug("Selected geom id %s name %s " % (id, name))
-            #__for id in names
-        #__for hit_record in buffer:
-        self.pick.active = False
+        # Determine the geometry whose bounds are crossed by the line. 
+        picked_geoms = self.query_pick_geometry(self.pick.point1, self.pick.point2)
+        self._logger.debug("Number of geometries crossed by the pick line %d" % len(picked_geoms))
 
         # Determine the intersection of the 3D line defined by the 
         # pick with the selected geometry.
@@ -483,6 +563,39 @@ class VisGraphics(object):
         # Re-display the scene.
         self.display()
 
+    def build_pick_bvh(self):
+        """ Build the bounding volume hierarchy of the bounding boxes of the visible geometry. """
+        self.pick_geometry = []
+        self.unbounded_pick_geometry = []
+        mins = []
+        maxs = []
+        for geom in self.render_geometry.values():
+            if not geom.visible:
+                continue
+            bounds = geom.get_bounds()
+            if bounds == None:
+                self.unbounded_pick_geometry.append(geom)
+                continue
+            self.pick_geometry.append(geom)
+            mins.append(bounds[0])
+            maxs.append(bounds[1])
+        #__for geom in self.render_geometry.values()
+        self.pick_bvh = VisBvh(mins, maxs, leaf_size=4)
+        self._logger.debug("Built pick hierarchy for %d geometries." % len(self.pick_geometry))
+
+    def query_pick_geometry(self, point1, point2):
+        """ Get the visible geometry whose bounds are crossed by a line. 
+
+            The hierarchy of geometry bounds is built again only if the visible geometry has changed since it 
+            was last built.
+        """
+        state = tuple(geom.id for geom in self.render_geometry.values() if geom.visible)
+        if state != self.pick_bvh_state:
+            self.build_pick_bvh()
+            self.pick_bvh_state = state
+        indexes = self.pick_bvh.query_line(point1, point2)
+        return [self.pick_geometry[i] for i in sorted(indexes)] + self.unbounded_pick_geometry
+
     def unproject_point(self, sx, sy):
         """ Unproject a screen point. 
 
@@ -533,7 +646,15 @@ class VisGraphics(object):
         self.center[0] = cx
         self.center[1] = cy
         self.center[2] = cz
-        glutPostRedisplay()
+        self.post_redisplay()
+
+    def post_redisplay(self):
+        """ Request that the graphics window be displayed again. 
+
+            This does nothing when rendering offscreen or while the model is loading.
+        """
+        if not (self.offscreen or self.loading):
+            glutPostRedisplay()
 
     def reshape(self, width, height):
         """ Process a window reshape event. """
@@ -543,11 +664,20 @@ class VisGraphics(object):
         # For the first reshape update the menu with selections from commands.
         # This is needed to make sure that the menus are fully initialized
         # and can then be modified. A flag in the 'menu' object makes sure
-        # the update is done only once.
-        self.menu.update()
+        # the update is done only once. The menu is not created until a 
+        # model being loaded has finished loading.
+        if self.menu:
+            self.menu.update()
 
     def display(self):
-        """ Display the geometry defined for the graphics scene. """
+        """ Display the geometry defined for the graphics scene. 
+
+            This does nothing when rendering offscreen; the scene is rendered by a VisOffscreenRenderer instead.
+            This also does nothing while the model is loading; the scene is displayed by the VisModelLoader
+            when geometry is added.
+        """
+        if self.offscreen or self.loading:
+            return
         self.set_viewport(self.width, self.height)
         self.render()
 
@@ -558,48 +688,17 @@ class VisGraphics(object):
         # Set up viewing transformation.
         glMatrixMode(GL_PROJECTION)
         glLoadIdentity()
-        xmin,xmax,ymin,ymax,zmin,zmax = self.extent.get_bounds()
-        cx, cy, cz = self.extent.get_center()
-        dx, dy, dz = self.extent.get_widths()
-
-        if (dx > dy):
-            max_dim = dx
-        else:
-            max_dim = dy
-        if (dz > max_dim):
-            max_dim = dz
-
-        sx = 1.0
-        sy = 1.0
-
-        if (width <= height):
-            sy = float(height) / float(width)
-            dy = dx * sy
-            ymin = cy - dy / 2.0;
-            ymax = cy + dy / 2.0;
-        else:
-            sx = float(width) / float(height)
-            dx = dy * sx
-            xmin = cx - dx / 2.0;
-            xmax = cx + dx / 2.0;
-
-        oxmin = cx - sx*max_dim;
-        oxmax = cx + sx*max_dim;
-        oymin = cy - sy*max_dim;
-        oymax = cy + sy*max_dim;
-        ozmin = cz - 100.0*max_dim;
-        ozmax = cz + 100.0*max_dim;
-
-        # If picking is active then set the picking matrix to define a picking window.
-        if self.pick.active: 
-            viewport = glGetIntegerv(GL_VIEWPORT)
-            gluPickMatrix(float(self.current_x), float(viewport[3]-self.current_y), 5.0, 5.0, viewport)
-
+        oxmin,oxmax,oymin,oymax,ozmin,ozmax = get_view_bounds(self.extent, width, height)
         glOrtho(oxmin, oxmax, oymin, oymax, ozmin, ozmax)
         glMatrixMode(GL_MODELVIEW)
 
     def render(self):
-        """ Render the geometry defined for the graphics scene. """
+        """ Render the geometry defined for the graphics scene into the graphics window. """
+        self.render_scene()
+        glutSwapBuffers()
+
+    def render_scene(self):
+        """ Render the geometry defined for the graphics scene into the current OpenGL context. """
         # Clear frame buffer and depth buffer
         glClear(GL_COLOR_BUFFER_BIT | GL_DEPTH_BUFFER_BIT)
         #glClearColor(0.40, 0.60, 0.80, 1.0)
@@ -621,33 +720,82 @@ class VisGraphics(object):
         glScalef(self.xform.scale, self.xform.scale, self.xform.scale)
         glTranslatef(-cx, -cy, -cz);
 
+        # Render geometry. 
+        self.render_batched_geometry()
+        glFlush()
+
+        # Render picked point.
+        self.pick.render()
+        glPopMatrix();
+
+    def select_lod_geometry(self, geometry):
+        """ Select the geometry and proxies to render at the level of detail of the current zoom scaling. 
+
+            Returns the list of geometry to render and the list of the level of detail selected for each geometry.
+        """
+        if not self.lod_enabled:
+            return geometry, [None]*len(geometry)
+        pixels_per_unit = get_pixels_per_unit(self.extent, self.xform.scale, self.width, self.height)
+        return select_lod_geometry(geometry, pixels_per_unit, self.lod_min_pixels)
+
+    def get_batches_state(self, geometry, lod_levels):
+        """ Get the state of the geometry that determines how it is packed into batches. """
+        state = []
+        for geom,level in zip(geometry, lod_levels):
+            state.append((geom.id, level, geom.selected, geom.transparent, geom.line_width, tuple(geom.color)))
+        #__for geom,level in zip(geometry, lod_levels)
+        return tuple(state)
+
+    def pack_render_batches(self, geometry):
+        """ Pack the batch items of the geometry into batches. """
+        items = []
+        self.unbatched_geometry = []
+        for geom in geometry:
+            geom_items = None
+            if not geom.selected:
+                geom_items = geom.get_batch_items()
+            if geom_items == None:
+                self.unbatched_geometry.append(geom)
+            else:
+                items.extend(geom_items)
+        #__for geom in geometry
+        self.render_batches = pack_batches(items)
+        self._logger.debug("Packed %d batch items into %d batches." % (len(items), len(self.render_batches)))
+
+    def update_render_batches(self):
+        """ Update the batches of the visible geometry. 
+
+            The batches are packed again only if the state of the geometry or the level of detail selected for it 
+            has changed since they were last packed.
+        """
+        geometry = [geom for geom in self.render_geometry.values() if geom.visible]
+        lod_geometry, lod_levels = self.select_lod_geometry(geometry)
+        state = self.get_batches_state(geometry, lod_levels)
+        if state != self.render_batches_state:
+            self.pack_render_batches(lod_geometry)
+            self.render_batches_state = state
+
+    def render_batched_geometry(self):
+        """ Render the geometry using batches. """
+        self.update_render_batches()
+
         # Render opaque geometry.
-        pick_id = 1
-        for geom in self.render_geometry.values():
+        for batch in self.render_batches:
+            if not batch.transparent:
+                draw_batch(batch)
+        restore_draw_state()
+        for geom in self.unbatched_geometry:
             if not geom.transparent:
-                if self.pick.active:
-                    glLoadName(geom.id)
                 geom.render()
-                pick_id += 1
-        #__for geom in self.render_geometry.values()
 
         # Render transparent geometry.
-        for geom in self.render_geometry.values():
+        for batch in self.render_batches:
+            if batch.transparent:
+                draw_batch(batch)
+        restore_draw_state()
+        for geom in self.unbatched_geometry:
             if geom.transparent:
-                if self.pick.active:
-                    glLoadName(geom.id)
                 geom.render()
-                pick_id += 1
-        #__for geom in self.render_geometry.values()
-
-        glFlush()
-
-        # Render picked point.
-        self.pick.render()
-        glPopMatrix();
-
-        if not self.pick.active: 
-            glutSwapBuffers()
 
     def init_view(self):
         """ Initialize lighting and rendering parameters. """
@@ -685,19 +833,8 @@ class VisGraphics(object):
     #__def init_view
 
     def map_value_to_color(self, colors, vmin, vmax, value):
-        num_colors = len(colors)
-        dv = vmax - vmin
-        if dv != 0.0: 
-            f = (num_colors-1) / dv
-            ci = int(f*(value - vmin))
-            if ci < 0: ci = 0
-            if ci > num_colors-1: ci = num_colors-1
-            color = colors[ci]
-        else:
-            color = colors[0]
-        #__if dv != 0.0
-
-        return color[:]
+        """ Map a value to a color. Use map_values_to_colors() to map arrays of values. """
+        return map_values_to_colors(colors, vmin, vmax, [value])[0].tolist()
     #__def get_color_map
 
     def get_spectrum_colors(self):
@@ -37,6 +37,10 @@
             connected by lines.
     strands - The strands passing through the helix are displayed as a
               continuous line with arrows.
+
+    When the helix is viewed zoomed out the coordinates, frames and nodes
+    representations are rendered as a single cylinder along the helix axis
+    and the strands representation as lines between domain end points.
 """
 from itertools import chain
 import logging
@@ -44,7 +48,8 @@ import os
 import sys
 import numpy as np
 from ..data.parameters import DnaPolarity
-from .geometry import VisGeometryCylinder,VisGeometryPath,VisGeometryAxes,VisGeometryLines,VisGeometrySymbols,vector_norm
+from .geometry import VisGeometryCylinder,VisGeometryCylinderSet,VisGeometryPath,VisGeometryAxes,VisGeometryLines,VisGeometrySymbols,vector_norm
+from .lod import get_domain_end_indexes
 from .strand import VisStrand
 
 class VisHelixRepType:
@@ -70,8 +75,12 @@ class VisHelix(object):
             dna_structure (DnaStructure): The dna structure derived from a DNA design.
             graphics (VisGraphics): The VisGraphics object.
             id (int): The helix id. This is currently set to the caDNAno vhelix number.
+            lod_cylinder (VisGeometryCylinder): The cylinder rendered in place of the per-base geometry of the 
+                helix at a low level of detail.
             name (String): The string representation of the helix id.
             representations (Dict[List[VisGeometry]): The dictionary storing the list of geometry for a representation.
+            rep_colors (Dict[List[Float]]): The dictionary storing the color set for a representation. This is used 
+                to set the color of representation geometry created again after it was removed.
             vhelix (DnaStructureHelix): The structure helix from a region in a DNA structure. This object contains
                 all the data needed to visualize a virtual helix.
     """
@@ -91,7 +100,9 @@ class VisHelix(object):
         self.vhelix = helix
         self.strand_ids = set()
         self.representations = {}
+        self.rep_colors = {}
         self.color = [0.6,0.6,0.6,0.5]
+        self.lod_cylinder = None
         self._logger = logging.getLogger(__name__ + ":" + self.name)
 
         # Set the methods to create geometry for the different representations.
@@ -178,17 +189,53 @@ class VisHelix(object):
         """ Create and store the geometry for the representation if it has not been created. """
         if rep not in self.representations:
             self.create_rep_methods[rep]()
+            if rep in self.rep_colors:
+                self._set_geometry_color(rep, self.rep_colors[rep])
+        self.model.rep_cache.touch(self, rep)
+
+    def remove_rep(self, rep):
+        """ Remove the geometry for the representation from the graphics scene. 
+
+            The geometry is created again the next time the representation is shown.
+        """
+        for geom in self.representations.pop(rep, []):
+            self.graphics.remove_render_geometry(geom)
 
     def set_color(self, rep, color, display=True):
         """ Set the color for the representation. """
         if len(color) == 3:
             color.append(0.5)
+        self.rep_colors[rep] = color[:]
         self.create_rep(rep)
-        for geom in self.representations[rep]:
-            geom.color[:] = color[:]
+        self._set_geometry_color(rep, color)
         if display:
             self.graphics.display()
 
+    def _set_geometry_color(self, rep, color):
+        """ Set the color of the geometry for the representation. """
+        for geom in self.representations[rep]:
+            geom.color[:] = color[:]
+            if isinstance(geom, VisGeometryCylinderSet):
+                geom.instance_colors = None
+
+    def get_lod_cylinder(self):
+        """ Get the cylinder rendered in place of the per-base geometry of the helix at a low level of detail. """
+        if not self.lod_cylinder:
+            point1 = self.vhelix.end_coordinates[0]
+            point2 = self.vhelix.end_coordinates[1]
+            radius = self.dna_structure.dna_parameters.helix_radius
+            num_sides = 8
+            name = "HelixLod:%s" % self.id
+            self.lod_cylinder = VisGeometryCylinder(name, radius, point1, point2, num_sides)
+            self.lod_cylinder.transparent = True
+            self.lod_cylinder.color = self.color
+        return self.lod_cylinder
+
+    def _set_lod_cylinder(self, geom):
+        """ Set the helix cylinder as the level of detail proxy for a geometry showing bases. """
+        geom.lod_proxy = self.get_lod_cylinder()
+        geom.lod_size = self.dna_structure.dna_parameters.base_pair_rise
+
     def create_crossovers_rep(self):
         """ Create the geometry for the helix crossover representation. """
         self._logger.debug("Create crossover rep for helix num %d " % self.vhelix.lattice_num)
@@ -388,19 +435,15 @@ class VisHelix(object):
         helix = self.vhelix 
         # Get the indexes into helix_axis_coords of dsDNA regions.
         boundary_points = self.get_boundaries()
-        self.representations[VisHelixRepType.PAIRED_GEOMETRY] = []
-        for i,points in enumerate(boundary_points): 
-            pt1 = points[0]
-            pt2 = points[1]
-            #self._logger.info("Pt1 %s  pt2 %s" % (str(pt1), str(pt2))) 
-            name = "HelixGeometry:%d_%d" % (helix.id,i+1) 
-            geom = VisGeometryCylinder(name, radius, pt1, pt2, num_sides)
-            geom.selected_callback = self.select_paired_geometry
-            geom.color = self.color
-            geom.color[3] = 1.0 
-            self.graphics.add_render_geometry(geom)
-            self.representations[VisHelixRepType.PAIRED_GEOMETRY].append(geom)
-        #__for pos in boundary_pos 
+        points1 = [ points[0] for points in boundary_points ]
+        points2 = [ points[1] for points in boundary_points ]
+        name = "HelixGeometry:%d" % helix.id
+        geom = VisGeometryCylinderSet(name, radius, points1, points2, num_sides)
+        geom.selected_callback = self.select_paired_geometry
+        geom.color = self.color
+        geom.color[3] = 1.0 
+        self.graphics.add_render_geometry(geom)
+        self.representations[VisHelixRepType.PAIRED_GEOMETRY] = [geom]
 
     def select_paired_geometry(self, geom, index):
         """ Process helix geometry selection.
@@ -423,6 +466,7 @@ class VisHelix(object):
         geom.select_vertex = True
         geom.entity_indexes = range(0,len(points))
         geom.selected_callback = self.select_base_positions
+        self._set_lod_cylinder(geom)
         self.representations[VisHelixRepType.BASE_POSITIONS] = [geom]
         self.graphics.add_render_geometry(geom)
 
@@ -464,6 +508,7 @@ class VisHelix(object):
         scaffold_geom.selected_callback = self.select_coords
         scaffold_geom.select_vertex = True
         scaffold_geom.entity_indexes = range(0,len(scaffold_points))
+        self._set_lod_cylinder(scaffold_geom)
         self.representations[VisHelixRepType.COORDINATES] = [scaffold_geom]
         self.graphics.add_render_geometry(scaffold_geom)
 
@@ -475,6 +520,7 @@ class VisHelix(object):
         staple_geom.selected_callback = self.select_coords
         staple_geom.select_vertex = True
         staple_geom.entity_indexes = range(0,len(staple_points))
+        self._set_lod_cylinder(staple_geom)
         self.graphics.add_render_geometry(staple_geom)
         self.representations[VisHelixRepType.COORDINATES].append(staple_geom) 
 
@@ -501,6 +547,7 @@ class VisHelix(object):
         name = "HelixFrame:%s" % self.id
         geom = VisGeometryAxes(name, origins, directions, scale)
         geom.selected_callback = self.select_frames
+        self._set_lod_cylinder(geom)
         self.representations[VisHelixRepType.COORDINATE_FRAMES] = [geom]
         self.graphics.add_render_geometry(geom)
 
@@ -519,9 +566,11 @@ class VisHelix(object):
     def create_domains_rep(self):
         """ Create the geometry for the helix domains representation. """
         radius = self.dna_structure.dna_parameters.helix_radius / 2.0
-        self.representations[VisHelixRepType.DOMAINS] = []
         domain_list = self.dna_structure.domain_list
         domain_ids = self.vhelix.get_domain_ids()
+        points1 = []
+        points2 = []
+        colors = []
         for id in domain_ids:
             domain = domain_list[id]
             point1,point2 = domain.get_end_points()
@@ -533,13 +582,16 @@ class VisHelix(object):
             else:
                 point1[2] -= radius
                 point2[2] -= radius
-            name = "HelixDomain:%s.%d" % (self.id, id)
-            geom = VisGeometryCylinder(name, radius, point1, point2)
-            geom.color = domain.color
-            geom.selected_callback = self.select_domains
-            self.representations[VisHelixRepType.DOMAINS].append(geom)
-            self.graphics.add_render_geometry(geom)
+            points1.append(point1)
+            points2.append(point2)
+            colors.append(domain.color)
         #__for domain in self.dna_structure.domain_list
+        name = "HelixDomain:%s" % self.id
+        geom = VisGeometryCylinderSet(name, radius, points1, points2, colors=colors)
+        geom.data = list(domain_ids)
+        geom.selected_callback = self.select_domains
+        self.representations[VisHelixRepType.DOMAINS] = [geom]
+        self.graphics.add_render_geometry(geom)
     #__create_domains_rep(self):
 
     def select_domains(self, geom, index):
@@ -549,9 +601,8 @@ class VisHelix(object):
                 geom (VisGeometry): The geometry selected.
                 index (int): The index into the geometry selected.
         """
-        domain_id = int(geom.name.split(".")[1])
+        domain_id = geom.data[index]
         domain_list = self.dna_structure.domain_list
-        domain_ids = self.vhelix.get_domain_ids()
         domain = domain_list[domain_id]
         num_bases = len(domain.base_list)
         start_base = domain.base_list[0]
@@ -568,7 +619,6 @@ class VisHelix(object):
         """
         radius = self.dna_structure.dna_parameters.helix_radius
         base_pair_rise = self.dna_structure.dna_parameters.base_pair_rise 
-        self.representations[VisHelixRepType.TEMPERATURE] = []
         domain_list = self.dna_structure.domain_list
         domain_ids = self.vhelix.get_domain_ids()
 
@@ -587,10 +637,8 @@ class VisHelix(object):
             domain_map[min_p] = id 
         #__for id in domain_ids
  
-        # Get a spectrums of colors (blue to red) and the max/min 
-        # domain melting temperatures for all domains in the structure.
-        spectrum_colors = self.graphics.get_spectrum_colors()
-        tmin, tmax = self.model.get_domains_temperature_range()
+        # Get the domain melting temperatures and colors (blue to red) computed for all domains in the structure.
+        domain_temperatures = self.model.get_domain_temperatures()
 
         # Sort the domains by position according to the helix polarity.
         # This will make the axis and domains consistent: point2 = point1 + axis
@@ -603,6 +651,10 @@ class VisHelix(object):
         axis = self.vhelix.helix_axis_frames[:,2,0]   # Vector pointing along the helix axis.
         s = 0.5 # Base rise scale.
         num_domains = len(domain_map)
+        ids = []
+        points1 = []
+        points2 = []
+        caps = []
         for i,key in enumerate(sorted(domain_map,reverse=sort_reversed)):
             id = domain_map[key]
             domain = domain_list[id]
@@ -612,26 +664,24 @@ class VisHelix(object):
             # Extend the domain ends by 1/2 base rise so adjacent domains touch.
             point1 = [point1[j] + s*base_pair_rise*axis[j] for j in xrange(0,3)]
             point2 = [point2[j] - s*base_pair_rise*axis[j] for j in xrange(0,3)]
-            temp = domain.melting_temperature()
-            self._logger.debug("Domain ID %d  #bases %d  temp %g" % (id, len(domain.base_list), temp))
-            if temp == -500.0:
-                color = [0.5, 0.5, 0.5]
-            else:
-                color = self.graphics.map_value_to_color(spectrum_colors, tmin, tmax, temp)
-            color.append(1.0)
-            name = "HelixDomainTemperature:%s.%d" % (self.id, id)
             if i == 0:
                 capped = (False,True)
             elif i == num_domains-1:
                 capped = (True,False)
             else:
                 capped = (False,False)
-            geom = VisGeometryCylinder(name, radius, point1, point2, capped=capped)
-            geom.color = color 
-            geom.selected_callback = self.select_domains_temperature
-            self.representations[VisHelixRepType.TEMPERATURE].append(geom)
-            self.graphics.add_render_geometry(geom)
+            ids.append(id)
+            points1.append(point1)
+            points2.append(point2)
+            caps.append(capped)
         #__for domain in self.dna_structure.domain_list
+        colors = domain_temperatures.get_colors(ids)
+        name = "HelixDomainTemperature:%s" % self.id
+        geom = VisGeometryCylinderSet(name, radius, points1, points2, capped=caps, colors=colors)
+        geom.data = ids
+        geom.selected_callback = self.select_domains_temperature
+        self.representations[VisHelixRepType.TEMPERATURE] = [geom]
+        self.graphics.add_render_geometry(geom)
     #__create_domains_rep(self):
 
     def select_domains_temperature(self, geom, index):
@@ -641,9 +691,8 @@ class VisHelix(object):
                 geom (VisGeometry): The geometry selected.
                 index (int): The index into the geometry selected.
         """
-        domain_id = int(geom.name.split(".")[1])
+        domain_id = geom.data[index]
         domain_list = self.dna_structure.domain_list
-        domain_ids = self.vhelix.get_domain_ids()
         domain = domain_list[domain_id]
         num_bases = len(domain.base_list)
         start_base = domain.base_list[0]
@@ -749,6 +798,9 @@ class VisHelix(object):
         self.representations[VisHelixRepType.STRANDS] = []
         for strand in strand_list:
             base_coords = strand.get_base_coords()
+            # Close the path of a circular strand.
+            if strand.is_circular:
+                base_coords = np.concatenate((base_coords, base_coords[:1]))
             name = "HelixStrand:%s.%d" % (self.id, strand.id)
             geom = VisGeometryPath(name,base_coords,show_verts,show_arrows)
             geom.start_marker = True
@@ -758,6 +810,8 @@ class VisHelix(object):
             geom.selected_callback = self.select_strand
             geom.select_vertex = True
             geom.entity_indexes = range(0,len(base_coords))
+            geom.lod_proxy = geom.decimate(get_domain_end_indexes(strand.tour, strand.is_circular))
+            geom.lod_size = self.dna_structure.dna_parameters.base_pair_rise
             self.representations[VisHelixRepType.STRANDS].append(geom)
             self.graphics.add_render_geometry(geom)
         #__for strand in strand_list
@@ -772,7 +826,8 @@ class VisHelix(object):
         """
         strand = geom.data
         strand_name = VisStrand.get_strand_name(strand)
-        base = strand.tour[index]
+        # The last vertex of the path of a circular strand is its first base.
+        base = strand.tour[index % len(strand.tour)]
         self._logger.info("Selected Helix %s Strand %s" % (self.name, strand_name))
         self._logger.info("Location in strand path %d  Vhelix %d  Position %d  " % (index+1, base.h, base.p))
         self.print_info()
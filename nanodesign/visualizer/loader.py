@@ -0,0 +1,126 @@
+# Copyright 2016 Autodesk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""This module is used to load a model while its graphics window is displayed.
+
+    Reading a large DNA design, computing its auxiliary data, generating its
+    atomic structure and creating the geometry of its representations can
+    take a long time. The VisModelLoader class performs these steps on a
+    loading thread after the graphics window has been displayed.
+
+    The start commands (see VisModel.execute_start_cmds()) are executed on the
+    loading thread while the graphics object is in its loading state: the
+    geometry created for each helix and strand representation is put on the
+    graphics render queue instead of being added to the render list and the
+    graphics is not displayed (OpenGL and GLUT functions must only be called
+    on the thread running the graphics loop). The GLUT idle callback drains
+    the render queue into the render list and displays the scene so that it
+    fills in as representations are created. The popup menu is created when
+    loading has finished.
+
+    If loading fails then the error is logged and the graphics window is left
+    displayed without a popup menu; exiting from a GLUT callback would not
+    shut down the graphics loop cleanly.
+"""
+import logging
+import threading
+import time
+
+try:
+    from OpenGL.GLUT import *
+
+except ImportError as e:
+    print "Could not import PyOpenGL."
+    raise e
+
+class VisModelLoader(object):
+    """ This class is used to load the DNA structure of a model on a loading thread.
+
+        Attributes:
+            error (Exception): The exception raised on the loading thread. This is None if loading succeeded.
+            finished (threading.Event): The event set when loading has finished.
+            model (VisModel): The model being loaded.
+            read_structure (Function): The function called to read the DNA design. It returns the DNA structure
+                and the atomic structure, which may be None.
+            thread (threading.Thread): The loading thread.
+    """
+    # The time in seconds the idle callback waits when there is no geometry to add.
+    IDLE_WAIT = 0.02
+
+    def __init__(self, model, read_structure):
+        """ Initialize a VisModelLoader object.
+
+            Arguments:
+                model (VisModel): The model to load.
+                read_structure (Function): The function called to read the DNA design.
+        """
+        self.model = model
+        self.read_structure = read_structure
+        self.error = None
+        self.finished = threading.Event()
+        self.thread = None
+        self._logger = logging.getLogger(__name__)
+
+    def start(self):
+        """ Start loading the model.
+
+            This must be called on the thread running the graphics loop after the graphics has been initialized.
+        """
+        self.model.graphics.loading = True
+        self.thread = threading.Thread(target=self._load, name="VisModelLoader")
+        self.thread.daemon = True
+        self.thread.start()
+        glutIdleFunc(self.idle)
+
+    def _load(self):
+        """ Load the model on the loading thread. """
+        start_time = time.time()
+        try:
+            dna_structure, atomic_structure = self.read_structure()
+            self.model.set_structure(dna_structure, atomic_structure)
+            self.model.graphics.set_extent(self.model.extent)
+            self.model.execute_start_cmds()
+            self._logger.info("Loaded model in %.2f s" % (time.time() - start_time))
+        except Exception as e:
+            self._logger.exception("Error loading model: %s" % str(e))
+            self.error = e
+        finally:
+            self.finished.set()
+
+    def idle(self):
+        """ Add the geometry created on the loading thread to the graphics scene and display it.
+
+            This is the GLUT idle callback used while the model is loading. If loading failed then the error is
+            logged and the geometry added before the error is displayed without creating the popup menu.
+        """
+        graphics = self.model.graphics
+        # Check if loading has finished before draining the queue so no geometry is left on it.
+        finished = self.finished.is_set()
+        if graphics.drain_render_queue():
+            graphics.set_viewport(graphics.width, graphics.height)
+            glutPostRedisplay()
+        elif not finished:
+            time.sleep(VisModelLoader.IDLE_WAIT)
+
+        if not finished:
+            return
+        glutIdleFunc(None)
+        graphics.loading = False
+        if self.error:
+            self._logger.error("The model was not loaded, the popup menu is not created.")
+            glutPostRedisplay()
+            return
+        self.model.finish_loading()
+
+#__class VisModelLoader(object)
@@ -0,0 +1,128 @@
+# Copyright 2016 Autodesk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""This module is used to select the level of detail used to render geometry.
+
+    When a large design is viewed zoomed out, the per-base and per-atom
+    geometry of its helices and strands (e.g. base coordinates, coordinate
+    frames and atomic bonds) is drawn using lines and polygons that cover
+    less than a pixel. A geometry can be given a coarse proxy geometry (e.g. a
+    single cylinder for a helix or a strand path reduced to its domain end
+    points) together with a detail size, the size in model units of the
+    smallest feature the geometry displays (e.g. the rise between bases). The
+    proxy is rendered in place of the geometry when its detail size projects
+    to fewer than a given number of pixels on the screen. Proxies shared by
+    several geometries (e.g. the cylinder of a helix) are rendered once.
+
+    The functions in this module do not use OpenGL so that the level of detail
+    can be selected and tested without a graphics context.
+"""
+import numpy as np
+
+# The projected size in pixels of the detail of a geometry below which its proxy is rendered.
+LOD_MIN_PIXELS = 2.0
+
+class VisLodLevel:
+    """ This class defines the levels of detail used to render geometry. """
+    COARSE = 'coarse'
+    FULL   = 'full'
+
+def get_pixels_per_unit(extent, scale, width, height):
+    """ Get the number of screen pixels spanned by one model unit.
+
+        Arguments:
+            extent (VisExtent): The extent of the graphics scene.
+            scale (Float): The zoom scaling factor of the graphics scene transformation.
+            width (int): The width of the graphics window.
+            height (int): The height of the graphics window.
+
+        The orthographic projection set by VisGraphics.set_viewport() maps twice the largest extent width onto
+        the smaller window dimension. Returns None if the extent has no width.
+    """
+    max_dim = max(extent.get_widths())
+    if max_dim <= 0.0:
+        return None
+    return scale * min(width, height) / (2.0 * max_dim)
+
+def select_lod_level(detail_size, pixels_per_unit, min_pixels=LOD_MIN_PIXELS):
+    """ Select the level of detail for a geometry from the projected size of its detail.
+
+        Arguments:
+            detail_size (Float): The size in model units of the smallest feature displayed by the geometry.
+            pixels_per_unit (Float): The number of screen pixels spanned by one model unit.
+            min_pixels (Float): The projected size in pixels below which the coarse level is selected.
+    """
+    if (detail_size == None) or (pixels_per_unit == None):
+        return VisLodLevel.FULL
+    if detail_size * pixels_per_unit < min_pixels:
+        return VisLodLevel.COARSE
+    return VisLodLevel.FULL
+
+def select_lod_geometry(geometry, pixels_per_unit, min_pixels=LOD_MIN_PIXELS):
+    """ Select the geometry to render at the current level of detail.
+
+        Arguments:
+            geometry (List[VisGeometry]): The list of visible geometry.
+            pixels_per_unit (Float): The number of screen pixels spanned by one model unit.
+            min_pixels (Float): The projected size in pixels below which proxies are rendered.
+
+        Returns the list of geometry and proxies to render and the list of the level of detail selected for
+        each geometry. Selected geometry and geometry without a proxy are always rendered at full detail.
+    """
+    lod_geometry = []
+    levels = []
+    proxy_ids = set()
+    for geom in geometry:
+        level = VisLodLevel.FULL
+        proxy = None
+        if not geom.selected:
+            proxy = geom.get_lod_proxy()
+            if proxy != None:
+                level = select_lod_level(geom.lod_size, pixels_per_unit, min_pixels)
+        levels.append(level)
+        if level == VisLodLevel.FULL:
+            lod_geometry.append(geom)
+        elif proxy.id not in proxy_ids:
+            proxy_ids.add(proxy.id)
+            lod_geometry.append(proxy)
+    #__for geom in geometry
+    return lod_geometry, levels
+
+def get_run_end_indexes(ids):
+    """ Get the indexes of the first and last elements of each run of equal ids.
+
+        Arguments:
+            ids (List[int]): The list of ids (e.g. the domain ID of each base of a strand).
+
+        This is used to decimate a polyline to the end points of the domains its vertices belong to.
+    """
+    ids = np.asarray(ids)
+    num_ids = len(ids)
+    if num_ids == 0:
+        return np.zeros(0, dtype=int)
+    changes = np.nonzero(ids[1:] != ids[:-1])[0]
+    return np.unique(np.concatenate(([0, num_ids-1], changes, changes+1)))
+
+def get_domain_end_indexes(bases, is_circular=False):
+    """ Get the indexes of the bases of a strand at the end points of its domains.
+
+        Arguments:
+            bases (List[DnaBase]): The list of the bases of the strand in path order.
+            is_circular (bool): If true then the strand is circular and its path repeats the first base at the end.
+                The index of the repeated first base is then included.
+    """
+    domain_ids = [base.domain for base in bases]
+    if is_circular and domain_ids:
+        domain_ids.append(domain_ids[0])
+    return get_run_end_indexes(domain_ids)
@@ -18,18 +18,30 @@
    domains, base connectivity etc. derived from a DNA design. The VisModel class
    in this module manages the visualization of these entities using various
    visualization representations (i.e. the geometry used to display an entity).
+
+   The geometry for a representation is only created when it is first shown.
+   The atomic structure of a strand is also only generated when one of its
+   representations is first shown. The geometry of hidden representations is
+   removed when it exceeds a vertex budget (see rep_cache.py).
+
+   The DNA structure of a model can also be loaded on a background thread
+   while the graphics window is displayed (see loader.py).
 """
+import logging
 import os
 import numpy as np
 from .atomic_struct import VisAtomicStructure
 from .cmd import VisCommand
 from .extent import VisExtent
 from .geometry import VisGeometryBox, VisGeometryCircle, VisGeometryPath, VisGeometryNumber, \
-    VisGeometryPolygon, VisGeometryLines, VisGeometryCylinder 
+    VisGeometryPolygon, VisGeometryLines, VisGeometryCylinderSet
 from .graphics import VisGraphics 
 from .helix import VisHelix
+from .loader import VisModelLoader
 from .menu import VisMenu,VisMenuItem
+from .rep_cache import VisRepCache
 from .strand import VisStrand
+from .temperature import VisDomainTemperatures
 
 try:
     from OpenGL.GL import *
@@ -59,6 +71,8 @@ class VisModel(object):
             command (VisCommand): The command processing object. 
             commands (String): The string containing visualization commands from the command line. 
             dna_structure (DnaStructure): The DNA structure derived from a DNA design.
+            domain_temperatures (VisDomainTemperatures): The melting temperatures and colors of the domains shared
+                by all temperature representations. This is created when it is first needed.
             extent (VisExtent): The extent of the DNA structure. 
             file_name (String): The design file name.
             graphics (VisGraphics): The visualization graphics object that manages the display of geometry for
@@ -67,6 +81,8 @@ class VisModel(object):
             helix_names (List[String]): The list of virtual helix names.
             menu (VisMenu): The menu object that manages the popup menu.
             name (String): The model name. This is the base name of the input file name. 
+            rep_cache (VisRepCache): The object used to remove the geometry of least recently used hidden 
+                representations.
             strands (Dict[VisStrand]): The list of objects for strand representations.
             strand_names (List[String]): The list of strand names.
     """
@@ -78,31 +94,45 @@ class VisModel(object):
                 file_name (String): The design file name.
                 cmd_file_name (String): The name of the input visualization commands file. This may be None.
                 commands (String): The string containing visualization commands from the command line. 
-                dna_structure (DnaStructure): The DNA structure derived from a DNA design.
+                dna_structure (DnaStructure): The DNA structure derived from a DNA design. This may be None if the
+                    structure is loaded using start_loading().
                 atomic_structure (AtomicStructure): The atomic structure of a DNA structure derived from a DNA design.
         """
         self.name = os.path.basename(file_name)
         self.file_name = file_name
         self.cmd_file_name = cmd_file_name
         self.commands = commands
-        self.dna_structure = dna_structure
+        self.dna_structure = None
         self.extent = VisExtent()
         self.command = VisCommand(self, cmd_file_name, commands)
         self.graphics = VisGraphics(self.name, self.command)
         self.menu = None 
+        self.rep_cache = VisRepCache()
         self.helices = {} 
         self.helix_names = [] 
         self.strands = {} 
         self.strand_names = [] 
-        self.atomic_structure = atomic_structure 
+        self.atomic_structure = None
         self.atomic_structures = {} 
         self.atomic_structure_names = [] 
         self.bounding_box_geometry = []
         self.helix_numbers_geometry = []
         self.helix_projection_geometry = []
         self.structure_geometry = []
-        self.domains_temperature_range = None
+        self.domain_temperatures = None
         self._logger = logging.getLogger(__name__)
+        if dna_structure:
+            self.set_structure(dna_structure, atomic_structure)
+
+    def set_structure(self, dna_structure, atomic_structure):
+        """ Set the DNA structure visualized by the model and create the objects used to visualize it. 
+
+            Arguments:
+                dna_structure (DnaStructure): The DNA structure derived from a DNA design.
+                atomic_structure (AtomicStructure): The atomic structure of a DNA structure derived from a DNA design.
+        """
+        self.dna_structure = dna_structure
+        self.atomic_structure = atomic_structure 
         self._set_extent()
         # Generate auxiliary data (e.g. domains) needed for certain visualizations.
         self.dna_structure.compute_aux_data()
@@ -145,24 +175,25 @@ class VisModel(object):
     #_create_strands
 
     def _create_atomic_structures(self):
-        """ Create a VisAtomicStructure object for each atomic structure object. """
+        """ Create a VisAtomicStructure object for each atomic structure strand. 
+
+            The atoms for a strand are generated when a representation of its atomic structure is first shown.
+        """
         if not self.atomic_structure:
             return
         dna_structure = self.dna_structure 
         self.atomic_structure_names.append(VisMenuItem.ALL)
         self.atomic_structure_names.append(VisMenuItem.NONE)
-        molecules = self.atomic_structure.generate_structure_ss()
-        #molecules = self.atomic_structure.generate_structure()
-        self._logger.info("Number of molecules %d" % (len(molecules))) 
+        atomic_strands = self.atomic_structure.strands
+        self._logger.info("Number of atomic structure strands %d" % (len(atomic_strands))) 
         id = 1
         atomic_struct_list = []
-        for molecule in molecules: 
-            #self._logger.info("Molecule %d  nchains %d  chainIDs %s " % (id, len(molecule.chains), str(list(molecule.chains))))
-            atomic_struct = VisAtomicStructure(id, self, molecule, self.graphics) 
+        for atomic_strand in atomic_strands: 
+            atomic_struct = VisAtomicStructure(id, self, self.atomic_structure, atomic_strand, self.graphics) 
             self.atomic_structures[atomic_struct.strand_name] = atomic_struct
             atomic_struct_list.append(atomic_struct)
             id += 1
-        #__for molecule in molecules
+        #__for atomic_strand in atomic_strands
         # Create a list of sorted atomic structure names.
         atomic_struct_list.sort(VisAtomicStructure.compare)
         for atomic_struct in atomic_struct_list:
@@ -178,12 +209,52 @@ class VisModel(object):
         # Create the popup menu.
         self._create_menu()
         # Execute commands from a file or the command line.
+        self.execute_start_cmds()
+        self.graphics.start_interactive()
+
+    def start_loading(self, read_structure):
+        """ Start the interactive visualization of the model while its DNA structure is loaded. 
+
+            Arguments:
+                read_structure (Function): The function called on the loading thread to read the DNA design.
+                    It returns the DNA structure and the atomic structure, which may be None.
+
+            The graphics window is displayed before the DNA design is read. The geometry of the representations
+            shown by the start commands is displayed as it is created. The popup menu is created when loading
+            has finished (see loader.py).
+        """
+        self.graphics.initialize_graphics()
+        loader = VisModelLoader(self, read_structure)
+        loader.start()
+        self.graphics.start_interactive()
+
+    def finish_loading(self):
+        """ Create the popup menu and display the model after it has been loaded. """
+        self._create_menu()
+        self.command.apply_menu_updates()
+        self.menu.update()
+        self.graphics.display()
+
+    def execute_start_cmds(self):
+        """ Execute the commands from a file or the command line and show the bounding box and helix numbers. """
         self.command.execute_file_cmds()
         self.command.execute_cmds()
-        # Show the bounding box and helix numbers.
         self.command.generate_model_cmd(VisModelRepType.BOUNDING_BOX, "true")
         self.command.generate_model_cmd(VisModelRepType.HELIX_NUMBERS, "true")
-        self.graphics.start_interactive()
+
+    def start_offscreen(self):
+        """ Set up the model for rendering offscreen.
+
+            The commands from a file or the command line are executed to create the geometry of the scene without
+            creating a graphics window or a popup menu. The scene is then rendered into images using a
+            VisOffscreenRenderer object.
+        """
+        self.graphics.offscreen = True
+        self.graphics.set_extent(self.extent)
+        self.graphics.xform.set(self.graphics.initial_xform)
+        # Execute commands from a file or the command line.
+        self.command.execute_file_cmds()
+        self.command.execute_cmds()
 
     def _set_extent(self):
         """ Set the model extent from the DNA structure. """
@@ -239,6 +310,7 @@ class VisModel(object):
                 helix.set_color(rep, color)
             if show != None:
                 helix.show(rep,show)
+        self.rep_cache.evict()
         self.graphics.display()
 
     def show_atomic_struct(self, name, rep, show):
@@ -256,11 +328,13 @@ class VisModel(object):
             display = False
             for atom_struct in self.atomic_structures.values():
                 atom_struct.show(rep,show,display)
+            self.rep_cache.evict()
             self.graphics.display()
         # Show a atom struct named 'name'.
         else:
             atomic_struct = self.atomic_structures[name]
             atomic_struct.show(rep,show)
+            self.rep_cache.evict()
 
     def show_strand(self, name, rep, attributes):
         """ Show a strand with the given representation. 
@@ -293,6 +367,7 @@ class VisModel(object):
             display = False
             for strand in self.strands.values():
                 strand.show(rep,show,display)
+            self.rep_cache.evict()
             self.graphics.display()
         # Show a strand named 'name'.
         else:
@@ -303,6 +378,7 @@ class VisModel(object):
                 strand.set_line_width(rep, line_width)
             if show != None:
                 strand.show(rep,show)
+            self.rep_cache.evict()
             self.graphics.display()
 
     def show_bounding_box(self, show):
@@ -450,17 +526,14 @@ class VisModel(object):
             # Get the indexes into helix_axis_coords of dsDNA regions.
             boundary_points = helix.get_boundaries()
             verts = []
-            for i,points in enumerate(boundary_points): 
-                pt1 = points[0]
-                pt2 = points[1]
-                #self._logger.info("Pt1 %s  pt2 %s" % (str(pt1), str(pt2))) 
-                verts.append(pt1)
-                verts.append(pt2)
-                name = "ModelGeometry:%d_%d" % (helix.vhelix.lattice_num,i+1) 
-                geom = VisGeometryCylinder(name, radius, pt1, pt2, num_sides)
-                self.graphics.add_render_geometry(geom)
-                self.structure_geometry.append(geom)
+            for points in boundary_points: 
+                verts.append(points[0])
+                verts.append(points[1])
             #__for pos in boundary_pos 
+            name = "ModelGeometry:%d_regions" % (helix.vhelix.lattice_num) 
+            geom = VisGeometryCylinderSet(name, radius, verts[0::2], verts[1::2], num_sides)
+            self.graphics.add_render_geometry(geom)
+            self.structure_geometry.append(geom)
             name = "ModelGeometry:%d" % (helix.vhelix.lattice_num) 
             arrows = False
             geom = VisGeometryLines(name, verts, arrows)
@@ -471,28 +544,19 @@ class VisModel(object):
 
         #__for helix in helix_list
 
+    def get_domain_temperatures(self):
+        """ Get the melting temperatures and colors of the domains. 
+
+            The temperatures of all domains are computed the first time they are needed. 
+        """
+        if self.domain_temperatures == None:
+            spectrum_colors = self.graphics.get_spectrum_colors()
+            self.domain_temperatures = VisDomainTemperatures(self.dna_structure.domain_list, spectrum_colors)
+        return self.domain_temperatures
+
     def get_domains_temperature_range(self):
         """ Get the domains temperature range. """
-        if self.domains_temperature_range == None:
-           tmin = None
-           tmax = None
-           for domain in self.dna_structure.domain_list:
-               temp = domain.melting_temperature()
-               if temp == -500.0:
-                   continue
-               if not tmin:
-                   tmin = temp
-                   vmax = temp
-               elif temp < tmin:
-                   tmin = temp
-               elif temp > tmax:
-                   tmax = temp
-           #__for domain in domain_list
-           self._logger.info("Domain temperature range min %g  max %g" % (tmin, tmax))
-           self.domains_temperature_range = (tmin,tmax)
-        #__if self.domains_temperature_range == None
-
-        return self.domains_temperature_range[0], self.domains_temperature_range[1]
+        return self.get_domain_temperatures().get_range()
     #__def get_domain_temperature_range
 
     #__create_structure_geometry(self)
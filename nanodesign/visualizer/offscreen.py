@@ -0,0 +1,160 @@
+# Copyright 2016 Autodesk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""This module is used to render the graphics scene of a model into images without a graphics window.
+
+    The VisOffscreenRenderer class renders the scene of a VisGraphics object
+    whose model was set up using VisModel.start_offscreen(). The scene is
+    rendered using an OSMesa OpenGL context if one can be created, otherwise
+    the batched geometry of the scene is rendered using the VisRasterizer
+    software rasterizer (see raster.py). The software rasterizer renders only
+    the geometry that is packed into batches; geometry that does not provide
+    batch items is not rendered.
+
+    A VisOffscreenRenderer object keeps its OpenGL context or rasterizer and
+    can be used to render the scenes of many models, one after another.
+
+    PyOpenGL selects its platform when it is first imported. The
+    PYOPENGL_PLATFORM environment variable must be set to 'osmesa' before the
+    visualizer modules are imported for an OSMesa context to be created.
+"""
+import logging
+import numpy as np
+from .graphics import VisGraphicsXform
+from .raster import VisRasterizer, get_ortho_matrix, get_view_bounds, get_xform_matrix, write_png
+
+try:
+    from OpenGL.GL import *
+
+except ImportError as e:
+    print "Could not import PyOpenGL."
+    raise e
+
+class VisOffscreenRendererType:
+    """ This class defines the offscreen renderer types. """
+    OSMESA   = 'osmesa'
+    SOFTWARE = 'software'
+
+class VisOffscreenRenderer(object):
+    """ This class is used to render the graphics scene of a model into images.
+
+        Attributes:
+            buffer (GLubyteArray): The image buffer of the OSMesa context.
+            context (OSMesaContext): The OSMesa context. This is None if the software rasterizer is used.
+            height (int): The image height.
+            rasterizer (VisRasterizer): The software rasterizer. This is None if an OSMesa context is used.
+            renderer_type (VisOffscreenRendererType): The type of renderer used.
+            width (int): The image width.
+    """
+    def __init__(self, width=256, height=256, renderer_type=None):
+        """ Initialize a VisOffscreenRenderer object.
+
+            Arguments:
+                width (int): The image width.
+                height (int): The image height.
+                renderer_type (VisOffscreenRendererType): The type of renderer to use. If None then an OSMesa
+                    context is used if one can be created, otherwise the software rasterizer is used.
+        """
+        self.width = width
+        self.height = height
+        self.context = None
+        self.buffer = None
+        self.rasterizer = None
+        self._logger = logging.getLogger(__name__)
+        if renderer_type != VisOffscreenRendererType.SOFTWARE:
+            self._create_context()
+        if self.context != None:
+            self.renderer_type = VisOffscreenRendererType.OSMESA
+        else:
+            if renderer_type == VisOffscreenRendererType.OSMESA:
+                self._logger.warning("Could not create an OSMesa context; using the software rasterizer.")
+            self.renderer_type = VisOffscreenRendererType.SOFTWARE
+            self.rasterizer = VisRasterizer(width, height)
+        self._logger.info("Offscreen renderer type %s  size %d x %d" % (self.renderer_type, width, height))
+
+    def _create_context(self):
+        """ Create an OSMesa context and make it current. """
+        try:
+            from OpenGL import arrays
+            from OpenGL import osmesa
+            context = osmesa.OSMesaCreateContextExt(osmesa.OSMESA_RGBA, 24, 0, 0, None)
+            if not context:
+                return
+            buffer = arrays.GLubyteArray.zeros((self.height, self.width, 4))
+            if not osmesa.OSMesaMakeCurrent(context, buffer, GL_UNSIGNED_BYTE, self.width, self.height):
+                osmesa.OSMesaDestroyContext(context)
+                return
+        except Exception as e:
+            self._logger.info("OSMesa is not available: %s" % str(e))
+            return
+        self.context = context
+        self.buffer = buffer
+
+    def render(self, graphics):
+        """ Render the graphics scene of a model.
+
+            Arguments:
+                graphics (VisGraphics): The graphics object of a model set up using VisModel.start_offscreen().
+
+            Returns the NumPy HxWx3 array of 8-bit RGB values of the image. Row 0 is the top of the image.
+        """
+        graphics.width = self.width
+        graphics.height = self.height
+        if self.context != None:
+            return self._render_context(graphics)
+        return self._render_software(graphics)
+
+    def _render_context(self, graphics):
+        """ Render the graphics scene using the OSMesa context. """
+        # init_view() resets the scene transformation set by commands.
+        xform = VisGraphicsXform()
+        xform.set(graphics.xform)
+        graphics.init_view()
+        graphics.xform.set(xform)
+        graphics.set_viewport(self.width, self.height)
+        graphics.render_scene()
+        glFinish()
+        pixels = glReadPixels(0, 0, self.width, self.height, GL_RGB, GL_UNSIGNED_BYTE)
+        image = np.frombuffer(pixels, dtype=np.uint8).reshape((self.height, self.width, 3))
+        return image[::-1].copy()
+
+    def _render_software(self, graphics):
+        """ Render the batched geometry of the graphics scene using the software rasterizer. """
+        graphics.update_render_batches()
+        rasterizer = self.rasterizer
+        rasterizer.clear()
+        projection = get_ortho_matrix(*get_view_bounds(graphics.extent, self.width, self.height))
+        rasterizer.set_view(projection, get_xform_matrix(graphics.center, graphics.xform))
+        for batch in graphics.render_batches:
+            if not batch.transparent:
+                rasterizer.draw_batch(batch)
+        for batch in graphics.render_batches:
+            if batch.transparent:
+                rasterizer.draw_batch(batch)
+        return rasterizer.get_image()
+
+    def write_image(self, graphics, file_name):
+        """ Render the graphics scene of a model and write it to a PNG file. """
+        write_png(file_name, self.render(graphics))
+
+    def destroy(self):
+        """ Destroy the OSMesa context. """
+        if self.context == None:
+            return
+        from OpenGL import osmesa
+        osmesa.OSMesaDestroyContext(self.context)
+        self.context = None
+        self.buffer = None
+
+#__class VisOffscreenRenderer(object)
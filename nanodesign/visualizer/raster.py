@@ -0,0 +1,332 @@
+# Copyright 2016 Autodesk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""This module is used to render geometry batches into images without OpenGL.
+
+    The VisRasterizer class is a software rasterizer for the VisRenderBatch
+    objects packed by the graphics module (see batch.py). It is used to render
+    images when no OpenGL context can be created, for example on a machine
+    without a display or a GPU. The points, lines and triangles of a batch are
+    transformed using the same orthographic projection and scene transformation
+    as VisGraphics and are rasterized into color and depth buffers using NumPy
+    array operations. Triangles are lit using the lighting set by
+    VisGraphics.init_view() and colors are interpolated across primitives.
+    Transparent primitives are blended with the opaque primitives drawn before
+    them; only the transparent fragment closest to the viewer is blended at
+    each pixel.
+
+    The write_png() function writes an image to a PNG file using only the zlib
+    and struct modules.
+"""
+from math import cos, sin, radians
+import struct
+import zlib
+import numpy as np
+from .batch import VisBatchPrimitive
+
+# The lighting set by VisGraphics.init_view(): the global and light ambient intensities and the light diffuse
+# intensity. The light shines along the viewing direction.
+LIGHT_AMBIENT = 0.6
+LIGHT_DIFFUSE = 0.5
+
+# The maximum number of fragments generated at once.
+MAX_FRAGMENTS = 4000000
+
+def get_view_bounds(extent, width, height):
+    """ Get the bounds of the orthographic projection used to view a scene.
+
+        Arguments:
+            extent (VisExtent): The extent of the graphics scene.
+            width (int): The width of the graphics window.
+            height (int): The height of the graphics window.
+
+        Returns the left, right, bottom, top, near and far bounds passed to glOrtho().
+    """
+    cx, cy, cz = extent.get_center()
+    max_dim = max(extent.get_widths())
+    sx = 1.0
+    sy = 1.0
+    if (width <= height):
+        sy = float(height) / float(width)
+    else:
+        sx = float(width) / float(height)
+    return (cx - sx*max_dim, cx + sx*max_dim, cy - sy*max_dim, cy + sy*max_dim, cz - 100.0*max_dim,
+        cz + 100.0*max_dim)
+
+def get_ortho_matrix(left, right, bottom, top, near, far):
+    """ Get the 4x4 orthographic projection matrix created by glOrtho(). """
+    matrix = np.identity(4)
+    matrix[0,0] = 2.0 / (right - left)
+    matrix[1,1] = 2.0 / (top - bottom)
+    matrix[2,2] = -2.0 / (far - near)
+    matrix[0,3] = -(right + left) / (right - left)
+    matrix[1,3] = -(top + bottom) / (top - bottom)
+    matrix[2,3] = -(far + near) / (far - near)
+    return matrix
+
+def get_xform_matrix(center, xform):
+    """ Get the 4x4 modelview matrix of the scene transformation set by VisGraphics.render().
+
+        Arguments:
+            center (List[Float]): The center of rotation.
+            xform (VisGraphicsXform): The scene rotation, translation and scaling.
+    """
+    def translate(tx, ty, tz):
+        matrix = np.identity(4)
+        matrix[:3,3] = [tx, ty, tz]
+        return matrix
+
+    def rotate(angle, axis):
+        c = cos(radians(angle))
+        s = sin(radians(angle))
+        i, j = [k for k in xrange(0,3) if k != axis]
+        matrix = np.identity(4)
+        matrix[i,i] = c
+        matrix[j,j] = c
+        if axis == 1:
+            s = -s
+        matrix[i,j] = -s
+        matrix[j,i] = s
+        return matrix
+
+    cx, cy, cz = center
+    matrix = translate(cx + xform.translate_x, cy + xform.translate_y, cz + xform.translate_z)
+    matrix = matrix.dot(rotate(xform.rotate_x, 0))
+    matrix = matrix.dot(rotate(xform.rotate_y, 1))
+    matrix = matrix.dot(rotate(xform.rotate_z, 2))
+    matrix = matrix.dot(np.diag([xform.scale, xform.scale, xform.scale, 1.0]))
+    return matrix.dot(translate(-cx, -cy, -cz))
+
+class VisRasterizer(object):
+    """ This class is used to rasterize geometry batches into color and depth buffers.
+
+        Attributes:
+            background (List[Float]): The RGB color used to clear the color buffer.
+            color_buffer (NumPy HxWx3 ndarray[float]): The RGB color of each pixel. Row 0 is the top of the image.
+            depth_buffer (NumPy HxW ndarray[float]): The depth of each pixel, from -1 (near) to 1 (far).
+            height (int): The image height.
+            modelview (NumPy 4x4 ndarray[float]): The modelview matrix.
+            projection (NumPy 4x4 ndarray[float]): The projection matrix.
+            width (int): The image width.
+    """
+    def __init__(self, width, height, background=[0.75,0.75,0.75]):
+        """ Initialize a VisRasterizer object.
+
+            Arguments:
+                width (int): The image width.
+                height (int): The image height.
+                background (List[Float]): The RGB color used to clear the color buffer.
+        """
+        self.width = width
+        self.height = height
+        self.background = background
+        self.color_buffer = np.empty((height,width,3), dtype=float)
+        self.depth_buffer = np.empty((height,width), dtype=float)
+        self.projection = np.identity(4)
+        self.modelview = np.identity(4)
+        self.clear()
+
+    def clear(self):
+        """ Clear the color and depth buffers. """
+        self.color_buffer[:] = self.background
+        self.depth_buffer[:] = 1.0
+
+    def set_view(self, projection, modelview):
+        """ Set the projection and modelview matrices. """
+        self.projection = np.asarray(projection, dtype=float)
+        self.modelview = np.asarray(modelview, dtype=float)
+
+    def get_image(self):
+        """ Get the color buffer as a NumPy HxWx3 array of 8-bit RGB values. """
+        return np.clip(np.rint(255.0*self.color_buffer), 0, 255).astype(np.uint8)
+
+    def draw_batch(self, batch):
+        """ Rasterize the primitives of a VisRenderBatch. """
+        if len(batch.indices) == 0:
+            return
+        points, colors = self._transform_vertices(batch)
+        indices = np.asarray(batch.indices, dtype=int)
+        size = max(int(round(batch.size)), 1)
+        if batch.primitive == VisBatchPrimitive.TRIANGLES:
+            self._draw_triangles(points, colors, indices.reshape((-1,3)), batch.cull_face, batch.transparent)
+        elif batch.primitive == VisBatchPrimitive.LINES:
+            self._draw_lines(points, colors, indices.reshape((-1,2)), size, batch.transparent)
+        else:
+            self._draw_points(points, colors, indices, size, batch.transparent)
+
+    def _transform_vertices(self, batch):
+        """ Transform batch vertices into window coordinates and compute their lit colors.
+
+            Returns the NumPy Nx3 array of window x, y and depth coordinates and the NumPy Nx4 array of colors.
+        """
+        vertices = np.asarray(batch.vertices, dtype=float)
+        homogeneous = np.column_stack((vertices, np.ones(len(vertices))))
+        clip = homogeneous.dot(self.modelview.T).dot(self.projection.T)
+        points = np.empty((len(vertices),3), dtype=float)
+        points[:,0] = 0.5 * (clip[:,0] + 1.0) * self.width
+        points[:,1] = 0.5 * (1.0 - clip[:,1]) * self.height
+        points[:,2] = clip[:,2]
+        colors = np.array(batch.colors, dtype=float)
+        if batch.lighting and (batch.normals is not None):
+            normals = np.asarray(batch.normals, dtype=float).dot(self.modelview[:3,:3].T)
+            mags = np.sqrt(np.sum(normals*normals, axis=1))
+            mags[mags == 0.0] = 1.0
+            diffuse = np.maximum(normals[:,2] / mags, 0.0)
+            colors[:,:3] *= LIGHT_AMBIENT + LIGHT_DIFFUSE*diffuse[:,None]
+            np.clip(colors[:,:3], 0.0, 1.0, out=colors[:,:3])
+        return points, colors
+
+    def _draw_triangles(self, points, colors, triangles, cull_face, transparent):
+        """ Rasterize triangles by testing the pixel centers within their bounding boxes. """
+        p0 = points[triangles[:,0]]
+        p1 = points[triangles[:,1]]
+        p2 = points[triangles[:,2]]
+        # Window y increases downward so front facing (counterclockwise) triangles have a negative area.
+        area = (p1[:,0] - p0[:,0])*(p2[:,1] - p0[:,1]) - (p2[:,0] - p0[:,0])*(p1[:,1] - p0[:,1])
+        xs = np.column_stack((p0[:,0], p1[:,0], p2[:,0]))
+        ys = np.column_stack((p0[:,1], p1[:,1], p2[:,1]))
+        xmin = np.maximum(np.ceil(xs.min(axis=1) - 0.5), 0).astype(int)
+        xmax = np.minimum(np.floor(xs.max(axis=1) - 0.5), self.width-1).astype(int)
+        ymin = np.maximum(np.ceil(ys.min(axis=1) - 0.5), 0).astype(int)
+        ymax = np.minimum(np.floor(ys.max(axis=1) - 0.5), self.height-1).astype(int)
+        keep = (area != 0.0) & (xmax >= xmin) & (ymax >= ymin)
+        if cull_face:
+            keep &= (area < 0.0)
+        tri_ids = np.nonzero(keep)[0]
+        box_widths = xmax[tri_ids] - xmin[tri_ids] + 1
+        num_pixels = box_widths * (ymax[tri_ids] - ymin[tri_ids] + 1)
+
+        for ids, widths, counts in self._split_fragments(tri_ids, box_widths, num_pixels):
+            frag_tris = np.repeat(ids, counts)
+            offsets = np.repeat(np.cumsum(counts) - counts, counts)
+            local = np.arange(len(frag_tris)) - offsets
+            frag_widths = np.repeat(widths, counts)
+            px = xmin[frag_tris] + local % frag_widths
+            py = ymin[frag_tris] + local // frag_widths
+            cx = px + 0.5
+            cy = py + 0.5
+            a = p0[frag_tris]
+            b = p1[frag_tris]
+            c = p2[frag_tris]
+            frag_area = area[frag_tris]
+            w0 = ((b[:,0] - cx)*(c[:,1] - cy) - (c[:,0] - cx)*(b[:,1] - cy)) / frag_area
+            w1 = ((c[:,0] - cx)*(a[:,1] - cy) - (a[:,0] - cx)*(c[:,1] - cy)) / frag_area
+            w2 = 1.0 - w0 - w1
+            inside = (w0 >= 0.0) & (w1 >= 0.0) & (w2 >= 0.0)
+            weights = np.column_stack((w0, w1, w2))[inside]
+            frag_tris = frag_tris[inside]
+            depth = np.sum(weights * np.column_stack((a[inside,2], b[inside,2], c[inside,2])), axis=1)
+            frag_colors = np.zeros((len(frag_tris),4), dtype=float)
+            for k in xrange(0,3):
+                frag_colors += weights[:,k,None] * colors[triangles[frag_tris,k]]
+            self._write_fragments(px[inside], py[inside], depth, frag_colors, transparent)
+        #__for ids, widths, counts in self._split_fragments(tri_ids, box_widths, num_pixels)
+
+    def _draw_lines(self, points, colors, lines, size, transparent):
+        """ Rasterize lines by sampling each line once per pixel along its longest window axis. """
+        p0 = points[lines[:,0]]
+        p1 = points[lines[:,1]]
+        lengths = np.ceil(np.max(np.abs(p1[:,:2] - p0[:,:2]), axis=1)).astype(int) + 1
+        line_ids = np.arange(len(lines))
+        for ids, _, counts in self._split_fragments(line_ids, lengths, lengths*size*size):
+            samples = counts // (size*size)
+            frag_lines = np.repeat(ids, samples)
+            offsets = np.repeat(np.cumsum(samples) - samples, samples)
+            t = (np.arange(len(frag_lines)) - offsets) / np.maximum(np.repeat(samples, samples) - 1.0, 1.0)
+            t = t[:,None]
+            sample_points = (1.0 - t)*p0[frag_lines] + t*p1[frag_lines]
+            sample_colors = (1.0 - t)*colors[lines[frag_lines,0]] + t*colors[lines[frag_lines,1]]
+            self._write_sized_fragments(sample_points, sample_colors, size, transparent)
+        #__for ids, _, counts in self._split_fragments(line_ids, lengths, lengths*size*size)
+
+    def _draw_points(self, points, colors, indices, size, transparent):
+        """ Rasterize points as squares of the point size. """
+        self._write_sized_fragments(points[indices], colors[indices], size, transparent)
+
+    def _write_sized_fragments(self, points, colors, size, transparent):
+        """ Write the fragments of a square of the given size of pixels centered at each point. """
+        offsets = np.arange(size) - (size - 1) // 2
+        for dx in offsets:
+            for dy in offsets:
+                px = np.floor(points[:,0]).astype(int) + dx
+                py = np.floor(points[:,1]).astype(int) + dy
+                self._write_fragments(px, py, points[:,2], colors, transparent)
+        #__for dx in offsets
+
+    def _split_fragments(self, ids, widths, counts):
+        """ Split primitives into groups that generate at most MAX_FRAGMENTS fragments. """
+        start = 0
+        total = np.cumsum(counts)
+        while start < len(ids):
+            base = 0
+            if start > 0:
+                base = total[start-1]
+            end = max(np.searchsorted(total, base + MAX_FRAGMENTS, side='right'), start+1)
+            yield ids[start:end], widths[start:end], counts[start:end]
+            start = end
+        #__while start < len(ids)
+
+    def _write_fragments(self, px, py, depth, colors, transparent):
+        """ Write fragments that pass the depth test into the color and depth buffers.
+
+            Only the fragment closest to the viewer is written at each pixel.
+        """
+        keep = (px >= 0) & (px < self.width) & (py >= 0) & (py < self.height) & (depth >= -1.0) & (depth <= 1.0)
+        pixels = (py*self.width + px)[keep]
+        depth = depth[keep]
+        colors = colors[keep]
+        if len(pixels) == 0:
+            return
+        order = np.lexsort((depth, pixels))
+        pixels = pixels[order]
+        first = np.ones(len(pixels), dtype=bool)
+        first[1:] = pixels[1:] != pixels[:-1]
+        pixels = pixels[first]
+        depth = depth[order][first]
+        colors = colors[order][first]
+        depth_buffer = self.depth_buffer.reshape(-1)
+        color_buffer = self.color_buffer.reshape((-1,3))
+        visible = depth < depth_buffer[pixels]
+        pixels = pixels[visible]
+        colors = colors[visible]
+        depth_buffer[pixels] = depth[visible]
+        if transparent:
+            alpha = colors[:,3,None]
+            color_buffer[pixels] = alpha*colors[:,:3] + (1.0 - alpha)*color_buffer[pixels]
+        else:
+            color_buffer[pixels] = colors[:,:3]
+
+#__class VisRasterizer(object)
+
+def write_png(file_name, image):
+    """ Write an image to a PNG file.
+
+        Arguments:
+            file_name (String): The name of the PNG file.
+            image (NumPy HxWx3 ndarray[uint8]): The RGB image. Row 0 is the top of the image.
+    """
+    height, width = image.shape[:2]
+    rows = np.zeros((height, 1 + 3*width), dtype=np.uint8)
+    rows[:,1:] = image.reshape((height, 3*width))
+
+    def chunk(chunk_type, data):
+        crc = zlib.crc32(chunk_type + data) & 0xffffffff
+        return struct.pack("!I", len(data)) + chunk_type + data + struct.pack("!I", crc)
+
+    header = struct.pack("!2I5B", width, height, 8, 2, 0, 0, 0)
+    with open(file_name, 'wb') as png_file:
+        png_file.write(b"\x89PNG\r\n\x1a\n")
+        png_file.write(chunk(b"IHDR", header))
+        png_file.write(chunk(b"IDAT", zlib.compress(rows.tostring(), 6)))
+        png_file.write(chunk(b"IEND", b""))
@@ -0,0 +1,97 @@
+# Copyright 2016 Autodesk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""This module is used to limit the memory used by the geometry of hidden representations.
+
+    The geometry for a representation of a helix, strand or atomic structure
+    is created the first time the representation is shown and is kept when it
+    is hidden so that it can be quickly shown again. Viewing many
+    representations of a large design may then create more geometry than is
+    needed. The VisRepCache class records the order in which representations
+    were last used and removes the geometry of the least recently used hidden
+    representations when the number of vertices of hidden geometry exceeds a
+    budget. A removed representation is created again when it is next shown.
+
+    The objects owning representations implement a remove_rep(rep) method that
+    removes the geometry of a representation from the graphics scene and from
+    their representations dict.
+"""
+from collections import OrderedDict
+import logging
+
+class VisRepCache(object):
+    """ This class removes the geometry of least recently used hidden representations.
+
+        Attributes:
+            entries (OrderedDict): The dict mapping (owner,rep) keys to owners, ordered from the least to the most
+                recently used representation.
+            vertex_budget (int): The maximum number of vertices of hidden representation geometry kept.
+    """
+    DEFAULT_VERTEX_BUDGET = 2000000
+
+    def __init__(self, vertex_budget=DEFAULT_VERTEX_BUDGET):
+        """ Initialize a VisRepCache object.
+
+            Arguments:
+                vertex_budget (int): The maximum number of vertices of hidden representation geometry kept.
+        """
+        self.vertex_budget = vertex_budget
+        self.entries = OrderedDict()
+        self._logger = logging.getLogger(__name__)
+
+    def touch(self, owner, rep):
+        """ Record that a representation has been used.
+
+            Arguments:
+                owner (Object): The object owning the representation (e.g. VisHelix).
+                rep (String): The representation name.
+        """
+        key = (id(owner), rep)
+        self.entries.pop(key, None)
+        self.entries[key] = (owner, rep)
+
+    def evict(self):
+        """ Remove the geometry of the least recently used hidden representations that exceed the vertex budget.
+
+            Returns the number of representations removed.
+        """
+        hidden = []
+        num_hidden_vertices = 0
+        for key,(owner,rep) in self.entries.items():
+            geometry = owner.representations.get(rep)
+            if geometry == None:
+                del self.entries[key]
+                continue
+            if any(geom.visible for geom in geometry):
+                continue
+            num_vertices = sum(geom.num_vertices for geom in geometry)
+            hidden.append((key, num_vertices))
+            num_hidden_vertices += num_vertices
+        #__for key,(owner,rep) in self.entries.items()
+
+        num_removed = 0
+        for key,num_vertices in hidden:
+            if num_hidden_vertices <= self.vertex_budget:
+                break
+            owner, rep = self.entries.pop(key)
+            owner.remove_rep(rep)
+            num_hidden_vertices -= num_vertices
+            num_removed += 1
+        #__for key,num_vertices in hidden
+
+        if num_removed:
+            self._logger.info("Removed the geometry of %d hidden representations." % num_removed)
+        return num_removed
+
+#__class VisRepCache(object)
@@ -0,0 +1,192 @@
+# Copyright 2016 Autodesk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""This module is used to gather the atomic bond and ring geometry of the residues of a DNA strand.
+
+    The bonds representation of an atomic structure (see atomic_struct.py)
+    displays the atomic bonds of each residue as lines and its sugar and base
+    rings as polygons. The VisDnaResidueTables class stores the atoms of the
+    bonds and rings of each DNA residue type as padded index tables so that the
+    bond end points and ring polygon points of all of the residues of a strand
+    are gathered from an array of atom coordinates using array indexing.
+
+    The functions in this module do not use OpenGL so that the gathered
+    geometry can be tested without a graphics context.
+"""
+import numpy as np
+
+class VisDnaBonds:
+    """ This class defines the atom names for atomic bonds. """
+    backbone = [
+        # Phosphate group.
+        ("P", "OP1"), ("P", "OP2"), ("P", "OP3"), ("P", "O5'"),
+        # Sugar
+        ("O5'", "C5'"), ("C5'", "C4'"), ("C4'", "C3'"), ("C3'", "C2'"), ("C2'", "C1'"), ("C1'", "O4'"),
+        ("O4'", "C4'"), ("C3'", "O3'") ]
+
+    # Bases.
+    ade = [ ("C1'", "N9"), ("N9", "C8"), ("C8", "N7"), ("N7", "C5"), ("C5", "C4"), ("C4", "N9"), ("C5", "C6"),
+            ("C6", "N1"), ("N1", "C2"), ("C2", "N3"), ("N3", "C4") ]
+
+    gua = [ ("C1'", "N9"), ("N9", "C8"), ("C8", "N7"), ("N7", "C5"), ("C5", "C4"), ("C4", "N9"),
+            ("C5", "C6"), ("C6", "N1"), ("N1", "C2"), ("C2", "N3"), ("N3", "C4"), ("C6", "O6"), ("C2", "N2") ]
+
+    cyt = [ ("C1'", "N1"), ("N1", "C2"), ("C2", "N3"), ("N3", "C4"), ("C4", "C5"), ("C5", "C6"), ("C6", "N1"),
+            ("C4", "N4"), ("C2", "O2") ]
+
+    thy = [ ("C1'", "N1"), ("N1", "C2"), ("C2", "N3"), ("N3", "C4"), ("C4", "C5"), ("C5", "C6"), ("C6", "N1"),
+            ("C4", "O4"), ("C5", "C7") ]
+
+class VisDnaPlanes:
+    """ This class defines the atom names for ring atoms. """
+    sugar = [ ("C4'", "C3'", "C2'", "C1'", "O4'") ]
+    ade = [ ("N9", "C8", "N7", "C5", "C4"), ("C5", "C6", "N1", "C2", "N3", "C4") ]
+    gua = [ ("N9", "C8", "N7", "C5", "C4"), ("C5", "C6", "N1", "C2", "N3", "C4") ]
+    cyt = [ ("N1", "C6", "C5", "C4", "N3", "C2") ]
+    thy = [ ("N1", "C6", "C5", "C4", "N3", "C2") ]
+
+class VisDnaResidueTables(object):
+    """ This class stores the bond and ring atom index tables for the DNA residue types. 
+
+        Attributes:
+            atom_index (Dict[int]): The dictionary mapping atom names to their index into atom_names.
+            atom_names (List[String]): The list of the names of the atoms in the bonds and rings of all residue types.
+            bonds (NumPy TxBx2 ndarray[int]): The indexes into atom_names of the atoms of the backbone and base bonds
+                of each residue type. Rows are padded with -1.
+            residue_types (List[String]): The list of residue names. The last residue type is used for unknown 
+                residues and only has backbone bonds and the sugar ring.
+            ring_sizes (NumPy TxR ndarray[int]): The number of atoms of the sugar and base rings of each residue type.
+            rings (NumPy TxRxS ndarray[int]): The indexes into atom_names of the atoms of the sugar and base rings of 
+                each residue type. Rows are padded with -1.
+
+        The tables are created from the atom names defined in VisDnaBonds and VisDnaPlanes.
+    """
+    def __init__(self):
+        """ Initialize a VisDnaResidueTables object. """
+        self.residue_types = ["da", "dc", "dg", "dt", None]
+        residue_bonds = [ VisDnaBonds.ade, VisDnaBonds.cyt, VisDnaBonds.gua, VisDnaBonds.thy, [] ]
+        residue_planes = [ VisDnaPlanes.ade, VisDnaPlanes.cyt, VisDnaPlanes.gua, VisDnaPlanes.thy, [] ]
+        self.atom_names = []
+        self.atom_index = {}
+        for names in VisDnaBonds.backbone + VisDnaPlanes.sugar + sum(residue_bonds, []) + sum(residue_planes, []):
+            for name in names:
+                if name not in self.atom_index:
+                    self.atom_index[name] = len(self.atom_names)
+                    self.atom_names.append(name)
+        #__for names in ...
+
+        # Create the bond tables.
+        num_types = len(self.residue_types)
+        max_bonds = len(VisDnaBonds.backbone) + max(len(bonds) for bonds in residue_bonds)
+        self.bonds = np.full((num_types,max_bonds,2), -1, dtype=int)
+        for i,bonds in enumerate(residue_bonds):
+            for j,bond in enumerate(VisDnaBonds.backbone + bonds):
+                self.bonds[i,j] = [self.atom_index[bond[0]], self.atom_index[bond[1]]]
+        #__for i,bonds in enumerate(residue_bonds)
+
+        # Create the ring tables.
+        max_rings = len(VisDnaPlanes.sugar) + max(len(planes) for planes in residue_planes)
+        max_size = max(len(plane) for plane in VisDnaPlanes.sugar + sum(residue_planes, []))
+        self.rings = np.full((num_types,max_rings,max_size), -1, dtype=int)
+        self.ring_sizes = np.zeros((num_types,max_rings), dtype=int)
+        for i,planes in enumerate(residue_planes):
+            for j,plane in enumerate(VisDnaPlanes.sugar + planes):
+                self.rings[i,j,:len(plane)] = [self.atom_index[name] for name in plane]
+                self.ring_sizes[i,j] = len(plane)
+        #__for i,planes in enumerate(residue_planes)
+
+    def get_residue_type(self, res_name):
+        """ Get the index of the type of a residue from its name. """
+        res_name = res_name.strip().lower()
+        if res_name in self.residue_types:
+            return self.residue_types.index(res_name)
+        return len(self.residue_types)-1
+
+    def get_atom_arrays(self, residues, scale):
+        """ Get the arrays of atom coordinates and of the atom rows of each residue. 
+
+            Arguments:
+                residues (List[Dict[Atom]]): The list of residues, each a dictionary mapping atom names to atoms.
+                scale (Float): The scale applied to the atom coordinates.
+
+            Returns the NumPy Nx3 array of the scaled coordinates of the atoms named in atom_names, the NumPy RxM 
+            array of the row into the coordinates array of each of the M named atoms of each residue (-1 if a 
+            residue does not have the atom) and the NumPy R array of residue type indexes.
+        """
+        num_res = len(residues)
+        atom_rows = np.full((num_res,len(self.atom_names)), -1, dtype=int)
+        res_types = np.zeros(num_res, dtype=int)
+        coords = []
+        for i,residue_atoms in enumerate(residues):
+            res_types[i] = self.get_residue_type(residue_atoms["P"].res_name)
+            for atom_name,atom in residue_atoms.iteritems():
+                j = self.atom_index.get(atom_name)
+                if j != None:
+                    atom_rows[i,j] = len(coords)
+                    coords.append(atom.coords)
+        #__for i,residue_atoms in enumerate(residues)
+        coords = scale * np.array(coords, dtype=float).reshape((-1,3))
+        return coords, atom_rows, res_types
+
+    def get_bond_points(self, coords, atom_rows, res_types):
+        """ Get the end points of the bonds of the residues of a strand. 
+
+            Arguments:
+                coords (NumPy Nx3 ndarray[float]): The atom coordinates returned by get_atom_arrays().
+                atom_rows (NumPy RxM ndarray[int]): The atom rows of each residue returned by get_atom_arrays().
+                res_types (NumPy R ndarray[int]): The residue type indexes returned by get_atom_arrays().
+
+            Returns the NumPy Bx3 array of the end points of the bonds within each residue followed by the bond 
+            between its P atom and the O3' atom of the next residue, and the list of the number of bond points up 
+            to and including each residue. Bonds with a missing atom are skipped.
+        """
+        num_res = len(res_types)
+        res_indexes = np.arange(num_res)[:,None,None]
+        bonds = self.bonds[res_types]
+        bond_rows = np.where(bonds >= 0, atom_rows[res_indexes,bonds], -1)
+        res_bond_rows = np.full((num_res,1,2), -1, dtype=int)
+        if num_res > 1:
+            res_bond_rows[:-1,0,0] = atom_rows[:-1,self.atom_index["P"]]
+            res_bond_rows[:-1,0,1] = atom_rows[1:,self.atom_index["O3'"]]
+        bond_rows = np.concatenate((bond_rows, res_bond_rows), axis=1)
+        bond_valid = np.all(bond_rows >= 0, axis=2)
+        bond_points = coords[bond_rows[bond_valid]].reshape((-1,3))
+        bond_indexes = (2*np.cumsum(np.sum(bond_valid, axis=1))).tolist()
+        return bond_points, bond_indexes
+
+    def get_ring_points(self, coords, atom_rows, res_types):
+        """ Get the polygon points of the sugar and base rings of the residues of a strand. 
+
+            Arguments:
+                coords (NumPy Nx3 ndarray[float]): The atom coordinates returned by get_atom_arrays().
+                atom_rows (NumPy RxM ndarray[int]): The atom rows of each residue returned by get_atom_arrays().
+                res_types (NumPy R ndarray[int]): The residue type indexes returned by get_atom_arrays().
+
+            Returns the NumPy Px3 array of the ring polygon points, the list of the number of points of each 
+            polygon and the list of the number of polygons up to and including each residue. Rings with a missing 
+            atom are skipped.
+        """
+        res_indexes = np.arange(len(res_types))[:,None,None]
+        rings = self.rings[res_types]
+        ring_rows = np.where(rings >= 0, atom_rows[res_indexes,rings], -1)
+        ring_valid = (self.ring_sizes[res_types] > 0) & np.all((ring_rows >= 0) | (rings < 0), axis=2)
+        ring_points = coords[ring_rows[ring_valid[:,:,None] & (rings >= 0)]]
+        ring_counts = self.ring_sizes[res_types][ring_valid].tolist()
+        ring_indexes = np.cumsum(np.sum(ring_valid, axis=1)).tolist()
+        return ring_points, ring_counts, ring_indexes
+
+#__class VisDnaResidueTables(object)
+
+# The residue tables are created once and shared by all atomic structures.
+dna_residue_tables = VisDnaResidueTables()
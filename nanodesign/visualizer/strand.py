@@ -26,11 +26,17 @@
       where vhelixNUm = the virtual helix number from cadnano
              startPos = the position in the virtual helix of the first base in
                         the strand.
+
+   When a strand is viewed zoomed out its path, temperature and frames
+   representations are rendered as lines connecting the end points of its
+   domains.
 """
 from collections import OrderedDict
 import logging 
 import numpy as np
-from .geometry import VisGeometryAxes,VisGeometryCylinder,VisGeometryPath,VisGeometrySphere,VisGeometryLines, vector_norm
+from .geometry import VisGeometryAxes,VisGeometryCylinder,VisGeometryCylinderSet,VisGeometryPath,VisGeometrySphere,\
+    VisGeometrySphereSet,VisGeometryLines, vector_norm
+from .lod import get_domain_end_indexes
 
 class VisStrandRepType:
     """ This class defines the strand visualization representation types. """
@@ -51,8 +57,12 @@ class VisStrand(object):
             dna_structure (DnaStructure): The dna structure derived from a DNA design.
             graphics (VisGraphics): The VisGraphics object.
             id (int): The strand id from 0 to the number of strands in the design - 1.
+            lod_path (VisGeometryPath): The path connecting the strand domain end points rendered in place of the 
+                per-base geometry of the strand at a low level of detail.
             name (String): The string representation of the strand name for visualization.
             representations (Dict[List[VisGeometry]): The dictionary storing the list of geometry for a representation.
+            rep_colors (Dict[List[Float]]): The dictionary storing the color set for a representation. 
+            rep_line_widths (Dict[Float]): The dictionary storing the line width set for a representation. 
             tour (List[int]): The list of base IDs defining the stand's path through the DNA design.
             start_helix (int): The number where the strand starts. 
             start_pos (int): The base position in the virtual helix where the strand starts. 
@@ -76,6 +86,9 @@ class VisStrand(object):
         self.color = dna_strand.color
         self.color.append(1.0)
         self.representations = {}
+        self.rep_colors = {}
+        self.rep_line_widths = {}
+        self.lod_path = None
         # Set the strand starting helix ann position within that helix.
         tour = dna_strand.tour
         start_base = tour[0]
@@ -118,8 +131,7 @@ class VisStrand(object):
 
             If the geometry for the representation has not been created then create and store it.
         """
-        if rep not in self.representations:
-            self.create_rep_methods[rep]()
+        self.create_rep(rep)
         for geom in self.representations[rep]:
             geom.visible = show
         if display:
@@ -129,25 +141,72 @@ class VisStrand(object):
         """ Create and store the geometry for the representation if it has not been created. """
         if rep not in self.representations:
             self.create_rep_methods[rep]()
+            # Set the attributes of representation geometry created again after it was removed.
+            if rep in self.rep_colors:
+                self._set_geometry_color(rep, self.rep_colors[rep])
+            if rep in self.rep_line_widths:
+                self._set_geometry_line_width(rep, self.rep_line_widths[rep])
+        self.model.rep_cache.touch(self, rep)
+
+    def remove_rep(self, rep):
+        """ Remove the geometry for the representation from the graphics scene. 
+
+            The geometry is created again the next time the representation is shown.
+        """
+        for geom in self.representations.pop(rep, []):
+            self.graphics.remove_render_geometry(geom)
 
     def set_color(self, rep, color, display=True):
         """ Set the color for the representation. """
         if len(color) == 3:
             color.append(0.5)
+        self.rep_colors[rep] = color[:]
         self.create_rep(rep)
-        for geom in self.representations[rep]:
-            geom.color[:] = color[:]
+        self._set_geometry_color(rep, color)
         if display:
             self.graphics.display()
 
     def set_line_width(self, rep, line_width, display=True):
         """ Set the line width for the representation. """
+        self.rep_line_widths[rep] = line_width
         self.create_rep(rep)
-        for geom in self.representations[rep]:
-            geom.line_width = line_width 
+        self._set_geometry_line_width(rep, line_width)
         if display:
             self.graphics.display()
 
+    def _set_geometry_color(self, rep, color):
+        """ Set the color of the geometry for the representation. """
+        for geom in self.representations[rep]:
+            geom.color[:] = color[:]
+            if isinstance(geom, (VisGeometryCylinderSet,VisGeometrySphereSet)):
+                geom.instance_colors = None
+
+    def _set_geometry_line_width(self, rep, line_width):
+        """ Set the line width of the geometry for the representation. """
+        for geom in self.representations[rep]:
+            geom.line_width = line_width 
+            if geom.lod_proxy:
+                geom.lod_proxy.line_width = line_width 
+
+    def get_lod_indexes(self):
+        """ Get the indexes of the strand bases at the end points of its domains. 
+
+            If the strand is circular then the index of the first base repeated at the end of the strand is included.
+        """
+        return get_domain_end_indexes(self.tour, self.dna_strand.is_circular)
+
+    def get_lod_path(self):
+        """ Get the path connecting the strand domain end points rendered at a low level of detail. """
+        if not self.lod_path:
+            base_coords = self.dna_strand.get_base_coords()
+            # The index of the first base repeated at the end of a circular strand wraps around.
+            indexes = self.get_lod_indexes() % len(base_coords)
+            name = "StrandLod:%s" % self.name
+            self.lod_path = VisGeometryPath(name, base_coords[indexes])
+            self.lod_path.color = self.color
+            self.lod_path.line_width = 2.0
+        return self.lod_path
+
     def print_info(self):
         """ Print strand information. """ 
         start_base = self.tour[0]
@@ -161,6 +220,10 @@ class VisStrand(object):
         """ Create the geometry for the strand domain representation. """
         self.representations[VisStrandRepType.DOMAINS] = []
         radius = 0.2
+        points1 = []
+        points2 = []
+        colors = []
+        domains_data = []
         for i,domain in enumerate(self.dna_strand.domain_list):
             point1,point2 = domain.get_end_points()
             point1 = point1.copy()
@@ -174,10 +237,10 @@ class VisStrand(object):
 
             # Create a sphere to visually mark the first domain.
             if i == 0:
-                v = vector_norm([point2[i] - point1[i] for i in xrange(0,3)])
+                v = vector_norm([point2[j] - point1[j] for j in xrange(0,3)])
                 s = 0.1
                 point3 = point1
-                point1 = [point3[i] + s*v[i] for i in xrange(0,3)]
+                point1 = [point3[j] + s*v[j] for j in xrange(0,3)]
                 ends_highlight_color = [0.0,0.0,0.0,1.0]
                 name = "StrandDomain:%s.%d.%d.start" % (self.name, i, domain.id)
                 geom = VisGeometryCylinder(name, radius, point3, point1)
@@ -186,14 +249,19 @@ class VisStrand(object):
                 self.graphics.add_render_geometry(geom)
                 self.representations[VisStrandRepType.DOMAINS].append(geom)
 
-            name = "StrandDomain:%s.%d.%d" % (self.name, i, domain.id)
-            geom = VisGeometryCylinder(name, radius, point1, point2)
-            geom.color = domain.color
-            geom.selected_callback = self.select_domains 
-            self.representations[VisStrandRepType.DOMAINS].append(geom)
-            self.graphics.add_render_geometry(geom)
+            points1.append(point1)
+            points2.append(point2)
+            colors.append(domain.color)
+            domains_data.append((i, domain.id))
         #__for i,domain in enumerate(self.dna_strand.domain_list)
 
+        name = "StrandDomain:%s" % self.name
+        geom = VisGeometryCylinderSet(name, radius, points1, points2, colors=colors)
+        geom.data = domains_data
+        geom.selected_callback = self.select_domains 
+        self.representations[VisStrandRepType.DOMAINS].append(geom)
+        self.graphics.add_render_geometry(geom)
+
     def select_domains(self, geom, index):
         """ Process strand domain selection.
 
@@ -202,9 +270,7 @@ class VisStrand(object):
                 index (int): The index into the geometry selected.
         """
         base_conn = self.dna_structure.base_connectivity
-        tokens = geom.name.split(".")
-        domain_num = int(tokens[1]) 
-        domain_id = int(tokens[2]) 
+        domain_num,domain_id = geom.data[index]
         domain = self.dna_structure.domain_list[domain_id]
         num_bases = len(domain.base_list)
         start_base = domain.base_list[0]
@@ -241,20 +307,10 @@ class VisStrand(object):
             for base in domain.base_list:
                 base_domain_map[(base.h,base.p)] = domain
         #__for domain in self.dna_strand.domain_list
-        spectrum_colors = self.graphics.get_spectrum_colors()
-        tmin, tmax = self.model.get_domains_temperature_range()
-        colors = []
-        temp_data = []
-        for domain in base_domain_map.values():
-            temp = domain.melting_temperature()
-            temp_data.append(temp)
-            if temp == -500.0:
-                color = [0.5, 0.5, 0.5]
-            else:
-                color = self.graphics.map_value_to_color(spectrum_colors, tmin, tmax, temp)
-            color.append(1.0)
-            colors.append(color)
-        #__for domain in base_domain_map.values()
+        domain_temperatures = self.model.get_domain_temperatures()
+        domain_ids = [domain.id for domain in base_domain_map.values()]
+        temp_data = domain_temperatures.get_temperatures(domain_ids)
+        colors = domain_temperatures.get_colors(domain_ids)
         if self.dna_strand.is_circular:
             colors.append(colors[0])
 
@@ -269,6 +325,8 @@ class VisStrand(object):
         geom.entity_indexes = range(0,len(base_coords))
         geom.data = temp_data 
         geom.selected_callback = self.select_temperature
+        geom.lod_proxy = geom.decimate(self.get_lod_indexes())
+        geom.lod_size = self.dna_structure.dna_parameters.base_pair_rise
         self.representations[VisStrandRepType.TEMPERATURE] = [geom]
         self.graphics.add_render_geometry(geom)
 
@@ -307,6 +365,8 @@ class VisStrand(object):
         geom.color = self.color
         geom.entity_indexes = range(0,len(base_coords))
         geom.selected_callback = self.select_frames
+        geom.lod_proxy = self.get_lod_path()
+        geom.lod_size = self.dna_structure.dna_parameters.base_pair_rise
         self.representations[VisStrandRepType.FRAMES] = [geom]
         self.graphics.add_render_geometry(geom)
 
@@ -348,6 +408,8 @@ class VisStrand(object):
         geom.line_width = 2.0 
         geom.entity_indexes = range(0,len(base_coords))
         geom.selected_callback = self.select_path
+        geom.lod_proxy = geom.decimate(self.get_lod_indexes())
+        geom.lod_size = self.dna_structure.dna_parameters.base_pair_rise
         self.representations[VisStrandRepType.PATH] = [geom]
         self.graphics.add_render_geometry(geom)
 
@@ -449,18 +511,16 @@ class VisStrand(object):
                 self.representations[VisStrandRepType.CONNECTORS] = [geom]
                 self.graphics.add_render_geometry(geom)
 
-            for pt in points1:
-                name = "StrandConnectorsPt1:%s" % self.name
-                sphere = VisGeometrySphere(name, pt, radius)
-                sphere.color = [0.0,0.8,0.0,1]
-                self.representations[VisStrandRepType.CONNECTORS].append(sphere)
-                self.graphics.add_render_geometry(sphere)
-            for pt in points2:
-                name = "StrandConnectorsPt2:%s" % self.name
-                sphere = VisGeometrySphere(name, pt, radius)
-                sphere.color = [0.8,0.0,0.0,1]
-                self.representations[VisStrandRepType.CONNECTORS].append(sphere)
-                self.graphics.add_render_geometry(sphere)
+            name = "StrandConnectorsPt1:%s" % self.name
+            spheres = VisGeometrySphereSet(name, points1, radius)
+            spheres.color = [0.0,0.8,0.0,1]
+            self.representations[VisStrandRepType.CONNECTORS].append(spheres)
+            self.graphics.add_render_geometry(spheres)
+            name = "StrandConnectorsPt2:%s" % self.name
+            spheres = VisGeometrySphereSet(name, points2, radius)
+            spheres.color = [0.8,0.0,0.0,1]
+            self.representations[VisStrandRepType.CONNECTORS].append(spheres)
+            self.graphics.add_render_geometry(spheres)
         #__if len(self.dna_structure.connector_points) != 0
 
 
@@ -0,0 +1,105 @@
+# Copyright 2016 Autodesk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""This module is used to store the melting temperatures and colors of the domains of a DNA structure.
+
+    The temperature representations of helices and strands color domains by
+    mapping their melting temperature to a spectrum of colors using the
+    temperature range of all the domains in the structure. The
+    VisDomainTemperatures class computes the melting temperatures of all the
+    domains in a single pass and maps them to colors once so that they can be
+    shared by all of the temperature representations of a model.
+
+    The functions in this module do not use OpenGL so that the temperatures
+    and colors can be tested without a graphics context.
+"""
+import logging
+import numpy as np
+from ..data.domain import melting_temperatures
+
+# The nonphysical melting temperature given to domains that are not paired.
+UNPAIRED_TEMPERATURE = -500.0
+
+# The color used for domains that are not paired.
+UNPAIRED_COLOR = [0.5, 0.5, 0.5, 1.0]
+
+def map_values_to_colors(colors, vmin, vmax, values):
+    """ Map values to colors.
+
+        Arguments:
+            colors (List[List[Float]]): The list of RGB colors mapped from vmin to vmax.
+            vmin (Float): The value mapped to the first color.
+            vmax (Float): The value mapped to the last color.
+            values (NumPy ndarray[float]): The values to map.
+
+        Returns the NumPy Nx3 array of colors for the values. Values outside of the range [vmin,vmax] are mapped
+        to the first or last color.
+    """
+    colors = np.asarray(colors, dtype=float)
+    values = np.asarray(values, dtype=float)
+    num_colors = len(colors)
+    dv = vmax - vmin
+    if dv != 0.0:
+        f = (num_colors-1) / dv
+        indexes = np.clip(np.trunc(f*(values - vmin)), 0, num_colors-1).astype(int)
+    else:
+        indexes = np.zeros(len(values), dtype=int)
+    return colors[indexes]
+
+class VisDomainTemperatures(object):
+    """ This class stores the melting temperatures and colors of the domains of a DNA structure.
+
+        Attributes:
+            colors (NumPy Nx4 ndarray[float]): The RGBA color of each domain.
+            temperatures (NumPy ndarray[float]): The melting temperature of each domain.
+            tmax (Float): The maximum melting temperature of the paired domains.
+            tmin (Float): The minimum melting temperature of the paired domains.
+
+        The arrays are indexed by domain ID.
+    """
+    def __init__(self, domains, spectrum_colors):
+        """ Initialize a VisDomainTemperatures object.
+
+            Arguments:
+                domains (List[Domain]): The list of domains of a DNA structure, indexed by domain ID.
+                spectrum_colors (List[List[Float]]): The list of RGB colors the temperatures are mapped to.
+        """
+        self._logger = logging.getLogger(__name__)
+        self.temperatures = np.array(melting_temperatures(domains), dtype=float)
+        self.tmin = None
+        self.tmax = None
+        paired = self.temperatures != UNPAIRED_TEMPERATURE
+        if np.any(paired):
+            self.tmin = self.temperatures[paired].min()
+            self.tmax = self.temperatures[paired].max()
+            self._logger.info("Domain temperature range min %g  max %g" % (self.tmin, self.tmax))
+        self.colors = np.empty((len(domains),4), dtype=float)
+        self.colors[:] = UNPAIRED_COLOR
+        if self.tmin != None:
+            self.colors[paired,:3] = map_values_to_colors(spectrum_colors, self.tmin, self.tmax,
+                self.temperatures[paired])
+
+    def get_range(self):
+        """ Get the minimum and maximum melting temperatures of the paired domains. """
+        return self.tmin, self.tmax
+
+    def get_temperatures(self, domain_ids):
+        """ Get the list of melting temperatures for a list of domain IDs. """
+        return self.temperatures[domain_ids].tolist()
+
+    def get_colors(self, domain_ids):
+        """ Get the list of RGBA colors for a list of domain IDs. """
+        return self.colors[domain_ids].tolist()
+
+#__class VisDomainTemperatures(object)
@@ -32,6 +32,7 @@ converter_read_map = { ConverterFileFormats.CADNANO    : 'read_cadnano_file' }
 
 # Define the map between file formats and the functions that write files in that format. 
 converter_write_map = { ConverterFileFormats.VIEWER    : 'write_viewer_file',
+                        ConverterFileFormats.VIEWER_BINARY : 'write_viewer_binary_file',
                         ConverterFileFormats.CADNANO   : 'write_cadnano_file',
                         ConverterFileFormats.CANDO     : 'write_cando_file',
                         ConverterFileFormats.CIF       : 'write_cif_file',
@@ -52,7 +53,7 @@ def parse_args():
     parser.add_argument("-isn", "--inseqname",   help="input sequence name")
     parser.add_argument("-m",   "--modify",      help="create DNA structure using the deleted/inserted bases given in a cadnano design file")
     parser.add_argument("-o",   "--outfile",     help="output file")
-    parser.add_argument("-of",  "--outformat",   help="output file format: cadnano, viewer, cando, cif, pdb, simdna, structure, topology")
+    parser.add_argument("-of",  "--outformat",   help="output file format: cadnano, viewer, viewer_binary, cando, cif, pdb, simdna, structure, topology")
     parser.add_argument("-s",   "--staples",     help="staple operations")
     parser.add_argument("-x",   "--transform",   help="apply a transformation to a set of helices")
     return parser.parse_args(), parser.print_help
@@ -109,7 +110,7 @@ def main():
     else:
         logger.info("Output file format %s" % args.outformat)
         # Make the helix distance a bit larger to better visualization.
-        if args.outformat == ConverterFileFormats.VIEWER:
+        if args.outformat in [ConverterFileFormats.VIEWER, ConverterFileFormats.VIEWER_BINARY]:
             converter.dna_parameters.helix_distance = 2.50
 
     if error_flag:
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+# Copyright 2016 Autodesk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""This module is used to render images of 3D DNA structures defined by caDNAno
+   design files without a graphics window.
+
+   Each design file is read and visualized using the visualization commands
+   given in a file or on the command line (see vis.py). The graphics scene is
+   then rendered offscreen and written to a PNG file named after the design
+   file in the output directory. The same offscreen renderer is used for all of
+   the design files.
+
+   The scene is rendered using an OSMesa OpenGL context when the '-r osmesa'
+   option is given and PyOpenGL can create one, otherwise it is rendered using
+   a software rasterizer. The number of designs rendered per second is printed
+   when all of the design files have been rendered.
+"""
+import os
+import sys
+import time
+import logging
+import argparse
+
+def parse_args():
+    """ Parse command-line arguments. """
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-c",  "--commands",       help="commands",
+        default="helix name=All rep=geometry show=true")
+    parser.add_argument("-cf", "--cmdfile",        help="command file")
+    parser.add_argument("-i",  "--infiles",        help="input files", nargs='+')
+    parser.add_argument("-is", "--inseqfile",      help="input sequence file")
+    parser.add_argument("-isn","--inseqname",      help="input sequence name")
+    parser.add_argument("-o",  "--outdir",         help="output directory", default=".")
+    parser.add_argument("-r",  "--renderer",       help="renderer type (osmesa or software)", default="software")
+    parser.add_argument("-sz", "--size",           help="image width and height", type=int, nargs=2,
+        default=[256,256])
+    return parser.parse_args()
+
+# PyOpenGL selects its platform when it is first imported so the platform must be set before the visualizer
+# modules are imported.
+args = parse_args()
+if args.renderer == "osmesa":
+    os.environ["PYOPENGL_PLATFORM"] = "osmesa"
+
+try:
+    import nanodesign
+except ImportError:
+    import sys
+    base_path = os.path.abspath( os.path.join( os.path.dirname(os.path.abspath( __file__)), '../'))
+    sys.path.append(base_path)
+    import nanodesign
+    sys.path = sys.path[:-1]
+
+from nanodesign.visualizer.model import VisModel
+from nanodesign.visualizer.offscreen import VisOffscreenRenderer
+from nanodesign.converters import Converter
+
+def read_file(file_name, args):
+    """ Read in a cadnano file. """
+    converter = Converter()
+    converter.logger = logging.getLogger('nanodesign.visualizer')
+    converter.read_cadnano_file(file_name, args.inseqfile, args.inseqname)
+    return converter
+
+def main():
+    logger = logging.getLogger("render-images")
+
+    if not args.infiles:
+        logger.error("No input file names given.")
+        sys.exit(1)
+
+    if not os.path.exists(args.outdir):
+        os.makedirs(args.outdir)
+
+    width, height = args.size
+    renderer = VisOffscreenRenderer(width, height, args.renderer)
+    start_time = time.time()
+
+    for file_name in args.infiles:
+        logger.info("Input file name: %s" % file_name)
+        converter = read_file(file_name, args)
+        vis_model = VisModel(file_name, args.cmdfile, args.commands, converter.dna_structure, None)
+        vis_model.start_offscreen()
+        base_name = os.path.splitext(os.path.basename(file_name))[0]
+        image_file_name = os.path.join(args.outdir, base_name + ".png")
+        renderer.write_image(vis_model.graphics, image_file_name)
+        print("Wrote %s" % image_file_name)
+    #__for file_name in args.infiles
+
+    elapsed_time = time.time() - start_time
+    num_designs = len(args.infiles)
+    print("Rendered %d designs in %.2f s (%.2f designs/s, %s renderer)" % (num_designs, elapsed_time,
+        num_designs / elapsed_time, renderer.renderer_type))
+    renderer.destroy()
+
+if __name__ == '__main__':
+    main()
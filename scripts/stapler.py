@@ -23,6 +23,7 @@ import sys
 import json
 import logging
 import argparse
+import multiprocessing
 import numpy as np
 
 try:
@@ -47,10 +48,13 @@ class Stapler(object):
         crossovers_joint      = list of all unique crossover locations, number of currently closed crossovers (1 : single crossover, 2 : double crossover)
         path_crossover_list   = list of paths of domains, [ crossover_joint index of crossover at 3' end of domain , [ crossovers entry for crossover at 3' at end of domain ]
         strand_index          = strand id of path i
+        strand_is_circular    = list of strands: True if the strand is circular
         
         template              = template staple design, list of domain lengths 5' to 3'
         temperature           = monte carlo temperature ( in kT ? )
         energy                = list of paths: energies of paths of current state
+        total_energy          = sum of energies of paths of current state, updated with the energy change of each accepted step
+                                and set to the sum of energy every energy_sum_steps steps so that round-off does not accumulate
         path_probabilities    = probablity to chose path i for step
         uncovered_domain_penalty = energy penalty for domains that are not covered by any template
         template_overhang_penalty_factor = energy penalty for template domains not associated to any path domain = length of template domain * template_overhang_penalty_factor
@@ -73,6 +77,14 @@ class Stapler(object):
             double crossovers map to the same crossovers_joint field
     """
 
+    # Number of steps after which total_energy is set to the sum of the path energies.
+    energy_sum_steps = 1000
+
+    # The attributes used by monte carlo steps that are not part of the system state, sent to replica processes.
+    replica_attributes = ( 'path_list', 'path_crossover_list', 'path_cumulative_probabilities', 'strand_index',
+                           'strand_is_circular', 'template', 'uncovered_domain_penalty', 'template_overhang_penalty_factor',
+                           'step_probabilities', 'standard_domain_length' )
+
     def __init__(self,dna_structure,cadnano_design):
         self.dna_structure = dna_structure
         self.cadnano_design = cadnano_design
@@ -82,10 +94,13 @@ class Stapler(object):
         self.crossovers_joint = [0]
         self.path_crossover_list = []
         self.strand_index = []
+        self.strand_is_circular = [ strand.is_circular for strand in dna_structure.strands ]
         
         self.template = []
         self.energy = []
+        self.total_energy = 0.0
         self.path_probabilities = []
+        self.path_cumulative_probabilities = []
         self.uncovered_domain_penalty = 0.0
         self.template_overhang_penalty_factor = 0.0
         self.temperature = 1.0
@@ -234,7 +249,8 @@ class Stapler(object):
 
         # Calculate total energy of system.
         for path_nr in range(len(self.path_list)):
-            self.energy.append( self._calculate_energy(self.template_positions,self.template_offsets,self.break_positions,self.single_strand_side_exception,self.template_types,path_nr) )
+            self.energy.append( self._calculate_energy(self.template_positions[path_nr],self.template_offsets[path_nr],self.break_positions[path_nr],self.single_strand_side_exception[path_nr],self.template_types[path_nr],path_nr) )
+        self.total_energy = sum(self.energy)
         
         domain_number = 0       #calculate total number of path domains
         for path in self.path_list:
@@ -242,13 +258,19 @@ class Stapler(object):
 
         for path in self.path_list: #set probabilities for each path to be chosen during monte-carlo steps. paths weighted with number of domains
             self.path_probabilities.append( float( len(path) ) / domain_number )
+
+        #cumulative path probabilities used to choose paths, normalized the same way as numpy.random.choice
+        self.path_cumulative_probabilities = np.cumsum(self.path_probabilities)
+        self.path_cumulative_probabilities /= self.path_cumulative_probabilities[-1]
                 
         print "Starting state energy",sum(self.energy),self.energy #TODO
 
     def _calculate_energy(self,template_positions,template_offsets,break_positions,single_strand_side_exception,template_types,path_nr):
-        """ calculate energy of given path in current system state
+        """ calculate energy of given path for the given path state
+            template_positions, template_offsets, break_positions, template_types are the lists for the path, single_strand_side_exception is the value for the path
             fully unbound template domains add ( template_overhang_penalty_factor * length ) to energy
             mismatches in lengths between domain and template domain add ( 1.0 * length ) to energy
+            only the state of path path_nr is used so the cost does not depend on the size of the design
         """
         
         energy=0
@@ -257,11 +279,11 @@ class Stapler(object):
            
         path_copy=path[:]    #make a copy of the path domain lengths
         
-        for template_nr,template_pos in enumerate(template_positions[path_nr]): #project template domains onto current unbroken strand section domains
+        for template_nr,template_pos in enumerate(template_positions): #project template domains onto current unbroken strand section domains
             
-            template_off = template_offsets[path_nr][template_nr]
+            template_off = template_offsets[template_nr]
             
-            template_type = template_types[path_nr][template_nr]
+            template_type = template_types[template_nr]
             
             """ start_pos is first domain of current unbroken strand section
                 end_pos is last domain of current unbroken strand section
@@ -269,10 +291,10 @@ class Stapler(object):
                 end_pos_break is break index right of current unbroken strand section
             """
             
-            start_pos_break = break_positions[path_nr][ ( template_nr - 1 ) % len(break_positions[path_nr]) ]
+            start_pos_break = break_positions[ ( template_nr - 1 ) % len(break_positions) ]
             start_pos = ( start_pos_break + 1 ) // 2
                 
-            end_pos_break = break_positions[path_nr][template_nr]
+            end_pos_break = break_positions[template_nr]
             end_pos = end_pos_break // 2
 
             template_copy=self.template[template_type][:]   #make a copy of the template domain lengths
@@ -344,7 +366,7 @@ class Stapler(object):
             
             #shift positions if wrap around case
             if start_pos_break >= end_pos_break:
-                if ( template_pos >= start_pos ) and ( single_strand_side_exception[path_nr] == 0 ):
+                if ( template_pos >= start_pos ) and ( single_strand_side_exception == 0 ):
                     end_pos += len(self.path_list[path_nr])
                 else:
                     start_pos -= len(self.path_list[path_nr])
@@ -384,32 +406,20 @@ class Stapler(object):
         """
         
         # Determine path to change.
-        current_path = np.random.choice(range(len(self.path_list)), None, p = self.path_probabilities)
+        current_path = int( np.searchsorted(self.path_cumulative_probabilities, np.random.random(), side='right') )
         current_strand = self.strand_index[current_path]
         
         # Determine type of change.
         change_type = np.random.choice((0,1,2,3,4), None, p = self.step_probabilities)
         
-        # Copy system state.
-        crossovers_joint_temp = self.crossovers_joint[:]
-        
-        template_positions_temp = []
-        for element in self.template_positions:
-            template_positions_temp.append(element[:])
-        
-        template_offsets_temp = []
-        for element in self.template_offsets:
-            template_offsets_temp.append(element[:])
-        
-        template_types_temp = []
-        for element in self.template_types:
-            template_types_temp.append(element[:])
-        
-        break_positions_temp = []
-        for element in self.break_positions:
-            break_positions_temp.append(element[:])
-        
-        single_strand_side_exception_temp = self.single_strand_side_exception[:]
+        # Copy the state of the current path. Changes to crossovers_joint are made in place and 
+        # recorded in an undo log so they can be reverted if the step is rejected.
+        template_positions_path = self.template_positions[current_path][:]
+        template_offsets_path = self.template_offsets[current_path][:]
+        template_types_path = self.template_types[current_path][:]
+        break_positions_path = self.break_positions[current_path][:]
+        single_strand_side_exception_path = self.single_strand_side_exception[current_path]
+        crossovers_joint_undo = []
         
         #keep track if step was forbidden because not physical
         forbidden = False
@@ -417,7 +427,7 @@ class Stapler(object):
         if change_type == 0:        #add new break to path
             
             # List of non-broken locations in path.
-            break_positions_available = [pos for pos in range( 2 * len(self.path_list[current_path]) ) if pos not in break_positions_temp[current_path]]
+            break_positions_available = [pos for pos in range( 2 * len(self.path_list[current_path]) ) if pos not in break_positions_path]
 
             if not break_positions_available:   #no positions available
                 print "current path is broken at every position" #TODO
@@ -426,44 +436,44 @@ class Stapler(object):
                 break_pos_new = np.random.choice( break_positions_available )          #roll new break position
                 
                 # Check if single crossover in unique crossover location.
-                if ( ( break_pos_new % 2 ) == 1 ) and ( crossovers_joint_temp[ self.path_crossover_list[current_path][ break_pos_new // 2 ][0] ] < 2 ):
+                if ( ( break_pos_new % 2 ) == 1 ) and ( self.crossovers_joint[ self.path_crossover_list[current_path][ break_pos_new // 2 ][0] ] < 2 ):
                     forbidden = True
                 else:
                     insertion_index = -1
 
-                    # Reduce crossover counter in crossovers_joint_temp if crossover break.
+                    # Reduce crossover counter in crossovers_joint if crossover break.
                     if ( break_pos_new % 2 ) == 1:
-                        crossovers_joint_temp[ self.path_crossover_list[current_path][ break_pos_new // 2 ][0] ] -= 1
+                        self._change_crossover_count( self.path_crossover_list[current_path][ break_pos_new // 2 ][0], -1, crossovers_joint_undo )
 
                     # Unbroken (single break) strand, insert break directly at index 0 of break_positions.
-                    if len(break_positions_temp[current_path]) == 1:
-                        break_positions_temp[current_path].insert(0, break_pos_new)
+                    if len(break_positions_path) == 1:
+                        break_positions_path.insert(0, break_pos_new)
                         insertion_index = 0
-                        break_pos_left = break_positions_temp[current_path][1]
+                        break_pos_left = break_positions_path[1]
                         break_pos_right = break_pos_left
                 
                     # Find insertion index for new break_pos
                     else:
                         #find break positions larger than new break position
-                        breaks_larger = [[index, break_pos] for index, break_pos in enumerate(break_positions_temp[current_path]) if break_pos > break_pos_new]
+                        breaks_larger = [[index, break_pos] for index, break_pos in enumerate(break_positions_path) if break_pos > break_pos_new]
                     
                         if not breaks_larger:   #new break_pos is largest break_pos so far (must be circular strand), insert after previously largest break_pos
                         
                             #find break positions smaller than new break position
-                            breaks_smaller = [[index, break_pos] for index, break_pos in enumerate(break_positions_temp[current_path]) if break_pos < break_pos_new]
+                            breaks_smaller = [[index, break_pos] for index, break_pos in enumerate(break_positions_path) if break_pos < break_pos_new]
                         
                             break_smaller_largest = max(breaks_smaller, key = lambda value: value[1])
-                            break_positions_temp[current_path].insert(break_smaller_largest[0] + 1, break_pos_new)
+                            break_positions_path.insert(break_smaller_largest[0] + 1, break_pos_new)
                             insertion_index = break_smaller_largest[0] + 1
                             break_pos_left = break_smaller_largest[1]
-                            break_pos_right = break_positions_temp[current_path][ ( break_smaller_largest[0] + 2 ) % len(break_positions_temp[current_path]) ]
+                            break_pos_right = break_positions_path[ ( break_smaller_largest[0] + 2 ) % len(break_positions_path) ]
                     
                         else:  #new break_pos is not largest break_pos so far, insert before smallest break_pos larger than new break_pos
                         
                             break_larger_smallest = min(breaks_larger, key = lambda value: value[1])
-                            break_positions_temp[current_path].insert(break_larger_smallest[0], break_pos_new)
+                            break_positions_path.insert(break_larger_smallest[0], break_pos_new)
                             insertion_index = break_larger_smallest[0]
-                            break_pos_left = break_positions_temp[current_path][ ( break_larger_smallest[0] - 1 ) % len(break_positions_temp[current_path]) ]
+                            break_pos_left = break_positions_path[ ( break_larger_smallest[0] - 1 ) % len(break_positions_path) ]
                             break_pos_right = break_larger_smallest[1]
 
                     #current unbroken path wraps around, map values to continous range
@@ -476,16 +486,16 @@ class Stapler(object):
                     domains_left = [domains % len(self.path_list[current_path]) for domains in range( ( break_pos_left + 1 ) // 2, ( break_pos_new // 2 ) + 1 )]
                     domains_right = [domains % len(self.path_list[current_path]) for domains in range( ( break_pos_new + 1 ) // 2, ( break_pos_right // 2 ) + 1 )]
 
-                    template_pos_current = template_positions_temp[current_path][ insertion_index % len(template_positions_temp[current_path]) ]  #save current template_pos
-                    template_off_current = template_offsets_temp[current_path][ insertion_index % len(template_positions_temp[current_path]) ]    #save current template_off
-                    template_type_current = template_types_temp[current_path][ insertion_index % len(template_positions_temp[current_path]) ]    #save current template_type
+                    template_pos_current = template_positions_path[ insertion_index % len(template_positions_path) ]  #save current template_pos
+                    template_off_current = template_offsets_path[ insertion_index % len(template_positions_path) ]    #save current template_off
+                    template_type_current = template_types_path[ insertion_index % len(template_positions_path) ]    #save current template_type
                     
                     template_type_new = np.random.randint( 0, len(self.template) )      #roll new template type
                     template_off_new = np.random.randint( 0 , len(self.template[template_type_new]) )  #roll new template_off
 
                     # existing template_pos is left of new break_pos
-                    if template_positions_temp[current_path][insertion_index % len(template_positions_temp[current_path])] in domains_left:
-                        if single_strand_side_exception_temp[current_path] == 1:
+                    if template_positions_path[insertion_index % len(template_positions_path)] in domains_left:
+                        if single_strand_side_exception_path == 1:
                             """ this case should only occur if the following are true: circular strand, single break, break in domain, template domain identical to break domain, template to the left of break
                                 
                                 template is found in left side, but single_strand_exception = 1 means it is left of its break, = right side from new break
@@ -493,79 +503,79 @@ class Stapler(object):
                                 """
                             template_pos_new = np.random.choice( domains_left )             #roll new template_pos
                         
-                            template_positions_temp[current_path].insert(insertion_index, template_pos_new )    #insert new template_pos left
-                            template_offsets_temp[current_path].insert(insertion_index, template_off_new )      #insert new template_off left
-                            template_types_temp[current_path].insert(insertion_index, template_type_new )       #insert new template type left
+                            template_positions_path.insert(insertion_index, template_pos_new )    #insert new template_pos left
+                            template_offsets_path.insert(insertion_index, template_off_new )      #insert new template_off left
+                            template_types_path.insert(insertion_index, template_type_new )       #insert new template type left
                     
-                            template_positions_temp[current_path][ ( insertion_index + 1 ) % len(template_positions_temp[current_path]) ] = template_pos_current    #insert current template_pos right
-                            template_offsets_temp[current_path][ ( insertion_index + 1 ) % len(template_positions_temp[current_path]) ] = template_off_current      #insert current template_off right
-                            template_types_temp[current_path][ ( insertion_index + 1 ) % len(template_positions_temp[current_path]) ] = template_type_current      #insert current template_type right
+                            template_positions_path[ ( insertion_index + 1 ) % len(template_positions_path) ] = template_pos_current    #insert current template_pos right
+                            template_offsets_path[ ( insertion_index + 1 ) % len(template_positions_path) ] = template_off_current      #insert current template_off right
+                            template_types_path[ ( insertion_index + 1 ) % len(template_positions_path) ] = template_type_current      #insert current template_type right
                     
-                            single_strand_side_exception_temp[current_path] = 0   #change single_strand_exception to 0
+                            single_strand_side_exception_path = 0   #change single_strand_exception to 0
                         else:
                             """ template is found in left side, no single_strand exception, put new template in right side, insert right of current template
                                 """
                             template_pos_new = np.random.choice( domains_right )            #roll new template_pos
 
-                            template_positions_temp[current_path].insert(insertion_index, template_pos_current )    #insert current template_pos left
-                            template_offsets_temp[current_path].insert(insertion_index, template_off_current )      #insert current template_off left
-                            template_types_temp[current_path].insert(insertion_index, template_type_current )      #insert current template_off left
+                            template_positions_path.insert(insertion_index, template_pos_current )    #insert current template_pos left
+                            template_offsets_path.insert(insertion_index, template_off_current )      #insert current template_off left
+                            template_types_path.insert(insertion_index, template_type_current )      #insert current template_off left
                         
-                            template_positions_temp[current_path][ ( insertion_index + 1 ) % len(template_positions_temp[current_path]) ] = template_pos_new    #insert new template_pos right
-                            template_offsets_temp[current_path][ ( insertion_index + 1 ) % len(template_positions_temp[current_path]) ] = template_off_new    #insert new template_off right
-                            template_types_temp[current_path][ ( insertion_index + 1 ) % len(template_positions_temp[current_path]) ] = template_type_new    #insert new template_off right
+                            template_positions_path[ ( insertion_index + 1 ) % len(template_positions_path) ] = template_pos_new    #insert new template_pos right
+                            template_offsets_path[ ( insertion_index + 1 ) % len(template_positions_path) ] = template_off_new    #insert new template_off right
+                            template_types_path[ ( insertion_index + 1 ) % len(template_positions_path) ] = template_type_new    #insert new template_off right
                             #existing template_pos is right of new break_pos
                     else:
                         template_pos_new = np.random.choice( domains_left )             #roll new template_pos
                     
-                        template_positions_temp[current_path].insert(insertion_index, template_pos_new )    #insert new template_pos left
-                        template_offsets_temp[current_path].insert(insertion_index, template_off_new )      #insert new template_off lefft
-                        template_types_temp[current_path].insert(insertion_index, template_type_new )      #insert new template_off lefft
+                        template_positions_path.insert(insertion_index, template_pos_new )    #insert new template_pos left
+                        template_offsets_path.insert(insertion_index, template_off_new )      #insert new template_off lefft
+                        template_types_path.insert(insertion_index, template_type_new )      #insert new template_off lefft
                     
-                        template_positions_temp[current_path][ ( insertion_index + 1 ) % len(template_positions_temp[current_path]) ] = template_pos_current    #insert current template_pos right
-                        template_offsets_temp[current_path][ ( insertion_index + 1 ) % len(template_positions_temp[current_path]) ] = template_off_current      #insert current template_off right
-                        template_types_temp[current_path][ ( insertion_index + 1 ) % len(template_positions_temp[current_path]) ] = template_type_current      #insert current template_off right
+                        template_positions_path[ ( insertion_index + 1 ) % len(template_positions_path) ] = template_pos_current    #insert current template_pos right
+                        template_offsets_path[ ( insertion_index + 1 ) % len(template_positions_path) ] = template_off_current      #insert current template_off right
+                        template_types_path[ ( insertion_index + 1 ) % len(template_positions_path) ] = template_type_current      #insert current template_off right
 
         if change_type == 1:    #remove break from path
             
-            if len(break_positions_temp[current_path]) < 2:
+            if len(break_positions_path) < 2:
                 #print "current path has no free breaks left to remove" #TODO
                 forbidden = True
             else:
                 #roll break to remove
-                break_index = np.random.randint( 0 , len(break_positions_temp[current_path]) - ( not self.dna_structure.strands[current_strand].is_circular )  )
+                break_index = np.random.randint( 0 , len(break_positions_path) - ( not self.strand_is_circular[current_strand] )  )
             
                 #roll which template (left or right of break) to delete
                 template_left_or_right = np.random.choice((0,1))
-                template_index_to_delete = ( break_index + template_left_or_right ) % len(template_positions_temp[current_path])
+                template_index_to_delete = ( break_index + template_left_or_right ) % len(template_positions_path)
             
                 #circular strand and single break will remain: check for single_strand_side_exception status
-                if ( len(template_positions_temp[current_path]) == 2 ) and self.dna_structure.strands[current_strand].is_circular:
+                if ( len(template_positions_path) == 2 ) and self.strand_is_circular[current_strand]:
                     template_index_to_keep = 1 - template_index_to_delete
                     break_index_to_keep = 1 - break_index
                     #remaining break and template are on same domain, save on which side remaining template is relative to remaining break: 0 = right, 1 = left
-                    if ( template_positions_temp[current_path][template_index_to_keep] == ( break_positions_temp[current_path][break_index_to_keep] // 2 ) ) and ( ( break_positions_temp[current_path][break_index_to_keep] % 2 ) == 0 ):
-                        single_strand_side_exception_temp[current_path] = 1 - template_left_or_right
+                    if ( template_positions_path[template_index_to_keep] == ( break_positions_path[break_index_to_keep] // 2 ) ) and ( ( break_positions_path[break_index_to_keep] % 2 ) == 0 ):
+                        single_strand_side_exception_path = 1 - template_left_or_right
             
-                #increase crossover counter in crossovers_joint_temp if crossover break
-                if ( break_positions_temp[current_path][break_index] % 2 ) == 1:
-                        crossovers_joint_temp[ self.path_crossover_list[current_path][ break_positions_temp[current_path][break_index] // 2 ][0] ] += 1
+                #increase crossover counter in crossovers_joint if crossover break
+                if ( break_positions_path[break_index] % 2 ) == 1:
+                        self._change_crossover_count( self.path_crossover_list[current_path][ break_positions_path[break_index] // 2 ][0], +1, crossovers_joint_undo )
                 
                 #delete chosen break and template
-                del break_positions_temp[current_path][break_index]
-                del template_positions_temp[current_path][template_index_to_delete]
-                del template_offsets_temp[current_path][template_index_to_delete]
-                del template_types_temp[current_path][template_index_to_delete]
+                del break_positions_path[break_index]
+                del template_positions_path[template_index_to_delete]
+                del template_offsets_path[template_index_to_delete]
+                del template_types_path[template_index_to_delete]
 
         if change_type == 2:    #move break
         
-            if ( len(break_positions_temp[current_path]) - ( not self.dna_structure.strands[current_strand].is_circular ) ) == 0:
+            if ( len(break_positions_path) - ( not self.strand_is_circular[current_strand] ) ) == 0:
                 #can't move, is linear strand with only ending break
                 forbidden = True
             else:
                 #roll break to move
-                break_index = np.random.randint( 0 , len(break_positions_temp[current_path]) - ( not self.dna_structure.strands[current_strand].is_circular )  )
-                break_pos = break_positions_temp[current_path][break_index]
+                break_index = np.random.randint( 0 , len(break_positions_path) - ( not self.strand_is_circular[current_strand] )  )
+                break_pos = break_positions_path[break_index]
                 
                 """ TODO
                     choose step direction and distance
@@ -574,11 +584,11 @@ class Stapler(object):
                 step = np.random.choice((-5,-4,-3,-2,-1,1,2,3,4,5),p=(0.025,0.025,0.05,0.15,0.25,0.25,0.15,0.05,0.025,0.025)) #roll step distance
                 
                 #break_pos left and right of current break_pos
-                break_limit_left = break_positions_temp[current_path][ ( break_index - 1 ) % len(break_positions_temp[current_path]) ]
-                break_limit_right = break_positions_temp[current_path][ ( break_index + 1 ) % len(break_positions_temp[current_path]) ]
+                break_limit_left = break_positions_path[ ( break_index - 1 ) % len(break_positions_path) ]
+                break_limit_right = break_positions_path[ ( break_index + 1 ) % len(break_positions_path) ]
                 
-                template_limit_left = 2 * template_positions_temp[current_path][ break_index ]
-                template_limit_right = 2 * template_positions_temp[current_path][ ( break_index + 1 ) % len(break_positions_temp[current_path]) ]
+                template_limit_left = 2 * template_positions_path[ break_index ]
+                template_limit_right = 2 * template_positions_path[ ( break_index + 1 ) % len(break_positions_path) ]
                 
                 # if limiting breaks are on limiting domains, move limits closer (modulo wrapping omitted because done in next step anyway
                 limit_left = template_limit_left + ( template_limit_left == break_limit_left )
@@ -586,7 +596,7 @@ class Stapler(object):
                 
                 #shift limit by path length * 2 if wrap around case
                 if template_limit_left >= template_limit_right:
-                    if break_pos > limit_left  or ( single_strand_side_exception_temp[current_path] == 1 ):
+                    if break_pos > limit_left  or ( single_strand_side_exception_path == 1 ):
                         limit_right += 2 * len(self.path_list[current_path])
                     else:
                         limit_left -= 2 * len(self.path_list[current_path])
@@ -594,7 +604,7 @@ class Stapler(object):
                 break_pos_new = break_pos + step
 
                 #check if new break_pos is outside of limits, or if break is trapped between two templates on same domain
-                if ( break_pos_new > limit_right ) or ( break_pos_new < limit_left ) or ( ( break_pos == template_limit_left ) and ( break_pos == template_limit_right ) and ( len(break_positions_temp[current_path]) > 1 ) ):
+                if ( break_pos_new > limit_right ) or ( break_pos_new < limit_left ) or ( ( break_pos == template_limit_left ) and ( break_pos == template_limit_right ) and ( len(break_positions_path) > 1 ) ):
                     forbidden = True
                 else:
                     #shift new break_pos back to real coordinates
@@ -602,39 +612,39 @@ class Stapler(object):
                 
                     #check if crossover is broken, and if yes if its a single crossover
                     if ( break_pos_new % 2 ) == 1:  #two step check, because linear strands do not have crossover entry for last segment
-                        if crossovers_joint_temp[ self.path_crossover_list[current_path][ break_pos_new // 2 ][0] ] == 1:
+                        if self.crossovers_joint[ self.path_crossover_list[current_path][ break_pos_new // 2 ][0] ] == 1:
                             forbidden = True
                     if not forbidden:
                         #adjust unique crossover position counters
                         if ( break_pos % 2 ) == 1:
-                            crossovers_joint_temp[ self.path_crossover_list[current_path][ break_pos // 2 ][0] ] += 1
+                            self._change_crossover_count( self.path_crossover_list[current_path][ break_pos // 2 ][0], +1, crossovers_joint_undo )
                 
                         if ( break_pos_new % 2 ) == 1:
-                            crossovers_joint_temp[ self.path_crossover_list[current_path][ break_pos_new // 2 ][0] ] -= 1
+                            self._change_crossover_count( self.path_crossover_list[current_path][ break_pos_new // 2 ][0], -1, crossovers_joint_undo )
                 
                         #change break_pos
-                        break_positions_temp[current_path][break_index] = break_pos_new
+                        break_positions_path[break_index] = break_pos_new
 
                         """" check if circular strand and only one break, control single_strand_side_exception status
                             if = 1, all moves will change state to 0 (even a full circle around a single-segment path)
                             if = 0, if new domain = template domain, if move to the left, set to 1, if move to the right, set to 0
                         """
-                        if self.dna_structure.strands[current_strand].is_circular and ( len(break_positions_temp[current_path]) == 1 ):
-                            if single_strand_side_exception_temp[current_path] == 1:
-                                single_strand_side_exception_temp[current_path] = 0
-                            elif ( template_positions_temp[current_path][0] == ( break_positions_temp[current_path][0] // 2 ) ) and ( ( break_positions_temp[current_path][0] % 2 ) == 0 ):
+                        if self.strand_is_circular[current_strand] and ( len(break_positions_path) == 1 ):
+                            if single_strand_side_exception_path == 1:
+                                single_strand_side_exception_path = 0
+                            elif ( template_positions_path[0] == ( break_positions_path[0] // 2 ) ) and ( ( break_positions_path[0] % 2 ) == 0 ):
                                 if step < 0:
-                                    single_strand_side_exception_temp[current_path] = 1
+                                    single_strand_side_exception_path = 1
 
         if change_type == 3:    #move template
             
             #roll template to move
-            template_index = np.random.randint( 0 , len(template_positions_temp[current_path]) )
-            template_pos = template_positions_temp[current_path][template_index]
+            template_index = np.random.randint( 0 , len(template_positions_path) )
+            template_pos = template_positions_path[template_index]
 
             #break_pos left and right of current template_pos
-            limit_right = break_positions_temp[current_path][ template_index ]
-            limit_left = break_positions_temp[current_path][ ( template_index - 1 ) % len(break_positions_temp[current_path]) ]
+            limit_right = break_positions_path[ template_index ]
+            limit_left = break_positions_path[ ( template_index - 1 ) % len(break_positions_path) ]
 
             step_pos = 0
             step_off = 0
@@ -649,7 +659,7 @@ class Stapler(object):
         
             #shift limit by path length * 2 if wrap around case
             if limit_left >= limit_right:
-                if template_pos * 2 >= limit_left  and ( single_strand_side_exception_temp[current_path] == 0 ):
+                if template_pos * 2 >= limit_left  and ( single_strand_side_exception_path == 0 ):
                     limit_right += 2 * len(self.path_list[current_path])
                 else:
                     limit_left -= 2 * len(self.path_list[current_path])
@@ -657,42 +667,42 @@ class Stapler(object):
             limit_left = ( limit_left + 1 ) // 2
             limit_right = limit_right // 2
             template_pos_new = template_pos + step_pos
-            template_off_new = template_offsets_temp[current_path][template_index] + step_off
+            template_off_new = template_offsets_path[template_index] + step_off
 
             #check if new position and new offset are in physical limits
-            if ( template_pos_new > limit_right ) or ( template_pos_new < limit_left ) or ( template_off_new < 0 ) or ( template_off_new >= len(self.template[ template_types_temp[current_path][template_index] ]) ):
+            if ( template_pos_new > limit_right ) or ( template_pos_new < limit_left ) or ( template_off_new < 0 ) or ( template_off_new >= len(self.template[ template_types_path[template_index] ]) ):
                 forbidden = True
             else:
                 #shift new template_pos back to real coordinates
                 template_pos_new = template_pos_new % len(self.path_list[current_path])
                     
                 #change template_pos, template_off
-                template_positions_temp[current_path][template_index] = template_pos_new
-                template_offsets_temp[current_path][template_index] = template_off_new
+                template_positions_path[template_index] = template_pos_new
+                template_offsets_path[template_index] = template_off_new
                         
                 """" check if circular and only break, control single_strand_side_exception status
                     if = 1, all moves will change state to 0 (even a full circle around a single-segment path)
                     if = 0, if new domain = template domain, if move to the left, set to 1, if move to the right, set to 0
                 """
-                if self.dna_structure.strands[current_strand].is_circular and ( len(template_positions_temp[current_path]) == 1 ):
-                    if single_strand_side_exception_temp[current_path] == 1:
-                        single_strand_side_exception_temp[current_path] = 0
-                    elif ( template_positions_temp[current_path][0] == ( break_positions_temp[current_path][0] // 2 ) ) and ( ( break_positions_temp[current_path][0] % 2 ) == 0 ):
+                if self.strand_is_circular[current_strand] and ( len(template_positions_path) == 1 ):
+                    if single_strand_side_exception_path == 1:
+                        single_strand_side_exception_path = 0
+                    elif ( template_positions_path[0] == ( break_positions_path[0] // 2 ) ) and ( ( break_positions_path[0] % 2 ) == 0 ):
                         if step_pos > 0:
-                            single_strand_side_exception_temp[current_path] = 1
+                            single_strand_side_exception_path = 1
 
         if change_type == 4:    #change template type
         
             template_type_new = np.random.randint( 0, len(self.template) )  #roll new template type
-            template_index = np.random.randint( 0 , len(template_positions_temp[current_path]) ) #roll template index
+            template_index = np.random.randint( 0 , len(template_positions_path) ) #roll template index
             
             #check if current template offset is compatible with new template type = (offset < length)
-            if template_offsets_temp[current_path][template_index] < len(self.template[template_type_new]):
-                template_types_temp[current_path][template_index] = template_type_new
+            if template_offsets_path[template_index] < len(self.template[template_type_new]):
+                template_types_path[template_index] = template_type_new
             else:
                 forbidden = True
 
-        energy_new = self._calculate_energy(template_positions_temp,template_offsets_temp,break_positions_temp,single_strand_side_exception_temp,template_types_temp,current_path)
+        energy_new = self._calculate_energy(template_positions_path,template_offsets_path,break_positions_path,single_strand_side_exception_path,template_types_path,current_path)
         energy_diff = energy_new - self.energy[current_path]
         
         p = np.exp(- energy_diff / self.temperature)
@@ -700,18 +710,31 @@ class Stapler(object):
         random_draw = np.random.random()
         
         if p > random_draw:
-            self.crossovers_joint = crossovers_joint_temp
-            self.template_positions = template_positions_temp
-            self.template_offsets = template_offsets_temp
-            self.template_types = template_types_temp
-            self.break_positions = break_positions_temp
-            self.single_strand_side_exception = single_strand_side_exception_temp
+            self.template_positions[current_path] = template_positions_path
+            self.template_offsets[current_path] = template_offsets_path
+            self.template_types[current_path] = template_types_path
+            self.break_positions[current_path] = break_positions_path
+            self.single_strand_side_exception[current_path] = single_strand_side_exception_path
+            self.total_energy += energy_diff
             self.energy[current_path] = energy_new
             acceptance = ( True and not forbidden )
         else:
+            for index, count in reversed(crossovers_joint_undo):
+                self.crossovers_joint[index] = count
             acceptance = False
 
         return acceptance, change_type
+
+    def _sum_energy(self):
+        """ set total_energy to the sum of the path energies, discarding the round-off accumulated from energy changes
+        """
+        self.total_energy = sum(self.energy)
+
+    def _change_crossover_count(self, index, change, undo_log):
+        """ change the number of closed crossovers at unique crossover location index, record the previous count in undo_log
+        """
+        undo_log.append( ( index, self.crossovers_joint[index] ) )
+        self.crossovers_joint[index] += change
     
     def generate(self,nr_steps,nr_steps_timescale,temperature_adjust_rate):
         #approximate average acceptance rate for each step type over last 10000 steps
@@ -722,9 +745,11 @@ class Stapler(object):
         counter = 0
         
         for step_nr in range(nr_steps):
-            energy_previous = sum(self.energy)
+            if step_nr % self.energy_sum_steps == 0:
+                self._sum_energy()
+            energy_previous = self.total_energy
             acceptance_current, type = self._take_step()
-            energy_new = sum(self.energy)
+            energy_new = self.total_energy
             if energy_new == energy_previous:
                 counter += 1
             else:
@@ -738,12 +763,99 @@ class Stapler(object):
             if energy_rate > 0.0:
                 self.temperature *= temperature_adjust_rate
             if step_nr % 1000 == 0:
-                print "step",step_nr,"acceptance_rate",acceptance_rate,"step type",type,"energy",sum(self.energy),"temp",self.temperature,"e rate",energy_rate #TODO
+                print "step",step_nr,"acceptance_rate",acceptance_rate,"step type",type,"energy",self.total_energy,"temp",self.temperature,"e rate",energy_rate #TODO
         
+        self._sum_energy()
         self._break_json()
 
         return
 
+    def get_state(self):
+        """ get a copy of the system state
+        """
+        self._sum_energy()
+        return { 'template_types'               : [ element[:] for element in self.template_types ],
+                 'template_positions'           : [ element[:] for element in self.template_positions ],
+                 'template_offsets'             : [ element[:] for element in self.template_offsets ],
+                 'break_positions'              : [ element[:] for element in self.break_positions ],
+                 'single_strand_side_exception' : self.single_strand_side_exception[:],
+                 'crossovers_joint'             : self.crossovers_joint[:],
+                 'energy'                       : self.energy[:],
+                 'total_energy'                 : self.total_energy
+               }
+
+    def get_replica_data(self):
+        """ get the data used by monte carlo steps that is not part of the system state
+        """
+        return dict( ( name, getattr(self, name) ) for name in self.replica_attributes )
+
+    def set_state(self,state):
+        """ set the system state from a state returned by get_state
+        """
+        self.template_types = [ element[:] for element in state['template_types'] ]
+        self.template_positions = [ element[:] for element in state['template_positions'] ]
+        self.template_offsets = [ element[:] for element in state['template_offsets'] ]
+        self.break_positions = [ element[:] for element in state['break_positions'] ]
+        self.single_strand_side_exception = state['single_strand_side_exception'][:]
+        self.crossovers_joint = state['crossovers_joint'][:]
+        self.energy = state['energy'][:]
+        self._sum_energy()
+
+    def generate_replica_exchange(self,nr_steps,temperatures,nr_steps_exchange,processes=None):
+        """ do monte carlo steps with replica exchange (parallel tempering)
+            one replica of the system state is run at each temperature in temperatures, starting from the current state
+            every nr_steps_exchange steps the states of replicas at neighboring temperatures are exchanged with probability
+                min( 1, exp( ( E_i - E_j ) * ( 1/T_i - 1/T_j ) ) )
+            replicas are run on a pool of processes processes (default: number of cpus). the path and crossover tables are
+            sent to each process once by the pool initializer, only the replica states are sent for each exchange
+            the lowest energy state found is set as the system state and written into cadnano_design
+        """
+        global _replica_stapler
+        nr_replicas = len(temperatures)
+        states = [ self.get_state() for temperature in temperatures ]
+        best_state = self.get_state()
+        nr_exchanges = max( 1, nr_steps // nr_steps_exchange )
+        exchanges_accepted = [0] * ( nr_replicas - 1 )
+        exchanges_tried = [0] * ( nr_replicas - 1 )
+
+        replica_data = self.get_replica_data()
+        pool = None
+        if processes != 1:
+            pool = multiprocessing.Pool(processes, _init_replica, (replica_data,))
+        else:
+            _init_replica(replica_data)
+        try:
+            for exchange_nr in range(nr_exchanges):
+                seeds = np.random.randint( 0, 2**31 - 1, nr_replicas )
+                args = [ ( states[i], temperatures[i], nr_steps_exchange, seeds[i] ) for i in range(nr_replicas) ]
+                if pool:
+                    states = pool.map( _run_replica, args )
+                else:
+                    states = map( _run_replica, args )
+
+                for state in states:
+                    if state['total_energy'] < best_state['total_energy']:
+                        best_state = state
+
+                # Exchange states of neighboring temperatures, alternating between even and odd pairs.
+                for i in range( exchange_nr % 2, nr_replicas - 1, 2 ):
+                    delta = ( states[i]['total_energy'] - states[i+1]['total_energy'] ) * ( 1.0 / temperatures[i] - 1.0 / temperatures[i+1] )
+                    exchanges_tried[i] += 1
+                    if ( delta >= 0.0 ) or ( np.random.random() < np.exp(delta) ):
+                        states[i], states[i+1] = states[i+1], states[i]
+                        exchanges_accepted[i] += 1
+
+                self._logger.debug("Replica exchange %d energies %s best %g" % (exchange_nr, str([ state['total_energy'] for state in states ]), best_state['total_energy']))
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+            _replica_stapler = None
+
+        self._logger.info("Replica exchange acceptance %s" % str([ float(accepted) / max(tried, 1) for accepted, tried in zip(exchanges_accepted, exchanges_tried) ]))
+        self.set_state(best_state)
+        self._break_json()
+
     def _break_json(self):
         """ write all breaks into cadnano_design
         """
@@ -847,16 +959,47 @@ class Stapler(object):
 
     #__def _break_json
 
+# The Stapler used to run replicas in a process, created by _init_replica().
+_replica_stapler = None
+
+def _init_replica(replica_data):
+    """ create the stapler used to run replicas in a process from the data returned by Stapler.get_replica_data()
+    """
+    global _replica_stapler
+    stapler = Stapler.__new__(Stapler)
+    stapler.__dict__.update(replica_data)
+    stapler._logger = logging.getLogger("stapler")
+    _replica_stapler = stapler
+
+def _run_replica(args):
+    """ run monte carlo steps for a replica state at a temperature, return the new state
+    """
+    state, temperature, nr_steps, seed = args
+    stapler = _replica_stapler
+    stapler.set_state(state)
+    stapler.temperature = temperature
+    # Restore the random state afterwards so replicas run in process do not change the random numbers of the caller.
+    random_state = np.random.get_state()
+    np.random.seed(seed)
+    for step_nr in range(nr_steps):
+        if step_nr % stapler.energy_sum_steps == 0:
+            stapler._sum_energy()
+        stapler._take_step()
+    np.random.set_state(random_state)
+    return stapler.get_state()
+
 def main():
     
     converter = Converter()
 
     # TODO: I removed some abspath stuff here so that it just tries to expand the first argument, that way this can be called from different relative paths. Remove this comment or edit to match a consistent style for argument handling.
-    if (len(sys.argv) != 2):
+    if (len(sys.argv) != 2) and (len(sys.argv) != 3):
         sys.stderr.write("**** ERROR: Wrong number of arguments.\n") 
-        sys.stderr.write("Usage: stapler.py <filename>\n")
+        sys.stderr.write("Usage: stapler.py <filename> [<number of replicas>]\n")
         sys.stderr.write("Output: If <filename> is path/name.json, output will be placed in path/name_recode.json\n")
+        sys.stderr.write("If a number of replicas is given then replicas are run in parallel with replica exchange.\n")
         sys.exit(1)
+    nr_replicas = int(sys.argv[2]) if len(sys.argv) == 3 else 1
     
     file_full_path_and_name = os.path.abspath( os.path.expanduser( sys.argv[1] ))
     file_name = os.path.basename( file_full_path_and_name )
@@ -896,7 +1039,12 @@ def main():
     stapler.temperature = 10.0
     nr_steps = 10000000
     nr_steps_timescale = 10000
-    stapler.generate(nr_steps, nr_steps_timescale, 0.999975)
+    if nr_replicas > 1:
+        # Geometric temperature ladder from 0.1 to the starting temperature.
+        temperatures = list( np.logspace(np.log10(0.1), np.log10(stapler.temperature), nr_replicas) )
+        stapler.generate_replica_exchange(nr_steps, temperatures, nr_steps_timescale)
+    else:
+        stapler.generate(nr_steps, nr_steps_timescale, 0.999975)
 
     # For an overnight run, the paramaters (1e8, 1e4, 0.9999998047) should get to an error free structure.
 
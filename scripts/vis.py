@@ -52,6 +52,11 @@
    file named 'vis.cmd'. These commands can be saved to a file and read in to
    perform operations when the visualizer starts. Commands can also be executed
    from the command line as a semicolon-separated string.
+
+   The graphics window is displayed before the design file is read. The design
+   is read, and the geometry for the representations given by commands is
+   created, on a loading thread; the geometry is displayed as it is created.
+   The popup menu is available when loading has finished.
 """
 import os
 import re
@@ -94,23 +99,16 @@ def read_file(args, logger):
     logger = logging.getLogger('nanodesign.visualizer')
     converter.logger = logger
 
-    if args.infile == None:
-        logger.error("No input file name given.")
-        sys.exit(1)
-    else:
-        logger.info("Input file name: %s" % args.infile)
-        infile = args.infile
-
+    logger.info("Input file name: %s" % args.infile)
     converter.read_cadnano_file( args.infile, args.inseqfile, args.inseqname )
 
     return converter
 
-def main():
-    logger = logging.getLogger("vis")
-
-    # Get command-line arguments.
-    args = parse_args()
+def read_structure(args, logger):
+    """ Read in a cadnano file and create the dna structure and its atomic structure. 
 
+        This is called on the loading thread.
+    """
     # Read cadnano file and create dna structure.
     converter = read_file(args, logger)
     dna_structure = converter.dna_structure
@@ -129,11 +127,23 @@ def main():
     else:
         atomic_structure = None
 
+    return dna_structure, atomic_structure
+
+def main():
+    logger = logging.getLogger("vis")
+
+    # Get command-line arguments.
+    args = parse_args()
+
+    if args.infile == None:
+        logger.error("No input file name given.")
+        sys.exit(1)
+
     # Initialize visualization.
-    vis_model = VisModel(args.infile, args.cmdfile, args.commands, dna_structure, atomic_structure)
+    vis_model = VisModel(args.infile, args.cmdfile, args.commands, None, None)
 
-    # Start interactive visualization. 
-    vis_model.start_interactive()
+    # Start interactive visualization while the cadnano file is loaded. 
+    vis_model.start_loading(lambda: read_structure(args, logger))
 
 if __name__ == '__main__':
     main()
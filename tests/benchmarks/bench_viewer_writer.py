@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# Copyright 2016 Autodesk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+""" 
+This script times the serialization of domains by the viewer writer for caDNAno designs of increasing size.
+
+The time per base should stay roughly constant as the number of bases increases. 
+
+Usage:
+    ./bench_viewer_writer.py [design names]
+"""
+import logging
+import os
+import sys
+import time
+
+tests_path = os.path.dirname( os.path.abspath( __file__ ))
+samples_path = os.path.join( tests_path, '../samples/')
+sys.path.append( os.path.join( tests_path, '../../' ))
+
+from nanodesign.converters.converter import Converter
+from nanodesign.converters.viewer.writer import ViewerWriter
+
+default_designs = [ "fourhelix", "flat_sheet", "beachball", "aNANO_3D_7_14_final", "monolith" ]
+
+def time_domain_info( name ):
+    """ Time ViewerWriter._get_domain_info() for a design. """
+    converter = Converter()
+    converter.read_cadnano_file( os.path.join(samples_path, name + ".json"), None, "M13mp18" )
+    dna_structure = converter.dna_structure
+    dna_structure.compute_aux_data()
+    viewer_writer = ViewerWriter( dna_structure, converter.dna_parameters )
+    start_time = time.time()
+    viewer_writer._get_domain_info( dna_structure )
+    elapsed_time = time.time() - start_time
+    return len(dna_structure.base_connectivity), len(dna_structure.domain_list), elapsed_time
+
+def main():
+    logging.basicConfig( level=logging.ERROR )
+    designs = sys.argv[1:] if len(sys.argv) > 1 else default_designs 
+    print "%24s %10s %10s %10s %14s" % ("design", "bases", "domains", "time (s)", "time/base (us)")
+    for name in designs:
+        num_bases, num_domains, elapsed_time = time_domain_info( name )
+        print "%24s %10d %10d %10.3f %14.2f" % (name, num_bases, num_domains, elapsed_time, 1e6*elapsed_time/num_bases)
+
+if __name__ == '__main__':
+    main()
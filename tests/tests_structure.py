@@ -0,0 +1,1065 @@
+# Copyright 2016 Autodesk Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+import imp
+import json
+import os.path
+import sys
+import types
+import numpy as np
+
+###################
+# Setup path data #
+###################
+
+tests_path = os.path.dirname( os.path.abspath( __file__ ))
+samples_path = os.path.join( tests_path, 'samples/')
+base_path = os.path.abspath( os.path.join( tests_path, '../' ))
+
+if base_path not in sys.path:
+    sys.path.append(base_path)
+
+from nanodesign.converters.cadnano import convert_design
+from nanodesign.converters.cadnano.convert_design import CadnanoConvertDesign
+from nanodesign.converters.cadnano.utils import compute_nucleotide_coordinates,generate_coordinates,vrrotmat2vec,\
+    vrrotvec2mat
+from nanodesign.converters.cando.writer import CandoWriter
+from nanodesign.converters.converter import Converter
+from nanodesign.converters.pdbcif.atomic_structure import AtomicStructure
+from nanodesign.converters.simdna.writer import SimDnaWriter
+from nanodesign.converters.viewer.binary_format import read_binary_viewer_file
+from nanodesign.converters.viewer.compare import ViewerFile,get_occurrences,match_rows
+from nanodesign.converters.viewer.writer import ViewerWriter
+from nanodesign.data.dna_structure_helix import DnaStructureHelix
+from nanodesign.data.domain import melting_temperatures
+from nanodesign.data.energymodel import energy_model
+from nanodesign.utils.json_emitter import JsonArray,JsonEmitter
+from nanodesign.utils.json_reader import JsonReader
+from nanodesign.utils.xform import Xform,HelixGroupXform,solve_helix_group_xforms
+from nanodesign.visualizer.batch import VisBatchItem,VisBatchPrimitive,line_strip_indices,pack_batches
+from nanodesign.visualizer.bvh import VisBvh,intersect_line_segments,intersect_line_spheres,intersect_line_triangles
+from nanodesign.visualizer.extent import VisExtent
+from nanodesign.visualizer.lod import VisLodLevel,get_domain_end_indexes,get_pixels_per_unit,get_run_end_indexes,\
+    select_lod_geometry
+from nanodesign.visualizer.raster import VisRasterizer,get_ortho_matrix,get_view_bounds,write_png
+from nanodesign.visualizer.rep_cache import VisRepCache
+from nanodesign.visualizer.residue_tables import VisDnaBonds,VisDnaPlanes,dna_residue_tables
+from nanodesign.visualizer.temperature import VisDomainTemperatures,map_values_to_colors
+
+####################
+# Helper Functions #
+####################
+
+def read_structure( file_name ):
+    converter = Converter()
+    converter.read_cadnano_file( os.path.join(samples_path, file_name), None, "M13mp18" )
+    return converter
+
+def read_modified_structure( file_name ):
+    """ Read a design creating the structure with its deleted and inserted bases. """
+    converter = Converter()
+    converter.modify = True
+    converter.read_cadnano_file( os.path.join(samples_path, file_name), None, "M13mp18" )
+    return converter
+
+def bp_interp_loop( dnode_1, triad_1, dnode_2, triad_2, n ):
+    """ Interpolate base pair coordinates and frames one position at a time. """
+    dnode_interp = np.zeros((n,3),dtype=float)
+    triad_interp = np.zeros((3,3,n),dtype=float)
+    R = np.dot(triad_2,triad_1.T)
+    a,theta = vrrotmat2vec(R)
+    for i in xrange(0,n):
+        dnode_interp[i,:] = (dnode_1*(n+1-(i+1)) + dnode_2*(i+1)) / (n+1)
+        rot_mat = vrrotvec2mat(a, theta*(i+1)/(n+1))
+        triad_interp[:,:,i] = np.dot(rot_mat,triad_1)
+    return dnode_interp, triad_interp
+
+def delete_bases_per_base( self, helices, base_connectivity ):
+    """ Remove deleted bases from base_connectivity one base at a time, updating the helix arrays for each helix. """
+    num_deleted_bases = 0
+    for helix in helices:
+        deleted_bases = helix.process_base_deletes( update_coordinates=False )
+        if len(deleted_bases) != 0:
+            helix.regenerate_coordinate_arrays()
+            helix.build_base_pos_maps()
+        num_deleted_bases += len(deleted_bases)
+        for base in deleted_bases:
+            base_connectivity.remove(base)
+    if num_deleted_bases != 0:
+        self._renumber_baseIDs(base_connectivity)
+    return set()
+
+def insert_helix_bases_per_base( self, insert_bases, update_coordinates=True ):
+    """ Insert bases into the helix base lists one base at a time, before the first base at the same position. """
+    for insert_base in insert_bases:
+        bases = self.scaffold_bases if insert_base.is_scaf else self.staple_bases
+        for i,base in enumerate(bases):
+            if base.p == insert_base.p:
+                bases.insert(i,insert_base)
+                break
+    if len(insert_bases) != 0:
+        self.regenerate_coordinate_arrays()
+        self.build_base_pos_maps()
+
+def get_cando_table_lines( dna_structure ):
+    """ Get the lines of the CanDo file tables for a structure formatted one row at a time. """
+    base_conn = dna_structure.base_connectivity
+    lines = [ "dnaTop,id,up,down,across,seq" ]
+    for i,base in enumerate(base_conn):
+        up = base.up.id if base.up else -1
+        down = base.down.id if base.down else -1
+        across = base.across.id if base.across else -1
+        lines.append( "%d,%d,%d,%d,%d,%s" % (i+1, base.id, up, down, across, base.seq) )
+    lines += [ "", 'dNode,"e0(1)","e0(2)","e0(3)"' ]
+    for i,base in enumerate(base_conn):
+        coords = base.coordinates
+        lines.append( "%d,%f,%f,%f" % (i+1, coords[0], coords[1], coords[2]) )
+    lines += [ "", 'triad,"e1(1)","e1(2)","e1(3)","e2(1)","e2(2)","e2(3)","e3(1)","e3(2)","e3(3)"' ]
+    for i,base in enumerate(base_conn):
+        ref_frame = base.ref_frame
+        lines.append( "%d,%f,%f,%f,%f,%f,%f,%f,%f,%f" % (i+1, -ref_frame[0,0], -ref_frame[1,0], -ref_frame[2,0],
+            ref_frame[0,1], ref_frame[1,1], ref_frame[2,1], -ref_frame[0,2], -ref_frame[1,2], -ref_frame[2,2]) )
+    lines += [ "", "id_nt,id1,id2" ]
+    id_nt = [ (base.id, base.across.id) for base in base_conn if base.across and base.is_scaf ]
+    for i,(id1, id2) in enumerate(id_nt):
+        lines.append( "%d,%d,%d" % (i+1, id1+1, id2+1) )
+    return lines
+
+def get_simdna_record_lines( dna_structure ):
+    """ Get the lines of the SimDNA base records for a structure formatted one base at a time. """
+    strands = [ strand for strand in dna_structure.strands if strand.is_scaffold ] + \
+              [ strand for strand in dna_structure.strands if not strand.is_scaffold ]
+    lines = []
+    for strand_id,strand in enumerate(strands):
+        for i,base in enumerate(strand.tour):
+            if base.across == None:
+                paired_strand_id = -1
+                paired_base_id = -1
+            else:
+                paired_strand_id = base.across.strand
+                paired_strand = dna_structure.strands_map[paired_strand_id]
+                paired_base_id = paired_strand.get_base_index(base.across)+1
+            coord = 10.0 * base.nt_coords
+            lines.append( "%4d %4d %8g %8g %8g %4d %4d" % 
+                (strand_id, i+1, coord[0], coord[1], coord[2], paired_strand_id, paired_base_id) )
+    #__for strand_id,strand in enumerate(strands)
+    return lines
+
+def get_modified_structure_info( dna_structure ):
+    """ Get the connectivity, coordinates and helix base lists of a structure with deleted and inserted bases. """
+    def get_id( base ):
+        return None if base is None else base.id
+    bases = [ (base.id, base.h, base.p, base.is_scaf, get_id(base.up), get_id(base.down), get_id(base.across), 
+               base.coordinates, base.ref_frame, np.array(base.nt_coords)) for base in dna_structure.base_connectivity ]
+    helices = []
+    for helix_id in sorted(dna_structure.structure_helices_map):
+        helix = dna_structure.structure_helices_map[helix_id]
+        helices.append( ([base.id for base in helix.scaffold_bases], [base.id for base in helix.staple_bases],
+                         helix.helix_axis_coords, helix.helix_axis_frames) )
+    strands = [ [base.id for base in strand.tour] for strand in dna_structure.strands ]
+    return bases, helices, strands
+
+def create_stapler( file_name ):
+    """ Create a Stapler from the stapler script for a design, with its system initialized. """
+    stapler_module = imp.load_source( "stapler", os.path.join(base_path, "scripts", "stapler.py") )
+    converter = read_structure( file_name )
+    converter.dna_structure.get_domains()
+    stapler = stapler_module.Stapler( converter.dna_structure, converter.cadnano_design )
+    stapler.template = [[7,7,14,7,7,7],[7,14,7,7,7],[14,7,7,7],[7,7,7,14,7,7],[7,7,14,7],[7,7,14]]
+    stapler.uncovered_domain_penalty = 10.0
+    stapler.template_overhang_penalty_factor = 0.5
+    stapler.step_probabilities = (0.1,0.1,0.35,0.35,0.1)
+    stapler.standard_domain_length = 5
+    stapler.initialize_system()
+    stapler.temperature = 10.0
+    return stapler_module, stapler
+
+def get_residue_loop_geometry( residues, scale ):
+    """ Get the bond and ring geometry of a list of residues by looping over the bond and ring atoms of each residue. """
+    residue_bonds = { "da" : VisDnaBonds.ade, "dc" : VisDnaBonds.cyt, "dg" : VisDnaBonds.gua, "dt" : VisDnaBonds.thy }
+    residue_planes = { "da" : VisDnaPlanes.ade, "dc" : VisDnaPlanes.cyt, "dg" : VisDnaPlanes.gua, 
+        "dt" : VisDnaPlanes.thy }
+    bond_points, bond_indexes, plane_points, plane_counts, plane_indexes = [], [], [], [], []
+    for i,residue_atoms in enumerate(residues):
+        res_name = residue_atoms["P"].res_name.strip().lower()
+        bonds = VisDnaBonds.backbone + residue_bonds.get(res_name, [])
+        if i != len(residues)-1:
+            bonds = bonds + [ ("P", None) ]
+        for name1,name2 in bonds:
+            atoms2 = residues[i+1] if name2 is None else residue_atoms
+            name2 = "O3'" if name2 is None else name2
+            if (name1 in residue_atoms) and (name2 in atoms2):
+                bond_points.extend([ scale*np.array(residue_atoms[name1].coords), scale*np.array(atoms2[name2].coords) ])
+        for plane in VisDnaPlanes.sugar + residue_planes.get(res_name, []):
+            if all(name in residue_atoms for name in plane):
+                plane_counts.append(len(plane))
+                plane_points.extend([ scale*np.array(residue_atoms[name].coords) for name in plane ])
+        bond_indexes.append(len(bond_points))
+        plane_indexes.append(len(plane_counts))
+    #__for i,residue_atoms in enumerate(residues)
+    return np.array(bond_points).reshape((-1,3)), bond_indexes, np.array(plane_points).reshape((-1,3)), \
+        plane_counts, plane_indexes
+
+def get_batch_triangles( items ):
+    """ Get the vertices, unit normals and colors of the triangles of batch items as an array with a row per triangle. """
+    triangles = []
+    for batch in pack_batches( items ):
+        normals = batch.normals / np.sqrt(np.sum(batch.normals*batch.normals, axis=1))[:,None]
+        values = np.hstack(( batch.vertices, normals, batch.colors ))[batch.indices]
+        triangles.append( values.reshape((-1, 3*values.shape[1])) )
+    return np.concatenate( triangles )
+
+def match_triangles( triangles1, triangles2 ):
+    """ Check that two arrays of triangles contain the same triangles in any order. """
+    distances = np.sqrt(np.sum( (triangles1[:,None,:] - triangles2[None,:,:])**2, axis=2 ))
+    return (len(triangles1) == len(triangles2)) and np.all(np.min(distances, axis=0) < 1e-4) and \
+        np.all(np.min(distances, axis=1) < 1e-4)
+
+class GlutStub(object):
+    """ This class records the GLUT calls made by the visualizer so it can be tested without a graphics window. """
+    def __init__(self):
+        self.idle_funcs = []
+        self.redisplays = 0
+        self.menus = []
+        self.menu_entries = []
+    def glutIdleFunc(self, func):
+        self.idle_funcs.append(func)
+    def glutPostRedisplay(self):
+        self.redisplays += 1
+    def glutCreateMenu(self, callback):
+        self.menus.append(callback)
+        return len(self.menus)
+    def glutGetMenu(self):
+        return len(self.menus)
+    def glutChangeToMenuEntry(self, entry, name, value):
+        self.menu_entries.append(name)
+    def glutAddMenuEntry(self, name, value):
+        pass
+    def glutAddSubMenu(self, name, menu):
+        pass
+    def glutAttachMenu(self, button):
+        pass
+    def glutSetMenu(self, menu):
+        pass
+
+def get_domains_info( dna_structure ):
+    return [ (domain.id, domain.strand.id, [base.id for base in domain.base_list], domain.connected_strand, 
+              domain.connected_domain) for domain in dna_structure.domain_list ]
+
+def get_connectivity_info( dna_structure ):
+    info = []
+    for helix_id in sorted(dna_structure.structure_helices_map):
+        helix = dna_structure.structure_helices_map[helix_id]
+        info.append( [ (connection.from_helix.id, connection.to_helix.id, tuple(np.round(connection.direction, 9)))
+                       for connection in helix.helix_connectivity ] )
+    return info
+
+def get_crossovers_info( dna_structure ):
+    info = []
+    for helix_id in sorted(dna_structure.structure_helices_map):
+        helix = dna_structure.structure_helices_map[helix_id]
+        for connection in helix.helix_connectivity:
+            info.append( sorted([ (xover.crossover_base.id, xover.strand.id) for xover in connection.crossovers ]))
+    return info
+
+############
+# Fixtures #
+############
+
+@pytest.fixture(scope="module",
+                params=["fourhelix.json", "flat_sheet.json"])
+def sample_file( request ):
+    return request.param
+
+@pytest.fixture
+def glut_stub( monkeypatch ):
+    """ Stub the GLUT functions called by the visualizer model loader, graphics and menus. 
+
+        Empty OpenGL modules are used to import the visualizer if PyOpenGL is not installed.
+    """
+    try:
+        import OpenGL.GLUT
+    except ImportError:
+        for name in [ "OpenGL", "OpenGL.GL", "OpenGL.GLU", "OpenGL.GLUT" ]:
+            monkeypatch.setitem( sys.modules, name, types.ModuleType(name) )
+    # The model module is imported first to resolve the circular imports of the visualizer modules.
+    from nanodesign.visualizer import model
+    from nanodesign.visualizer import graphics, loader, menu
+    stub = GlutStub()
+    for module in [ graphics, loader, menu ]:
+        for name in [ "glutIdleFunc", "glutPostRedisplay", "glutCreateMenu", "glutGetMenu", "glutChangeToMenuEntry",
+                      "glutAddMenuEntry", "glutAddSubMenu", "glutAttachMenu", "glutSetMenu" ]:
+            monkeypatch.setattr( module, name, getattr(stub, name), raising=False )
+    monkeypatch.setattr( menu, "GLUT_RIGHT_BUTTON", 2, raising=False )
+    return stub
+
+#########
+# Tests #
+#########
+
+def test_update_aux_data( sample_file ):
+    """ Check that aux data updated after removing staples matches aux data computed from scratch. """
+    for staples_arg in [ "delete", "delete,retain=[11184640,243362]", "maximal_set" ]:
+        converter = read_structure( sample_file )
+        converter.dna_structure.compute_aux_data()
+        converter.perform_staple_operations( staples_arg )
+        converter.dna_structure.compute_aux_data()
+
+        full_converter = read_structure( sample_file )
+        full_converter.perform_staple_operations( staples_arg )
+        full_converter.dna_structure.compute_aux_data()
+
+        assert get_domains_info(converter.dna_structure) == get_domains_info(full_converter.dna_structure)
+        assert get_connectivity_info(converter.dna_structure) == get_connectivity_info(full_converter.dna_structure)
+        assert get_crossovers_info(converter.dna_structure) == get_crossovers_info(full_converter.dna_structure)
+
+def test_remove_bases_axis_arrays( sample_file, monkeypatch ):
+    """ Check that compacting the helix axis arrays after removing staples preserves the base to axis mapping. """
+    converter = read_structure( sample_file )
+    dna_structure = converter.dna_structure
+    axis_data = dict( (base.id, (base.coordinates.copy(), base.ref_frame.copy())) for base in dna_structure.base_connectivity )
+    def regenerate_coordinate_arrays( helix ):
+        raise AssertionError("helix %d axis arrays regenerated" % helix.id)
+    monkeypatch.setattr( DnaStructureHelix, "regenerate_coordinate_arrays", regenerate_coordinate_arrays )
+    converter.perform_staple_operations( "delete,retain=[11184640,243362]" )
+
+    for helix in dna_structure.structure_helices_map.itervalues():
+        bases = helix.scaffold_bases + helix.staple_bases
+        rows = helix._get_axis_rows( bases )
+        assert sorted(set(rows)) == range(len(helix.helix_axis_coords))
+        for base,row in zip(bases, rows):
+            coords, frame = axis_data[base.id]
+            assert np.array_equal( helix.helix_axis_coords[row], coords )
+            assert np.array_equal( helix.helix_axis_frames[:,:,row], frame )
+            assert np.may_share_memory( base.ref_frame, helix.helix_axis_frames )
+
+def test_maximal_staple_set( sample_file ):
+    """ Check that the maximal staple set has the base coordinates and strands given by regenerating the coordinates
+        of all helices and tracing all strands.
+    """
+    for staples_arg in [ "maximal_set", "maximal_set,retain=[11184640,243362]" ]:
+        converter = read_structure( sample_file )
+        converter.perform_staple_operations( staples_arg )
+        dna_structure = converter.dna_structure
+        bases = dna_structure.base_connectivity
+        base_coords = [ (base.coordinates.copy(), base.ref_frame.copy(), np.array(base.nt_coords)) for base in bases ]
+        strands = [ (strand.id, strand.is_scaffold, strand.is_circular, [base.id for base in strand.tour]) 
+                    for strand in dna_structure.strands ]
+        assert all( base.strand == strand.id for strand in dna_structure.strands for base in strand.tour )
+
+        for helix in dna_structure.structure_helices_map.itervalues():
+            helix.set_coordinates( *generate_coordinates(dna_structure.dna_parameters, dna_structure.lattice_type, 
+                helix.lattice_row, helix.lattice_col, helix.lattice_num, helix.scaffold_bases, helix.staple_bases) )
+        for base,(coordinates, ref_frame, nt_coords) in zip(bases, base_coords):
+            assert np.allclose( base.coordinates, coordinates )
+            assert np.allclose( base.ref_frame, ref_frame )
+            assert np.allclose( base.nt_coords, nt_coords )
+        dna_structure.create_strands()
+        assert [ (strand.id, strand.is_scaffold, strand.is_circular, [base.id for base in strand.tour]) 
+                 for strand in dna_structure.strands ] == strands
+    #__for staples_arg in [ "maximal_set", "maximal_set,retain=[11184640,243362]" ]
+
+def test_modify_structure( monkeypatch ):
+    """ Check that applying deletes and inserts in one pass gives the structure created by deleting and inserting 
+        bases one at a time and updating the helix arrays after each step. 
+    """
+    for file_name in [ "flat_sheet.json", "beachball.json", "railedbridge.json" ]:
+        bases, helices, strands = get_modified_structure_info( read_modified_structure(file_name).dna_structure )
+        monkeypatch.setattr( convert_design, "bp_interp", bp_interp_loop )
+        monkeypatch.setattr( CadnanoConvertDesign, "_delete_bases", delete_bases_per_base )
+        monkeypatch.setattr( DnaStructureHelix, "insert_bases", insert_helix_bases_per_base )
+        monkeypatch.setattr( DnaStructureHelix, "update_modified_bases", lambda helix: None )
+        per_base_bases, per_base_helices, per_base_strands = get_modified_structure_info( 
+            read_modified_structure(file_name).dna_structure )
+        monkeypatch.undo()
+
+        assert len(bases) == len(per_base_bases)
+        for base,per_base in zip(bases, per_base_bases):
+            assert base[:7] == per_base[:7]
+            for values,per_base_values in zip(base[7:], per_base[7:]):
+                assert np.allclose( values, per_base_values )
+        assert len(helices) == len(per_base_helices)
+        for helix,per_base_helix in zip(helices, per_base_helices):
+            assert helix[:2] == per_base_helix[:2]
+            assert np.allclose( helix[2], per_base_helix[2] )
+            assert np.allclose( helix[3], per_base_helix[3] )
+        assert strands == per_base_strands
+    #__for file_name in [ "flat_sheet.json", "beachball.json", "railedbridge.json" ]
+
+def test_staples_by_color( sample_file ):
+    """ Check that the strand indexes match a scan of the structure strands. """
+    converter = read_structure( sample_file )
+    dna_structure = converter.dna_structure
+    colors = set([ strand.icolor for strand in dna_structure.strands if not strand.is_scaffold ])
+    for color in colors:
+        staples = set([ strand.id for strand in dna_structure.strands if (not strand.is_scaffold) and (strand.icolor == color) ])
+        assert dna_structure.get_staples_by_color([color]) == staples
+
+    for strand in dna_structure.strands:
+        base = strand.tour[0]
+        assert dna_structure.get_strand_by_start(base.h, base.p, strand.is_scaffold) == strand
+
+    retain_colors = sorted(colors)[:2]
+    converter.perform_staple_operations( "delete,retain=[%s]" % ",".join([str(color) for color in retain_colors]) )
+    for helix_id in dna_structure.structure_helices_map:
+        strands = [ strand for strand in dna_structure.strands if helix_id in [base.h for base in strand.tour] ]
+        assert dna_structure.get_helix_strands(helix_id) == strands
+    staples = set([ strand.id for strand in dna_structure.strands if not strand.is_scaffold ])
+    assert len(staples) != 0
+    assert dna_structure.get_staples_by_color(retain_colors) == staples
+
+def test_melting_temperatures( sample_file ):
+    """ Check that domain melting temperatures computed together match those computed for each domain. """
+    converter = read_structure( sample_file )
+    dna_structure = converter.dna_structure
+    dna_structure.compute_aux_data()
+    temperatures = [ domain.melting_temperature() for domain in dna_structure.domain_list ]
+    assert melting_temperatures(dna_structure.domain_list) == temperatures
+
+    # Check bases without a complement, e.g. ambiguous bases, against the per-pair lookup.
+    complement = { "A":"T", "T":"A", "C":"G", "G":"C", "a":"t", "t":"a", "c":"g", "g":"c" }
+    sequences = [ "ACGTRAC", "aNgTc", "GGY" ]
+    reverse_complements = [ "".join(complement.get(base, base) for base in reversed(sequence)) for sequence in sequences ]
+    energies = [ energy_model.stack_energy( sequence, reverse )[2:] for sequence,reverse in zip(sequences, reverse_complements) ]
+    assert energy_model.paired_stack_energies( sequences ) == energies
+
+def test_domain_temperatures( sample_file ):
+    """ Check that the domain temperature table matches the domain melting temperatures and maps them to colors. """
+    converter = read_structure( sample_file )
+    dna_structure = converter.dna_structure
+    dna_structure.compute_aux_data()
+    domains = dna_structure.domain_list
+    spectrum_colors = [ [0.0,0.0,1.0], [0.0,1.0,0.0], [1.0,0.0,0.0] ]
+    table = VisDomainTemperatures(domains, spectrum_colors)
+    temperatures = [ domain.melting_temperature() for domain in domains ]
+    assert table.get_temperatures(range(len(domains))) == temperatures
+    paired = [ temp for temp in temperatures if temp != -500.0 ]
+    assert table.get_range() == (min(paired), max(paired))
+    for domain,temp in zip(domains, temperatures):
+        if temp == -500.0:
+            assert table.get_colors([domain.id]) == [[0.5, 0.5, 0.5, 1.0]]
+
+    colors = map_values_to_colors(spectrum_colors, 10.0, 20.0, [5.0, 10.0, 14.0, 15.0, 20.0, 25.0])
+    assert colors.tolist() == [ spectrum_colors[i] for i in [0, 0, 0, 1, 2, 2] ]
+    assert map_values_to_colors(spectrum_colors, 10.0, 10.0, [10.0]).tolist() == [spectrum_colors[0]]
+
+def test_write_viewer_binary( sample_file, tmpdir ):
+    """ Check that a binary viewer file stores the same strand and domain data as the viewer JSON file. """
+    converter = read_structure( sample_file )
+    json_file = str(tmpdir.join("viewer.json"))
+    binary_file = str(tmpdir.join("viewer.bin"))
+    converter.write_viewer_file( json_file )
+    converter.write_viewer_binary_file( binary_file )
+    with open(json_file) as infile:
+        model = json.load(infile)
+    header, arrays = read_binary_viewer_file( binary_file )
+
+    strand_offsets = arrays['strand_offsets']
+    for n,strand_info in enumerate(model['strands']):
+        start,end = strand_offsets[n],strand_offsets[n+1]
+        bases = strand_info['bases']
+        assert header['strands'][n]['id'] == strand_info['id']
+        assert list(arrays['base_ids'][start:end]) == [ base['id'] for base in bases ]
+        assert list(arrays['base_sequence'][start:end]) == [ ord(base['sequence']) for base in bases ]
+        assert arrays['base_helix_positions'][start:end].tolist() == [ [base['h'],base['p']] for base in bases ]
+        assert np.allclose(arrays['base_coordinates'][start:end], [ base['coordinates'] for base in bases ], atol=1e-4)
+
+    domain_offsets = arrays['domain_offsets']
+    for n,domain_info in enumerate(model['domains']):
+        assert header['domains'][n]['id'] == domain_info['id']
+        assert list(arrays['domain_base_ids'][domain_offsets[n]:domain_offsets[n+1]]) == domain_info['bases']
+    assert header['virtual_helices'] == model['virtual_helices']
+
+def test_write_cando( sample_file, tmpdir ):
+    """ Check that the CanDo file tables match the tables formatted one row at a time. """
+    converter = read_structure( sample_file )
+    file_name = str(tmpdir.join("structure.cndo"))
+    CandoWriter( converter.dna_structure ).write( file_name )
+    with open(file_name) as cndo_file:
+        lines = cndo_file.read().splitlines()
+    assert lines[1] == ""
+    table_lines = get_cando_table_lines( converter.dna_structure )
+    assert len(lines) == len(table_lines)+2
+    for line,table_line in zip(lines[2:], table_lines):
+        assert line == table_line
+
+    cando_writer = CandoWriter( converter.dna_structure )
+    assert cando_writer._format_table( "%d,%f\n", np.zeros((0,2)) ) == ""
+    table = np.empty((2,3), dtype=object)
+    table[:,0] = [1, 2]
+    table[:,1] = [-1, 7]
+    table[:,2] = ["A", "N"]
+    assert cando_writer._format_table( "%d,%d,%s\n", table ) == "1,-1,A\n2,7,N\n"
+
+def test_write_simdna( sample_file, tmpdir ):
+    """ Check that the SimDNA base records match the records formatted one base at a time. """
+    for staples_arg in [ None, "delete,retain=[11184640,243362]" ]:
+        converter = read_structure( sample_file )
+        if staples_arg:
+            converter.perform_staple_operations( staples_arg )
+        file_name = str(tmpdir.join("structure.pairs"))
+        SimDnaWriter( converter.dna_structure ).write( file_name )
+        with open(file_name) as pairs_file:
+            lines = pairs_file.read().splitlines()
+        record_lines = get_simdna_record_lines( converter.dna_structure )
+        assert lines[0] == "%d" % len(converter.dna_structure.base_connectivity)
+        assert len(lines) == len(record_lines)+1
+        for line,record_line in zip(lines[1:], record_lines):
+            assert line == record_line
+    #__for staples_arg in [ None, "delete,retain=[11184640,243362]" ]
+
+    assert SimDnaWriter( converter.dna_structure )._get_base_records( [], {}, 10.0 ).shape == (0,7)
+
+def test_transform_structure( sample_file ):
+    """ Check that transformed nucleotide coordinates match those computed from the transformed helix axes. """
+    converter = read_structure( sample_file )
+    converter.transform_structure( "helices(0,1):rotate(90,0,0),translate(0.5,0,0);helices(1,2,3):rotate(0,90,0),translate(1,0,0)" )
+    for helix in converter.dna_structure.structure_helices_map.values():
+        for bases,is_scaffold in [ (helix.scaffold_bases,True), (helix.staple_bases,False) ]:
+            if len(bases) == 0:
+                continue
+            coords = np.array([ base.coordinates for base in bases ])
+            frames = np.array([ base.ref_frame for base in bases ])
+            nt_coords = compute_nucleotide_coordinates( converter.dna_parameters, coords, frames, is_scaffold )
+            assert np.allclose(nt_coords, [ base.nt_coords for base in bases ])
+
+def test_rms_fit():
+    """ Check that a fit recovers a rotation and translation and does not produce a reflection. """
+    points1 = np.random.RandomState(1).randn(20,3)
+    xform = Xform( rotation_angles=[30.0,40.0,50.0], translation=[1.0,2.0,3.0] )
+    points2 = xform.transform_points( points1 )
+    fit = Xform()
+    fit.rms_fit( points1, points2 )
+    assert np.allclose(fit.transform_points(points1), points2)
+    fit.rms_fit( points1, points2*[1.0,1.0,-1.0] )
+    assert np.isclose(np.linalg.det(fit.rotation_matrix), 1.0)
+
+def test_solve_helix_group_xforms( sample_file ):
+    """ Check that solving for helix group transformations reduces the distance between connected bases. """
+    converter = read_structure( sample_file )
+    dna_structure = converter.dna_structure
+    converter.transform_structure( "helices(0,1):rotate(30,0,0),translate(4,0,0);helices(2):rotate(0,0,20),translate(0,-4,0)" )
+    helices_map = dna_structure.structure_helices_map
+    helix_group_xforms = [ HelixGroupXform([helices_map[0], helices_map[1]], Xform()), 
+                           HelixGroupXform([helices_map[2]], Xform()) ]
+    scaffold = [ strand for strand in dna_structure.strands if strand.is_scaffold ]
+    solution = solve_helix_group_xforms( helix_group_xforms, scaffold, dna_structure.dna_parameters.helix_distance )
+    assert solution.num_connections != 0
+    assert solution.converged
+    assert solution.rms_distance < solution.initial_rms_distance
+
+def test_json_emitter( sample_file, tmpdir ):
+    """ Check that streamed JSON output matches the output written by the json module. """
+    converter = read_structure( sample_file )
+    dna_structure = converter.dna_structure
+    topology = { 'bases' : [ dna_structure._get_base_json_info(base) for base in dna_structure.base_connectivity ],
+                 'empty' : [], 'info' : { 'strands' : [ [ base.id for base in strand.tour ] for strand in dna_structure.strands ] } }
+    streamed = { 'bases' : JsonArray(dna_structure._get_base_json_info(base) for base in dna_structure.base_connectivity),
+                 'empty' : JsonArray([]), 'info' : { 'strands' : JsonArray(JsonArray(base.id for base in strand.tour) for strand in dna_structure.strands) } }
+    for indent,separators in [ (4, (',', ': ')), (None, (',', ':')) ]:
+        file_name = str(tmpdir.join("topology.json"))
+        with open(file_name, 'w') as outfile:
+            JsonEmitter(outfile, indent).dump(streamed)
+        with open(file_name) as infile:
+            assert infile.read() == json.dumps(topology, indent=indent, separators=separators)
+        streamed['bases'].iterable = (dna_structure._get_base_json_info(base) for base in dna_structure.base_connectivity)
+        streamed['info']['strands'].iterable = (JsonArray(base.id for base in strand.tour) for strand in dna_structure.strands)
+
+    json_file = str(tmpdir.join("viewer.json"))
+    compact_file = str(tmpdir.join("viewer_compact.json"))
+    converter.write_viewer_file( json_file )
+    ViewerWriter(dna_structure, converter.dna_parameters).write( compact_file, indent=None )
+    with open(json_file) as infile, open(compact_file) as compact_infile:
+        assert json.load(compact_infile) == json.load(infile)
+
+def test_pack_batches():
+    """ Check that items are packed into batches by material with their indices offset into the shared arrays. """
+    red = [1.0, 0.0, 0.0, 1.0]
+    path = VisBatchItem( VisBatchPrimitive.LINES, [[0,0,0],[1,0,0],[1,1,0]], indices=line_strip_indices(3), color=red )
+    lines = VisBatchItem( VisBatchPrimitive.LINES, [[0,0,1],[1,0,1]], colors=[red,red] )
+    wide_lines = VisBatchItem( VisBatchPrimitive.LINES, [[0,0,2],[1,0,2]], size=2.0 )
+    triangle = VisBatchItem( VisBatchPrimitive.TRIANGLES, [[0,0,0],[1,0,0],[0,1,0]], normals=[0,0,1], lighting=True, 
+        transparent=True )
+    batches = pack_batches( [triangle, path, lines, wide_lines] )
+    assert [ (batch.primitive, batch.size, batch.transparent) for batch in batches ] == [ 
+        (VisBatchPrimitive.LINES, 1.0, False), (VisBatchPrimitive.LINES, 2.0, False), 
+        (VisBatchPrimitive.TRIANGLES, 1.0, True) ]
+    assert list(batches[0].indices) == [0, 1, 1, 2, 3, 4]
+    assert np.allclose(batches[0].vertices[batches[0].indices[-1]], [1,0,1])
+    assert np.allclose(batches[0].colors, red)
+    assert batches[0].normals is None
+    assert np.allclose(batches[2].normals, [0,0,1])
+    assert list(line_strip_indices(3, closed=True)) == [0, 1, 1, 2, 2, 0]
+
+def test_bvh_pick():
+    """ Check that a bounding volume hierarchy query finds the primitives crossed by a line and that the 
+        intersection functions return the line parameter of the closest intersection.
+    """
+    centers = np.array([ [x, y, 0.0] for x in range(10) for y in range(10) ], dtype=float)
+    radii = np.full(len(centers), 0.25)
+    bvh = VisBvh(centers - 0.25, centers + 0.25, leaf_size=4)
+    point1 = [3.0, 4.0, -5.0]
+    point2 = [3.0, 4.0, 5.0]
+    indexes = bvh.query_line(point1, point2)
+    assert 34 in indexes
+    assert len(indexes) < len(centers)
+    t = intersect_line_spheres(point1, point2, centers[indexes], radii[indexes])
+    assert np.count_nonzero(~np.isnan(t)) == 1
+    assert indexes[np.nanargmin(t)] == 34
+    assert np.isclose(np.nanmin(t), 0.475)
+    assert len(bvh.query_line([-5.0, -5.0, 1.0], [20.0, -5.0, 1.0])) == 0
+
+    t, points = intersect_line_segments(point1, point2, np.array([[2.0,4.05,0.0],[2.0,6.0,0.0]]), 
+        np.array([[4.0,4.05,0.0],[4.0,6.0,0.0]]))
+    assert np.isclose(t[0], 0.5) and np.isnan(t[1])
+    assert np.allclose(points[0], [3.0,4.05,0.0])
+    t = intersect_line_triangles(point1, point2, np.array([[2.0,3.0,1.0]]), np.array([[5.0,3.0,1.0]]), 
+        np.array([[2.0,6.0,1.0]]))
+    assert np.isclose(t[0], 0.6)
+
+def test_rep_cache():
+    """ Check that the geometry of the least recently used hidden representations is removed to meet the budget. """
+    class Geometry(object):
+        def __init__(self, num_vertices, visible):
+            self.num_vertices = num_vertices
+            self.visible = visible
+
+    class Owner(object):
+        def __init__(self):
+            self.representations = {}
+        def remove_rep(self, rep):
+            del self.representations[rep]
+
+    owner = Owner()
+    owner.representations = { 'a' : [Geometry(60, False)], 'b' : [Geometry(60, True)], 'c' : [Geometry(50, False)], 
+        'd' : [Geometry(30, False), Geometry(10, False)] }
+    cache = VisRepCache(vertex_budget=100)
+    for rep in ['a', 'b', 'c', 'd']:
+        cache.touch(owner, rep)
+    cache.touch(owner, 'a')
+    assert cache.evict() == 1
+    assert sorted(owner.representations.keys()) == ['a', 'b', 'd']
+    assert cache.evict() == 0
+
+def test_lod_selection():
+    """ Check that proxies are selected when the projected geometry detail is small and are rendered once. """
+    class Geometry(object):
+        def __init__(self, id, lod_proxy=None, lod_size=None):
+            self.id = id
+            self.selected = False
+            self.lod_proxy = lod_proxy
+            self.lod_size = lod_size
+        def get_lod_proxy(self):
+            return self.lod_proxy
+
+    extent = VisExtent()
+    extent.set(0.0, 100.0, 0.0, 50.0, 0.0, 10.0)
+    assert get_pixels_per_unit(extent, 1.0, 800, 600) == 3.0
+    assert get_pixels_per_unit(extent, 2.0, 800, 600) == 6.0
+
+    proxy = Geometry(0)
+    coords = Geometry(1, proxy, 0.34)
+    frames = Geometry(2, proxy, 0.34)
+    domains = Geometry(3)
+    geometry = [coords, frames, domains]
+    lod_geometry, levels = select_lod_geometry(geometry, 3.0)
+    assert lod_geometry == [proxy, domains]
+    assert levels == [VisLodLevel.COARSE, VisLodLevel.COARSE, VisLodLevel.FULL]
+    lod_geometry, levels = select_lod_geometry(geometry, 6.0)
+    assert lod_geometry == geometry
+    coords.selected = True
+    lod_geometry, levels = select_lod_geometry(geometry, 3.0)
+    assert lod_geometry == [coords, proxy, domains]
+
+    # Decimate a strand path to the end points of its domains.
+    assert list(get_run_end_indexes([4,4,4,4,7,7,2])) == [0, 3, 4, 5, 6]
+    assert list(get_run_end_indexes([4])) == [0]
+
+    # Decimate the path of a circular strand, which repeats its first base at the end.
+    class Base(object):
+        def __init__(self, domain):
+            self.domain = domain
+    bases = [ Base(domain) for domain in [4,4,7,7,7,4] ]
+    assert list(get_domain_end_indexes(bases)) == [0, 1, 2, 4, 5]
+    assert list(get_domain_end_indexes(bases, is_circular=True)) == [0, 1, 2, 4, 5, 6]
+    assert list(get_domain_end_indexes([], is_circular=True)) == []
+
+def test_raster( tmpdir ):
+    """ Check that the software rasterizer draws culled, depth tested triangles and lines and writes a PNG file. """
+    red = [1.0, 0.0, 0.0, 1.0]
+    green = [0.0, 1.0, 0.0, 1.0]
+    blue = [0.0, 0.0, 1.0, 1.0]
+    front = VisBatchItem( VisBatchPrimitive.TRIANGLES, [[0,0,0],[10,0,0],[0,10,0]], color=red )
+    behind = VisBatchItem( VisBatchPrimitive.TRIANGLES, [[0,0,-1],[10,0,-1],[0,10,-1]], color=blue )
+    back = VisBatchItem( VisBatchPrimitive.TRIANGLES, [[0,0,1],[0,10,1],[10,10,1]], color=blue )
+    line = VisBatchItem( VisBatchPrimitive.LINES, [[0,11.75,0],[10,11.75,0]], color=green )
+
+    extent = VisExtent()
+    extent.set(0.0, 10.0, 0.0, 10.0, 0.0, 10.0)
+    assert get_view_bounds(extent, 20, 20) == (-5.0, 15.0, -5.0, 15.0, -995.0, 1005.0)
+    rasterizer = VisRasterizer(20, 20)
+    rasterizer.set_view(get_ortho_matrix(*get_view_bounds(extent, 20, 20)), np.identity(4))
+    for batch in pack_batches( [front, back, line] ) + pack_batches( [behind] ):
+        rasterizer.draw_batch(batch)
+    image = rasterizer.get_image()
+    assert list(image[13,7]) == [255, 0, 0]
+    assert list(image[6,8]) == [191, 191, 191]
+    assert list(image[3,10]) == [0, 255, 0]
+
+    file_name = str(tmpdir.join('image.png'))
+    write_png(file_name, image)
+    with open(file_name, 'rb') as png_file:
+        data = png_file.read()
+    assert data[:8] == b"\x89PNG\r\n\x1a\n"
+    assert data[12:16] == b"IHDR"
+
+def test_json_reader( tmpdir ):
+    """ Check that JSON object members read in small chunks match the data read by the json module. """
+    data = { 'name' : "reader \"test\"", 'empty' : [], 'values' : [ 1.5e-10, -2, None, True, { 'a' : [1,2] } ],
+             'info' : { 'ids' : list(range(100)) }, 'last' : 12345678 }
+    file_name = str(tmpdir.join("data.json"))
+    for indent in [4, None]:
+        with open(file_name, 'w') as outfile:
+            json.dump(data, outfile, indent=indent)
+        with open(file_name) as infile:
+            items = {}
+            for key,value in JsonReader(infile, chunk_size=7).iter_items(['empty','values']):
+                items[key] = list(value) if key in ['empty','values'] else value
+        assert items == data
+
+def test_compare_viewer_files( sample_file, tmpdir ):
+    """ Check that viewer file differences are found when reading files in memory or streaming them. """
+    assert list(match_rows( np.array([[1,2],[3,4],[5,6]]), np.array([[5,6],[1,2]]) )) == [1, -1, 0]
+    assert list(get_occurrences( np.array([[1,2],[3,4],[1,2],[1,2],[3,4]]) )) == [0, 0, 1, 2, 1]
+
+    converter = read_structure( sample_file )
+    json_file = str(tmpdir.join("viewer.json"))
+    changed_file = str(tmpdir.join("viewer_changed.json"))
+    converter.write_viewer_file( json_file )
+    with open(json_file) as infile:
+        data = json.load(infile)
+    for strand in data['strands']:
+        for base in strand['bases']:
+            base['id'] += 1
+    data['strands'][0]['bases'][1]['coordinates'][2] += 1e-3
+    data['domains'][2]['connected_domain'] += 1
+    del data['domains'][3]
+    with open(changed_file, 'w') as outfile:
+        json.dump(data, outfile)
+
+    # Give bases the same helix position (e.g. the bases of an insert) and check that they are matched in order.
+    repeated_file = str(tmpdir.join("viewer_repeated.json"))
+    swapped_file = str(tmpdir.join("viewer_swapped.json"))
+    bases = data['strands'][1]['bases']
+    for base in bases[1:3]:
+        base['h'], base['p'] = bases[0]['h'], bases[0]['p']
+    with open(repeated_file, 'w') as outfile:
+        json.dump(data, outfile)
+    bases[0], bases[2] = bases[2], bases[0]
+    with open(swapped_file, 'w') as outfile:
+        json.dump(data, outfile)
+
+    for stream in [False, True]:
+        viewer_files = []
+        for file_name in [json_file, json_file, changed_file]:
+            viewer_file = ViewerFile( file_name )
+            viewer_file.read( stream, chunk_size=4096 )
+            viewer_files.append( viewer_file )
+        assert viewer_files[0].tables['base'].num_rows == len(converter.dna_structure.base_connectivity)
+        assert viewer_files[0].compare( viewer_files[1] ) == 0
+        assert viewer_files[0].compare( viewer_files[2] ) == 3
+        assert viewer_files[0].compare( viewer_files[2], tol=1e-2 ) == 2
+        repeated_files = []
+        for file_name in [repeated_file, repeated_file, swapped_file]:
+            viewer_file = ViewerFile( file_name )
+            viewer_file.read( stream, chunk_size=4096 )
+            repeated_files.append( viewer_file )
+        assert repeated_files[0].compare( repeated_files[1] ) == 0
+        assert repeated_files[0].compare( repeated_files[2] ) > 0
+
+def test_strand_atomic_structure():
+    """ Check that strand atoms do not depend on the order strands are generated in and base frames are unchanged. """
+    converter = read_structure( "fourhelix.json" )
+    dna_structure = converter.dna_structure
+    frames = [ base.ref_frame.copy() for base in dna_structure.base_connectivity ]
+    molecules = []
+    for order in [ 1, -1 ]:
+        atomic_structure = AtomicStructure( dna_structure )
+        strands = atomic_structure.strands[::order]
+        atoms = [ [ tuple(atom.coords) for atom in atomic_structure.generate_strand_structure_ss(strand).atoms ]
+                  for strand in strands ]
+        molecules.append( atoms[::order] )
+    assert molecules[0] == molecules[1]
+    for base,frame in zip(dna_structure.base_connectivity, frames):
+        assert np.array_equal(base.ref_frame, frame)
+
+def test_residue_tables():
+    """ Check that the residue index tables gather the same bond and ring geometry as looping over each residue. """
+    class ResidueAtom(object):
+        def __init__(self, atom, res_name):
+            self.coords = atom.coords
+            self.res_name = res_name
+
+    atomic_structure = AtomicStructure( read_structure( "fourhelix.json" ).dna_structure )
+    tables = dna_residue_tables
+    residues_list = []
+    for strand in atomic_structure.strands:
+        residues_list.append( list(atomic_structure.generate_strand_structure_ss(strand).residues.values()) )
+    # Remove ring and bond atoms and rename a residue to an unknown type.
+    residues = [ dict(residue_atoms) for residue_atoms in residues_list[0][:5] ]
+    del residues[0]["C5"]
+    del residues[1]["C1'"]
+    del residues[3]["O3'"]
+    residues[2] = dict( (name, ResidueAtom(atom, "DU")) for name,atom in residues[2].items() )
+    residues_list.append( residues )
+    residues_list.append( residues_list[0][:1] )
+
+    for residues in residues_list:
+        coords, atom_rows, res_types = tables.get_atom_arrays( residues, 0.5 )
+        bond_points, bond_indexes = tables.get_bond_points( coords, atom_rows, res_types )
+        ring_points, ring_counts, ring_indexes = tables.get_ring_points( coords, atom_rows, res_types )
+        loop_bond_points, loop_bond_indexes, loop_ring_points, loop_ring_counts, loop_ring_indexes = \
+            get_residue_loop_geometry( residues, 0.5 )
+        assert np.allclose( bond_points, loop_bond_points )
+        assert bond_indexes == loop_bond_indexes
+        assert np.allclose( ring_points, loop_ring_points )
+        assert (ring_counts, ring_indexes) == (loop_ring_counts, loop_ring_indexes)
+    #__for residues in residues_list
+
+def test_stapler_energy():
+    """ Check that the total energy updated by Monte Carlo steps is the sum of the path energies. """
+    _, stapler = create_stapler( "flat_sheet.json" )
+    np.random.seed(1)
+    stapler.generate( 2500, 10000, 0.999975 )
+    assert stapler.total_energy == sum(stapler.energy)
+
+    # Check the energies of a path after steps against the energies computed from scratch.
+    for step_nr in range(500):
+        stapler._take_step()
+    state = stapler.get_state()
+    assert state['total_energy'] == sum(state['energy'])
+    for path_nr in range(len(stapler.path_list)):
+        assert stapler.energy[path_nr] == stapler._calculate_energy( stapler.template_positions[path_nr],
+            stapler.template_offsets[path_nr], stapler.break_positions[path_nr],
+            stapler.single_strand_side_exception[path_nr], stapler.template_types[path_nr], path_nr )
+
+def test_stapler_replica_exchange():
+    """ Check that replica exchange gives the same result when replicas are run in a process pool or in process. """
+    states = []
+    for processes in [ 1, 2 ]:
+        np.random.seed(1)
+        _, stapler = create_stapler( "flat_sheet.json" )
+        stapler.generate_replica_exchange( 600, [ 1.0, 3.0, 10.0 ], 200, processes=processes )
+        states.append( stapler.get_state() )
+    assert states[0] == states[1]
+    assert states[0]['total_energy'] == sum(states[0]['energy'])
+
+def create_loading_model( read_structure, glut_stub ):
+    """ Create a visualizer model and start loading it with a VisModelLoader, waiting for the loading thread. """
+    from nanodesign.visualizer.loader import VisModelLoader
+    from nanodesign.visualizer.model import VisModel
+    model = VisModel( "fourhelix.json", None, "helix name=All rep=geometry show=true;strand name=All rep=path show=true", 
+        None, None )
+    model.graphics.set_viewport = lambda width, height: None
+    model.graphics.render = lambda: None
+    loader = VisModelLoader( model, read_structure )
+    loader.start()
+    loader.thread.join()
+    assert loader.finished.is_set()
+    assert glut_stub.idle_funcs == [ loader.idle ]
+    return model, loader
+
+def test_vis_model_loader( glut_stub, tmpdir, monkeypatch ):
+    """ Check that the geometry created on the loading thread is added to the render list by the idle callback
+        and that the menu selections from the start commands are applied when the menu is created.
+    """
+    monkeypatch.chdir( tmpdir )
+    def read():
+        converter = read_structure( "fourhelix.json" )
+        return converter.dna_structure, None
+    model, loader = create_loading_model( read, glut_stub )
+    graphics = model.graphics
+    assert loader.error is None
+    assert graphics.loading and not graphics.render_geometry
+    assert not graphics.render_queue.empty()
+    assert model.menu is None
+    assert [ (entity, rep) for entity, name, rep in model.command.menu_updates ] == [ ('helix', 'geometry'), 
+        ('strand', 'path'), ('model', 'Bounding box'), ('model', 'Virtual helix numbers') ]
+    assert glut_stub.redisplays == 0
+
+    queued = dict( (geometry.id, (geometry, add)) for geometry, add in graphics.render_queue.queue )
+    render_geometry = dict( (id, geometry) for id, (geometry, add) in queued.items() if add )
+
+    loader.idle()
+    assert graphics.render_queue.empty()
+    assert graphics.render_geometry == render_geometry
+    assert glut_stub.redisplays == 1
+    assert glut_stub.idle_funcs[-1] is None
+    assert not graphics.loading
+    assert model.menu is not None and graphics.menu is model.menu
+    assert model.command.menu_updates == []
+    assert model.menu.updated
+    assert any(name.endswith(model.menu.selected_symbol) for name in glut_stub.menu_entries)
+
+def test_vis_model_loader_error( glut_stub, tmpdir, monkeypatch, caplog ):
+    """ Check that a loading error is logged by the idle callback and leaves the graphics window displayed. """
+    monkeypatch.chdir( tmpdir )
+    def read():
+        raise IOError("no design")
+    model, loader = create_loading_model( read, glut_stub )
+    assert isinstance(loader.error, IOError)
+    loader.idle()
+    assert glut_stub.idle_funcs[-1] is None
+    assert glut_stub.redisplays == 1
+    assert not model.graphics.loading
+    assert model.menu is None
+    assert "The model was not loaded" in caplog.text
+
+def test_geometry_sets( glut_stub ):
+    """ Check that the cylinder and sphere sets generate and pick the same geometry as the per-object cylinders and 
+        spheres.
+    """
+    from nanodesign.visualizer.geometry import VisGeometryCylinder,VisGeometryCylinderSet,VisGeometrySphere, \
+        VisGeometrySphereSet,compute_basis,compute_bases,get_circle_template,get_cylinder_template,get_sphere_template
+    normals = np.array([ [0,0,1], [0,0,-1], [1,0,0], [0.6,0.8,0], [1/3.0,2/3.0,2/3.0] ], dtype=float)
+    u,v = compute_bases( normals )
+    assert np.allclose( u, [ compute_basis(normal)[0] for normal in normals ] )
+    assert np.allclose( v, [ compute_basis(normal)[1] for normal in normals ] )
+    cos_t,sin_t = get_circle_template( 8 )
+    assert np.allclose( cos_t + 1j*sin_t, np.exp(2j*np.pi*np.arange(8)/8) )
+    side_conn, cap1_conn, cap2_conn = get_cylinder_template( 8 )
+    assert (side_conn.shape, cap1_conn.shape, cap2_conn.shape) == ((16,3), (8,3), (8,3))
+    vertices, conn = get_sphere_template( 8 )
+    assert np.allclose( np.sum(vertices*vertices, axis=1), 1.0 )
+    assert conn.shape == (128,3) and (conn.max() == len(vertices)-1)
+
+    n = 8
+    points1 = [ [0,0,0], [5,0,0], [0,5,1] ]
+    points2 = [ [0,0,3], [5,2,0], [4,5,1] ]
+    radii = [ 0.5, 1.0, 0.25 ]
+    capped = [ (True,True), (True,False), (False,True) ]
+    colors = [ [1,0,0,1], [0,1,0,1], [0,0,1,1] ]
+    cylinder_set = VisGeometryCylinderSet( "set", radii, points1, points2, num_sides=n, capped=capped, colors=colors )
+    cylinders = []
+    for i in range(3):
+        cylinder = VisGeometryCylinder( "cylinder", radii[i], points1[i], points2[i], num_sides=n, capped=capped[i] )
+        cylinder.color = colors[i]
+        cylinders.append( cylinder )
+    assert cylinder_set.num_vertices == len(cylinder_set.vertices) == len(cylinder_set.normals) == 3*(4*n+2)
+    set_items = cylinder_set.get_batch_items()
+    items = [ item for cylinder in cylinders for item in cylinder.get_batch_items() ]
+    assert sum(np.size(item.indices) for item in set_items) == sum(3*cylinder.num_tri for cylinder in cylinders)
+    assert match_triangles( get_batch_triangles(set_items), get_batch_triangles(items) )
+
+    centers = [ [0,0,0], [3,0,0], [0,3,1] ]
+    sphere_set = VisGeometrySphereSet( "set", centers, radii, num_sides=n, colors=colors )
+    spheres = []
+    for i in range(3):
+        sphere = VisGeometrySphere( "sphere", centers[i], radii[i], num_sides=n )
+        sphere.color = colors[i]
+        spheres.append( sphere )
+    assert sphere_set.num_vertices == len(sphere_set.vertices) == len(sphere_set.normals) == 3*len(vertices)
+    set_items = sphere_set.get_batch_items()
+    items = [ item for sphere in spheres for item in sphere.get_batch_items() ]
+    assert sum(np.size(item.indices) for item in set_items) == sum(np.size(item.indices) for item in items)
+    assert match_triangles( get_batch_triangles(set_items), get_batch_triangles(items) )
+
+    # Pick each cylinder across its middle and along its axis, and each sphere through its center.
+    for geometry_set, geometry in [ (cylinder_set, cylinders), (sphere_set, spheres) ]:
+        for i,geom in enumerate(geometry):
+            if geometry_set is cylinder_set:
+                center = (np.array(points1[i]) + np.array(points2[i])) / 2.0
+                axis = cylinder_set.unit_axes[i]
+                lines = [ (center + 10*u, center - 10*u) for u in compute_bases(np.array([axis]))[0] ]
+                lines.append( (np.array(points1[i]) - 2*axis, np.array(points2[i]) + 2*axis) )
+            else:
+                center = np.array(centers[i])
+                lines = [ (center + [0,0,10], center - [0,0,10]) ]
+            for point1, point2 in lines:
+                assert geometry_set.intersect_line( list(point1), list(point2) )
+                assert geom.intersect_line( list(point1), list(point2) )
+                assert geometry_set.selected_entity == geometry_set.intersect_index == i
+                assert np.allclose( geometry_set.intersect_point, geom.intersect_point )
+        #__for i,geom in enumerate(geometry)
+        assert not geometry_set.intersect_line( [-10,-10,-10], [-10,10,-10] )
+
+def test_geometry_set_data( glut_stub, tmpdir, monkeypatch, caplog ):
+    """ Check that the cylinder sets of the helix and strand domain reps map each picked cylinder to its domain. """
+    from nanodesign.visualizer.model import VisModel
+    monkeypatch.chdir( tmpdir )
+    model = VisModel( "fourhelix.json", None, None, None, None )
+    dna_structure = read_structure( "fourhelix.json" ).dna_structure
+    model.set_structure( dna_structure, None )
+    domain_list = dna_structure.domain_list
+
+    def check_domains_pick( geom, domains, radius, first_marker ):
+        """ Check that each cylinder is placed at its domain and that picking it selects the domain. """
+        for i,domain in enumerate(domains):
+            sign = 1.0 if domain.strand.is_scaffold else -1.0
+            point1,point2 = [ point + [0.0, 0.0, sign*radius] for point in domain.get_end_points() ]
+            assert np.allclose( geom.points2[i], point2 )
+            if not (first_marker and (i == 0)):
+                assert np.allclose( geom.points1[i], point1 )
+            center = (geom.points1[i] + geom.points2[i]) / 2.0
+            offset = [0.0, 0.0, sign*1.5*radius]
+            assert geom.intersect_line( list(center + offset), list(center - offset) )
+            assert geom.intersect_index == i
+            caplog.clear()
+            geom.selected_callback( geom, geom.intersect_index )
+            assert ("Domain ID %d " % domain.id) in caplog.text
+        #__for i,domain in enumerate(domains)
+
+    for helix in model.helices.values():
+        helix.create_domains_rep()
+        geom = helix.representations["domains"][0]
+        assert geom.data == list(helix.vhelix.get_domain_ids())
+        check_domains_pick( geom, [ domain_list[id] for id in geom.data ], 
+            dna_structure.dna_parameters.helix_radius / 2.0, False )
+    for strand in model.strands.values():
+        strand.create_domains_rep()
+        geom = strand.representations["domains"][-1]
+        assert geom.data == [ (i, domain.id) for i,domain in enumerate(strand.dna_strand.domain_list) ]
+        check_domains_pick( geom, strand.dna_strand.domain_list, 0.2, True )
+
+def test_helix_strands_lod( glut_stub, tmpdir, monkeypatch ):
+    """ Check that the level of detail proxy of the helix strands rep of a circular strand closes the strand path. """
+    from nanodesign.visualizer.helix import VisHelixRepType
+    from nanodesign.visualizer.model import VisModel
+    from nanodesign.visualizer.strand import VisStrand
+    monkeypatch.chdir( tmpdir )
+    model = VisModel( "fourhelix.json", None, None, None, None )
+    dna_structure = read_structure( "fourhelix.json" ).dna_structure
+    model.set_structure( dna_structure, None )
+    for strand in dna_structure.strands:
+        if strand.is_scaffold:
+            continue
+        for is_circular in [ False, True ]:
+            strand.is_circular = is_circular
+            base_coords = strand.get_base_coords()
+            indexes = get_domain_end_indexes( strand.tour, is_circular )
+            strand_lod_path = VisStrand( model, model.graphics, dna_structure, strand ).get_lod_path()
+            for helix in model.helices.values():
+                if helix.id not in strand.helix_list:
+                    continue
+                helix.create_strands_rep()
+                geom = [ geom for geom in helix.representations[VisHelixRepType.STRANDS] if geom.data is strand ][0]
+                assert geom.num_vertices == len(base_coords) + is_circular
+                assert np.allclose( geom.vertices[-1], base_coords[-1 + is_circular] )
+                assert np.allclose( geom.lod_proxy.vertices, geom.vertices[indexes] )
+                assert np.allclose( geom.lod_proxy.vertices, strand_lod_path.vertices )
+            #__for helix in model.helices.values()
+        #__for is_circular in [ False, True ]
+    #__for strand in dna_structure.strands